@@ -7,59 +7,15 @@ between streamlit_app and ui_helpers.
 
 from typing import Dict, Any, Optional
 import streamlit as st
-import os
-import json
-import hashlib
-import tempfile
 
-# Cache utilities (moved from streamlit_app to avoid circular import)
-TEMP_DIR = os.path.join(tempfile.gettempdir(), "pdf_processor_cache")
-os.makedirs(TEMP_DIR, exist_ok=True)
-
-
-def get_file_hash(file_bytes: bytes, params: dict) -> str:
-	"""Generate hash based on file content and parameters."""
-	content = file_bytes + json.dumps(params, sort_keys=True).encode('utf-8')
-	return hashlib.md5(content).hexdigest()
-
-
-def save_result_to_file(file_hash: str, result: dict) -> str:
-	"""Save processing result to temporary file."""
-	filepath = os.path.join(TEMP_DIR, f"{file_hash}.json")
-	with open(filepath, 'w', encoding='utf-8') as f:
-		# Don't save pdf_bytes to file, only save other information
-		result_copy = result.copy()
-		result_copy.pop('pdf_bytes', None)
-		json.dump(result_copy, f, ensure_ascii=False, indent=2)
-	return filepath
-
-
-def load_result_from_file(file_hash: str) -> Optional[Dict[str, Any]]:
-	"""Load processing result from temporary file."""
-	filepath = os.path.join(TEMP_DIR, f"{file_hash}.json")
-	if not os.path.exists(filepath):
-		return None
-	try:
-		with open(filepath, 'r', encoding='utf-8') as f:
-			return json.load(f)
-	except (json.JSONDecodeError, UnicodeDecodeError) as e:
-		# Log warning but don't raise - corrupted cache should be handled gracefully
-		try:
-			import logging
-			logging.getLogger(__name__).warning(f"Failed to load cache file {filepath}: {e}")
-			# Try to remove corrupted cache file
-			os.remove(filepath)
-		except OSError:
-			pass
-		return None
-	except Exception as e:
-		# Log unexpected errors but don't crash
-		try:
-			import logging
-			logging.getLogger(__name__).error(f"Unexpected error loading cache file {filepath}: {e}", exc_info=True)
-		except Exception:
-			pass
-		return None
+# Cache utilities live in the UI-free services layer; re-exported here for
+# backward compatibility (streamlit_app, ui_helpers and handlers import them from here)
+from app.services.result_cache import (
+	TEMP_DIR,
+	get_file_hash,
+	save_result_to_file,
+	load_result_from_file,
+)
 
 
 @st.cache_data
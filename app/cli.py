@@ -0,0 +1,275 @@
+"""
+Headless command-line entry point.
+
+Runs batches without Streamlit and streams progress as JSON lines on stdout:
+
+    python -m app.cli process slides/ extra.pdf -o out/ --mode pdf --schedule round_robin
+
+Multi-user deployments can instead push work through the shared job queue:
+
+    python -m app.cli worker --processes 4 --api-concurrency 50
+    python -m app.cli submit slides/*.pdf --mode html
+    python -m app.cli status
+
+Credentials and defaults come from the environment / .env (see AppConfig.from_env);
+command-line options override them.
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+# Allow `python app/cli.py` as well as `python -m app.cli`
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+from app.config import AppConfig
+from app.services.batch_pipeline import MODE_ALIASES, run_batch
+from app.services.constants import BATCH_SCHEDULER_MAX_CONCURRENCY, BATCH_SCHEDULER_POLICY
+from app.services.job_queue import JobQueue, run_worker, start_workers
+
+
+def collect_pdf_paths(inputs: List[str], recursive: bool = False) -> List[str]:
+    """Expand files, directories and glob patterns into a de-duplicated list of PDF paths."""
+    paths: List[str] = []
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = os.path.join(item, "**", "*.pdf") if recursive else os.path.join(item, "*.pdf")
+            paths.extend(glob.glob(pattern, recursive=recursive))
+        elif any(ch in item for ch in "*?["):
+            paths.extend(p for p in glob.glob(item, recursive=recursive) if p.lower().endswith(".pdf"))
+        else:
+            paths.append(item)
+    # Preserve order, drop duplicates
+    seen = set()
+    unique = []
+    for path in paths:
+        key = os.path.abspath(path)
+        if key not in seen:
+            seen.add(key)
+            unique.append(path)
+    return unique
+
+
+def build_params(args: argparse.Namespace) -> Dict[str, Any]:
+    """Merge environment configuration with command-line overrides."""
+    config = AppConfig.from_env()
+    overrides = {
+        "llm_provider": args.provider,
+        "api_key": args.api_key,
+        "api_base": args.api_base,
+        "model_name": args.model,
+        "user_prompt": args.prompt,
+        "dpi": args.dpi,
+        "concurrency": args.concurrency,
+        "font_size": args.font_size,
+        "render_mode": args.render_mode,
+        "cjk_font_name": args.font_name,
+        "markdown_title": args.title,
+    }
+    for key, value in overrides.items():
+        if value is not None:
+            setattr(config, key, value)
+    config.output_mode = MODE_ALIASES[args.mode]
+    if args.use_context:
+        config.use_context = True
+    if args.external_assets:
+        config.embed_images = False
+    # Re-run validation on the merged values
+    config.__post_init__()
+    params = config.to_dict()
+    params["auto_retry_failed_pages"] = not args.no_retry
+    return params
+
+
+def _print_event(event: Dict[str, Any]) -> None:
+    sys.stdout.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+    sys.stdout.flush()
+
+
+def cmd_process(args: argparse.Namespace) -> int:
+    pdf_paths = collect_pdf_paths(args.inputs, recursive=args.recursive)
+    if not pdf_paths:
+        _print_event({"event": "error", "message": "no PDF files found"})
+        return 2
+    missing = [p for p in pdf_paths if not os.path.isfile(p)]
+    if missing:
+        _print_event({"event": "error", "message": "files not found", "files": missing})
+        return 2
+
+    try:
+        params = build_params(args)
+    except ValueError as e:
+        _print_event({"event": "error", "message": str(e)})
+        return 2
+    if not params.get("api_key"):
+        _print_event({"event": "error", "message": "API key missing: set GEMINI_API_KEY / OPENAI_API_KEY or pass --api-key"})
+        return 2
+
+    results = run_batch(
+        pdf_paths,
+        params,
+        output_dir=args.output_dir,
+        workers=args.workers,
+        on_event=_print_event if not args.quiet else None,
+        use_journal=not args.no_journal,
+        schedule=None if args.schedule == "threads" else args.schedule,
+        max_concurrency=args.max_concurrency,
+    )
+    failed = [path for path, summary in results.items() if summary["status"] != "completed"]
+    return 1 if failed else 0
+
+
+def cmd_submit(args: argparse.Namespace) -> int:
+    pdf_paths = collect_pdf_paths(args.inputs, recursive=args.recursive)
+    missing = [p for p in pdf_paths if not os.path.isfile(p)]
+    if not pdf_paths or missing:
+        _print_event({"event": "error", "message": "no PDF files found", "files": missing})
+        return 2
+    try:
+        params = build_params(args)
+    except ValueError as e:
+        _print_event({"event": "error", "message": str(e)})
+        return 2
+
+    queue = JobQueue(args.queue_db)
+    for path in pdf_paths:
+        with open(path, "rb") as f:
+            job_id = queue.submit(
+                f.read(),
+                os.path.basename(path),
+                params,
+                output_dir=os.path.abspath(args.output_dir) if args.output_dir else None,
+            )
+        _print_event({"event": "submitted", "job": job_id, "file": path})
+    return 0
+
+
+def cmd_status(args: argparse.Namespace) -> int:
+    queue = JobQueue(args.queue_db)
+    jobs = [queue.get(args.job)] if args.job else queue.list_jobs(status=args.status, limit=args.limit)
+    for job in jobs:
+        if job is None:
+            _print_event({"event": "error", "message": f"unknown job {args.job}"})
+            return 2
+        _print_event({
+            "event": "job",
+            "job": job["id"],
+            "file": job["filename"],
+            "status": job["status"],
+            "done": job["progress_done"],
+            "total": job["progress_total"],
+            "error": job["error"],
+            "outputs": (job["result"] or {}).get("outputs", []),
+        })
+    return 0
+
+
+def cmd_worker(args: argparse.Namespace) -> int:
+    queue = JobQueue(args.queue_db)
+    budgets = {
+        "max_running_jobs": args.max_running_jobs,
+        "api_concurrency": args.api_concurrency,
+        "api_rpm": args.api_rpm,
+    }
+    budgets = {key: value for key, value in budgets.items() if value is not None}
+    if budgets:
+        queue.set_budgets(**budgets)
+    _print_event({"event": "workers_start", "processes": args.processes, "queue": queue.db_path,
+                  **queue.get_budgets()})
+
+    if args.processes <= 1:
+        try:
+            run_worker(queue.db_path, poll_interval=args.poll_interval)
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    processes, stop_event = start_workers(queue.db_path, args.processes, poll_interval=args.poll_interval)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        stop_event.set()
+        for process in processes:
+            process.join()
+    return 0
+
+
+def _add_generation_options(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--mode", choices=sorted(MODE_ALIASES), default="pdf", help="output mode (default: pdf)")
+    p.add_argument("--concurrency", type=int, help="page-level LLM concurrency per file")
+    p.add_argument("--recursive", action="store_true", help="search directories recursively")
+    p.add_argument("--provider", choices=["gemini", "openai"], help="LLM provider")
+    p.add_argument("--api-key", help="API key (defaults to environment)")
+    p.add_argument("--api-base", help="OpenAI-compatible API base URL")
+    p.add_argument("--model", help="model name")
+    p.add_argument("--prompt", help="explanation prompt")
+    p.add_argument("--use-context", action="store_true", help="send previous/next page as context")
+    p.add_argument("--dpi", type=int, help="render DPI for LLM input")
+    p.add_argument("--font-size", type=int, help="explanation font size")
+    p.add_argument("--font-name", help="CJK font name")
+    p.add_argument("--render-mode", choices=["text", "markdown", "empty_right"], help="PDF explanation render mode")
+    p.add_argument("--title", help="document title for markdown/HTML outputs")
+    p.add_argument("--external-assets", action="store_true",
+                   help="html modes: write page screenshots (or split pdf2htmlEX fonts and pages) "
+                        "to <name>_assets/ and lazy-load them instead of embedding everything")
+    p.add_argument("--no-retry", action="store_true", help="do not auto-retry failed pages")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="PDF 讲解流 headless batch runner")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("process", help="generate explanations and outputs for PDFs")
+    p.add_argument("inputs", nargs="+", help="PDF files, directories or glob patterns")
+    p.add_argument("-o", "--output-dir", default="output", help="directory for generated files (default: output)")
+    p.add_argument("--workers", type=int, help="files processed concurrently (default: CPU count, at least 4)")
+    p.add_argument("--schedule", choices=["round_robin", "srf", "threads"], default=BATCH_SCHEDULER_POLICY,
+                   help="page dispatch across files: round-robin, shortest-remaining-first, "
+                        "or one event loop per file (default: %(default)s)")
+    p.add_argument("--max-concurrency", type=int, default=BATCH_SCHEDULER_MAX_CONCURRENCY,
+                   help="pages in flight across the whole batch (default: %(default)s)")
+    _add_generation_options(p)
+    p.add_argument("--no-journal", action="store_true", help="disable per-page checkpoint journal")
+    p.add_argument("--quiet", action="store_true", help="do not stream progress events")
+    p.set_defaults(func=cmd_process)
+
+    queue_db_help = "job queue database (default: <tmp>/pdf_processor_queue/queue.db)"
+
+    p = sub.add_parser("submit", help="enqueue PDFs for queue workers")
+    p.add_argument("inputs", nargs="+", help="PDF files, directories or glob patterns")
+    p.add_argument("-o", "--output-dir", help="directory for generated files (default: per-job directory)")
+    p.add_argument("--queue-db", help=queue_db_help)
+    _add_generation_options(p)
+    p.set_defaults(func=cmd_submit)
+
+    p = sub.add_parser("status", help="show queued, running and finished jobs")
+    p.add_argument("job", nargs="?", help="job id (default: list recent jobs)")
+    p.add_argument("--status", choices=["queued", "running", "completed", "failed", "cancelled"])
+    p.add_argument("--limit", type=int, default=100)
+    p.add_argument("--queue-db", help=queue_db_help)
+    p.set_defaults(func=cmd_status)
+
+    p = sub.add_parser("worker", help="run queue worker processes")
+    p.add_argument("--processes", type=int, default=1, help="worker processes to start (default: 1)")
+    p.add_argument("--max-running-jobs", type=int, help="jobs running at once across all workers")
+    p.add_argument("--api-concurrency", type=int, help="LLM requests in flight across all workers")
+    p.add_argument("--api-rpm", type=int, help="LLM requests per minute across all workers")
+    p.add_argument("--poll-interval", type=float, default=1.0, help="seconds between queue polls")
+    p.add_argument("--queue-db", help=queue_db_help)
+    p.set_defaults(func=cmd_worker)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,422 @@
+"""
+Headless batch pipeline.
+
+Runs the full generate → compose flow for many PDFs without Streamlit:
+explanations are generated with the services layer, checkpointed to the
+job journal, cached in the result cache and written to an output
+directory. Progress is reported as plain event dicts so callers (the CLI,
+schedulers, tests) can stream them as JSON lines.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from . import pdf_processor
+from .batch_scheduler import PageScheduler
+from .constants import BATCH_SCHEDULER_FILE_WORKERS, BATCH_SCHEDULER_MAX_CONCURRENCY, BATCH_SCHEDULER_POLICY
+from .content_hash import get_content_hash
+from .document_info import DocumentInfo, get_document_info
+from .html_stream import write_html_chunks
+from .job_journal import FileJournal, JobJournal
+from .logger import get_logger
+from .result_cache import get_file_hash, load_result_from_file, save_result_to_file
+
+logger = get_logger()
+
+# CLI-friendly aliases for the output modes used throughout the app
+MODE_ALIASES = {
+    "pdf": "PDF讲解版",
+    "markdown": "Markdown截图讲解",
+    "html": "HTML截图版",
+    "pdf2htmlex": "HTML-pdf2htmlEX版",
+}
+
+EventCallback = Callable[[Dict[str, Any]], None]
+
+
+def _emit(on_event: Optional[EventCallback], event: str, **fields: Any) -> None:
+    if on_event is None:
+        return
+    try:
+        on_event({"event": event, "ts": round(time.time(), 3), **fields})
+    except Exception as e:
+        logger.warning(f"Event callback failed for {event}: {e}")
+
+
+def _base_name(filename: str) -> str:
+    return os.path.splitext(os.path.basename(filename))[0]
+
+
+def explanation_kwargs(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Build generate_explanations keyword arguments from a params dict."""
+    return {
+        "api_key": params["api_key"],
+        "model_name": params["model_name"],
+        "user_prompt": params["user_prompt"],
+        "temperature": params["temperature"],
+        "max_tokens": params["max_tokens"],
+        "dpi": params["dpi"],
+        "concurrency": params["concurrency"],
+        "rpm_limit": params["rpm_limit"],
+        "tpm_budget": params["tpm_budget"],
+        "rpd_limit": params["rpd_limit"],
+        "use_context": params.get("use_context", False),
+        "context_prompt": params.get("context_prompt", None),
+        "llm_provider": params.get("llm_provider", "gemini"),
+        "api_base": params.get("api_base"),
+        "auto_retry_failed_pages": params.get("auto_retry_failed_pages", True),
+        "max_auto_retries": params.get("max_auto_retries", 2),
+    }
+
+
+def render_output(
+    src_bytes: bytes,
+    filename: str,
+    explanations: Dict[int, str],
+    params: Dict[str, Any],
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    on_page_status: Optional[Callable[[int, str, Optional[str]], None]] = None,
+    document_info: Optional[DocumentInfo] = None,
+) -> Dict[str, Any]:
+    """
+    Compose the final document for one file from its explanations.
+
+    Args:
+        src_bytes: Source PDF bytes
+        filename: Source file name (used for the default title)
+        explanations: Page explanations (0-indexed)
+        params: Processing parameters
+        on_progress: Progress callback for the compose stage
+        on_page_status: Page status callback for the compose stage
+        document_info: Pre-flight analysis of src_bytes (optional)
+
+    Returns:
+        Partial result dict with "pdf_bytes", "markdown_content" or
+        "html_chunks" (a lazy chunk stream consumed by write_outputs; with
+        embed_images off it fills the temporary "assets_dir" as it goes)
+    """
+    output_mode = params.get("output_mode", "PDF讲解版")
+    title = (params.get("markdown_title") or "").strip() or _base_name(filename)
+
+    if output_mode == "Markdown截图讲解":
+        markdown_content, images_dir = pdf_processor.generate_markdown_with_screenshots(
+            src_bytes=src_bytes,
+            explanations=explanations,
+            screenshot_dpi=params.get("screenshot_dpi", 150),
+            embed_images=params.get("embed_images", True),
+            title=params.get("markdown_title", "PDF文档讲解"),
+            on_progress=on_progress,
+            on_page_status=on_page_status,
+            document_info=document_info,
+        )
+        return {"markdown_content": markdown_content, "images_dir": images_dir}
+
+    html_kwargs = dict(
+        src_bytes=src_bytes,
+        explanations=explanations,
+        title=title,
+        font_name=params.get("cjk_font_name", "SimHei"),
+        font_size=params.get("font_size", 14),
+        line_spacing=params.get("line_spacing", 1.2),
+        column_count=params.get("html_column_count", 2),
+        column_gap=params.get("html_column_gap", 20),
+        show_column_rule=params.get("html_show_column_rule", True),
+        on_progress=on_progress,
+        on_page_status=on_page_status,
+    )
+    if output_mode == "HTML截图版":
+        if params.get("embed_images", True):
+            return {"html_chunks": pdf_processor.iter_html_screenshot_document(
+                screenshot_dpi=params.get("screenshot_dpi", 150), document_info=document_info, **html_kwargs
+            )}
+        assets_url = f"{_base_name(filename)}_assets"
+        assets_dir = tempfile.mkdtemp(prefix="html_assets_")
+        return {
+            "html_chunks": pdf_processor.iter_html_screenshot_document(
+                screenshot_dpi=params.get("screenshot_dpi", 150),
+                document_info=document_info,
+                embed_images=False,
+                assets_dir=assets_dir,
+                assets_url=assets_url,
+                **html_kwargs
+            ),
+            "assets_dir": assets_dir,
+            "assets_url": assets_url,
+        }
+    if output_mode == "HTML-pdf2htmlEX版":
+        if params.get("embed_images", True):
+            return {"html_chunks": pdf_processor.iter_html_pdf2htmlex_document(**html_kwargs)}
+        assets_url = f"{_base_name(filename)}_assets"
+        assets_dir = tempfile.mkdtemp(prefix="html_assets_")
+        return {
+            "html_chunks": pdf_processor.iter_html_pdf2htmlex_document(
+                embed_images=False,
+                assets_dir=assets_dir,
+                assets_url=assets_url,
+                **html_kwargs
+            ),
+            "assets_dir": assets_dir,
+            "assets_url": assets_url,
+        }
+
+    pdf_bytes = pdf_processor.compose_pdf(
+        src_bytes,
+        explanations,
+        params["right_ratio"],
+        params["font_size"],
+        font_name=(params.get("cjk_font_name") or "SimHei"),
+        render_mode=params.get("render_mode", "markdown"),
+        line_spacing=params["line_spacing"],
+        column_padding=params.get("column_padding", 10),
+        document_info=document_info,
+    )
+    return {"pdf_bytes": pdf_bytes}
+
+
+def process_document(
+    src_bytes: bytes,
+    filename: str,
+    params: Dict[str, Any],
+    on_event: Optional[EventCallback] = None,
+    journal: Optional[FileJournal] = None,
+    content_hash: Optional[str] = None,
+    scheduler: Optional[PageScheduler] = None,
+    document_info: Optional[DocumentInfo] = None,
+) -> Dict[str, Any]:
+    """
+    Generate explanations and compose the output for a single PDF.
+
+    Args:
+        src_bytes: Source PDF bytes
+        filename: File name (reported in events)
+        params: Processing parameters (see AppConfig.to_dict)
+        on_event: Receives progress event dicts
+        journal: FileJournal for per-page checkpointing (optional)
+        content_hash: Precomputed content digest of src_bytes (optional)
+        scheduler: Batch PageScheduler shared with the other files (optional)
+        document_info: Pre-flight analysis of src_bytes (optional, looked up
+            by content hash otherwise)
+
+    Returns:
+        Result dict with "status", "explanations", "failed_pages" and the
+        mode-specific output ("pdf_bytes", "markdown_content" or "html_chunks")
+    """
+    is_valid, validation_error = pdf_processor.validate_pdf_file(src_bytes, document_info)
+    if not is_valid:
+        return {"status": "failed", "explanations": {}, "failed_pages": [],
+                "error": f"PDF文件验证失败: {validation_error}"}
+    if document_info is None:
+        document_info = get_document_info(src_bytes, content_hash)
+
+    file_hash = get_file_hash(src_bytes, params, content_hash=content_hash)
+
+    def on_progress(done: int, total: int) -> None:
+        _emit(on_event, "progress", file=filename, done=done, total=total)
+
+    def on_page_status(page_index: int, status: str, error: Optional[str]) -> None:
+        _emit(on_event, "page", file=filename, page=page_index + 1, status=status, error=error)
+
+    def on_log(message: str) -> None:
+        _emit(on_event, "log", file=filename, message=message)
+
+    try:
+        cached = load_result_from_file(file_hash)
+        # Results with failed pages are regenerated (the journal keeps the pages that succeeded)
+        if (cached and cached.get("status") == "completed" and cached.get("explanations")
+                and not cached.get("failed_pages")):
+            explanations = {int(k): v for k, v in cached["explanations"].items()}
+            failed_pages = []
+            _emit(on_event, "cache_hit", file=filename)
+        else:
+            explanations, _preview_images, failed_pages = pdf_processor.generate_explanations(
+                src_bytes=src_bytes,
+                on_progress=on_progress,
+                on_log=on_log,
+                on_page_status=on_page_status,
+                scheduler=scheduler,
+                document_info=document_info,
+                **explanation_kwargs(params),
+                **(journal.generation_kwargs() if journal is not None else {}),
+            )
+            if not explanations:
+                return {"status": "failed", "explanations": {}, "failed_pages": failed_pages,
+                        "error": "生成讲解失败"}
+            if not failed_pages:
+                save_result_to_file(file_hash, {
+                    "status": "completed",
+                    "explanations": explanations,
+                    "failed_pages": [],
+                })
+
+        _emit(on_event, "compose", file=filename)
+        result = {
+            "status": "completed",
+            "explanations": explanations,
+            "failed_pages": failed_pages,
+        }
+        result.update(render_output(src_bytes, filename, explanations, params, document_info=document_info))
+        return result
+    except Exception as e:
+        logger.error(f"处理 {filename} 时发生异常: {e}", exc_info=True)
+        return {"status": "failed", "explanations": {}, "failed_pages": [], "error": str(e)}
+
+
+def write_outputs(filename: str, result: Dict[str, Any], output_dir: str) -> List[str]:
+    """
+    Write a completed result to disk, using the same names as the ZIP downloads.
+
+    HTML chunk streams are rendered page by page straight into the file.
+
+    Returns:
+        Paths of the written files
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    base_name = _base_name(filename)
+    written: List[str] = []
+
+    def _write(name: str, data: bytes) -> None:
+        path = os.path.join(output_dir, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        written.append(path)
+
+    if result.get("pdf_bytes"):
+        _write(f"{base_name}讲解版.pdf", result["pdf_bytes"])
+    if result.get("markdown_content"):
+        _write(f"{base_name}讲解文档.md", result["markdown_content"].encode("utf-8"))
+    if result.get("html_content"):
+        _write(f"{base_name}讲解文档.html", result["html_content"].encode("utf-8"))
+    if result.get("html_chunks") is not None:
+        path = os.path.join(output_dir, f"{base_name}讲解文档.html")
+        write_html_chunks(result["html_chunks"], path)
+        written.append(path)
+        if result.get("assets_dir"):
+            # Page images were rendered into a temp dir while streaming; replace
+            # the whole target so an earlier, longer run leaves no extra pages
+            target = os.path.join(output_dir, result.get("assets_url") or f"{base_name}_assets")
+            shutil.rmtree(target, ignore_errors=True)
+            shutil.copytree(result["assets_dir"], target)
+            shutil.rmtree(result["assets_dir"], ignore_errors=True)
+            written.append(target)
+    if result.get("explanations"):
+        _write(f"{base_name}.json", json.dumps(
+            result["explanations"], ensure_ascii=False, indent=2
+        ).encode("utf-8"))
+    return written
+
+
+def run_batch(
+    pdf_paths: List[str],
+    params: Dict[str, Any],
+    output_dir: str,
+    workers: Optional[int] = None,
+    on_event: Optional[EventCallback] = None,
+    use_journal: bool = True,
+    schedule: Optional[str] = BATCH_SCHEDULER_POLICY,
+    max_concurrency: int = BATCH_SCHEDULER_MAX_CONCURRENCY,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Process a batch of PDF files from disk and write the outputs.
+
+    Args:
+        pdf_paths: Paths of the PDFs to process
+        params: Processing parameters
+        output_dir: Directory that receives the outputs
+        workers: Number of files processed concurrently (default:
+            BATCH_SCHEDULER_FILE_WORKERS / CPU count, at least 4, when scheduling;
+            otherwise 4).
+            Each file renders its pages before they are queued, so this bounds
+            the page images held in memory; the scheduler bounds LLM calls
+        on_event: Receives progress event dicts (thread-safe delivery)
+        use_journal: Checkpoint pages to the job journal and resume from it
+        schedule: Page scheduling policy across files ("round_robin" or "srf");
+            None gives every file its own event loop
+        max_concurrency: Pages in flight across the batch when scheduling
+
+    Returns:
+        Mapping of file path to a summary dict (status, outputs, failed pages, error)
+    """
+    started = time.time()
+    event_lock = threading.Lock()
+
+    def emit(event: Dict[str, Any]) -> None:
+        if on_event is not None:
+            with event_lock:
+                on_event(event)
+
+    hashes: Dict[str, str] = {}
+    for path in pdf_paths:
+        with open(path, "rb") as f:
+            hashes[path] = get_content_hash(f)
+
+    journals: Dict[str, FileJournal] = (
+        {path: JobJournal.for_file(hashes[path], params) for path in pdf_paths} if use_journal else {}
+    )
+    _emit(emit, "batch_start", files=len(pdf_paths), output_dir=output_dir,
+          mode=params.get("output_mode"),
+          journals=[j.journal.path for j in journals.values()] if use_journal else None,
+          schedule=schedule)
+    scheduler = PageScheduler(max_concurrency, policy=schedule) if schedule else None
+    if workers is None:
+        workers = (BATCH_SCHEDULER_FILE_WORKERS or max(4, os.cpu_count() or 1)) if scheduler is not None else 4
+
+    def run_one(path: str) -> Tuple[str, Dict[str, Any]]:
+        with open(path, "rb") as f:
+            src_bytes = f.read()
+        filename = os.path.basename(path)
+        try:
+            document_info = get_document_info(src_bytes, hashes[path])
+            total_pages = document_info.page_count
+        except Exception:
+            document_info, total_pages = None, 0
+        file_journal = journals.get(path)
+        if file_journal is not None:
+            file_journal.start(filename, total_pages)
+        _emit(emit, "file_start", file=filename, path=path, pages=total_pages)
+        file_started = time.time()
+        result = process_document(src_bytes, filename, params, on_event=emit,
+                                  journal=file_journal, content_hash=hashes[path],
+                                  scheduler=scheduler, document_info=document_info)
+        summary: Dict[str, Any] = {
+            "status": result.get("status"),
+            "failed_pages": result.get("failed_pages", []),
+            "error": result.get("error"),
+            "outputs": [],
+        }
+        if result.get("status") == "completed":
+            try:
+                summary["outputs"] = write_outputs(filename, result, output_dir)
+            except Exception as e:
+                logger.error(f"写入 {filename} 输出失败: {e}", exc_info=True)
+                summary.update(status="failed", error=f"写入输出失败: {e}")
+        if file_journal is not None:
+            file_journal.finish(summary["status"] or "failed", summary["failed_pages"])
+            if summary["status"] == "completed" and not summary["failed_pages"]:
+                file_journal.discard()
+        _emit(emit, "file_done", file=filename, elapsed=round(time.time() - file_started, 2), **summary)
+        return path, summary
+
+    results: Dict[str, Dict[str, Any]] = {}
+    if scheduler is not None:
+        scheduler.start()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(pdf_paths) or 1))) as executor:
+            futures = [executor.submit(run_one, path) for path in pdf_paths]
+            for future in as_completed(futures):
+                path, summary = future.result()
+                results[path] = summary
+    finally:
+        if scheduler is not None:
+            scheduler.close()
+
+    completed = sum(1 for r in results.values() if r["status"] == "completed")
+    failed = len(results) - completed
+    _emit(emit, "batch_done", completed=completed, failed=failed,
+          elapsed=round(time.time() - started, 2))
+    return results
@@ -1,11 +1,15 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import multiprocessing
+import os
 import re
-from typing import Dict, List, Optional, Tuple
-
-import fitz  # PyMuPDF
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Set, Tuple
 
+from .constants import RECOMPOSE_MEMORY_BUDGET_MB, RECOMPOSE_MEMORY_FACTOR, RECOMPOSE_WORKERS
 from .pdf_composer import compose_pdf
 from .pdf_validator import safe_utf8_loads
 from .logger import get_logger
@@ -51,227 +55,397 @@ def match_pdf_json_files(pdf_files: List[str], json_files: List[str]) -> Dict[st
     return matches
 
 
-def batch_recompose_from_json(pdf_files: List[Tuple[str, bytes]], json_files: List[Tuple[str, bytes]],
-                            right_ratio: float, font_size: int,
-                            font_name: Optional[str] = None,
-                            render_mode: str = "text", line_spacing: float = 1.4, column_padding: int = 10) -> Dict[str, Dict]:
+def _failed(error: str) -> Dict:
+    return {"status": "failed", "pdf_bytes": None, "explanations": {}, "error": error}
+
+
+def _recompose_one(pdf_filename: str, pdf_bytes: bytes, json_filename: str, json_bytes: bytes,
+                   options: Dict) -> Dict:
     """
-    批量根据JSON文件重新合成PDF
+    根据一个JSON文件重新合成一个PDF（进程池任务，必须可被pickle）
 
     Args:
-        pdf_files: [(filename, bytes), ...] PDF文件列表
-        json_files: [(filename, bytes), ...] JSON文件列表
-        right_ratio: 右侧留白比例
-        font_size: 字体大小
-        font_name: 字体名称（如 "SimHei"）
-        render_mode: 渲染模式
-        line_spacing: 行间距
+        pdf_filename: PDF文件名
+        pdf_bytes: PDF内容
+        json_filename: 匹配的JSON文件名
+        json_bytes: JSON内容
+        options: compose_pdf 的参数（right_ratio, font_size, font_name, ...）
 
     Returns:
-        处理结果字典
+        单个文件的处理结果字典
     """
-    logger.info('开始批量重新合成PDF，PDF文件数: %d, JSON文件数: %d, 字体大小: %d',
-                len(pdf_files), len(json_files), font_size)
+    try:
+        json_data = safe_utf8_loads(json_bytes, source=json_filename)
+        # 转换键为整数
+        explanations = {int(k): str(v) for k, v in json_data.items()}
+        logger.debug('JSON文件 %s 解析成功，包含 %d 个讲解条目', json_filename, len(explanations))
+    except json.JSONDecodeError as e:
+        logger.error('JSON文件 %s 解析失败: %s', json_filename, e)
+        return _failed(f"JSON解析失败: {str(e)}")
+    except Exception as e:
+        logger.error('处理PDF文件 %s 时发生未知错误: %s', pdf_filename, e, exc_info=True)
+        return _failed(f"处理失败: {str(e)}")
+
+    try:
+        logger.debug('开始重新合成PDF文件: %s', pdf_filename)
+        result_pdf = compose_pdf(pdf_bytes, explanations, **options)
+    except Exception as e:
+        logger.error('PDF文件 %s 合成失败: %s', pdf_filename, e, exc_info=True)
+        return _failed(f"PDF合成失败: {str(e)}")
+
+    logger.debug('PDF文件 %s 重新合成成功，大小: %d bytes', pdf_filename, len(result_pdf))
+    return {"status": "completed", "pdf_bytes": result_pdf, "explanations": explanations, "error": None}
+
+
+class _RecomposeJobs:
+    """
+    配对后的重新合成任务与内存准入控制
 
-    # 提取文件名列表用于匹配
-    pdf_filenames = [name for name, _ in pdf_files]
-    json_filenames = [name for name, _ in json_files]
+    每个任务按 (PDF + JSON 大小) × RECOMPOSE_MEMORY_FACTOR 估算峰值内存
+    （父子进程各一份输入、打开的文档以及输出PDF）。同时运行的任务估算
+    总和不超过预算；只有一个任务运行时总是放行，超大文件也能处理。
 
-    logger.debug('PDF文件名列表: %s', pdf_filenames)
-    logger.debug('JSON文件名列表: %s', json_filenames)
+    子进程崩溃（如内存不足被杀）会使整个进程池失效，当时在运行的任务
+    都会失败。这些任务放回队列并逐个单独重跑（isolated），只有单独运行时
+    仍使进程池崩溃的任务才判为失败。
+    """
 
-    # 智能匹配文件
-    matches = match_pdf_json_files(pdf_filenames, json_filenames)
+    def __init__(self, pairs: List[Tuple[str, bytes, str, bytes]], memory_budget_mb: Optional[int]):
+        # (pdf_filename, pdf_bytes, json_filename, json_bytes), largest first so big files do not finish last
+        self.pending = sorted(pairs, key=lambda job: len(job[1]) + len(job[3]), reverse=True)
+        budget_mb = RECOMPOSE_MEMORY_BUDGET_MB if memory_budget_mb is None else memory_budget_mb
+        self.budget = budget_mb * 1024 * 1024
+        self.in_flight = 0
+        self.running = 0
+        # 进程池崩溃时在运行、需要单独重跑的任务（PDF文件名）
+        self.isolated: Set[str] = set()
+
+    @staticmethod
+    def cost(job: Tuple[str, bytes, str, bytes]) -> int:
+        return (len(job[1]) + len(job[3])) * RECOMPOSE_MEMORY_FACTOR
+
+    def admit(self, limit: int) -> List[Tuple[str, bytes, str, bytes]]:
+        """取出可以立即启动的任务（最多 limit 个同时运行；有待单独重跑的任务时只运行一个）"""
+        if self.isolated:
+            limit = 1
+        admitted = []
+        while self.pending and self.running < limit:
+            cost = self.cost(self.pending[0])
+            if self.running and self.in_flight + cost > self.budget:
+                # 先尝试放入更小的任务
+                fitting = next((job for job in self.pending if self.in_flight + self.cost(job) <= self.budget), None)
+                if fitting is None:
+                    break
+                self.pending.remove(fitting)
+                job = fitting
+            else:
+                job = self.pending.pop(0)
+            self.in_flight += self.cost(job)
+            self.running += 1
+            admitted.append(job)
+        return admitted
+
+    def release(self, job: Tuple[str, bytes, str, bytes]) -> None:
+        self.in_flight -= self.cost(job)
+        self.running -= 1
+        self.isolated.discard(job[0])
+
+    def unadmit(self, job: Tuple[str, bytes, str, bytes]) -> None:
+        """撤回未能提交的任务（保留其单独重跑标记）"""
+        self.in_flight -= self.cost(job)
+        self.running -= 1
+        self.pending.insert(0, job)
+
+    def crashed(self, broken: List[Tuple[str, bytes, str, bytes]]) -> List[Tuple[str, bytes, str, bytes]]:
+        """
+        处理进程池崩溃时在运行的任务（均已 release）
+
+        Returns:
+            确定使子进程崩溃的任务：只有它一个在运行时；否则全部放回队列单独重跑
+        """
+        if len(broken) == 1:
+            return broken
+        for job in reversed(broken):
+            self.isolated.add(job[0])
+            self.pending.insert(0, job)
+        return []
+
+
+def _match_pairs(pdf_files: List[Tuple[str, bytes]], json_files: List[Tuple[str, bytes]]
+                 ) -> Tuple[List[Tuple[str, bytes, str, bytes]], List[str]]:
+    """按文件名配对，返回 (配对任务列表, 未配对的PDF文件名)"""
+    matches = match_pdf_json_files([name for name, _ in pdf_files], [name for name, _ in json_files])
     logger.info('文件匹配完成，匹配对数: %d', len(matches))
-
-    # 创建文件名到内容的映射
     pdf_content_map = {name: content for name, content in pdf_files}
     json_content_map = {name: content for name, content in json_files}
+    pairs = [(name, pdf_content_map[name], matched, json_content_map[matched])
+             for name, matched in matches.items() if matched is not None]
+    return pairs, [name for name, matched in matches.items() if matched is None]
 
-    results = {}
-    completed_count = 0
-    failed_count = 0
 
-    for pdf_filename, matched_json in matches.items():
-        logger.debug('处理PDF文件: %s', pdf_filename)
+def _compose_options(right_ratio: float, font_size: int, font_name: Optional[str], render_mode: str,
+                     line_spacing: float, column_padding: int) -> Dict:
+    return dict(right_ratio=right_ratio, font_size=font_size, font_name=font_name,
+                render_mode=render_mode, line_spacing=line_spacing, column_padding=column_padding)
 
-        result = {
-            "status": "pending",
-            "pdf_bytes": None,
-            "explanations": {},
-            "error": None
-        }
 
-        try:
-            pdf_bytes = pdf_content_map[pdf_filename]
+def _worker_count(workers: Optional[int], jobs: int) -> int:
+    return max(1, min(workers or RECOMPOSE_WORKERS or os.cpu_count() or 1, jobs))
 
-            if matched_json is None:
-                logger.warning('PDF文件 %s 未找到匹配的JSON文件', pdf_filename)
-                result["status"] = "failed"
-                result["error"] = "未找到匹配的JSON文件"
-                failed_count += 1
-            else:
-                logger.debug('为PDF文件 %s 找到匹配的JSON文件: %s', pdf_filename, matched_json)
-                json_bytes = json_content_map[matched_json]
-
-                # 解析JSON
-                try:
-                    json_data = safe_utf8_loads(json_bytes, source=matched_json)
-                    # 转换键为整数
-                    explanations = {int(k): str(v) for k, v in json_data.items()}
-                    logger.debug('JSON文件 %s 解析成功，包含 %d 个讲解条目', matched_json, len(explanations))
-
-                    # 重新合成PDF
-                    logger.debug('开始重新合成PDF文件: %s', pdf_filename)
-                    result_pdf = compose_pdf(
-                        pdf_bytes,
-                        explanations,
-                        right_ratio,
-                        font_size,
-                        font_name=font_name,
-                        render_mode=render_mode,
-                        line_spacing=line_spacing,
-                        column_padding=column_padding
-                    )
-
-                    logger.debug('PDF文件 %s 重新合成成功，大小: %d bytes', pdf_filename, len(result_pdf))
-                    result["status"] = "completed"
-                    result["pdf_bytes"] = result_pdf
-                    result["explanations"] = explanations
-                    completed_count += 1
-
-                except json.JSONDecodeError as e:
-                    logger.error('JSON文件 %s 解析失败: %s', matched_json, e)
-                    result["status"] = "failed"
-                    result["error"] = f"JSON解析失败: {str(e)}"
-                    failed_count += 1
-                except Exception as e:
-                    logger.error('PDF文件 %s 合成失败: %s', pdf_filename, e, exc_info=True)
-                    result["status"] = "failed"
-                    result["error"] = f"PDF合成失败: {str(e)}"
-                    failed_count += 1
-
-        except Exception as e:
-            logger.error('处理PDF文件 %s 时发生未知错误: %s', pdf_filename, e, exc_info=True)
-            result["status"] = "failed"
-            result["error"] = f"处理失败: {str(e)}"
-            failed_count += 1
-
-        results[pdf_filename] = result
 
-    logger.info('批量重新合成PDF完成，成功: %d, 失败: %d, 总计: %d',
-                completed_count, failed_count, len(results))
-    return results
+def _process_pool(limit: int) -> ProcessPoolExecutor:
+    # Streamlit 和调度器都有后台线程；fork 会复制持锁状态导致子进程死锁，
+    # 因此用 spawn 启动子进程（_recompose_one 必须保持为模块级函数）
+    return ProcessPoolExecutor(max_workers=limit, mp_context=multiprocessing.get_context("spawn"))
 
 
-async def batch_recompose_from_json_async(pdf_files: List[Tuple[str, bytes]], json_files: List[Tuple[str, bytes]],
-                                        right_ratio: float, font_size: int,
-                                        font_name: Optional[str] = None,
-                                        render_mode: str = "text", line_spacing: float = 1.4, column_padding: int = 10) -> Dict[str, Dict]:
+def iter_recompose_from_json(pdf_files: List[Tuple[str, bytes]], json_files: List[Tuple[str, bytes]],
+                             right_ratio: float, font_size: int,
+                             font_name: Optional[str] = None,
+                             render_mode: str = "text", line_spacing: float = 1.4, column_padding: int = 10,
+                             workers: Optional[int] = None,
+                             memory_budget_mb: Optional[int] = None) -> Iterator[Tuple[str, Dict]]:
     """
-    异步批量根据JSON文件重新合成PDF
+    并行根据JSON文件重新合成PDF，按完成顺序逐个产出结果
+
+    每个 compose_pdf 在独立进程中运行（最多 workers 个），并按估算内存
+    准入（见 _RecomposeJobs）。只有一个任务或 workers 为 1 时在当前进程中
+    运行；进程池无法使用时回退为串行合成。
 
     Args:
         pdf_files: [(filename, bytes), ...] PDF文件列表
         json_files: [(filename, bytes), ...] JSON文件列表
         right_ratio: 右侧留白比例
         font_size: 字体大小
-        font_name: 字体名称
+        font_name: 字体名称（如 "SimHei"）
         render_mode: 渲染模式
         line_spacing: 行间距
+        column_padding: 栏内边距
+        workers: 进程数（默认 RECOMPOSE_WORKERS，None 时为 CPU 核数）
+        memory_budget_mb: 同时运行任务的估算内存上限（默认 RECOMPOSE_MEMORY_BUDGET_MB）
 
-    Returns:
-        处理结果字典
+    Yields:
+        (pdf_filename, 结果字典)，结果字典同 batch_recompose_from_json
     """
-    logger.info('开始异步批量重新合成PDF，PDF文件数: %d, JSON文件数: %d, 字体大小: %d',
-                len(pdf_files), len(json_files), font_size)
+    pairs, unmatched = _match_pairs(pdf_files, json_files)
+    for pdf_filename in unmatched:
+        logger.warning('PDF文件 %s 未找到匹配的JSON文件', pdf_filename)
+        yield pdf_filename, _failed("未找到匹配的JSON文件")
+    yield from iter_recompose_pairs(pairs, right_ratio, font_size, font_name=font_name, render_mode=render_mode,
+                                    line_spacing=line_spacing, column_padding=column_padding,
+                                    workers=workers, memory_budget_mb=memory_budget_mb)
+
+
+def iter_recompose_pairs(pairs: List[Tuple[str, bytes, str, bytes]],
+                         right_ratio: float, font_size: int,
+                         font_name: Optional[str] = None,
+                         render_mode: str = "text", line_spacing: float = 1.4, column_padding: int = 10,
+                         workers: Optional[int] = None,
+                         memory_budget_mb: Optional[int] = None) -> Iterator[Tuple[str, Dict]]:
+    """
+    iter_recompose_from_json 的已配对版本（调用方已确定PDF与JSON的对应关系）
 
-    # 提取文件名列表用于匹配
-    pdf_filenames = [name for name, _ in pdf_files]
-    json_filenames = [name for name, _ in json_files]
+    Args:
+        pairs: [(pdf_filename, pdf_bytes, json_filename, json_bytes), ...]
+        其余参数同 iter_recompose_from_json
 
-    logger.debug('PDF文件名列表: %s', pdf_filenames)
-    logger.debug('JSON文件名列表: %s', json_filenames)
+    Yields:
+        (pdf_filename, 结果字典)，按完成顺序
+    """
+    jobs = _RecomposeJobs(pairs, memory_budget_mb)
+    options = _compose_options(right_ratio, font_size, font_name, render_mode, line_spacing, column_padding)
+    limit = _worker_count(workers, len(jobs.pending))
+    if limit > 1:
+        try:
+            pool = _process_pool(limit)
+        except Exception as e:
+            logger.warning('无法创建进程池，改为串行合成: %s', e)
+        else:
+            running: Dict[Future, Tuple[str, bytes, str, bytes]] = {}
+            try:
+                while jobs.pending or running:
+                    pool_broken = False
+                    for job in jobs.admit(limit):
+                        try:
+                            running[pool.submit(_recompose_one, *job, options)] = job
+                        except BrokenProcessPool:
+                            jobs.unadmit(job)
+                            pool_broken = True
+                    done, _ = wait(running, return_when=FIRST_COMPLETED) if running else (set(), set())
+                    broken = []
+                    while done:
+                        for future in done:
+                            job = running.pop(future)
+                            jobs.release(job)
+                            try:
+                                result = future.result()
+                            except BrokenProcessPool:
+                                broken.append(job)
+                                continue
+                            except Exception as e:
+                                logger.error('PDF文件 %s 合成进程失败: %s', job[0], e)
+                                result = _failed(f"PDF合成失败: {str(e)}")
+                            yield job[0], result
+                        # 进程池已失效：其余在运行的任务也会失败，收齐后再重建进程池
+                        done = wait(running).done if broken or pool_broken else set()
+                    if broken or pool_broken:
+                        for job in jobs.crashed(broken):
+                            logger.error('PDF文件 %s 合成进程崩溃', job[0])
+                            yield job[0], _failed("PDF合成失败: 合成进程意外退出")
+                        pool.shutdown(wait=False)
+                        pool = _process_pool(limit)
+            finally:
+                for future in running:
+                    future.cancel()
+                pool.shutdown(wait=True, cancel_futures=True)
+            return
+
+    while jobs.pending:
+        job = jobs.pending.pop(0)
+        yield job[0], _recompose_one(*job, options)
+
+
+async def aiter_recompose_from_json(pdf_files: List[Tuple[str, bytes]], json_files: List[Tuple[str, bytes]],
+                                    right_ratio: float, font_size: int,
+                                    font_name: Optional[str] = None,
+                                    render_mode: str = "text", line_spacing: float = 1.4,
+                                    column_padding: int = 10,
+                                    workers: Optional[int] = None,
+                                    memory_budget_mb: Optional[int] = None) -> AsyncIterator[Tuple[str, Dict]]:
+    """
+    iter_recompose_from_json 的异步版本：等待进程池结果时不阻塞事件循环
 
-    # 智能匹配文件
-    matches = match_pdf_json_files(pdf_filenames, json_filenames)
-    logger.info('文件匹配完成，匹配对数: %d', len(matches))
+    参数与产出同 iter_recompose_from_json；串行回退时每个文件在线程中合成。
+    """
+    pairs, unmatched = _match_pairs(pdf_files, json_files)
+    jobs = _RecomposeJobs(pairs, memory_budget_mb)
+    options = _compose_options(right_ratio, font_size, font_name, render_mode, line_spacing, column_padding)
+    for pdf_filename in unmatched:
+        logger.warning('PDF文件 %s 未找到匹配的JSON文件', pdf_filename)
+        yield pdf_filename, _failed("未找到匹配的JSON文件")
+
+    limit = _worker_count(workers, len(jobs.pending))
+    if limit > 1:
+        try:
+            pool = _process_pool(limit)
+        except Exception as e:
+            logger.warning('无法创建进程池，改为串行合成: %s', e)
+        else:
+            running: Dict[asyncio.Future, Tuple[str, bytes, str, bytes]] = {}
+            try:
+                while jobs.pending or running:
+                    pool_broken = False
+                    for job in jobs.admit(limit):
+                        try:
+                            running[asyncio.wrap_future(pool.submit(_recompose_one, *job, options))] = job
+                        except BrokenProcessPool:
+                            jobs.unadmit(job)
+                            pool_broken = True
+                    done = set()
+                    if running:
+                        done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                    broken = []
+                    while done:
+                        for future in done:
+                            job = running.pop(future)
+                            jobs.release(job)
+                            try:
+                                result = future.result()
+                            except BrokenProcessPool:
+                                broken.append(job)
+                                continue
+                            except Exception as e:
+                                logger.error('PDF文件 %s 合成进程失败: %s', job[0], e)
+                                result = _failed(f"PDF合成失败: {str(e)}")
+                            yield job[0], result
+                        done = set()
+                        if running and (broken or pool_broken):
+                            done, _ = await asyncio.wait(running)
+                    if broken or pool_broken:
+                        for job in jobs.crashed(broken):
+                            logger.error('PDF文件 %s 合成进程崩溃', job[0])
+                            yield job[0], _failed("PDF合成失败: 合成进程意外退出")
+                        pool.shutdown(wait=False)
+                        pool = _process_pool(limit)
+            finally:
+                for future in running:
+                    future.cancel()
+                pool.shutdown(wait=False, cancel_futures=True)
+            return
+
+    while jobs.pending:
+        job = jobs.pending.pop(0)
+        yield job[0], await asyncio.to_thread(_recompose_one, *job, options)
 
-    # 创建文件名到内容的映射
-    pdf_content_map = {name: content for name, content in pdf_files}
-    json_content_map = {name: content for name, content in json_files}
 
-    results = {}
-    completed_count = 0
-    failed_count = 0
+def batch_recompose_from_json(pdf_files: List[Tuple[str, bytes]], json_files: List[Tuple[str, bytes]],
+                            right_ratio: float, font_size: int,
+                            font_name: Optional[str] = None,
+                            render_mode: str = "text", line_spacing: float = 1.4, column_padding: int = 10,
+                            workers: Optional[int] = None, memory_budget_mb: Optional[int] = None,
+                            on_result: Optional[Callable[[str, Dict], None]] = None) -> Dict[str, Dict]:
+    """
+    批量根据JSON文件重新合成PDF（多进程并行，见 iter_recompose_from_json）
+
+    Args:
+        pdf_files: [(filename, bytes), ...] PDF文件列表
+        json_files: [(filename, bytes), ...] JSON文件列表
+        right_ratio: 右侧留白比例
+        font_size: 字体大小
+        font_name: 字体名称（如 "SimHei"）
+        render_mode: 渲染模式
+        line_spacing: 行间距
+        column_padding: 栏内边距
+        workers: 进程数
+        memory_budget_mb: 同时运行任务的估算内存上限
+        on_result: 每个文件完成时回调 (pdf_filename, 结果字典)
 
-    for pdf_filename, matched_json in matches.items():
-        logger.debug('处理PDF文件: %s', pdf_filename)
+    Returns:
+        处理结果字典（按PDF文件输入顺序）
+    """
+    logger.info('开始批量重新合成PDF，PDF文件数: %d, JSON文件数: %d, 字体大小: %d',
+                len(pdf_files), len(json_files), font_size)
 
-        result = {
-            "status": "pending",
-            "pdf_bytes": None,
-            "explanations": {},
-            "error": None
-        }
+    results = {}
+    for pdf_filename, result in iter_recompose_from_json(
+            pdf_files, json_files, right_ratio, font_size, font_name=font_name, render_mode=render_mode,
+            line_spacing=line_spacing, column_padding=column_padding,
+            workers=workers, memory_budget_mb=memory_budget_mb):
+        results[pdf_filename] = result
+        if on_result:
+            on_result(pdf_filename, result)
+    return _ordered_results(pdf_files, results)
 
-        try:
-            pdf_bytes = pdf_content_map[pdf_filename]
 
-            if matched_json is None:
-                logger.warning('PDF文件 %s 未找到匹配的JSON文件', pdf_filename)
-                result["status"] = "failed"
-                result["error"] = "未找到匹配的JSON文件"
-                failed_count += 1
-            else:
-                logger.debug('为PDF文件 %s 找到匹配的JSON文件: %s', pdf_filename, matched_json)
-                json_bytes = json_content_map[matched_json]
-
-                # 解析JSON
-                try:
-                    json_data = safe_utf8_loads(json_bytes, source=matched_json)
-                    # 转换键为整数
-                    explanations = {int(k): str(v) for k, v in json_data.items()}
-                    logger.debug('JSON文件 %s 解析成功，包含 %d 个讲解条目', matched_json, len(explanations))
-
-                    # 重新合成PDF
-                    logger.debug('开始重新合成PDF文件: %s', pdf_filename)
-                    result_pdf = compose_pdf(
-                        pdf_bytes,
-                        explanations,
-                        right_ratio,
-                        font_size,
-                        font_name=font_name,
-                        render_mode=render_mode,
-                        line_spacing=line_spacing,
-                        column_padding=column_padding
-                    )
-
-                    logger.debug('PDF文件 %s 重新合成成功，大小: %d bytes', pdf_filename, len(result_pdf))
-                    result["status"] = "completed"
-                    result["pdf_bytes"] = result_pdf
-                    result["explanations"] = explanations
-                    completed_count += 1
-
-                except json.JSONDecodeError as e:
-                    logger.error('JSON文件 %s 解析失败: %s', matched_json, e)
-                    result["status"] = "failed"
-                    result["error"] = f"JSON解析失败: {str(e)}"
-                    failed_count += 1
-                except Exception as e:
-                    logger.error('PDF文件 %s 合成失败: %s', pdf_filename, e, exc_info=True)
-                    result["status"] = "failed"
-                    result["error"] = f"PDF合成失败: {str(e)}"
-                    failed_count += 1
+async def batch_recompose_from_json_async(pdf_files: List[Tuple[str, bytes]], json_files: List[Tuple[str, bytes]],
+                                        right_ratio: float, font_size: int,
+                                        font_name: Optional[str] = None,
+                                        render_mode: str = "text", line_spacing: float = 1.4, column_padding: int = 10,
+                                        workers: Optional[int] = None, memory_budget_mb: Optional[int] = None,
+                                        on_result: Optional[Callable[[str, Dict], None]] = None) -> Dict[str, Dict]:
+    """
+    异步批量根据JSON文件重新合成PDF（参数同 batch_recompose_from_json）
 
-        except Exception as e:
-            logger.error('处理PDF文件 %s 时发生未知错误: %s', pdf_filename, e, exc_info=True)
-            result["status"] = "failed"
-            result["error"] = f"处理失败: {str(e)}"
-            failed_count += 1
+    Returns:
+        处理结果字典（按PDF文件输入顺序）
+    """
+    logger.info('开始异步批量重新合成PDF，PDF文件数: %d, JSON文件数: %d, 字体大小: %d',
+                len(pdf_files), len(json_files), font_size)
 
+    results = {}
+    async for pdf_filename, result in aiter_recompose_from_json(
+            pdf_files, json_files, right_ratio, font_size, font_name=font_name, render_mode=render_mode,
+            line_spacing=line_spacing, column_padding=column_padding,
+            workers=workers, memory_budget_mb=memory_budget_mb):
         results[pdf_filename] = result
+        if on_result:
+            on_result(pdf_filename, result)
+    return _ordered_results(pdf_files, results)
 
-    logger.info('异步批量重新合成PDF完成，成功: %d, 失败: %d, 总计: %d',
-                completed_count, failed_count, len(results))
-    return results
\ No newline at end of file
+
+def _ordered_results(pdf_files: List[Tuple[str, bytes]], results: Dict[str, Dict]) -> Dict[str, Dict]:
+    ordered = {name: results[name] for name, _ in pdf_files if name in results}
+    completed_count = sum(1 for result in ordered.values() if result["status"] == "completed")
+    logger.info('批量重新合成PDF完成，成功: %d, 失败: %d, 总计: %d',
+                completed_count, len(ordered) - completed_count, len(ordered))
+    return ordered
@@ -8,14 +8,38 @@ import os
 import io
 import json
 import zipfile
-import tempfile
-import shutil
-from typing import Dict, List, Tuple, Optional, Any
-from pathlib import Path
-
-import fitz
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Tuple, Optional, Any
 
+from app.services.batch_processor import iter_recompose_pairs
+from app.services.constants import REGENERATION_THREAD_WORKERS
+from app.services.document_info import get_document_info
 from app.services.enhanced_html_generator import EnhancedHTMLGenerator
+from app.services.logger import get_logger
+from app.services.markdown_generator import generate_markdown_with_screenshots
+from app.services.pdf_validator import safe_utf8_loads
+
+logger = get_logger()
+
+# (on_progress(done, total), on_page_status(page_index, status, error)) for one file
+ProgressCallbacks = Tuple[
+    Optional[Callable[[int, int], None]],
+    Optional[Callable[[int, str, Optional[str]], None]]
+]
+
+
+def _parse_explanations(json_bytes: bytes, source: str) -> Dict[int, str]:
+    explanations_data = safe_utf8_loads(json_bytes, source=source)
+    return {int(k): str(v) for k, v in explanations_data.items()}
+
+
+def _notify(callback: Optional[Callable[..., None]], *args) -> None:
+    # UI回调失败不影响生成
+    if callback:
+        try:
+            callback(*args)
+        except Exception:
+            pass
 
 
 class BatchRegenerationService:
@@ -55,197 +79,193 @@ class BatchRegenerationService:
     def regenerate_pdf_batch(
         pdf_json_pairs: List[Tuple[bytes, bytes, str]],
         output_mode: str = "PDF讲解版",
-        params: Dict[str, Any] = None
+        params: Dict[str, Any] = None,
+        max_workers: Optional[int] = None,
+        progress_callbacks: Optional[Callable[[str], ProgressCallbacks]] = None,
+        on_file_done: Optional[Callable[[str, Dict[str, Any]], None]] = None
     ) -> Dict[str, Dict[str, Any]]:
         """
         批量重新生成PDF/Markdown/HTML
         
+        各文件并行生成：PDF讲解版使用 iter_recompose_pairs 的进程池，
+        Markdown 与分页HTML版使用线程池（与生成流程相同的页面级回调；
+        PDF讲解版只有文件级进度）。
+        结果全部保存在内存中，ZIP 直接由内存内容写出，不经过临时目录。
+        
         Args:
             pdf_json_pairs: [(pdf_bytes, json_bytes, pdf_name), ...]
             output_mode: 输出模式
             params: 生成参数
+            max_workers: 并行文件数（默认 REGENERATION_THREAD_WORKERS / RECOMPOSE_WORKERS）
+            progress_callbacks: pdf_name -> (on_progress, on_page_status)，
+                与 DetailedProgressTracker.create_thread_safe_callbacks 相同
+            on_file_done: 每个文件完成时回调 (pdf_name, result_dict)
             
         Returns:
-            {pdf_name: result_dict}
+            {pdf_name: result_dict}（按输入顺序）
         """
-        results = {}
         params = params or {}
         
         if output_mode == "分页HTML版":
-            return BatchRegenerationService._regenerate_per_page_html_batch(pdf_json_pairs, params)
+            worker = BatchRegenerationService._regenerate_per_page_html
         elif output_mode == "Markdown截图讲解":
-            return BatchRegenerationService._regenerate_markdown_batch(pdf_json_pairs, params)
+            worker = BatchRegenerationService._regenerate_markdown
         else:
-            return BatchRegenerationService._regenerate_pdf_batch(pdf_json_pairs, params)
+            return BatchRegenerationService._regenerate_pdf_batch(
+                pdf_json_pairs, params, max_workers, progress_callbacks, on_file_done
+            )
+        return BatchRegenerationService._run_threaded(
+            worker, pdf_json_pairs, params, max_workers, progress_callbacks, on_file_done
+        )
     
     @staticmethod
-    def _regenerate_per_page_html_batch(
-        pdf_json_pairs: List[Tuple[bytes, bytes, str]], 
-        params: Dict[str, Any]
+    def _run_threaded(
+        worker: Callable[..., Dict[str, Any]],
+        pdf_json_pairs: List[Tuple[bytes, bytes, str]],
+        params: Dict[str, Any],
+        max_workers: Optional[int],
+        progress_callbacks: Optional[Callable[[str], ProgressCallbacks]],
+        on_file_done: Optional[Callable[[str, Dict[str, Any]], None]]
     ) -> Dict[str, Dict[str, Any]]:
-        """批量重新生成分页HTML版"""
+        """在线程池中逐文件运行 worker(pdf_bytes, explanations, pdf_name, params, on_progress, on_page_status)"""
         results = {}
+        if not pdf_json_pairs:
+            return results
         
-        for pdf_bytes, json_bytes, pdf_name in pdf_json_pairs:
+        def run(pdf_bytes: bytes, json_bytes: bytes, pdf_name: str) -> Dict[str, Any]:
+            on_progress, on_page_status = progress_callbacks(pdf_name) if progress_callbacks else (None, None)
             try:
-                # 解析JSON数据
-                explanations_data = json.loads(json_bytes.decode('utf-8'))
-                explanations = {int(k): str(v) for k, v in explanations_data.items()}
-                
-                # 获取PDF总页数
-                with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf_doc:
-                    total_pages = pdf_doc.page_count
-                
-                # 创建临时目录
-                base_name = os.path.splitext(pdf_name)[0]
-                temp_dir = tempfile.mkdtemp(prefix=f"regenerate_{base_name}_")
-                
-                try:
-                    # 生成完整的分页HTML结构
-                    generated_files = EnhancedHTMLGenerator.generate_complete_per_page_structure(
-                        explanations=explanations,
-                        pdf_filename=base_name + ".pdf",
-                        total_pages=total_pages,
-                        output_dir=temp_dir,
-                        font_name=params.get("html_font_name", "SimHei"),
-                        font_size=params.get("html_font_size", 14),
-                        line_spacing=params.get("html_line_spacing", 1.2)
-                    )
-                    
-                    # 复制PDF文件到同一目录
-                    pdf_dest_path = os.path.join(temp_dir, base_name + ".pdf")
-                    with open(pdf_dest_path, 'wb') as f:
-                        f.write(pdf_bytes)
-                    
-                    # 创建解压后的文件结构到ZIP
-                    zip_buffer = io.BytesIO()
-                    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                        # 将临时目录中的所有文件添加到ZIP，保持文件夹结构
-                        for root, dirs, files in os.walk(temp_dir):
-                            for file in files:
-                                file_path = os.path.join(root, file)
-                                # 计算相对路径并保持结构
-                                arc_name = os.path.relpath(file_path, temp_dir)
-                                zip_file.write(file_path, arc_name)
-                    
-                    zip_buffer.seek(0)
-                    
-                    results[pdf_name] = {
-                        "status": "completed",
-                        "zip_bytes": zip_buffer.getvalue(),
-                        "explanations": explanations,
-                        "pdf_bytes": pdf_bytes,
-                        "generated_files": generated_files,
-                        "total_pages": total_pages
-                    }
-                    
-                finally:
-                    # 清理临时目录
-                    if os.path.exists(temp_dir):
-                        shutil.rmtree(temp_dir, ignore_errors=True)
-                        
+                explanations = _parse_explanations(json_bytes, pdf_name)
+                return worker(pdf_bytes, explanations, pdf_name, params, on_progress, on_page_status)
             except Exception as e:
-                results[pdf_name] = {
-                    "status": "failed",
-                    "error": str(e)
-                }
+                logger.error('重新生成 %s 失败: %s', pdf_name, e, exc_info=True)
+                return {"status": "failed", "error": str(e)}
+        
+        workers = max(1, min(max_workers or REGENERATION_THREAD_WORKERS, len(pdf_json_pairs)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="regenerate") as executor:
+            futures = {
+                executor.submit(run, pdf_bytes, json_bytes, pdf_name): pdf_name
+                for pdf_bytes, json_bytes, pdf_name in pdf_json_pairs
+            }
+            for future in as_completed(futures):
+                pdf_name = futures[future]
+                results[pdf_name] = future.result()
+                if on_file_done:
+                    on_file_done(pdf_name, results[pdf_name])
         
-        return results
+        return {pdf_name: results[pdf_name] for _, _, pdf_name in pdf_json_pairs}
     
     @staticmethod
-    def _regenerate_markdown_batch(
-        pdf_json_pairs: List[Tuple[bytes, bytes, str]], 
-        params: Dict[str, Any]
-    ) -> Dict[str, Dict[str, Any]]:
-        """批量重新生成Markdown版"""
-        from app.services.pdf_processor import PDFProcessor
+    def _regenerate_per_page_html(
+        pdf_bytes: bytes,
+        explanations: Dict[int, str],
+        pdf_name: str,
+        params: Dict[str, Any],
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        on_page_status: Optional[Callable[[int, str, Optional[str]], None]] = None
+    ) -> Dict[str, Any]:
+        """重新生成一个文件的分页HTML版；files 为 ZIP 内相对路径 -> 内容"""
+        total_pages = get_document_info(pdf_bytes).page_count
         
-        results = {}
+        base_name = os.path.splitext(pdf_name)[0]
+        files: Dict[str, bytes] = {}
+        pages = EnhancedHTMLGenerator.iter_per_page_html(
+            explanations=explanations,
+            pdf_filename=base_name + ".pdf",
+            total_pages=total_pages,
+            font_name=params.get("html_font_name", "SimHei"),
+            font_size=params.get("html_font_size", 14),
+            line_spacing=params.get("html_line_spacing", 1.2),
+            output_folder=base_name
+        )
+        for page_index, (page_filename, html_content) in enumerate(pages):
+            files[page_filename] = html_content.encode("utf-8")
+            _notify(on_page_status, page_index, "completed", None)
+            _notify(on_progress, page_index + 1, total_pages)
+        # 页面引用同目录下的PDF
+        files[base_name + ".pdf"] = pdf_bytes
         
-        for pdf_bytes, json_bytes, pdf_name in pdf_json_pairs:
-            try:
-                # 解析JSON数据
-                explanations_data = json.loads(json_bytes.decode('utf-8'))
-                explanations = {int(k): str(v) for k, v in explanations_data.items()}
-                
-                # 创建临时图片目录
-                base_name = os.path.splitext(pdf_name)[0]
-                embed_images = params.get("embed_images", True)
-                images_dir = None
-                
-                if not embed_images:
-                    images_dir = tempfile.mkdtemp(prefix=f"{base_name}_images_")
-                
-                # 生成Markdown文档
-                markdown_content, images_dir_return = PDFProcessor.generate_markdown_with_screenshots(
-                    src_bytes=pdf_bytes,
-                    explanations=explanations,
-                    screenshot_dpi=params.get("screenshot_dpi", 150),
-                    embed_images=embed_images,
-                    title=params.get("markdown_title", "PDF文档讲解"),
-                    images_dir=images_dir
-                )
-                
-                results[pdf_name] = {
-                    "status": "completed",
-                    "markdown_content": markdown_content,
-                    "explanations": explanations,
-                    "images_dir": images_dir_return
-                }
-                
-                # 清理临时目录
-                if images_dir and os.path.exists(images_dir):
-                    shutil.rmtree(images_dir, ignore_errors=True)
-                    
-            except Exception as e:
-                results[pdf_name] = {
-                    "status": "failed",
-                    "error": str(e)
-                }
+        return {
+            "status": "completed",
+            "files": files,
+            "explanations": explanations,
+            "pdf_bytes": pdf_bytes,
+            "generated_files": [name for name in files if name.endswith(".html")],
+            "total_pages": total_pages
+        }
+    
+    @staticmethod
+    def _regenerate_markdown(
+        pdf_bytes: bytes,
+        explanations: Dict[int, str],
+        pdf_name: str,
+        params: Dict[str, Any],
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        on_page_status: Optional[Callable[[int, str, Optional[str]], None]] = None
+    ) -> Dict[str, Any]:
+        """重新生成一个文件的Markdown版；不嵌入时截图保存在 images（文件名 -> PNG 字节）"""
+        embed_images = params.get("embed_images", True)
+        images: Optional[Dict[str, bytes]] = None if embed_images else {}
+        
+        markdown_content, _ = generate_markdown_with_screenshots(
+            src_bytes=pdf_bytes,
+            explanations=explanations,
+            screenshot_dpi=params.get("screenshot_dpi", 150),
+            embed_images=embed_images,
+            title=params.get("markdown_title", "PDF文档讲解"),
+            on_progress=on_progress,
+            on_page_status=on_page_status,
+            images=images,
+            document_info=get_document_info(pdf_bytes)
+        )
         
-        return results
+        return {
+            "status": "completed",
+            "markdown_content": markdown_content,
+            "explanations": explanations,
+            "images": images or {}
+        }
     
     @staticmethod
     def _regenerate_pdf_batch(
-        pdf_json_pairs: List[Tuple[bytes, bytes, str]], 
-        params: Dict[str, Any]
+        pdf_json_pairs: List[Tuple[bytes, bytes, str]],
+        params: Dict[str, Any],
+        max_workers: Optional[int] = None,
+        progress_callbacks: Optional[Callable[[str], ProgressCallbacks]] = None,
+        on_file_done: Optional[Callable[[str, Dict[str, Any]], None]] = None
     ) -> Dict[str, Dict[str, Any]]:
-        """批量重新生成PDF版"""
-        from app.services.pdf_processor import PDFProcessor
+        """
+        批量重新生成PDF版（compose_pdf 在进程池中运行）
         
-        results = {}
+        compose_pdf 没有页面级回调（生成流程同样如此），只通过 on_file_done 报告文件进度；
+        progress_callbacks 仅为统一签名而接受。
+        """
+        pairs = [
+            (pdf_name, pdf_bytes, os.path.splitext(pdf_name)[0] + ".json", json_bytes)
+            for pdf_bytes, json_bytes, pdf_name in pdf_json_pairs
+        ]
         
-        for pdf_bytes, json_bytes, pdf_name in pdf_json_pairs:
-            try:
-                # 解析JSON数据
-                explanations_data = json.loads(json_bytes.decode('utf-8'))
-                explanations = {int(k): str(v) for k, v in explanations_data.items()}
-                
-                # 重新合成PDF
-                result_bytes = PDFProcessor.compose_pdf(
-                    src_bytes=pdf_bytes,
-                    explanations=explanations,
-                    right_ratio=params.get("right_ratio", 0.48),
-                    font_size=params.get("font_size", 20),
-                    font_name=params.get("cjk_font_name", "SimHei"),
-                    render_mode=params.get("render_mode", "markdown"),
-                    line_spacing=params.get("line_spacing", 1.2),
-                    column_padding=params.get("column_padding", 10)
-                )
-                
-                results[pdf_name] = {
-                    "status": "completed",
-                    "pdf_bytes": result_bytes,
-                    "explanations": explanations
-                }
-                
-            except Exception as e:
-                results[pdf_name] = {
-                    "status": "failed",
-                    "error": str(e)
-                }
+        results = {}
+        recomposed = iter_recompose_pairs(
+            pairs,
+            right_ratio=params.get("right_ratio", 0.48),
+            font_size=params.get("font_size", 20),
+            font_name=params.get("cjk_font_name", "SimHei"),
+            render_mode=params.get("render_mode", "markdown"),
+            line_spacing=params.get("line_spacing", 1.2),
+            column_padding=params.get("column_padding", 10),
+            workers=max_workers
+        )
+        for pdf_name, result in recomposed:
+            if result["status"] == "completed":
+                result = {"status": "completed", "pdf_bytes": result["pdf_bytes"], "explanations": result["explanations"]}
+            else:
+                result = {"status": "failed", "error": result["error"]}
+            results[pdf_name] = result
+            if on_file_done:
+                on_file_done(pdf_name, result)
         
-        return results
+        return {pdf_name: results[pdf_name] for _, _, pdf_name in pdf_json_pairs}
     
     @staticmethod
     def create_flattened_zip_for_per_page_html(
@@ -266,39 +286,24 @@ class BatchRegenerationService:
         
         with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
             for filename, result in batch_results.items():
-                if result["status"] == "completed" and result.get("zip_bytes"):
-                    base_name = os.path.splitext(filename)[0]
-                    
+                if result["status"] != "completed":
+                    continue
+                base_name = os.path.splitext(filename)[0]
+                # 将每个PDF的文件放在单独的子文件夹中，避免冲突
+                # 格式：PDF文件名/子文件夹/文件名
+                if result.get("files"):
+                    for rel_path, content in result["files"].items():
+                        zip_file.writestr(f"{base_name}/{rel_path}", content)
+                elif result.get("zip_bytes"):
                     try:
-                        # 创建临时目录来解包
-                        temp_dir = tempfile.mkdtemp()
-                        
+                        # 逐条复制内层ZIP，避免嵌套压缩包
                         with zipfile.ZipFile(io.BytesIO(result["zip_bytes"]), 'r') as inner_zip:
-                            # 先解包到临时目录
-                            inner_zip.extractall(temp_dir)
-                            
-                            # 重新组织文件结构，避免嵌套压缩包
-                            for root, dirs, files in os.walk(temp_dir):
-                                for file in files:
-                                    file_path = os.path.join(root, file)
-                                    # 计算相对路径
-                                    rel_path = os.path.relpath(file_path, temp_dir)
-                                    
-                                    # 将每个PDF的文件放在单独的子文件夹中，避免冲突
-                                    # 格式：PDF文件名/子文件夹/文件名
-                                    arc_name = f"{base_name}/{rel_path}"
-                                    zip_file.write(file_path, arc_name)
-                            
-                            # 清理临时目录
-                            shutil.rmtree(temp_dir, ignore_errors=True)
-                            
+                            for info in inner_zip.infolist():
+                                if not info.is_dir():
+                                    zip_file.writestr(f"{base_name}/{info.filename}", inner_zip.read(info))
                     except Exception as e:
-                        print(f"处理文件 {filename} 时出错: {e}")
-                        # 如果解压失败，尝试直接复制（可能已经是扁平结构）
-                        try:
-                            zip_file.writestr(f"{base_name}/error.txt", f"处理此PDF时出错: {e}")
-                        except:
-                            pass
+                        logger.warning('处理文件 %s 时出错: %s', filename, e)
+                        zip_file.writestr(f"{base_name}/error.txt", f"处理此PDF时出错: {e}")
             
             # 添加JSON文件到json子目录（便于复现）
             for filename, result in batch_results.items():
@@ -359,6 +364,8 @@ class BatchRegenerationService:
                                 pass
                         
                         # 添加图片文件夹
+                        for img_file, img_bytes in (result.get("images") or {}).items():
+                            zip_file.writestr(f"{base_name}_images/{img_file}", img_bytes)
                         images_dir = result.get("images_dir")
                         if images_dir and os.path.exists(images_dir):
                             for img_file in os.listdir(images_dir):
@@ -0,0 +1,231 @@
+"""
+Batch-level page scheduler.
+
+Without a scheduler every file in a batch runs its own event loop with its
+own page semaphore, so files race each other for the global concurrency
+budget and a large file can hold most of the slots while small files wait.
+
+PageScheduler owns a single event loop (on a background thread) for the
+whole batch. Each file's explanation coroutine runs on that loop and asks
+its lane for a slot before calling the LLM; whenever a slot frees up the
+scheduler hands it to the next file according to the policy:
+
+- ``round_robin``: rotate across files that have pages waiting
+- ``srf``: shortest-remaining-first, the file with the fewest unfinished
+  pages goes first, so small files finish early (lowest mean file
+  completion time; the whole batch can take slightly longer than with
+  per-file loops, see scripts/bench_batch_scheduler.py)
+
+Every page still acquires the process-wide GlobalConcurrencyController
+inside its lane slot, so schedulers of separate batches (e.g. several
+Streamlit sessions) never exceed the global cap together.
+
+File threads call ``scheduler.run(coro)`` and block until their coroutine
+completes, which keeps the synchronous generate_explanations API intact.
+"""
+
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Coroutine, Deque, List, Optional
+
+from .constants import BATCH_SCHEDULER_MAX_CONCURRENCY
+from .logger import get_logger
+
+logger = get_logger()
+
+SCHEDULING_POLICIES = ("round_robin", "srf")
+
+
+class _LaneSlot:
+    """Async context manager holding one scheduler slot for a lane."""
+
+    __slots__ = ("_lane",)
+
+    def __init__(self, lane: "FileLane"):
+        self._lane = lane
+
+    async def __aenter__(self):
+        await self._lane._acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self._lane._release()
+
+
+class FileLane:
+    """Per-file view of the scheduler; created on the scheduler loop by open_lane()."""
+
+    def __init__(self, scheduler: "PageScheduler", limit: int, order: int):
+        self._scheduler = scheduler
+        self.limit = max(1, limit)
+        self.order = order
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.running = 0
+
+    @property
+    def remaining(self) -> int:
+        """Pages of this file that have not finished yet."""
+        return len(self.waiters) + self.running
+
+    def slot(self) -> _LaneSlot:
+        """Async context manager to wrap each page's LLM call."""
+        return _LaneSlot(self)
+
+    def close(self) -> None:
+        self._scheduler._remove_lane(self)
+
+    async def _acquire(self) -> None:
+        waiter = self._scheduler.loop.create_future()
+        self.waiters.append(waiter)
+        self._scheduler._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just before cancellation: hand the slot back
+                self._release()
+            else:
+                try:
+                    self.waiters.remove(waiter)
+                except ValueError:
+                    pass
+            raise
+
+    def _release(self) -> None:
+        self.running -= 1
+        self._scheduler._in_flight -= 1
+        self._scheduler._dispatch()
+
+
+class PageScheduler:
+    """
+    One event loop and one page budget shared by every file of a batch.
+
+    Usage::
+
+        with PageScheduler(max_concurrency=50, policy="srf") as scheduler:
+            # from any number of file threads
+            generate_explanations(..., scheduler=scheduler)
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = BATCH_SCHEDULER_MAX_CONCURRENCY,
+        policy: str = "round_robin",
+    ):
+        """
+        Initialize the scheduler (call start() or use it as a context manager).
+
+        Args:
+            max_concurrency: Pages in flight at once across all files
+            policy: "round_robin" or "srf" (shortest remaining first)
+        """
+        if policy not in SCHEDULING_POLICIES:
+            raise ValueError(f"Unknown scheduling policy: {policy}")
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        self.policy = policy
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lanes: List[FileLane] = []
+        self._lane_counter = 0
+        self._cursor = 0
+        self._in_flight = 0
+
+    def start(self) -> "PageScheduler":
+        if self.loop is not None:
+            return self
+        self.loop = asyncio.new_event_loop()
+        # LLM clients run blocking SDK calls via asyncio.to_thread; size the
+        # default executor so it never becomes a hidden concurrency cap
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency + 4, thread_name_prefix="page-scheduler"
+        )
+        self.loop.set_default_executor(self._executor)
+        ready = threading.Event()
+
+        def run_loop() -> None:
+            asyncio.set_event_loop(self.loop)
+            self.loop.call_soon(ready.set)
+            self.loop.run_forever()
+
+        self._thread = threading.Thread(target=run_loop, name="page-scheduler-loop", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def close(self) -> None:
+        if self.loop is None:
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+        self._executor.shutdown(wait=False)
+        self.loop = None
+        self._thread = None
+        self._executor = None
+
+    def __enter__(self) -> "PageScheduler":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def run(self, coro: Coroutine[Any, Any, Any]) -> Any:
+        """Run a coroutine on the scheduler loop and block the calling thread until it finishes."""
+        if self.loop is None:
+            raise RuntimeError("PageScheduler is not started")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def open_lane(self, limit: Optional[int] = None) -> FileLane:
+        """
+        Register a file with the scheduler. Must be called on the scheduler loop.
+
+        Args:
+            limit: Per-file cap on pages in flight (the page-level concurrency setting)
+        """
+        lane = FileLane(self, limit or self.max_concurrency, self._lane_counter)
+        self._lane_counter += 1
+        self._lanes.append(lane)
+        return lane
+
+    def _remove_lane(self, lane: FileLane) -> None:
+        try:
+            index = self._lanes.index(lane)
+        except ValueError:
+            return
+        self._lanes.pop(index)
+        if index < self._cursor:
+            self._cursor -= 1
+        self._dispatch()
+
+    def _pick_lane(self) -> Optional[FileLane]:
+        eligible = [lane for lane in self._lanes if lane.waiters and lane.running < lane.limit]
+        if not eligible:
+            return None
+        if self.policy == "srf":
+            return min(eligible, key=lambda lane: (lane.remaining, lane.order))
+        count = len(self._lanes)
+        for step in range(count):
+            lane = self._lanes[(self._cursor + step) % count]
+            if lane.waiters and lane.running < lane.limit:
+                self._cursor = (self._cursor + step + 1) % count
+                return lane
+        return None
+
+    def _dispatch(self) -> None:
+        """Hand free slots to waiting pages according to the policy."""
+        while self._in_flight < self.max_concurrency:
+            lane = self._pick_lane()
+            if lane is None:
+                return
+            waiter = lane.waiters.popleft()
+            if waiter.cancelled():
+                continue
+            lane.running += 1
+            self._in_flight += 1
+            waiter.set_result(None)
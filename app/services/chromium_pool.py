@@ -0,0 +1,531 @@
+"""
+Long-lived headless Chromium shared by all HTML fragment renders.
+
+Launching Chromium costs hundreds of milliseconds, far more than printing a
+small fragment, so HtmlRenderer no longer starts a browser per call. One
+browser is kept running on a dedicated event-loop thread (which also keeps
+Playwright away from Streamlit's own loop) and renders go through a fixed
+set of reusable pages:
+
+- up to ``pages`` fragments are printed concurrently, each on its own page
+  and browser context
+- at most ``max_queue`` renders may be queued or running; callers block
+  (and eventually fail) instead of piling up unbounded work
+- a page is recycled after ``recycle_after`` renders or after any error,
+  and the browser is relaunched if it crashed or disconnected
+
+Each page loads the renderer document (base styles, Prism, MathJax; see
+HtmlRenderer._build_html_document) once; a render then only swaps the
+fragment's HTML and CSS in and typesets it, so MathJax is initialized once
+per page instead of once per fragment.
+
+Sync callers use render_fragment / render_fragments; async callers use
+render_fragment_async / render_fragments_async, which can run many
+fragments concurrently without blocking their own loop. A fragment is a
+dict of HtmlRenderer.render_html_to_pdf_fragment keyword arguments.
+
+render_batch goes one step further for a whole document's explanations:
+fragments sharing size, CSS and options are laid out in one document, one
+fixed-size box per printed page (``break-after: page``), typeset once and
+printed with a single page.pdf call; the PDF is then split back into one
+single-page PDF per fragment. Fragments whose content overflows their box
+are printed again on their own, with continuation pages. pdf_composer uses
+it for a document's markdown explanations when pandoc is unavailable.
+"""
+
+import asyncio
+import atexit
+import sys
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import fitz  # PyMuPDF
+
+from .constants import (
+    CHROMIUM_BATCH_MAX_FRAGMENTS,
+    CHROMIUM_LAUNCH_RETRY_SECONDS,
+    CHROMIUM_POOL_MAX_QUEUE,
+    CHROMIUM_POOL_PAGES,
+    CHROMIUM_RECYCLE_AFTER_RENDERS,
+    CHROMIUM_RENDER_TIMEOUT_SECONDS,
+)
+from .html_renderer import HtmlRenderer, HtmlRendererError
+from .logger import get_logger
+
+logger = get_logger()
+
+CHROMIUM_ARGS = [
+    '--no-sandbox',
+    '--disable-setuid-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-gpu',
+    '--no-first-run',
+    '--disable-features=VizDisplayCompositor',
+]
+
+# Waiting for Prism/MathJax inside a page
+READY_TIMEOUT_MS = 15000
+
+NO_MARGIN = {"top": "0in", "right": "0in", "bottom": "0in", "left": "0in"}
+
+
+def _remaining(deadline: float) -> float:
+    """Seconds left until a time.monotonic() deadline (never negative)."""
+    return max(0.0, deadline - time.monotonic())
+
+
+def _document_key(fragment: Dict[str, Any]) -> Tuple[str, bool, bool]:
+    """Options that need a different renderer document."""
+    return (fragment.get("background", "white"), fragment.get("mathjax", True), fragment.get("prism", True))
+
+
+def plan_batches(fragments: Sequence[Dict[str, Any]], batch_size: int) -> List[List[int]]:
+    """
+    Group fragment indices that can share one printed document.
+
+    Fragments with the same page size, CSS and document options are grouped
+    (in order of first appearance) and split into chunks of ``batch_size``.
+    """
+    groups: Dict[Tuple, List[int]] = {}
+    for i, fragment in enumerate(fragments):
+        key = (fragment["width_pt"], fragment["height_pt"], fragment.get("css") or "", _document_key(fragment))
+        groups.setdefault(key, []).append(i)
+    size = max(1, batch_size)
+    return [indices[i:i + size] for indices in groups.values() for i in range(0, len(indices), size)]
+
+
+def split_pdf_pages(pdf_bytes: bytes) -> List[bytes]:
+    """Split a PDF into one single-page PDF per page."""
+    pages = []
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        for page_index in range(doc.page_count):
+            single = fitz.open()
+            single.insert_pdf(doc, from_page=page_index, to_page=page_index)
+            pages.append(single.tobytes(garbage=1, deflate=True))
+            single.close()
+    return pages
+
+
+class _Slot:
+    """A reusable browser context + page."""
+
+    def __init__(self, browser: Any, context: Any, page: Any):
+        self.browser = browser
+        self.context = context
+        self.page = page
+        self.renders = 0
+        # (background, mathjax, prism) of the renderer document loaded in the page
+        self.document_key: Optional[Tuple[str, bool, bool]] = None
+
+
+class ChromiumPool:
+    """Shared Chromium with a bounded set of reusable pages."""
+
+    def __init__(
+        self,
+        pages: int = CHROMIUM_POOL_PAGES,
+        max_queue: int = CHROMIUM_POOL_MAX_QUEUE,
+        recycle_after: int = CHROMIUM_RECYCLE_AFTER_RENDERS,
+        launch_retry: float = CHROMIUM_LAUNCH_RETRY_SECONDS,
+    ):
+        self.pages = max(1, pages)
+        self.recycle_after = max(1, recycle_after)
+        self.launch_retry = launch_retry
+        self._admission = threading.BoundedSemaphore(max(self.pages, max_queue))
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        # Only touched on the pool's loop
+        self._playwright = None
+        self._browser = None
+        self._browser_lock: Optional[asyncio.Lock] = None
+        self._slot_semaphore: Optional[asyncio.Semaphore] = None
+        self._idle: List[_Slot] = []
+        self.launches = 0
+        self.renders = 0
+        self.batches = 0
+        # Why Chromium could not be started, once that happened (see available)
+        self.launch_error: Optional[str] = None
+        self._launch_failed_at = 0.0
+
+    # ---- event loop thread -------------------------------------------------
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                if sys.platform.startswith("win"):
+                    # Playwright starts the driver as a subprocess
+                    loop = asyncio.ProactorEventLoop()
+                else:
+                    loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="chromium-pool", daemon=True)
+                thread.start()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    def _submit(self, job: Callable[[Any], Awaitable[Any]], argument: Any, wait: float) -> Future:
+        """Admit one render (or batch) into the bounded queue and schedule job(argument) on the pool's loop."""
+        if not self._admission.acquire(timeout=wait):
+            raise HtmlRendererError(f"Chromium 渲染队列已满（等待超过 {wait:.0f} 秒）")
+        try:
+            future = asyncio.run_coroutine_threadsafe(job(argument), self._ensure_loop())
+        except Exception:
+            self._admission.release()
+            raise
+        future.add_done_callback(lambda _: self._admission.release())
+        return future
+
+    # ---- browser and pages (pool loop only) --------------------------------
+
+    async def _launch(self) -> Tuple[Any, Any]:
+        """Start Playwright and Chromium; returns (playwright, browser)."""
+        try:
+            from playwright.async_api import async_playwright
+        except Exception as e:
+            raise HtmlRendererError(f"Playwright 不可用，请先安装依赖并安装 Chromium。原始错误: {e}")
+        playwright = await async_playwright().start()
+        try:
+            browser = await playwright.chromium.launch(headless=True, args=CHROMIUM_ARGS)
+        except Exception:
+            await playwright.stop()
+            raise
+        return playwright, browser
+
+    async def _ensure_browser(self) -> None:
+        if self._browser_lock is None:
+            self._browser_lock = asyncio.Lock()
+        async with self._browser_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return
+            if self._browser is not None:
+                logger.warning("Chromium disconnected, relaunching")
+                await self._shutdown_browser()
+            try:
+                self._playwright, self._browser = await self._launch()
+            except Exception as e:
+                self.launch_error = str(e)
+                self._launch_failed_at = time.monotonic()
+                raise
+            self.launch_error = None
+            self.launches += 1
+            logger.info(f"Chromium launched for the render pool (launch #{self.launches})")
+
+    async def _shutdown_browser(self) -> None:
+        for slot in self._idle:
+            await self._close_slot(slot)
+        self._idle.clear()
+        browser, playwright = self._browser, self._playwright
+        self._browser = self._playwright = None
+        for closer in (browser and browser.close, playwright and playwright.stop):
+            if closer:
+                try:
+                    await closer()
+                except Exception:
+                    pass
+
+    async def _close_slot(self, slot: _Slot) -> None:
+        try:
+            await slot.context.close()
+        except Exception:
+            pass
+
+    async def _acquire_slot(self) -> _Slot:
+        if self._slot_semaphore is None:
+            self._slot_semaphore = asyncio.Semaphore(self.pages)
+        await self._slot_semaphore.acquire()
+        try:
+            await self._ensure_browser()
+            while self._idle:
+                slot = self._idle.pop()
+                # Health check: pages of a replaced browser or closed pages are dropped
+                if slot.browser is self._browser and not slot.page.is_closed():
+                    return slot
+                await self._close_slot(slot)
+            context = await self._browser.new_context()
+            page = await context.new_page()
+            page.set_default_timeout(READY_TIMEOUT_MS)
+            page.set_default_navigation_timeout(READY_TIMEOUT_MS)
+            return _Slot(self._browser, context, page)
+        except BaseException:
+            self._slot_semaphore.release()
+            raise
+
+    async def _release_slot(self, slot: _Slot, healthy: bool) -> None:
+        try:
+            if (healthy and slot.renders < self.recycle_after and slot.browser is self._browser
+                    and self._browser is not None and self._browser.is_connected()):
+                self._idle.append(slot)
+            else:
+                await self._close_slot(slot)
+        finally:
+            self._slot_semaphore.release()
+
+    async def _load_document(self, slot: _Slot, key: Tuple[str, bool, bool]) -> None:
+        """Load the renderer document (scripts, base styles) into the page once per key."""
+        if slot.document_key == key:
+            return
+        background, mathjax, prism = key
+        await slot.page.set_content(
+            HtmlRenderer._build_html_document("", None, background, mathjax, prism), wait_until="load"
+        )
+        try:
+            await slot.page.wait_for_function("() => window.__ready__ === true", timeout=READY_TIMEOUT_MS)
+        except Exception:
+            logger.warning("等待渲染脚本加载超时，可能影响公式或代码高亮显示")
+        slot.document_key = key
+
+    async def _run_script(self, slot: _Slot, script: str, args: Any) -> Any:
+        """Swap content into the page and wait for it to be typeset (Prism/MathJax)."""
+        try:
+            return await asyncio.wait_for(slot.page.evaluate(script, args), READY_TIMEOUT_MS / 1000)
+        except asyncio.TimeoutError:
+            logger.warning("等待渲染完成超时，可能影响公式或代码高亮显示")
+            # The page may still be typesetting; print what is there, then replace it
+            slot.renders = self.recycle_after
+            return None
+
+    async def _set_viewport(self, slot: _Slot, width_pt: float, height_pt: float) -> None:
+        await slot.page.set_viewport_size({
+            "width": max(1, HtmlRenderer._pt_to_px(width_pt)),
+            "height": max(1, HtmlRenderer._pt_to_px(height_pt)),
+        })
+
+    async def _print(self, slot: _Slot, width_pt: float, height_pt: float) -> bytes:
+        return await slot.page.pdf(
+            width=f"{HtmlRenderer._pt_to_inches(width_pt)}in",
+            height=f"{HtmlRenderer._pt_to_inches(height_pt)}in",
+            print_background=True,
+            margin=NO_MARGIN,
+        )
+
+    async def _print_fragment(self, slot: _Slot, fragment: Dict[str, Any]) -> bytes:
+        width_pt, height_pt = fragment["width_pt"], fragment["height_pt"]
+        await self._set_viewport(slot, width_pt, height_pt)
+        await self._run_script(
+            slot,
+            "([html, css]) => window.__renderFragment(html, css)",
+            [fragment.get("html") or "", fragment.get("css") or ""],
+        )
+        return await self._print(slot, width_pt, height_pt)
+
+    async def _render(self, fragment: Dict[str, Any]) -> bytes:
+        slot = await self._acquire_slot()
+        healthy = False
+        try:
+            await self._load_document(slot, _document_key(fragment))
+            pdf_bytes = await self._print_fragment(slot, fragment)
+            slot.renders += 1
+            self.renders += 1
+            healthy = True
+            return pdf_bytes
+        except HtmlRendererError:
+            raise
+        except Exception as e:
+            raise HtmlRenderer._render_error(e)
+        finally:
+            await self._release_slot(slot, healthy)
+
+    async def _render_batch(self, fragments: List[Dict[str, Any]]) -> List[bytes]:
+        """Print fragments of one plan_batches group with a single page.pdf call."""
+        first = fragments[0]
+        width_pt, height_pt = first["width_pt"], first["height_pt"]
+        slot = await self._acquire_slot()
+        healthy = False
+        try:
+            await self._load_document(slot, _document_key(first))
+            await self._set_viewport(slot, width_pt, height_pt)
+            overflowing = await self._run_script(
+                slot,
+                "([items, css, width, height]) => window.__renderBatch(items, css, width, height)",
+                [[fragment.get("html") or "" for fragment in fragments], first.get("css") or "", width_pt, height_pt],
+            )
+            pages = split_pdf_pages(await self._print(slot, width_pt, height_pt))
+            if len(pages) != len(fragments):
+                # A box spilled onto an extra page; page i no longer maps to fragment i
+                logger.warning(f"批量渲染得到 {len(pages)} 页（预期 {len(fragments)} 页），改为逐个渲染")
+                pages = [await self._print_fragment(slot, fragment) for fragment in fragments]
+            else:
+                # Boxes clip content longer than one page; print those alone so it flows onto continuation pages
+                for i in overflowing or []:
+                    pages[i] = await self._print_fragment(slot, fragments[i])
+            slot.renders += 1
+            self.renders += len(fragments)
+            self.batches += 1
+            healthy = True
+            return pages
+        except HtmlRendererError:
+            raise
+        except Exception as e:
+            raise HtmlRenderer._render_error(e)
+        finally:
+            await self._release_slot(slot, healthy)
+
+    # ---- public API --------------------------------------------------------
+
+    @property
+    def available(self) -> bool:
+        """
+        False for launch_retry seconds after launching Chromium failed.
+
+        Callers with a fallback skip the pool meanwhile; afterwards the next
+        render tries to launch again (a transient failure does not disable
+        the pool for good).
+        """
+        if self.launch_error is None:
+            return True
+        return time.monotonic() - self._launch_failed_at >= self.launch_retry
+
+    def render_fragment(
+        self,
+        fragment: Dict[str, Any],
+        timeout: float = CHROMIUM_RENDER_TIMEOUT_SECONDS,
+    ) -> bytes:
+        """Print one fragment to a width_pt x height_pt PDF page (timeout covers queueing and rendering)."""
+        deadline = time.monotonic() + timeout
+        future = self._submit(self._render, fragment, wait=timeout)
+        try:
+            return future.result(timeout=_remaining(deadline))
+        except FutureTimeoutError:
+            future.cancel()
+            raise HtmlRendererError(f"HTML渲染超时({timeout}秒)")
+
+    def render_fragments(
+        self,
+        fragments: Sequence[Dict[str, Any]],
+        timeout: float = CHROMIUM_RENDER_TIMEOUT_SECONDS,
+    ) -> List[bytes]:
+        """
+        Print many fragments concurrently.
+
+        Results keep the input order; the timeout applies per fragment,
+        counted from the moment it asks for a place in the queue.
+        """
+        futures = []
+        deadlines = []
+        results = []
+        try:
+            for fragment in fragments:
+                deadlines.append(time.monotonic() + timeout)
+                futures.append(self._submit(self._render, fragment, wait=timeout))
+            for future, deadline in zip(futures, deadlines):
+                results.append(future.result(timeout=_remaining(deadline)))
+        except FutureTimeoutError:
+            raise HtmlRendererError(f"HTML渲染超时({timeout}秒)")
+        finally:
+            for future in futures[len(results):]:
+                future.cancel()
+        return results
+
+    async def render_fragment_async(
+        self,
+        fragment: Dict[str, Any],
+        timeout: float = CHROMIUM_RENDER_TIMEOUT_SECONDS,
+    ) -> bytes:
+        """Async variant of render_fragment for callers running their own event loop."""
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + timeout
+        # Waiting for queue admission must not block the caller's loop
+        future = await loop.run_in_executor(None, self._submit, self._render, fragment, timeout)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), _remaining(deadline))
+        except asyncio.TimeoutError:
+            raise HtmlRendererError(f"HTML渲染超时({timeout}秒)")
+
+    async def render_fragments_async(
+        self,
+        fragments: Sequence[Dict[str, Any]],
+        timeout: float = CHROMIUM_RENDER_TIMEOUT_SECONDS,
+    ) -> List[bytes]:
+        """Async variant of render_fragments."""
+        return list(await asyncio.gather(*(
+            self.render_fragment_async(fragment, timeout) for fragment in fragments
+        )))
+
+    def render_batch(
+        self,
+        fragments: Sequence[Dict[str, Any]],
+        timeout: float = CHROMIUM_RENDER_TIMEOUT_SECONDS,
+        batch_size: int = CHROMIUM_BATCH_MAX_FRAGMENTS,
+    ) -> List[bytes]:
+        """
+        Print many fragments with one page.pdf call per batch (see plan_batches).
+
+        Batches run concurrently on the pool's pages; results keep the input
+        order and the timeout applies per batch, queueing included.
+        """
+        plan = plan_batches(fragments, batch_size)
+        futures = []
+        deadlines = []
+        results: List[Optional[bytes]] = [None] * len(fragments)
+        done = 0
+        try:
+            for indices in plan:
+                deadlines.append(time.monotonic() + timeout)
+                futures.append(self._submit(self._render_batch, [fragments[i] for i in indices], wait=timeout))
+            for indices, future, deadline in zip(plan, futures, deadlines):
+                for i, pdf_bytes in zip(indices, future.result(timeout=_remaining(deadline))):
+                    results[i] = pdf_bytes
+                done += 1
+        except FutureTimeoutError:
+            raise HtmlRendererError(f"HTML批量渲染超时({timeout}秒)")
+        finally:
+            for future in futures[done:]:
+                future.cancel()
+        return results
+
+    async def render_batch_async(
+        self,
+        fragments: Sequence[Dict[str, Any]],
+        timeout: float = CHROMIUM_RENDER_TIMEOUT_SECONDS,
+        batch_size: int = CHROMIUM_BATCH_MAX_FRAGMENTS,
+    ) -> List[bytes]:
+        """Async variant of render_batch."""
+        loop = asyncio.get_running_loop()
+
+        async def run(batch: List[Dict[str, Any]]) -> List[bytes]:
+            deadline = time.monotonic() + timeout
+            future = await loop.run_in_executor(None, self._submit, self._render_batch, batch, timeout)
+            try:
+                return await asyncio.wait_for(asyncio.wrap_future(future), _remaining(deadline))
+            except asyncio.TimeoutError:
+                raise HtmlRendererError(f"HTML批量渲染超时({timeout}秒)")
+
+        plan = plan_batches(fragments, batch_size)
+        batches = await asyncio.gather(*(run([fragments[i] for i in indices]) for indices in plan))
+        results: List[Optional[bytes]] = [None] * len(fragments)
+        for indices, pages in zip(plan, batches):
+            for i, pdf_bytes in zip(indices, pages):
+                results[i] = pdf_bytes
+        return results
+
+    def close(self, timeout: float = 10) -> None:
+        """Close the browser and stop the pool's loop (it restarts on the next render)."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown_browser(), loop).result(timeout=timeout)
+        except Exception as e:
+            logger.debug(f"Chromium pool shutdown: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=timeout)
+        self._browser_lock = None
+        self._slot_semaphore = None
+
+
+_default_pool: Optional[ChromiumPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_chromium_pool() -> ChromiumPool:
+    """Process-wide pool, closed at interpreter exit."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ChromiumPool()
+            atexit.register(_default_pool.close)
+        return _default_pool
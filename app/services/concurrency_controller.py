@@ -6,9 +6,11 @@ from concurrent file and page processing.
 """
 
 import asyncio
+import threading
 import time
-from typing import Optional
-from dataclasses import dataclass, field
+from collections import deque
+from typing import Deque, Optional, Tuple
+from dataclasses import dataclass, field, replace
 from .logger import get_logger
 
 logger = get_logger()
@@ -31,10 +33,16 @@ class GlobalConcurrencyController:
     This controller manages the total number of concurrent API requests
     across all files and pages to prevent exceeding API limits and
     system resources.
+
+    Files are processed in separate threads, each running its own event
+    loop, so the controller is a thread-safe token pool rather than an
+    asyncio.Semaphore: the count lives behind a threading.Lock and each
+    waiter is a future on its own loop, woken with call_soon_threadsafe
+    when a token is handed to it.
     """
     
     _instance: Optional['GlobalConcurrencyController'] = None
-    _lock = asyncio.Lock()
+    _lock = threading.Lock()
     
     def __init__(self, max_global_concurrency: int = 200):
         """
@@ -44,10 +52,13 @@ class GlobalConcurrencyController:
             max_global_concurrency: Maximum total concurrent requests across all operations
         """
         self.max_global_concurrency = max_global_concurrency
-        self.semaphore = asyncio.Semaphore(max_global_concurrency)
         self.stats = ConcurrencyStats()
         self._active_requests: set[str] = set()
         self._request_counter = 0
+        self._state_lock = threading.Lock()
+        self._in_use = 0
+        # (loop, future) pairs in FIFO order
+        self._waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
     
     @classmethod
     async def get_instance(cls, max_global_concurrency: int = 200) -> 'GlobalConcurrencyController':
@@ -60,11 +71,7 @@ class GlobalConcurrencyController:
         Returns:
             Global concurrency controller instance
         """
-        if cls._instance is None:
-            async with cls._lock:
-                if cls._instance is None:
-                    cls._instance = cls(max_global_concurrency)
-        return cls._instance
+        return cls.get_instance_sync(max_global_concurrency)
     
     @classmethod
     def get_instance_sync(cls, max_global_concurrency: int = 200) -> 'GlobalConcurrencyController':
@@ -78,9 +85,31 @@ class GlobalConcurrencyController:
             Global concurrency controller instance
         """
         if cls._instance is None:
-            cls._instance = cls(max_global_concurrency)
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls(max_global_concurrency)
         return cls._instance
     
+    @classmethod
+    def install(cls, controller) -> None:
+        """
+        Replace the process-wide controller.
+
+        Used by queue workers to route every LLM request through a budget
+        shared with other processes. ``controller`` must be an async context
+        manager; ``None`` restores lazy creation of the default controller.
+        """
+        with cls._lock:
+            cls._instance = controller
+    
+    def _take_token_locked(self, request_id: Optional[str]) -> None:
+        self._in_use += 1
+        self.stats.current_requests = self._in_use
+        self.stats.total_requests += 1
+        self.stats.peak_requests = max(self.stats.peak_requests, self._in_use)
+        if request_id:
+            self._active_requests.add(request_id)
+    
     async def acquire(self, request_id: Optional[str] = None) -> None:
         """
         Acquire a concurrency slot.
@@ -88,27 +117,60 @@ class GlobalConcurrencyController:
         Args:
             request_id: Optional identifier for this request (for tracking)
         """
-        # Check if we need to wait
-        if self.semaphore._value <= 0:
+        loop = asyncio.get_running_loop()
+        with self._state_lock:
+            if self._in_use < self.max_global_concurrency and not self._waiters:
+                self._take_token_locked(request_id)
+                return
             self.stats.blocked_requests += 1
-            if self.stats.blocked_requests % 10 == 0:
-                logger.warning(
-                    f"Global concurrency limit reached ({self.max_global_concurrency}). "
-                    f"{self.stats.blocked_requests} requests blocked."
-                )
+            blocked = self.stats.blocked_requests
+            waiter = loop.create_future()
+            self._waiters.append((loop, waiter))
         
-        await self.semaphore.acquire()
+        if blocked % 10 == 0:
+            logger.warning(
+                f"Global concurrency limit reached ({self.max_global_concurrency}). "
+                f"{blocked} requests blocked."
+            )
         
-        # Update statistics
-        self.stats.current_requests += 1
-        self.stats.total_requests += 1
-        self.stats.peak_requests = max(
-            self.stats.peak_requests,
-            self.stats.current_requests
-        )
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            with self._state_lock:
+                try:
+                    self._waiters.remove((loop, waiter))
+                    handed_over = False
+                except ValueError:
+                    handed_over = True
+            # A token already handed to this waiter must go back to the pool;
+            # if the wake-up is still pending, _wake sees the cancelled future
+            if handed_over and waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
         
         if request_id:
-            self._active_requests.add(request_id)
+            with self._state_lock:
+                self._active_requests.add(request_id)
+    
+    def _wake(self, waiter: asyncio.Future) -> None:
+        """Runs on the waiter's loop: deliver the token or pass it on."""
+        if waiter.cancelled():
+            self.release()
+        else:
+            waiter.set_result(None)
+    
+    def _hand_over_locked(self) -> None:
+        """Move free tokens to waiters (caller holds _state_lock)."""
+        while self._waiters and self._in_use < self.max_global_concurrency:
+            loop, waiter = self._waiters.popleft()
+            if waiter.cancelled() or loop.is_closed():
+                continue
+            try:
+                loop.call_soon_threadsafe(self._wake, waiter)
+            except RuntimeError:
+                # Loop closed while the waiter was queued
+                continue
+            self._take_token_locked(None)
     
     def release(self, request_id: Optional[str] = None) -> None:
         """
@@ -117,11 +179,12 @@ class GlobalConcurrencyController:
         Args:
             request_id: Optional identifier for this request
         """
-        self.semaphore.release()
-        self.stats.current_requests = max(0, self.stats.current_requests - 1)
-        
-        if request_id and request_id in self._active_requests:
-            self._active_requests.remove(request_id)
+        with self._state_lock:
+            self._in_use = max(0, self._in_use - 1)
+            self.stats.current_requests = self._in_use
+            if request_id and request_id in self._active_requests:
+                self._active_requests.remove(request_id)
+            self._hand_over_locked()
     
     async def __aenter__(self):
         """Async context manager entry."""
@@ -133,16 +196,19 @@ class GlobalConcurrencyController:
         self.release()
     
     def get_stats(self) -> ConcurrencyStats:
-        """Get current concurrency statistics."""
-        return self.stats
+        """Get a snapshot of current concurrency statistics."""
+        with self._state_lock:
+            return replace(self.stats)
     
     def get_available_slots(self) -> int:
         """Get number of available concurrency slots."""
-        return self.semaphore._value
+        with self._state_lock:
+            return max(0, self.max_global_concurrency - self._in_use)
     
     def reset_stats(self) -> None:
         """Reset statistics (useful for monitoring periods)."""
-        self.stats = ConcurrencyStats()
+        with self._state_lock:
+            self.stats = ConcurrencyStats(current_requests=self._in_use)
     
     def adjust_limit(self, new_limit: int) -> None:
         """
@@ -154,25 +220,17 @@ class GlobalConcurrencyController:
         if new_limit < 1:
             raise ValueError("Concurrency limit must be at least 1")
         
-        old_limit = self.max_global_concurrency
-        self.max_global_concurrency = new_limit
-        
-        # Adjust semaphore
-        current_value = self.semaphore._value
-        difference = new_limit - old_limit
-        
-        if difference > 0:
-            # Increase limit: release additional permits
-            for _ in range(difference):
-                self.semaphore.release()
-        elif difference < 0:
-            # Decrease limit: acquire permits to reduce available slots
-            # Note: This won't block existing requests, just prevents new ones
-            pass
+        with self._state_lock:
+            old_limit = self.max_global_concurrency
+            self.max_global_concurrency = new_limit
+            # Raising the limit wakes waiters right away; lowering it lets
+            # in-flight requests finish and only holds back new ones
+            self._hand_over_locked()
+            current = self._in_use
         
         logger.info(
             f"Global concurrency limit adjusted from {old_limit} to {new_limit}. "
-            f"Current active: {self.stats.current_requests}"
+            f"Current active: {current}"
         )
 
 
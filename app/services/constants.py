@@ -18,6 +18,7 @@ CHAR_WIDTH_FACTOR_LATIN = 0.45  # Character width factor for Latin fonts
 MARKDOWN_LINE_HEIGHT_MULTIPLIER = 1.15  # Extra spacing for markdown elements
 CAPACITY_FACTOR = 0.5  # Conservative capacity estimation factor
 SMALL_CAPACITY_FACTOR = 0.7  # More generous factor for small capacities (< 50 chars)
+TEXT_PROFILE_CACHE_SIZE = 64  # Measured explanation texts kept for re-layout (text_layout.text_profile)
 
 # Font Constants
 DEFAULT_FONT_SIZE = 12  # Default font size in points
@@ -45,7 +46,69 @@ DEFAULT_RPM_LIMIT = 150  # Default requests per minute
 DEFAULT_TPM_BUDGET = 2000000  # Default tokens per minute
 DEFAULT_RPD_LIMIT = 10000  # Default requests per day
 
+# Document Analysis Constants
+DOCUMENT_INFO_CACHE_SIZE = 64  # Analyzed uploads kept, keyed by content hash
+PAGE_TEXT_MIN_CHARS = 20  # Extractable characters before a page counts as having text
+PAGE_IMAGE_COVERAGE = 0.5  # Image share of the page area above which a text page is "mixed"
+IMAGE_TOKENS_PER_TILE = 258  # Input tokens per image tile (Gemini)
+IMAGE_TOKEN_TILE_PX = 768  # Tile edge in pixels; images up to IMAGE_TOKEN_SMALL_PX cost one tile
+IMAGE_TOKEN_SMALL_PX = 384
+
 # Cache Constants
 CACHE_DIR_NAME = "pdf_processor_cache"  # Cache directory name
 CACHE_EXPIRY_DAYS = 7  # Cache expiry time in days
 
+
+# Job Journal Constants
+JOURNAL_DIR_NAME = "pdf_processor_jobs"  # Per-batch checkpoint journal directory
+
+# Job Queue Constants
+QUEUE_DIR_NAME = "pdf_processor_queue"  # SQLite queue database and spooled uploads
+QUEUE_DEFAULT_API_CONCURRENCY = 50  # Concurrent LLM requests across all workers
+QUEUE_DEFAULT_MAX_RUNNING_JOBS = 4  # Jobs running at once across all workers (CPU budget)
+QUEUE_STALE_JOB_SECONDS = 600  # Running jobs without a heartbeat for this long are requeued
+QUEUE_HEARTBEAT_SECONDS = 30  # How often a worker marks its running job as alive
+QUEUE_POLL_SECONDS = 0.5  # How often a Streamlit session polls the status of its jobs
+QUEUE_WORKER_TIMEOUT_SECONDS = 120  # Workers without a heartbeat for this long no longer count as live
+QUEUE_STALL_TIMEOUT_SECONDS = 1800  # A session stops waiting when its jobs made no progress for this long
+
+# JSON Recompose Constants
+RECOMPOSE_WORKERS = None  # compose_pdf processes for batch recompose from JSON (None: CPU count)
+RECOMPOSE_MEMORY_BUDGET_MB = 2048  # Estimated memory of recompose jobs running at once
+RECOMPOSE_MEMORY_FACTOR = 8  # Peak memory of one job as a multiple of its PDF + JSON size
+REGENERATION_THREAD_WORKERS = 4  # Files regenerated at once in markdown / per-page HTML modes
+
+# Download ZIP Constants
+ZIP_SPOOL_MAX_MB = 32  # Download ZIPs kept in memory up to this size, then spilled to a temp file
+ZIP_STORED_EXTENSIONS = (".pdf", ".png", ".jpg", ".jpeg", ".webp", ".gif", ".woff", ".woff2", ".zip")  # Already compressed
+
+# Batch Scheduler Constants
+BATCH_SCHEDULER_MAX_CONCURRENCY = 200  # Pages in flight across all files of a batch
+BATCH_SCHEDULER_POLICY = "round_robin"  # "round_robin" or "srf" (shortest remaining first)
+BATCH_SCHEDULER_FILE_WORKERS = None  # Files rendered at once when scheduling (None: CPU count, at least 4)
+
+# Markdown Renderer Constants
+MARKDOWN_CACHE_SIZE = 4096  # Rendered explanations kept in the LRU
+
+# Pandoc Renderer Constants
+PANDOC_TIMEOUT_SECONDS = 10  # Per pandoc invocation (batches add a little per document)
+PANDOC_CACHE_SIZE = 2048  # Rendered documents kept in the LRU
+PANDOC_BATCH_MAX_CHARS = 2000000  # Markdown characters sent through one pandoc process
+
+# pdf2htmlEX Constants
+PDF2HTMLEX_PARALLEL_WORKERS = None  # Concurrent pdf2htmlEX processes per document (None: CPU count)
+PDF2HTMLEX_MAX_PROCESSES = None  # pdf2htmlEX processes running at once across all documents (None: CPU count)
+PDF2HTMLEX_MIN_CHUNK_PAGES = 40  # Smallest page range converted by its own process
+PDF2HTMLEX_ZOOM = 1.3  # pdf2htmlEX --zoom
+PDF2HTMLEX_DPI = 144  # pdf2htmlEX --dpi (resolution of embedded graphics)
+PDF2HTMLEX_CACHE_DIR_NAME = "pdf_processor_pdf2htmlex"  # Parsed conversions keyed by PDF hash
+PDF2HTMLEX_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024  # Compressed size budget before LRU eviction
+CSS_SCOPE_CACHE_MAX_BYTES = 64 * 1024 * 1024  # Scoped pdf2htmlEX stylesheets (with base64 fonts) memoized by CSS hash
+
+# Chromium Pool Constants
+CHROMIUM_POOL_PAGES = 4  # Fragments printed concurrently by the shared browser
+CHROMIUM_POOL_MAX_QUEUE = 64  # Renders queued or running before callers block
+CHROMIUM_RECYCLE_AFTER_RENDERS = 200  # Renders before a page/context is replaced
+CHROMIUM_RENDER_TIMEOUT_SECONDS = 30  # Per fragment, including the wait for a free page
+CHROMIUM_BATCH_MAX_FRAGMENTS = 32  # Fragments printed together by one page.pdf call
+CHROMIUM_LAUNCH_RETRY_SECONDS = 300  # After a failed launch, callers skip the pool this long before it is tried again
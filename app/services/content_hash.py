@@ -0,0 +1,113 @@
+"""
+Content hashing service.
+
+Hashes uploaded PDFs exactly once, in fixed-size chunks, with BLAKE2b.
+The digest is memoized on the upload object so caches, trackers and
+ZIP builders can share it instead of re-hashing the same bytes.
+"""
+
+import hashlib
+import json
+from typing import Any, BinaryIO, Optional, Union
+
+CHUNK_SIZE = 1024 * 1024  # 1 MB per read
+DIGEST_SIZE = 20  # 160-bit digest, 40 hex characters
+
+# Attribute used to memoize the digest on upload objects
+_MEMO_ATTR = "_content_hash"
+
+
+def _new_hasher() -> "hashlib.blake2b":
+    return hashlib.blake2b(digest_size=DIGEST_SIZE)
+
+
+def hash_bytes(data: Union[bytes, bytearray, memoryview]) -> str:
+    """
+    Hash an in-memory buffer without copying it.
+
+    Args:
+        data: Buffer to hash
+
+    Returns:
+        Hex digest
+    """
+    hasher = _new_hasher()
+    view = memoryview(data)
+    for offset in range(0, len(view), CHUNK_SIZE):
+        hasher.update(view[offset:offset + CHUNK_SIZE])
+    return hasher.hexdigest()
+
+
+def hash_stream(stream: BinaryIO) -> str:
+    """
+    Hash a file-like object chunk by chunk, restoring its position afterwards.
+
+    Args:
+        stream: Readable binary stream
+
+    Returns:
+        Hex digest
+    """
+    hasher = _new_hasher()
+    try:
+        position = stream.tell()
+    except Exception:
+        position = None
+    try:
+        stream.seek(0)
+    except Exception:
+        pass
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        hasher.update(chunk)
+    if position is not None:
+        stream.seek(position)
+    return hasher.hexdigest()
+
+
+def get_content_hash(source: Any) -> str:
+    """
+    Get the content digest of an upload, computing it at most once.
+
+    Accepts raw bytes or a file-like upload object (e.g. Streamlit's
+    UploadedFile). For upload objects the digest is cached on the object.
+
+    Args:
+        source: Bytes or file-like object
+
+    Returns:
+        Hex digest
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return hash_bytes(source)
+
+    cached = getattr(source, _MEMO_ATTR, None)
+    if cached:
+        return cached
+
+    digest = hash_stream(source)
+    try:
+        setattr(source, _MEMO_ATTR, digest)
+    except Exception:
+        pass
+    return digest
+
+
+def combine_with_params(content_hash: str, params: Optional[dict]) -> str:
+    """
+    Derive a cache key from a content digest and processing parameters.
+
+    Args:
+        content_hash: Digest returned by get_content_hash
+        params: Processing parameters (JSON-serializable)
+
+    Returns:
+        Hex digest identifying (content, params)
+    """
+    hasher = _new_hasher()
+    hasher.update(content_hash.encode("ascii"))
+    hasher.update(b"\0")
+    hasher.update(json.dumps(params or {}, sort_keys=True, default=str).encode("utf-8"))
+    return hasher.hexdigest()
@@ -0,0 +1,276 @@
+"""
+Up-front pagination of explanations across the main and continuation pages.
+
+_compose_vector used to insert an explanation, guess the overflow from
+text-length heuristics and recurse into process_continuation_page, which
+repeated the insertion and the guesswork for every continuation level. Text
+that PyMuPDF refused to insert was lost, and markdown was shrunk to fit.
+
+plan_explanation lays the whole explanation out once, measuring with the
+same engine that draws it, and flows it column by column through the main
+page and up to MAX_CONTINUATION_DEPTH continuation pages:
+
+- text mode: the text is broken into lines once (text_layout.wrap_text_lines,
+  measured with the drawing font) and the lines fill column after column
+- markdown mode: one fitz.Story is placed into consecutive column-sized
+  pages of a scratch PDF, so headings, lists and code blocks are split by
+  the layout engine instead of at character counts
+
+The resulting ExplanationPlan knows how many output pages the explanation
+needs; draw_plan_page then fills one output page from the plan without any
+further measuring.
+"""
+
+from __future__ import annotations
+
+import functools
+import io
+import os
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import fitz  # PyMuPDF
+from markdown import markdown
+
+from . import constants
+from .logger import get_logger
+from .text_layout import wrap_text_lines
+
+logger = get_logger()
+
+MARKDOWN_EXTENSIONS = ["fenced_code", "tables", "toc", "codehilite"]
+
+
+
+@dataclass
+class ColumnPlan:
+    """Content of one column on one output page."""
+    rect: fitz.Rect
+    text: str = ""  # text mode: the lines placed in this column
+    story_page: Optional[int] = None  # markdown mode: page of ExplanationPlan.story_doc
+
+
+@dataclass
+class ExplanationPlan:
+    """Columns of every output page (main page first, then continuation pages)."""
+    pages: List[List[ColumnPlan]] = field(default_factory=list)
+    writers: List[fitz.TextWriter] = field(default_factory=list)  # text mode, one per page
+    story_doc: Optional[fitz.Document] = None  # markdown mode, one page per column
+    truncated: bool = False
+
+    @property
+    def page_count(self) -> int:
+        return len(self.pages)
+
+    def close(self) -> None:
+        if self.story_doc is not None:
+            self.story_doc.close()
+            self.story_doc = None
+
+
+def resolve_font(font_name: Optional[str]) -> Tuple[str, Optional[str]]:
+    """Return (fontname, fontfile) for PyMuPDF; falls back to Helvetica."""
+    if not font_name:
+        logger.debug("未指定字体名称，将使用默认字体")
+        return "helv", None
+    from app.services.font_helper import get_font_file_path
+    font_path = get_font_file_path(font_name)
+    if not font_path:
+        logger.warning(f"无法找到字体 {font_name} 的文件路径，将使用默认字体")
+        return "helv", None
+    try:
+        if os.path.exists(font_path) and os.access(font_path, os.R_OK):
+            return "china", font_path
+        logger.warning(f"字体文件不存在或不可读: {font_path}，将使用默认字体")
+    except Exception as e:
+        logger.warning(f"字体文件验证失败: {e}，将使用默认字体")
+    return "helv", None
+
+
+@functools.lru_cache(maxsize=8)
+def _load_font(fontname: str, fontfile: Optional[str]) -> fitz.Font:
+    # CJK font files are large; parse each one once per process
+    return fitz.Font(fontfile=fontfile) if fontfile else fitz.Font(fontname)
+
+
+def explanation_column_rects(page_width: float, page_height: float, font_size: int, line_spacing: float,
+                             column_padding: int, render_mode: str) -> List[fitz.Rect]:
+    """
+    Column rectangles of the explanation area, right of the source page.
+
+    Args:
+        page_width: Source page width (the output page is PDF_WIDTH_MULTIPLIER times wider)
+        page_height: Source page height
+        font_size: Explanation font size
+        line_spacing: Line spacing multiplier
+        column_padding: Column internal padding
+        render_mode: "text" or "markdown"
+
+    Returns:
+        MAX_COLUMNS rectangles in output page coordinates
+    """
+    new_w, new_h = int(page_width * constants.PDF_WIDTH_MULTIPLIER), page_height
+    margin_x, margin_y = constants.DEFAULT_MARGIN_X_PT, constants.DEFAULT_MARGIN_Y_PT
+    right_start = page_width + margin_x
+    right_end = new_w - margin_x
+    available_width = max(right_end - right_start, 1)
+    column_spacing = constants.COLUMN_SPACING_PT
+    max_columns = constants.MAX_COLUMNS
+
+    line_height = font_size * max(1.0, line_spacing)
+    if render_mode in ("markdown", "pandoc"):
+        # Markdown needs some space for potential table/list overflow
+        bottom_safe = min(max(8, int(line_height * 0.8)), 20)
+    else:
+        # Text mode: use minimal margin (half line height)
+        bottom_safe = max(int(line_height * 0.5), 4)
+
+    left_internal_margin = max(column_padding, int(font_size * 1.2))
+    right_internal_margin = max(column_padding, int(font_size * 0.6))
+    column_width = max(1.0, (available_width - column_spacing * (max_columns - 1)) / max(max_columns, 1))
+
+    top = margin_y
+    bottom = new_h - margin_y - bottom_safe
+    if bottom <= top:
+        # Ensure minimum rect height (at least 3 lines)
+        bottom = top + max(line_height * 3, font_size * 3)
+    rects = []
+    for idx in range(max_columns):
+        x_left = right_start + idx * (column_width + column_spacing)
+        x0 = x_left + left_internal_margin
+        x1 = min(x_left + column_width, right_end) - right_internal_margin
+        if x1 <= x0:
+            # Ensure minimum width for at least one character
+            x1 = x0 + max(font_size, 20)
+        rects.append(fitz.Rect(x0, top, x1, bottom))
+    return rects
+
+
+def markdown_css(font_size: int, line_spacing: float) -> str:
+    """CSS for explanation columns in markdown mode."""
+    return f"""
+    body {{ margin: 1px; font-size: {font_size}pt; line-height: {line_spacing}; font-family: 'SimHei','Noto Sans SC','Microsoft YaHei',sans-serif; color: #000000; word-wrap: break-word; overflow-wrap: break-word; word-break: break-word; white-space: normal; }}
+    pre, code {{ font-family: 'Consolas','Fira Code',monospace; font-size: {max(8, font_size - 1)}pt; color: #000000; }}
+    table {{ border-collapse: collapse; width: 100%; }}
+    th, td {{ border: 1px solid #ccc; padding: 2pt 4pt; color: #000000; }}
+    body, p, h1, h2, h3, h4, h5, h6, ul, ol, pre, table {{ margin: 0; padding: 0; color: #000000; }}
+    ul, ol {{ padding-left: 0; list-style-position: inside; }}
+    p {{ margin-bottom: 1pt; }}
+    """
+
+
+def markdown_to_html(text: str) -> str:
+    """Render explanation markdown; LaTeX is shown as code since PyMuPDF cannot typeset it."""
+    text = re.sub(r"\$\$(.+?)\$\$", r"\n```\n\1\n```\n", text, flags=re.S)
+    text = re.sub(r"\$(.+?)\$", r"`\1`", text, flags=re.S)
+    return markdown(text, extensions=MARKDOWN_EXTENSIONS)
+
+
+def _plan_text(text: str, rects: List[fitz.Rect], page_rect: fitz.Rect, font: fitz.Font,
+               font_size: int, max_pages: int, plan: ExplanationPlan) -> None:
+    # Same metrics as TextWriter.fill_textbox / insert_textbox
+    tolerance = font_size * 0.2
+    line_height = font_size * (font.ascender - font.descender if font.ascender - font.descender > 1 else 1.2)
+    first_baseline = font_size * font.ascender
+    # All columns share one size
+    rect = rects[0]
+    lines = wrap_text_lines(text, font, font_size, rect.width - tolerance)
+    lines_per_column = max(int((rect.height - first_baseline) / line_height) + 1, 1)
+
+    position = 0
+    while position < len(lines) and plan.page_count < max_pages:
+        writer = fitz.TextWriter(page_rect)
+        columns = []
+        for rect in rects:
+            # Blank lines at the top of a column are dropped
+            while position < len(lines) and not lines[position].strip():
+                position += 1
+            if position >= len(lines):
+                break
+            column_lines = lines[position:position + lines_per_column]
+            position += len(column_lines)
+            for i, line in enumerate(column_lines):
+                if line:
+                    writer.append((rect.x0 + tolerance, rect.y0 + first_baseline + i * line_height),
+                                  line, font=font, fontsize=font_size)
+            columns.append(ColumnPlan(rect, text="\n".join(column_lines)))
+        if columns:
+            plan.pages.append(columns)
+            plan.writers.append(writer)
+    plan.truncated = any(line.strip() for line in lines[position:])
+
+
+def _plan_markdown(text: str, rects: List[fitz.Rect], font_size: int, line_spacing: float,
+                   max_pages: int, plan: ExplanationPlan) -> None:
+    story = fitz.Story(html=markdown_to_html(text), user_css=markdown_css(font_size, line_spacing))
+    buffer = io.BytesIO()
+    writer = fitz.DocumentWriter(buffer)
+    more = True
+    story_page = 0
+    try:
+        while more and plan.page_count < max_pages:
+            columns = []
+            for rect in rects:
+                mediabox = fitz.Rect(0, 0, rect.width, rect.height)
+                device = writer.begin_page(mediabox)
+                more, _ = story.place(mediabox)
+                story.draw(device)
+                writer.end_page()
+                columns.append(ColumnPlan(rect, story_page=story_page))
+                story_page += 1
+                if not more:
+                    break
+            plan.pages.append(columns)
+    finally:
+        writer.close()
+    plan.story_doc = fitz.open(stream=buffer.getvalue(), filetype="pdf")
+    plan.truncated = bool(more)
+
+
+def plan_explanation(text: str, page_width: float, page_height: float, font_size: int,
+                     font_name: Optional[str] = None, render_mode: str = "text",
+                     line_spacing: float = 1.4, column_padding: int = 10,
+                     max_pages: int = 1 + constants.MAX_CONTINUATION_DEPTH) -> ExplanationPlan:
+    """
+    Paginate an explanation over the main page and its continuation pages.
+
+    Args:
+        text: Explanation text (markdown in markdown mode)
+        page_width: Source page width
+        page_height: Source page height
+        font_size: Font size in points
+        font_name: Font name (see font_helper); text mode only
+        render_mode: "text" or "markdown"
+        line_spacing: Line spacing multiplier
+        column_padding: Column internal padding
+        max_pages: Output pages allowed, including the main page
+
+    Returns:
+        ExplanationPlan with at least one page; close() it after drawing
+    """
+    rects = explanation_column_rects(page_width, page_height, font_size, line_spacing, column_padding, render_mode)
+    plan = ExplanationPlan()
+    if text.strip():
+        if render_mode == "markdown":
+            _plan_markdown(text, rects, font_size, line_spacing, max_pages, plan)
+        else:
+            fontname, fontfile = resolve_font(font_name)
+            page_rect = fitz.Rect(0, 0, int(page_width * constants.PDF_WIDTH_MULTIPLIER), page_height)
+            _plan_text(text, rects, page_rect, _load_font(fontname, fontfile), font_size, max_pages, plan)
+    if not plan.pages:
+        plan.pages.append([])
+    if plan.truncated:
+        logger.warning(
+            f"讲解内容超过 {max_pages} 页（含 {max_pages - 1} 个续页），超出部分未输出"
+        )
+    return plan
+
+
+def draw_plan_page(page: fitz.Page, plan: ExplanationPlan, index: int) -> None:
+    """Draw the explanation columns of output page ``index`` onto ``page``."""
+    if plan.story_doc is not None:
+        for column in plan.pages[index]:
+            page.show_pdf_page(column.rect, plan.story_doc, column.story_page)
+    elif index < len(plan.writers):
+        plan.writers[index].write_text(page)
@@ -0,0 +1,278 @@
+"""
+CSS scoping for embedded pdf2htmlEX styles.
+
+pdf2htmlEX output CSS is often minified onto a handful of very long lines
+and carries large @font-face blocks with base64 fonts. scope_css walks it
+once with a small tokenizer (strings, comments, parentheses and brace
+nesting) and prefixes every style rule selector with a container class:
+
+- @media / @supports / @container / @layer / @document blocks are kept and
+  their inner rules are scoped recursively
+- @font-face, @keyframes, @page and other descriptor blocks are copied
+  verbatim; identical @font-face blocks are emitted only once
+- statement at-rules (@charset, @import, ...) are copied verbatim
+
+Results are memoized by CSS hash, since the same fonts and base styles
+repeat across the documents of a batch.
+
+merge_css uses the same tokenizer to concatenate stylesheets (such as the
+page-range chunks of one pdf2htmlEX conversion) while keeping each
+identical top-level block only once.
+"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Iterator, List, Set
+
+from .constants import CSS_SCOPE_CACHE_MAX_BYTES
+
+DEFAULT_SCOPE = ".pdf2htmlex-container"
+
+# At-rules whose block contains ordinary style rules
+_NESTED_RULE_AT_RULES = {"media", "supports", "container", "layer", "document", "-moz-document", "scope"}
+
+# Characters the tokenizer stops at; everything else (declarations, base64
+# font data) is skipped with a regex search instead of char by char
+_SPECIAL = re.compile(r'["\'/{}()\[\],;]')
+_BLOCK_SPECIAL = re.compile(r'["\'/{}]')
+_DQ_STRING_END = re.compile(r'[^"\\\n]*(?:\\.[^"\\\n]*)*["\n]', re.DOTALL)
+_SQ_STRING_END = re.compile(r"[^'\\\n]*(?:\\.[^'\\\n]*)*['\n]", re.DOTALL)
+
+_cache: "OrderedDict[str, str]" = OrderedDict()
+_cache_bytes = 0  # Characters of the memoized stylesheets
+_cache_lock = threading.Lock()
+
+
+def _skip_string(css: str, i: int) -> int:
+    """i points at a quote; return the index after the closing quote."""
+    match = (_DQ_STRING_END if css[i] == '"' else _SQ_STRING_END).match(css, i + 1)
+    return match.end() if match else len(css)
+
+
+def _skip_comment(css: str, i: int) -> int:
+    """i points at '/*'; return the index after '*/'."""
+    end = css.find("*/", i + 2)
+    return len(css) if end < 0 else end + 2
+
+
+def _scan_to(css: str, i: int, stops: str) -> int:
+    """
+    Return the index of the first top-level character in ``stops`` at or
+    after i, skipping strings, comments and (...) / [...] groups.
+    """
+    n = len(css)
+    depth = 0
+    while i < n:
+        # Jump straight to the next character that matters
+        match = _SPECIAL.search(css, i)
+        if not match:
+            return n
+        i = match.start()
+        ch = css[i]
+        if ch == '"' or ch == "'":
+            i = _skip_string(css, i)
+            continue
+        if ch == "/":
+            i = _skip_comment(css, i) if css.startswith("/*", i) else i + 1
+            continue
+        if ch in "([":
+            depth += 1
+        elif ch in ")]":
+            depth = max(0, depth - 1)
+        elif depth == 0 and ch in stops:
+            return i
+        i += 1
+    return n
+
+
+def _block_end(css: str, i: int) -> int:
+    """i points just after '{'; return the index just after the matching '}'."""
+    n = len(css)
+    depth = 1
+    while i < n:
+        match = _BLOCK_SPECIAL.search(css, i)
+        if not match:
+            return n
+        i = match.start()
+        ch = css[i]
+        if ch == '"' or ch == "'":
+            i = _skip_string(css, i)
+            continue
+        if ch == "/":
+            i = _skip_comment(css, i) if css.startswith("/*", i) else i + 1
+            continue
+        if ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return n
+
+
+def _split_selectors(selector_text: str) -> List[str]:
+    parts = []
+    start = 0
+    while True:
+        comma = _scan_to(selector_text, start, ",")
+        parts.append(selector_text[start:comma].strip())
+        if comma >= len(selector_text):
+            return [part for part in parts if part]
+        start = comma + 1
+
+
+def _scope_rules(css: str, i: int, scope: str, out: List[str], seen_font_faces: Set[str]) -> int:
+    """Scope a rule list starting at i until a closing '}' or the end; return the stop index."""
+    n = len(css)
+    while i < n:
+        ch = css[i]
+        if ch.isspace():
+            i += 1
+            continue
+        if ch == "/" and css.startswith("/*", i):
+            i = _skip_comment(css, i)
+            continue
+        if ch == "}":
+            return i
+        if ch == "@":
+            stop = _scan_to(css, i, "{;}")
+            prelude = css[i:stop].strip()
+            name = prelude[1:].split(None, 1)[0].split("(", 1)[0].lower() if len(prelude) > 1 else ""
+            if stop >= n or css[stop] != "{":
+                # Statement at-rule (@charset, @import, @layer a, b;)
+                out.append(prelude + ";")
+                i = stop + 1 if stop < n and css[stop] == ";" else stop
+                continue
+            if name in _NESTED_RULE_AT_RULES:
+                out.append(prelude + "{")
+                i = _scope_rules(css, stop + 1, scope, out, seen_font_faces)
+                out.append("}")
+                i += 1
+                continue
+            end = _block_end(css, stop + 1)
+            block = prelude + css[stop:end]
+            if name == "font-face":
+                if block in seen_font_faces:
+                    i = end
+                    continue
+                seen_font_faces.add(block)
+            out.append(block)
+            i = end
+            continue
+        # Style rule: selector list followed by a declaration block
+        stop = _scan_to(css, i, "{}")
+        if stop >= n or css[stop] == "}":
+            # Stray text without a block; drop it like a browser would
+            i = stop
+            continue
+        end = _block_end(css, stop + 1)
+        selectors = _split_selectors(css[i:stop])
+        if selectors:
+            out.append(", ".join(f"{scope} {selector}" for selector in selectors) + css[stop:end])
+        i = end
+    return n
+
+
+def scope_css(css: str, scope: str = DEFAULT_SCOPE) -> str:
+    """
+    Prefix every style rule in ``css`` with ``scope``.
+
+    Args:
+        css: Stylesheet text (minified or not)
+        scope: Selector prepended to each rule selector
+
+    Returns:
+        Scoped stylesheet, one rule per line
+    """
+    if not css:
+        return ""
+    key = hashlib.sha1(f"{scope}\0{css}".encode("utf-8")).hexdigest()
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+            return cached
+
+    out: List[str] = []
+    seen_font_faces: Set[str] = set()
+    i = 0
+    while i < len(css):
+        i = _scope_rules(css, i, scope, out, seen_font_faces)
+        # A stray top-level '}' ends _scope_rules early; skip it and go on
+        i += 1
+    scoped = "\n".join(out)
+
+    _remember(key, scoped)
+    return scoped
+
+
+def _remember(key: str, scoped: str) -> None:
+    """Memoize a scoped stylesheet, evicting the least recently used beyond CSS_SCOPE_CACHE_MAX_BYTES."""
+    global _cache_bytes
+    # Embedded fonts make stylesheets large: one over the whole budget is not kept
+    if len(scoped) > CSS_SCOPE_CACHE_MAX_BYTES:
+        return
+    with _cache_lock:
+        if key in _cache:
+            return
+        _cache[key] = scoped
+        _cache_bytes += len(scoped)
+        while _cache_bytes > CSS_SCOPE_CACHE_MAX_BYTES:
+            _, evicted = _cache.popitem(last=False)
+            _cache_bytes -= len(evicted)
+
+
+def _top_level_blocks(css: str) -> Iterator[str]:
+    """
+    Split ``css`` into consecutive slices, each ending with one top-level
+    rule, block at-rule or statement at-rule; joined they give back ``css``.
+    """
+    n = len(css)
+    start = i = 0
+    while i < n:
+        ch = css[i]
+        if ch.isspace() or ch == "}":
+            i += 1
+            continue
+        if ch == "/" and css.startswith("/*", i):
+            i = _skip_comment(css, i)
+            continue
+        stop = _scan_to(css, i, "{;}" if ch == "@" else "{}")
+        if stop < n and css[stop] == "{":
+            end = _block_end(css, stop + 1)
+        elif ch == "@" and stop < n and css[stop] == ";":
+            end = stop + 1
+        else:
+            # Stray text without a block; it stays attached to the next slice
+            i = stop
+            continue
+        yield css[start:end]
+        start = i = end
+    if css[start:].strip():
+        yield css[start:]
+
+
+def merge_css(css_list: List[str]) -> str:
+    """
+    Concatenate stylesheets, keeping each identical top-level block once.
+
+    Rules, @font-face and @media blocks are compared as whole blocks (after
+    stripping surrounding whitespace), so minified CSS with many rules per
+    line is deduplicated the same way as one rule per line. The first
+    occurrence keeps its position; everything else is copied verbatim.
+    """
+    seen: Set[str] = set()
+    merged = []
+    for css in css_list:
+        kept = []
+        for block in _top_level_blocks(css or ""):
+            key = block.strip()
+            if key in seen:
+                continue
+            seen.add(key)
+            kept.append(block)
+        merged.append("".join(kept))
+    return "\n".join(merged)
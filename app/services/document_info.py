@@ -0,0 +1,267 @@
+"""
+Pre-flight analysis of uploaded PDFs.
+
+The tracker, validation, resume and file info used to open every upload
+again just to read its page count. analyze_pdf opens a document once and
+records what those stages need in a DocumentInfo: page sizes and rotation,
+a text / image classification, a hash per page and an estimated token cost
+of sending the pages to the LLM. get_document_info caches the result by
+content hash, so an upload is analyzed once no matter how many stages ask.
+
+Page hashes identify identical pages within one document (same content
+streams, resources, geometry and annotations); the render and compose
+stages use them to render or import a repeated page only once.
+"""
+
+import hashlib
+import math
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+import fitz
+
+from .constants import (
+    DEFAULT_DPI,
+    DOCUMENT_INFO_CACHE_SIZE,
+    IMAGE_TOKEN_SMALL_PX,
+    IMAGE_TOKEN_TILE_PX,
+    IMAGE_TOKENS_PER_TILE,
+    PAGE_IMAGE_COVERAGE,
+    PAGE_TEXT_MIN_CHARS,
+)
+from .content_hash import get_content_hash
+from .logger import get_logger
+
+logger = get_logger()
+
+T = TypeVar("T")
+
+# content hash -> DocumentInfo, least recently used first
+_info_cache: "OrderedDict[str, DocumentInfo]" = OrderedDict()
+_info_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class PageInfo:
+    """One page as it is displayed (width/height already account for rotation)."""
+
+    index: int
+    width: float
+    height: float
+    rotation: int
+    text_chars: int
+    image_coverage: float
+    page_hash: str
+
+    @property
+    def kind(self) -> str:
+        """"text", "image" (little or no extractable text) or "mixed"."""
+        if self.text_chars < PAGE_TEXT_MIN_CHARS:
+            return "image"
+        return "mixed" if self.image_coverage >= PAGE_IMAGE_COVERAGE else "text"
+
+    def estimate_tokens(self, dpi: int = DEFAULT_DPI) -> int:
+        """Input tokens of the page screenshot rendered at ``dpi``."""
+        w_px = self.width * dpi / 72.0
+        h_px = self.height * dpi / 72.0
+        if w_px <= IMAGE_TOKEN_SMALL_PX and h_px <= IMAGE_TOKEN_SMALL_PX:
+            return IMAGE_TOKENS_PER_TILE
+        tiles = math.ceil(w_px / IMAGE_TOKEN_TILE_PX) * math.ceil(h_px / IMAGE_TOKEN_TILE_PX)
+        return tiles * IMAGE_TOKENS_PER_TILE
+
+
+@dataclass(frozen=True)
+class DocumentInfo:
+    """Everything the pipeline needs to know about an upload before processing it."""
+
+    content_hash: str
+    size_bytes: int
+    pages: Tuple[PageInfo, ...]
+
+    @property
+    def page_count(self) -> int:
+        return len(self.pages)
+
+    @property
+    def page_sizes(self) -> List[Tuple[float, float]]:
+        return [(page.width, page.height) for page in self.pages]
+
+    @property
+    def text_pages(self) -> List[int]:
+        """0-based indices of pages with extractable text."""
+        return [page.index for page in self.pages if page.kind != "image"]
+
+    @property
+    def image_pages(self) -> List[int]:
+        """0-based indices of pages that are (almost) only images or drawings."""
+        return [page.index for page in self.pages if page.kind == "image"]
+
+    @cached_property
+    def duplicates(self) -> Dict[int, int]:
+        """Page index -> index of the first earlier page with the same page hash."""
+        first: Dict[str, int] = {}
+        duplicates: Dict[int, int] = {}
+        for page in self.pages:
+            if not page.page_hash:
+                continue
+            if page.page_hash in first:
+                duplicates[page.index] = first[page.page_hash]
+            else:
+                first[page.page_hash] = page.index
+        return duplicates
+
+    def estimate_tokens(self, dpi: int = DEFAULT_DPI, prompt_tokens: int = 0, output_tokens: int = 0) -> int:
+        """
+        Estimated LLM tokens for explaining every page.
+
+        Args:
+            dpi: DPI the pages are rendered at for the LLM
+            prompt_tokens: Prompt tokens sent with each page
+            output_tokens: Tokens generated per page (max_tokens gives an upper bound)
+        """
+        return sum(page.estimate_tokens(dpi) + prompt_tokens + output_tokens for page in self.pages)
+
+    @property
+    def estimated_tokens(self) -> int:
+        """Input tokens of all page screenshots at the default DPI."""
+        return self.estimate_tokens()
+
+
+def _resources(doc: fitz.Document, xref: int) -> str:
+    # The page's /Resources, inherited from the page tree if the page has none
+    while xref:
+        kind, value = doc.xref_get_key(xref, "Resources")
+        if kind == "xref":
+            return doc.xref_object(int(value.split()[0]), compressed=True)
+        if kind != "null":
+            return value
+        kind, value = doc.xref_get_key(xref, "Parent")
+        xref = int(value.split()[0]) if kind == "xref" else 0
+    return ""
+
+
+def _page_hash(doc: fitz.Document, page: fitz.Page) -> str:
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(repr((tuple(page.mediabox), tuple(page.cropbox), page.rotation)).encode("ascii"))
+    # Resources and annotations are compared by reference: pages that draw
+    # the same objects of this document look the same
+    hasher.update(_resources(doc, page.xref).encode("utf-8", "replace"))
+    hasher.update(doc.xref_get_key(page.xref, "Annots")[1].encode("utf-8", "replace"))
+    hasher.update(page.read_contents())
+    return hasher.hexdigest()
+
+
+def _analyze_page(doc: fitz.Document, index: int) -> PageInfo:
+    try:
+        page = doc.load_page(index)
+        rect = page.rect
+    except Exception as e:  # noqa: BLE001
+        logger.warning(f"Failed to load page {index + 1} for analysis: {e}")
+        return PageInfo(index, 0.0, 0.0, 0, 0, 0.0, "")
+    try:
+        text_chars = sum(len(word) for word in page.get_text("text").split())
+        area = rect.width * rect.height
+        covered = sum(abs(fitz.Rect(info["bbox"]) & rect) for info in page.get_image_info())
+        image_coverage = min(covered / area, 1.0) if area > 0 else 0.0
+        page_hash = _page_hash(doc, page)
+    except Exception as e:  # noqa: BLE001
+        # Still usable for sizes; an empty hash never matches another page
+        logger.warning(f"Failed to analyze page {index + 1}: {e}")
+        text_chars, image_coverage, page_hash = 0, 0.0, ""
+    return PageInfo(index, rect.width, rect.height, page.rotation, text_chars, image_coverage, page_hash)
+
+
+def analyze_pdf(src_bytes: bytes, content_hash: Optional[str] = None) -> DocumentInfo:
+    """
+    Open a PDF once and describe its pages.
+
+    Args:
+        src_bytes: PDF file bytes
+        content_hash: Precomputed content digest of src_bytes (optional)
+
+    Returns:
+        DocumentInfo of the document
+
+    Raises:
+        Whatever fitz raises for data that is not a readable PDF
+    """
+    if content_hash is None:
+        content_hash = get_content_hash(src_bytes)
+    with fitz.open(stream=src_bytes, filetype="pdf") as doc:
+        pages = tuple(_analyze_page(doc, index) for index in range(doc.page_count))
+    return DocumentInfo(content_hash=content_hash, size_bytes=len(src_bytes), pages=pages)
+
+
+def _read_all(source: Any) -> bytes:
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    position = source.tell()
+    source.seek(0)
+    try:
+        return source.read()
+    finally:
+        source.seek(position)
+
+
+def get_document_info(source: Any, content_hash: Optional[str] = None) -> DocumentInfo:
+    """
+    DocumentInfo of an upload, analyzed at most once per content hash.
+
+    Args:
+        source: PDF bytes or a file-like upload object (e.g. Streamlit's UploadedFile)
+        content_hash: Precomputed content digest (optional, see content_hash)
+
+    Returns:
+        Cached or freshly computed DocumentInfo
+    """
+    if content_hash is None:
+        content_hash = get_content_hash(source)
+    with _info_lock:
+        info = _info_cache.get(content_hash)
+        if info is not None:
+            _info_cache.move_to_end(content_hash)
+            return info
+    info = analyze_pdf(_read_all(source), content_hash)
+    with _info_lock:
+        _info_cache[content_hash] = info
+        _info_cache.move_to_end(content_hash)
+        while len(_info_cache) > DOCUMENT_INFO_CACHE_SIZE:
+            _info_cache.popitem(last=False)
+    return info
+
+
+class PageRenderCache:
+    """
+    Renders pages through ``render`` so repeated pages are rendered once.
+
+    A render is kept only until the last page repeating it has asked for it,
+    so streaming generators still hold a single screenshot at a time unless
+    the document really repeats pages. Without a DocumentInfo matching the
+    document (``page_count``) every page is simply rendered.
+    """
+
+    def __init__(self, document_info: Optional[DocumentInfo], page_count: int,
+                 render: Callable[[int], T]):
+        self._render = render
+        self._hashes: Dict[int, str] = {}
+        self._remaining: Dict[str, int] = {}
+        self._kept: Dict[str, T] = {}
+        if document_info is not None and document_info.page_count == page_count and document_info.duplicates:
+            repeated = {document_info.pages[i].page_hash for i in document_info.duplicates}
+            self._hashes = {page.index: page.page_hash for page in document_info.pages if page.page_hash in repeated}
+            self._remaining = dict(Counter(self._hashes.values()))
+
+    def get(self, page_index: int) -> T:
+        key = self._hashes.get(page_index)
+        if key is None:
+            return self._render(page_index)
+        value = self._kept[key] if key in self._kept else self._render(page_index)
+        self._remaining[key] -= 1
+        if self._remaining[key] > 0:
+            self._kept[key] = value
+        else:
+            self._kept.pop(key, None)
+        return value
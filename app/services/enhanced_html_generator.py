@@ -8,7 +8,9 @@ import json
 import math
 import uuid
 import re
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .markdown_renderer import render_markdown_batch, render_markdown_to_html
 
 
 class EnhancedHTMLGenerator:
@@ -16,42 +18,8 @@ class EnhancedHTMLGenerator:
     
     @staticmethod
     def _render_markdown_to_html(markdown_content: str) -> str:
-        """
-        将Markdown格式的讲解内容渲染为HTML
-        
-        Args:
-            markdown_content: Markdown格式的文本
-            
-        Returns:
-            渲染后的HTML字符串
-        """
-        if not markdown_content or not markdown_content.strip():
-            return "<p>暂无讲解内容</p>"
-        
-        try:
-            # 尝试使用markdown库进行渲染
-            import markdown
-            html_content = markdown.markdown(
-                markdown_content,
-                extensions=[
-                    'fenced_code',  # 代码块支持
-                    'tables',       # 表格支持
-                    'nl2br',        # 自动换行
-                    'sane_lists'    # 更好的列表处理
-                ]
-            )
-            return html_content
-        except ImportError:
-            # 如果没有markdown库，使用简单的文本转换
-            html_content = markdown_content.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-            html_content = html_content.replace('\n\n', '</p><p>').replace('\n', '<br>')
-            return f"<p>{html_content}</p>"
-        except Exception as e:
-            # 如果渲染失败，返回原始内容（转义后）
-            print(f"Warning: Failed to render markdown: {e}")
-            html_content = markdown_content.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-            html_content = html_content.replace('\n\n', '</p><p>').replace('\n', '<br>')
-            return f"<p>{html_content}</p>"
+        """将Markdown格式的讲解内容渲染为HTML（共享的带缓存渲染器）"""
+        return render_markdown_to_html(markdown_content)
     
     @staticmethod
     def generate_sync_styles(
@@ -769,6 +737,27 @@ window.prevPage = function() {{
         Returns:
             完整的HTML字符串
         """
+        return "".join(EnhancedHTMLGenerator.iter_sync_html(
+            pdf_content, explanations, total_pages, font_name, font_size,
+            line_spacing, column_padding
+        ))
+    
+    @staticmethod
+    def iter_sync_html(
+        pdf_content: str,
+        explanations: Dict[int, str],
+        total_pages: int = 1,
+        font_name: str = "SimHei",
+        font_size: int = 14,
+        line_spacing: float = 1.2,
+        column_padding: int = 10
+    ) -> Iterator[str]:
+        """
+        逐块生成同步HTML页面，参数与 generate_sync_html 相同
+        
+        Yields:
+            HTML文档的连续片段
+        """
         css_styles = EnhancedHTMLGenerator.generate_sync_styles(
             font_name, font_size, line_spacing, column_padding
         )
@@ -777,31 +766,7 @@ window.prevPage = function() {{
             total_pages, explanations
         )
         
-        # 生成所有讲解页面的HTML内容
-        explanation_pages_html = ""
-        for page_num in range(1, total_pages + 1):
-            explanation_content = explanations.get(page_num, "")
-            
-            if not explanation_content:
-                explanation_content = f"""
-                <div class="note">
-                    <p><strong>第{page_num}页暂无讲解内容</strong></p>
-                    <p>本页PDF内容较为简单，无需额外解释。如有疑问，请参考相关教材或咨询老师。</p>
-                </div>
-                """
-            else:
-                # 简单的Markdown转HTML处理
-                explanation_html = explanation_content.replace('\n\n', '</p><p>').replace('\n', '<br>')
-                explanation_content = f"<p>{explanation_html}</p>"
-            
-            explanation_pages_html += f"""
-            <div class="explanation-page" id="explanation-page-{page_num}">
-                <h1>第 {page_num} 页 讲解</h1>
-                {explanation_content}
-            </div>
-            """
-        
-        html = f"""
+        yield f"""
 <!DOCTYPE html>
 <html lang="zh-CN">
 <head>
@@ -843,7 +808,32 @@ window.prevPage = function() {{
                 <h2>📖 页面讲解</h2>
             </div>
             <div class="explanation-content">
-                {explanation_pages_html}
+                """
+        
+        # 逐页生成讲解页面的HTML内容
+        for page_num in range(1, total_pages + 1):
+            explanation_content = explanations.get(page_num, "")
+            
+            if not explanation_content:
+                explanation_content = f"""
+                <div class="note">
+                    <p><strong>第{page_num}页暂无讲解内容</strong></p>
+                    <p>本页PDF内容较为简单，无需额外解释。如有疑问，请参考相关教材或咨询老师。</p>
+                </div>
+                """
+            else:
+                # 简单的Markdown转HTML处理
+                explanation_html = explanation_content.replace('\n\n', '</p><p>').replace('\n', '<br>')
+                explanation_content = f"<p>{explanation_html}</p>"
+            
+            yield f"""
+            <div class="explanation-page" id="explanation-page-{page_num}">
+                <h1>第 {page_num} 页 讲解</h1>
+                {explanation_content}
+            </div>
+            """
+        
+        yield f"""
             </div>
         </div>
     </div>
@@ -854,7 +844,6 @@ window.prevPage = function() {{
 </body>
 </html>
 """
-        return html
     
     @staticmethod
     def create_navigation_html(
@@ -865,7 +854,7 @@ window.prevPage = function() {{
         font_size: int = 14
     ) -> str:
         """创建导航索引页面，包含快速跳转到同步模式"""
-        nav_items = ""
+        nav_parts = []
         for page_num in range(1, total_pages + 1):
             explanation_content = explanations.get(page_num, "")
             preview = explanation_content[:100] + "..." if len(explanation_content) > 100 else explanation_content
@@ -876,7 +865,7 @@ window.prevPage = function() {{
             import re
             preview = re.sub(r'<[^>]+>', '', preview)
             
-            nav_items += f"""
+            nav_parts.append(f"""
             <div class="nav-item">
                 <div class="nav-content">
                     <h3>第 {page_num} 页</h3>
@@ -884,7 +873,8 @@ window.prevPage = function() {{
                     <button onclick="openSyncMode({page_num})" class="nav-btn">🚀 打开同步模式</button>
                 </div>
             </div>
-            """
+            """)
+        nav_items = "".join(nav_parts)
         
         nav_css = f"""
         body {{
@@ -1546,27 +1536,17 @@ window.prevPage = function() {{
         
         # 生成所有页面的HTML文件
         generated_files = {}
-        
-        for page_num in range(1, total_pages + 1):
-            explanation_content = explanations.get(page_num, "暂无讲解内容")
-            
-            # 渲染Markdown格式的讲解内容为HTML
-            explanation_html = EnhancedHTMLGenerator._render_markdown_to_html(explanation_content)
-            
-            # 生成单页HTML
-            html_content = EnhancedHTMLGenerator.generate_per_page_html(
-                page_number=page_num,
-                total_pages=total_pages,
-                explanation_content=explanation_html,
-                pdf_filename=pdf_filename,
-                font_name=font_name,
-                font_size=font_size,
-                line_spacing=line_spacing,
-                output_folder=str(output_path)
-            )
-            
+        pages = EnhancedHTMLGenerator.iter_per_page_html(
+            explanations=explanations,
+            pdf_filename=pdf_filename,
+            total_pages=total_pages,
+            font_name=font_name,
+            font_size=font_size,
+            line_spacing=line_spacing,
+            output_folder=str(output_path)
+        )
+        for page_filename, html_content in pages:
             # 保存HTML文件
-            page_filename = f"page_{page_num}.html"
             page_path = output_path / page_filename
             
             with open(page_path, 'w', encoding='utf-8') as f:
@@ -1593,6 +1573,50 @@ window.prevPage = function() {{
         print(f"Complete! Generated {total_pages} HTML pages to directory: {output_path}")
         return generated_files
 
+    @staticmethod
+    def iter_per_page_html(
+        explanations: Dict[int, str],
+        pdf_filename: str,
+        total_pages: int = 1,
+        font_name: str = "SimHei",
+        font_size: int = 14,
+        line_spacing: float = 1.2,
+        output_folder: str = ""
+    ) -> Iterator[Tuple[str, str]]:
+        """
+        逐页生成分页HTML（不写磁盘），可直接写入ZIP
+        
+        Args:
+            explanations: 页码到讲解内容的映射
+            pdf_filename: PDF文件名（页面中引用的相对路径）
+            total_pages: 总页数
+            font_name: 字体名称
+            font_size: 字体大小
+            line_spacing: 行距倍数
+            output_folder: 输出文件夹路径（见 generate_per_page_html）
+            
+        Yields:
+            (page_{n}.html, HTML内容)
+        """
+        # 批量渲染Markdown格式的讲解内容为HTML
+        rendered = render_markdown_batch({
+            page_num: explanations.get(page_num, "暂无讲解内容")
+            for page_num in range(1, total_pages + 1)
+        })
+        
+        for page_num in range(1, total_pages + 1):
+            html_content = EnhancedHTMLGenerator.generate_per_page_html(
+                page_number=page_num,
+                total_pages=total_pages,
+                explanation_content=rendered[page_num],
+                pdf_filename=pdf_filename,
+                font_name=font_name,
+                font_size=font_size,
+                line_spacing=line_spacing,
+                output_folder=output_folder
+            )
+            yield f"page_{page_num}.html", html_content
+
     @staticmethod
     def create_multi_pdf_index(
         pdf_info_list: list,
@@ -1608,7 +1632,7 @@ window.prevPage = function() {{
         Returns:
             生成的索引页面路径
         """
-        pdf_items = ""
+        pdf_parts = []
         
         for i, pdf_info in enumerate(pdf_info_list):
             name = pdf_info.get("name", f"PDF_{i+1}")
@@ -1616,7 +1640,7 @@ window.prevPage = function() {{
             pages = pdf_info.get("pages", 0)
             folder = pdf_info.get("folder", name)
             
-            pdf_items += f"""
+            pdf_parts.append(f"""
             <div class="pdf-card">
                 <div class="pdf-header">
                     <h2>{title}</h2>
@@ -1627,7 +1651,8 @@ window.prevPage = function() {{
                     <a href="{folder}/{folder}.pdf" class="action-btn secondary" download>📄 下载PDF</a>
                 </div>
             </div>
-            """
+            """)
+        pdf_items = "".join(pdf_parts)
         
         index_css = f"""
         * {{
@@ -0,0 +1,97 @@
+"""
+External page images for the HTML screenshot mode.
+
+By default the screenshot document embeds every page as a base64 PNG, which
+makes a 200-page deck a ~30 MB HTML file that the browser must fully parse
+before anything shows up. In external-asset mode each page is written once
+per resolution next to the HTML (``<name>_assets/p0001-150.webp`` ...) and
+referenced with ``srcset`` + ``loading="lazy"``, so the browser only fetches
+the pages near the viewport at the resolution it actually needs.
+
+WebP is used when Pillow was built with it (much smaller than PNG for slide
+screenshots); otherwise the assets fall back to PNG.
+"""
+
+import io
+import os
+from typing import Any, Dict, Sequence
+from urllib.parse import quote
+
+import fitz
+from PIL import Image, features
+
+ASSET_FORMAT = "webp" if features.check("webp") else "png"
+
+# Rendered resolutions relative to the configured screenshot DPI. The full
+# resolution is the <img src>; the smaller one serves narrow viewports.
+ASSET_SCALES = (0.5, 1.0)
+
+# The screenshot column takes half the window on desktop, all of it on mobile
+ASSET_SIZES = "(max-width: 900px) 100vw, 50vw"
+
+
+def _encode(pix: "fitz.Pixmap") -> bytes:
+    if ASSET_FORMAT == "png":
+        return pix.tobytes("png")
+    mode = "RGBA" if pix.alpha else "RGB"
+    image = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+    buf = io.BytesIO()
+    image.save(buf, format="WEBP", quality=85, method=4)
+    return buf.getvalue()
+
+
+def write_page_assets(
+    doc: "fitz.Document",
+    page_index: int,
+    assets_dir: str,
+    url_prefix: str,
+    dpi: int = 150,
+    scales: Sequence[float] = ASSET_SCALES,
+) -> Dict[str, Any]:
+    """
+    Render one page at several resolutions into ``assets_dir``.
+
+    Args:
+        doc: Open PDF document
+        page_index: 0-based page index
+        assets_dir: Directory receiving the image files (created if missing)
+        url_prefix: Relative URL of ``assets_dir`` as seen from the HTML file
+        dpi: Full-resolution DPI (the screenshot DPI setting)
+        scales: Resolutions to render, relative to ``dpi``
+
+    Returns:
+        Screenshot entry for HTMLScreenshotGenerator: page_num (1-based),
+        image_src, srcset, sizes, width, height
+    """
+    os.makedirs(assets_dir, exist_ok=True)
+    page = doc.load_page(page_index)
+    prefix = quote(url_prefix.rstrip("/"))
+    candidates = []
+    full = None
+    for scale in sorted(set(scales)):
+        page_dpi = max(1, int(round(dpi * scale)))
+        pix = page.get_pixmap(dpi=page_dpi)
+        name = f"p{page_index + 1:04d}-{page_dpi}.{ASSET_FORMAT}"
+        with open(os.path.join(assets_dir, name), "wb") as f:
+            f.write(_encode(pix))
+        url = f"{prefix}/{quote(name)}" if prefix else quote(name)
+        candidates.append(f"{url} {pix.width}w")
+        full = (url, pix.width, pix.height)
+    return {
+        'page_num': page_index + 1,
+        'image_src': full[0],
+        'srcset': ", ".join(candidates),
+        'sizes': ASSET_SIZES,
+        'width': full[1],
+        'height': full[2],
+    }
+
+
+def iter_asset_files(assets_dir: str):
+    """Yield (file name, absolute path) for every asset in ``assets_dir``, sorted by name."""
+    if not assets_dir or not os.path.isdir(assets_dir):
+        return
+    for name in sorted(os.listdir(assets_dir)):
+        path = os.path.join(assets_dir, name)
+        if os.path.isfile(path):
+            yield name, path
@@ -12,13 +12,164 @@ import base64
 import subprocess
 import tempfile
 import shutil
-from typing import Dict, Optional, List, Tuple
+import threading
+from typing import Any, Dict, Iterable, Iterator, Optional, List, Tuple, Union
 from pathlib import Path
 
+from .constants import (
+    PDF2HTMLEX_DPI,
+    PDF2HTMLEX_MAX_PROCESSES,
+    PDF2HTMLEX_MIN_CHUNK_PAGES,
+    PDF2HTMLEX_PARALLEL_WORKERS,
+    PDF2HTMLEX_ZOOM,
+)
+from .css_scoper import merge_css, scope_css
 from .logger import get_logger
+from .markdown_renderer import render_markdown_batch, render_markdown_to_html
 
 logger = get_logger()
 
+# Every pdf2htmlEX run in the process takes a slot, so page-range chunks of
+# concurrently converted documents share one limit instead of each document
+# starting CPU-count processes
+_pdf2htmlex_slots = threading.BoundedSemaphore(PDF2HTMLEX_MAX_PROCESSES or os.cpu_count() or 1)
+
+# Class names pdf2htmlEX numbers per conversion (font family, font size,
+# fill/stroke color, letter/word spacing, transform matrix, position, size,
+# vertical align, clip box, whitespace). Each page-range conversion restarts
+# the numbering, so the same name means different styles in different chunks.
+_GENERATED_CLASS_PREFIXES = r'(?:ff|fs|fc|sc|ls|ws|m|x|y|h|w|v|c|_)'
+_CSS_CLASS_REF = re.compile(r'(?<![\w-])\.(' + _GENERATED_CLASS_PREFIXES + r'[0-9a-f]+)(?![\w-])')
+_CSS_FONT_FAMILY = re.compile(r'(font-family\s*:\s*)(ff[0-9a-f]+)(?![\w-])')
+_HTML_CLASS_ATTR = re.compile(r'class="([^"]*)"')
+_HTML_GENERATED_CLASS = re.compile(r'^' + _GENERATED_CLASS_PREFIXES + r'[0-9a-f]+$')
+# Identifies how merge_pdf2htmlex_chunks renames generated names (part of
+# the conversion cache key); change it whenever the renaming changes
+CHUNK_RENAMING = "k1"
+
+
+# Boundary scanner for pdf2htmlEX output (see scan_pdf2htmlex_html)
+_HEAD_MARKER = re.compile(r'<style\b[^>]*>|<script\b[^>]*>|<div\b[^>]*\bid=["\']page-container["\'][^>]*>', re.IGNORECASE)
+_STYLE_END = re.compile(r'</style\s*>', re.IGNORECASE)
+_SCRIPT_END = re.compile(r'</script\s*>', re.IGNORECASE)
+_DIV_TAG = re.compile(r'<div\b[^>]*>|</div\s*>', re.IGNORECASE)
+_CLASS_VALUE = re.compile(r'\bclass\s*=\s*["\']([^"\']*)["\']', re.IGNORECASE)
+_SCAN_CHUNK_SIZE = 1024 * 1024
+
+
+def scan_pdf2htmlex_html(
+    html_path: str,
+    chunk_size: int = _SCAN_CHUNK_SIZE
+) -> Tuple[List[str], List[str]]:
+    """
+    Extract <style> blocks and page fragments from pdf2htmlEX output in one pass.
+    
+    Reads the file in chunks and tracks <div> nesting from each div.pf page
+    marker inside #page-container, so apart from the results only the
+    current page is held in memory. Page fragments are the original source
+    text of each page div.
+    
+    Returns:
+        (css_blocks, page_htmls); page_htmls is empty if no #page-container
+        was found
+    """
+    css_blocks: List[str] = []
+    pages: List[str] = []
+    buf = ""
+    pos = 0               # scan position in buf
+    block_end = None      # end-tag pattern while inside <style>/<script>
+    block_start = 0       # start of that block's content in buf
+    in_body = False
+    page_start = -1       # start of the open page div in buf
+    depth = 0
+    
+    with open(html_path, 'r', encoding='utf-8', errors='replace') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            buf += chunk
+            
+            while True:
+                if block_end is not None:
+                    # Inside <style>/<script>: look only at the new text
+                    match = block_end.search(buf, pos)
+                    if not match:
+                        pos = max(pos, len(buf) - 16)
+                        break
+                    if block_end is _STYLE_END:
+                        css_blocks.append(buf[block_start:match.start()])
+                    block_end = None
+                    pos = match.end()
+                elif not in_body:
+                    match = _HEAD_MARKER.search(buf, pos)
+                    if not match:
+                        last_lt = buf.rfind('<', pos)
+                        pos = last_lt if last_lt >= 0 else len(buf)
+                        break
+                    tag = match.group(0)[:7].lower()
+                    if tag.startswith('<style'):
+                        block_end, block_start = _STYLE_END, match.end()
+                    elif tag.startswith('<script'):
+                        block_end, block_start = _SCRIPT_END, match.end()
+                    else:
+                        in_body = True
+                    pos = match.end()
+                else:
+                    match = _DIV_TAG.search(buf, pos)
+                    if not match:
+                        last_lt = buf.rfind('<', pos)
+                        pos = last_lt if last_lt >= 0 else len(buf)
+                        break
+                    pos = match.end()
+                    if match.group(0)[1] != '/':
+                        if page_start >= 0:
+                            depth += 1
+                        else:
+                            class_match = _CLASS_VALUE.search(match.group(0))
+                            if class_match and 'pf' in class_match.group(1).split():
+                                page_start = match.start()
+                                depth = 1
+                    elif page_start >= 0:
+                        depth -= 1
+                        if depth == 0:
+                            pages.append(buf[page_start:match.end()])
+                            page_start = -1
+                    else:
+                        # </div> of #page-container: all pages seen
+                        return css_blocks, pages
+            
+            # Drop consumed text, keeping an open block/page and any split tag
+            if block_end is not None:
+                keep = block_start
+            elif page_start >= 0:
+                keep = page_start
+            else:
+                keep = pos
+            if keep > 0:
+                buf = buf[keep:]
+                pos -= keep
+                block_start -= keep
+                if page_start >= 0:
+                    page_start -= keep
+    
+    return css_blocks, pages
+
+
+def _rename_chunk_css(css: str, suffix: str) -> str:
+    css = _CSS_CLASS_REF.sub(lambda m: f".{m.group(1)}{suffix}", css)
+    return _CSS_FONT_FAMILY.sub(lambda m: f"{m.group(1)}{m.group(2)}{suffix}", css)
+
+
+def _rename_chunk_html(page_html: str, suffix: str) -> str:
+    def rename(match: "re.Match") -> str:
+        tokens = [
+            f"{token}{suffix}" if _HTML_GENERATED_CLASS.match(token) else token
+            for token in match.group(1).split()
+        ]
+        return f'class="{" ".join(tokens)}"'
+    return _HTML_CLASS_ATTR.sub(rename, page_html)
+
 
 class HTMLPdf2htmlEXGenerator:
     """Generate HTML view with pdf2htmlEX converted content and explanations"""
@@ -190,8 +341,10 @@ class HTMLPdf2htmlEXGenerator:
     def call_pdf2htmlex(
         pdf_bytes: bytes,
         output_dir: str,
-        zoom: float = 1.3,
-        dpi: int = 144
+        zoom: float = PDF2HTMLEX_ZOOM,
+        dpi: int = PDF2HTMLEX_DPI,
+        first_page: Optional[int] = None,
+        last_page: Optional[int] = None
     ) -> Tuple[bool, Optional[str], Optional[str]]:
         """
         Call pdf2htmlEX to convert PDF to HTML
@@ -202,6 +355,8 @@ class HTMLPdf2htmlEXGenerator:
             output_dir: Output directory path
             zoom: Zoom level for rendering
             dpi: Resolution for graphics in DPI
+            first_page: First page to convert (1-based, -f), default first
+            last_page: Last page to convert (1-based, -l), default last
             
         Returns:
             (success, html_path_or_none, error_message_or_none)
@@ -291,6 +446,12 @@ class HTMLPdf2htmlEXGenerator:
             if features['split_pages']:
                 cmd.extend(['--split-pages', '0'])
             
+            # Page range (used by convert_pdf2htmlex_parallel)
+            if first_page is not None:
+                cmd.extend(['-f', str(first_page)])
+            if last_page is not None:
+                cmd.extend(['-l', str(last_page)])
+            
             # In Docker environments, use output directory as tmp-dir to avoid permission issues
             # This helps with manifest file creation
             try:
@@ -307,15 +468,16 @@ class HTMLPdf2htmlEXGenerator:
             
             logger.info(f"Running pdf2htmlEX: {' '.join(cmd)}")
             
-            # Execute pdf2htmlEX
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                encoding='utf-8',
-                errors='replace',
-                timeout=300  # 5 minutes timeout
-            )
+            # Execute pdf2htmlEX (waits for a free process slot)
+            with _pdf2htmlex_slots:
+                result = subprocess.run(
+                    cmd,
+                    capture_output=True,
+                    text=True,
+                    encoding='utf-8',
+                    errors='replace',
+                    timeout=300  # 5 minutes timeout
+                )
             
             # Combine stdout and stderr for error checking (pdf2htmlEX may output errors to either)
             combined_output = (result.stdout or '') + (result.stderr or '')
@@ -496,6 +658,118 @@ class HTMLPdf2htmlEXGenerator:
             logger.error(error_msg)
             return False, None, error_msg
     
+    @staticmethod
+    def merge_pdf2htmlex_chunks(
+        chunks: List[Tuple[str, List[str]]]
+    ) -> Tuple[str, List[str]]:
+        """
+        Merge page-range conversions into one (css_content, page_htmls)
+        
+        pdf2htmlEX numbers its generated classes (ff1, m0, x3, ...) and
+        embedded font families per run, so every chunk after the first gets
+        its generated names suffixed with the chunk index, in both CSS and
+        the pages' class attributes. The static base CSS, identical in every
+        chunk, is kept once (css_scoper.merge_css compares whole top-level
+        blocks, so minified CSS is handled too).
+        
+        Args:
+            chunks: (css_content, page_htmls) per page range, in page order
+            
+        Returns:
+            (css_content, page_htmls)
+        """
+        css_list: List[str] = []
+        page_htmls: List[str] = []
+        
+        for index, (css, pages) in enumerate(chunks):
+            if index:
+                suffix = f"-k{index}"
+                css = _rename_chunk_css(css, suffix)
+                pages = [_rename_chunk_html(page, suffix) for page in pages]
+            css_list.append(css)
+            page_htmls.extend(pages)
+        
+        return merge_css(css_list), page_htmls
+    
+    @staticmethod
+    def plan_page_ranges(
+        total_pages: int,
+        workers: Optional[int] = None,
+        min_chunk_pages: int = PDF2HTMLEX_MIN_CHUNK_PAGES
+    ) -> List[Tuple[int, int]]:
+        """
+        Split pages 1..total_pages into the ranges convert_pdf2htmlex_parallel converts
+        
+        A single range means the document is converted in one process.
+        
+        Returns:
+            [(first_page, last_page), ...], 1-based and inclusive
+        """
+        workers = workers or PDF2HTMLEX_PARALLEL_WORKERS or os.cpu_count() or 1
+        chunk_count = max(1, min(workers, total_pages // max(1, min_chunk_pages)))
+        chunk_size = max(1, -(-total_pages // chunk_count))
+        return [
+            (first, min(first + chunk_size - 1, total_pages))
+            for first in range(1, total_pages + 1, chunk_size)
+        ]
+    
+    @staticmethod
+    def convert_pdf2htmlex_parallel(
+        pdf_bytes: bytes,
+        total_pages: int,
+        workers: Optional[int] = None,
+        min_chunk_pages: int = PDF2HTMLEX_MIN_CHUNK_PAGES
+    ) -> Tuple[Optional[str], Optional[List[str]], Optional[str]]:
+        """
+        Convert a PDF with several pdf2htmlEX processes, one per page range
+        
+        Args:
+            pdf_bytes: PDF file bytes
+            total_pages: Page count of the PDF
+            workers: Page ranges to split into (default: CPU count); the
+                processes actually running are bounded by PDF2HTMLEX_MAX_PROCESSES
+            min_chunk_pages: Smallest page range worth its own process
+            
+        Returns:
+            (css_content, page_htmls_list, error_message)
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        
+        ranges = HTMLPdf2htmlEXGenerator.plan_page_ranges(total_pages, workers, min_chunk_pages)
+        
+        temp_root = tempfile.mkdtemp(prefix='pdf2htmlex_parallel_')
+        
+        def convert(index: int, first: int, last: int):
+            chunk_dir = os.path.join(temp_root, f"chunk{index}")
+            success, html_path, error = HTMLPdf2htmlEXGenerator.call_pdf2htmlex(
+                pdf_bytes, chunk_dir, first_page=first, last_page=last
+            )
+            if not success:
+                return None, None, f"pages {first}-{last}: {error}"
+            return HTMLPdf2htmlEXGenerator.parse_pdf2htmlex_html(html_path)
+        
+        try:
+            logger.info(f"Running pdf2htmlEX on {len(ranges)} page ranges in parallel: {ranges}")
+            with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+                futures = [
+                    executor.submit(convert, index, first, last)
+                    for index, (first, last) in enumerate(ranges)
+                ]
+                results = [future.result() for future in futures]
+            
+            for css, pages, error in results:
+                if error or not pages:
+                    return None, None, error or "pdf2htmlEX produced no pages"
+            
+            css_content, page_htmls = HTMLPdf2htmlEXGenerator.merge_pdf2htmlex_chunks(
+                [(css or '', pages) for css, pages, _ in results]
+            )
+            if len(page_htmls) != total_pages:
+                return None, None, f"Expected {total_pages} pages, got {len(page_htmls)}"
+            return css_content, page_htmls, None
+        finally:
+            shutil.rmtree(temp_root, ignore_errors=True)
+    
     @staticmethod
     def _convert_to_wsl_path(windows_path: str) -> str:
         """
@@ -533,12 +807,29 @@ class HTMLPdf2htmlEXGenerator:
         """
         Parse pdf2htmlEX generated HTML and extract CSS and pages
         
+        Uses the streaming boundary scanner (scan_pdf2htmlex_html); falls
+        back to BeautifulSoup if the output doesn't have the usual
+        #page-container / div.pf structure.
+        
         Args:
             html_path: Path to pdf2htmlEX generated HTML file
             
         Returns:
             (css_content, page_htmls_list, error_message)
         """
+        try:
+            css_blocks, page_htmls = scan_pdf2htmlex_html(html_path)
+            if page_htmls:
+                css_content = '\n'.join(css_blocks)
+                logger.info(f"Parsed pdf2htmlEX HTML: {len(page_htmls)} pages, {len(css_content)} bytes CSS")
+                return css_content, page_htmls, None
+        except Exception as e:
+            logger.warning(f"Streaming pdf2htmlEX parser failed, using BeautifulSoup: {e}")
+        return HTMLPdf2htmlEXGenerator._parse_pdf2htmlex_html_soup(html_path)
+    
+    @staticmethod
+    def _parse_pdf2htmlex_html_soup(html_path: str) -> Tuple[Optional[str], Optional[List[str]], Optional[str]]:
+        """Parse pdf2htmlEX output with a full BeautifulSoup tree (slow fallback)."""
         try:
             from bs4 import BeautifulSoup
             
@@ -586,113 +877,25 @@ class HTMLPdf2htmlEXGenerator:
         """
         Add namespace prefix to pdf2htmlEX CSS to avoid conflicts
         
+        Every style rule selector gets a .pdf2htmlex-container prefix; at-rules
+        are kept intact (see css_scoper.scope_css). Memoized by CSS hash.
+        
         Args:
             css_content: Original CSS from pdf2htmlEX
             
         Returns:
             Modified CSS with namespace prefix
         """
-        if not css_content:
-            return ""
-        
-        # Add .pdf2htmlex-container prefix to all selectors
-        # This is a simple approach - might need refinement for complex CSS
-        
-        lines = css_content.split('\n')
-        modified_lines = []
-        
-        in_media_query = False
-        brace_depth = 0
-        
-        for line in lines:
-            stripped = line.strip()
-            
-            # Track media queries
-            if stripped.startswith('@media'):
-                in_media_query = True
-                modified_lines.append(line)
-                continue
-            
-            # Count braces to track nesting
-            brace_depth += line.count('{') - line.count('}')
-            
-            # Check if we're exiting media query
-            if in_media_query and brace_depth == 0:
-                in_media_query = False
-            
-            # Skip empty lines, comments, @rules
-            if not stripped or stripped.startswith('/*') or stripped.startswith('@'):
-                modified_lines.append(line)
-                continue
-            
-            # If line contains selector (before {)
-            if '{' in line and not line.strip().startswith('}'):
-                # Extract selector part
-                parts = line.split('{', 1)
-                selectors = parts[0].strip()
-                rest = '{' + parts[1] if len(parts) > 1 else ''
-                
-                # Split multiple selectors
-                selector_list = [s.strip() for s in selectors.split(',')]
-                
-                # Add prefix to each selector
-                prefixed_selectors = []
-                for selector in selector_list:
-                    if selector and not selector.startswith('@'):
-                        # Add .pdf2htmlex-container prefix
-                        prefixed = f".pdf2htmlex-container {selector}"
-                        prefixed_selectors.append(prefixed)
-                    else:
-                        prefixed_selectors.append(selector)
-                
-                # Reconstruct line
-                modified_line = ', '.join(prefixed_selectors) + ' ' + rest
-                modified_lines.append(modified_line)
-            else:
-                modified_lines.append(line)
-        
-        return '\n'.join(modified_lines)
+        return scope_css(css_content, ".pdf2htmlex-container")
     
     @staticmethod
     def _render_markdown_to_html(markdown_content: str) -> str:
-        """
-        Render markdown content to HTML
-        (Copied from HTMLScreenshotGenerator for consistency)
-        
-        Args:
-            markdown_content: Markdown formatted text
-            
-        Returns:
-            Rendered HTML string
-        """
-        if not markdown_content or not markdown_content.strip():
-            return "<p>暂无讲解内容</p>"
-        
-        try:
-            import markdown
-            html_content = markdown.markdown(
-                markdown_content,
-                extensions=[
-                    'fenced_code',
-                    'tables',
-                    'nl2br',
-                    'sane_lists'
-                ]
-            )
-            return html_content
-        except ImportError:
-            html_content = markdown_content.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-            html_content = html_content.replace('\n\n', '</p><p>').replace('\n', '<br>')
-            return f"<p>{html_content}</p>"
-        except Exception as e:
-            logger.warning(f"Failed to render markdown: {e}")
-            html_content = markdown_content.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-            html_content = html_content.replace('\n\n', '</p><p>').replace('\n', '<br>')
-            return f"<p>{html_content}</p>"
+        """Render markdown content to HTML (shared, cached renderer)"""
+        return render_markdown_to_html(markdown_content)
     
     @staticmethod
     def generate_html_pdf2htmlex_view(
-        page_htmls: List[str],
+        page_htmls: List[Union[str, Dict[str, Any]]],
         pdf2htmlex_css: str,
         explanations: Dict[int, str],
         total_pages: int,
@@ -709,7 +912,8 @@ class HTMLPdf2htmlEXGenerator:
         布局与HTML截图版完全一致：左侧PDF，右侧讲解
         
         Args:
-            page_htmls: pdf2htmlEX生成的页面HTML字符串列表
+            page_htmls: pdf2htmlEX生成的页面HTML字符串列表；分页模式下为
+                write_pdf2htmlex_page_fragment 返回的字典（按需加载的页面片段）
             pdf2htmlex_css: pdf2htmlEX生成的CSS样式内容
             explanations: 字典，键为页码（从1开始），值为讲解文本
             total_pages: PDF总页数
@@ -724,6 +928,34 @@ class HTMLPdf2htmlEXGenerator:
         Returns:
             完整的HTML文档字符串
         """
+        return "".join(HTMLPdf2htmlEXGenerator.iter_html_pdf2htmlex_view(
+            page_htmls, pdf2htmlex_css, explanations, total_pages, title, font_name,
+            font_size, line_spacing, column_count, column_gap, show_column_rule
+        ))
+    
+    @staticmethod
+    def iter_html_pdf2htmlex_view(
+        page_htmls: Iterable[Union[str, Dict[str, Any]]],
+        pdf2htmlex_css: str,
+        explanations: Dict[int, str],
+        total_pages: int,
+        title: str = "PDF文档讲解",
+        font_name: str = "SimHei",
+        font_size: int = 14,
+        line_spacing: float = 1.2,
+        column_count: int = 2,
+        column_gap: int = 20,
+        show_column_rule: bool = True
+    ) -> Iterator[str]:
+        """
+        以分块流的形式生成HTML视图，参数与 generate_html_pdf2htmlex_view 相同
+        
+        页面逐个输出，可直接写入文件或ZIP条目（见 html_stream.write_html_chunks），
+        内存与耗时随页数线性增长
+        
+        Yields:
+            HTML文档的连续片段
+        """
         logger.info(f"Generating HTML pdf2htmlEX view for {total_pages} pages")
         
         # 导入HTML截图生成器，复用其CSS样式生成功能
@@ -837,41 +1069,9 @@ class HTMLPdf2htmlEXGenerator:
         # 生成JavaScript代码（复用HTML截图版的逻辑，但适配pdf2htmlEX页面）
         javascript_code = HTMLPdf2htmlEXGenerator._generate_javascript_for_pdf2htmlex(total_pages)
         
-        # 生成左侧PDF页面的HTML结构
-        # 每个页面包含：外层容器、页面编号标签、pdf2htmlEX生成的页面内容
-        pdf2htmlex_pages_html = ""
-        for i, page_html in enumerate(page_htmls):
-            page_num = i + 1
-            pdf2htmlex_pages_html += f"""
-            <div class="page-screenshot pdf2htmlex-page" id="page-{page_num}" data-page="{page_num}">
-                <div class="pdf2htmlex-page-badge">第 {page_num} 页</div>
-                {page_html}
-            </div>
-            """
-        
-        # 生成右侧讲解内容的HTML结构
-        # 每个讲解项包含：页面标题、Markdown渲染后的讲解内容
-        explanations_html = ""
-        for page_num in range(1, total_pages + 1):
-            explanation_text = explanations.get(page_num, "")
-            
-            # 将Markdown格式的讲解文本转换为HTML
-            if explanation_text.strip():
-                explanation_html = HTMLPdf2htmlEXGenerator._render_markdown_to_html(explanation_text)
-            else:
-                explanation_html = "<p>暂无讲解内容</p>"
-            
-            explanations_html += f"""
-            <div class="explanation-item" id="explanation-{page_num}" data-page="{page_num}">
-                <div class="explanation-page-title">📖 第 {page_num} 页讲解</div>
-                <div class="explanation-content">
-                    {explanation_html}
-                </div>
-            </div>
-            """
+        size = 0
         
-        # 生成完整的HTML文档结构（布局与HTML截图版完全一致）
-        html_document = f"""<!DOCTYPE html>
+        chunk = f"""<!DOCTYPE html>
 <html lang="zh-CN">
 <head>
     <meta charset="UTF-8">
@@ -893,7 +1093,31 @@ class HTMLPdf2htmlEXGenerator:
         <!-- 左侧面板：显示pdf2htmlEX转换的PDF页面 -->
         <div class="screenshots-panel">
             <div class="pdf2htmlex-container">
-                {pdf2htmlex_pages_html}
+                """
+        size += len(chunk)
+        yield chunk
+        
+        # 生成左侧PDF页面的HTML结构
+        # 每个页面包含：外层容器、页面编号标签、pdf2htmlEX生成的页面内容
+        # 分页模式下条目为字典（见 pdf2htmlex_assets），只输出尺寸正确的空页面外壳，
+        # 页面内容在滚动到附近时由 JS 加载
+        for i, page_html in enumerate(page_htmls):
+            page_num = i + 1
+            if isinstance(page_html, dict):
+                fragment_attr = f' data-fragment="{page_html["fragment_src"]}"'
+                page_html = page_html["shell"]
+            else:
+                fragment_attr = ""
+            chunk = f"""
+            <div class="page-screenshot pdf2htmlex-page" id="page-{page_num}" data-page="{page_num}"{fragment_attr}>
+                <div class="pdf2htmlex-page-badge">第 {page_num} 页</div>
+                {page_html}
+            </div>
+            """
+            size += len(chunk)
+            yield chunk
+        
+        chunk = f"""
             </div>
         </div>
         
@@ -910,7 +1134,29 @@ class HTMLPdf2htmlEXGenerator:
             </div>
             <!-- 讲解内容容器：包含所有页面的讲解文本 -->
             <div class="explanations-container">
-                {explanations_html}
+                """
+        size += len(chunk)
+        yield chunk
+        
+        # 生成右侧讲解内容的HTML结构
+        # 每个讲解项包含：页面标题、Markdown渲染后的讲解内容
+        # Markdown讲解文本一次性批量转换为HTML（共享渲染器带缓存）
+        rendered = render_markdown_batch(explanations)
+        for page_num in range(1, total_pages + 1):
+            explanation_html = rendered.get(page_num, "<p>暂无讲解内容</p>")
+            
+            chunk = f"""
+            <div class="explanation-item" id="explanation-{page_num}" data-page="{page_num}">
+                <div class="explanation-page-title">📖 第 {page_num} 页讲解</div>
+                <div class="explanation-content">
+                    {explanation_html}
+                </div>
+            </div>
+            """
+            size += len(chunk)
+            yield chunk
+        
+        chunk = f"""
             </div>
         </div>
     </div>
@@ -961,9 +1207,10 @@ class HTMLPdf2htmlEXGenerator:
 </body>
 </html>
 """
+        size += len(chunk)
+        yield chunk
         
-        logger.info(f"HTML pdf2htmlEX view generated successfully, size: {len(html_document)} bytes")
-        return html_document
+        logger.info(f"HTML pdf2htmlEX view generated successfully, size: {size} bytes")
     
     @staticmethod
     def _generate_javascript_for_pdf2htmlex(total_pages: int) -> str:
@@ -984,6 +1231,7 @@ class HTMLPdf2htmlEXGenerator:
             if (loading) {{ setTimeout(() => loading.remove(), 500); }}
             this.loadSettings();
             this.scalePdf2htmlexPages();
+            this.setupFragmentLoading();
             this.setupObserver();
             this.setupControls();
             this.setupReadingProgress();
@@ -1004,55 +1252,124 @@ class HTMLPdf2htmlEXGenerator:
 
         // —— 关键修复：按“真实绘制尺寸”回填外层宽高，消除亚像素误差 ——
         scalePdf2htmlexPages() {{
-            const container = document.querySelector('.screenshots-panel');
+            const availableWidth = this.getAvailableWidth();
             const pages = document.querySelectorAll('.pdf2htmlex-container .pdf2htmlex-page');
-            if (!container || !pages.length) return;
+            if (!availableWidth || !pages.length) return;
+            pages.forEach(page => this.scalePage(page, availableWidth));
+        }}
+
+        getAvailableWidth() {{
+            const container = document.querySelector('.screenshots-panel');
+            if (!container) return 0;
 
             const containerWidth = container.clientWidth; // 内边距在 CSS 已统一
             // 动态 padding：避免紧贴边
             const dynamicPadding = Math.min(Math.max(Math.round(containerWidth * 0.03), 6), 24);
             const SAFETY = 5;
-            const availableWidth = Math.max(containerWidth - dynamicPadding * 2 - SAFETY,containerWidth * 0.5);
+            return Math.max(containerWidth - dynamicPadding * 2 - SAFETY,containerWidth * 0.5);
+        }}
 
-            pages.forEach(page => {{
-                const originalPage = page.querySelector('.pf');
+        scalePage(page, availableWidth) {{
+            const originalPage = page.querySelector('.pf');
 
-                // 清理旧状态
-                page.style.transform = '';
-                page.style.width = '';
-                page.style.height = '';
-                page.style.padding = '0px'//dynamicPadding + 'px'; // 只保留这一处 padding
+            // 清理旧状态
+            page.style.transform = '';
+            page.style.width = '';
+            page.style.height = '';
+            page.style.padding = '0px'//dynamicPadding + 'px'; // 只保留这一处 padding
 
-                if (originalPage) {{
-                    originalPage.style.transform = '';
-                    originalPage.style.transformOrigin = 'top left';
-                }}
+            if (originalPage) {{
+                originalPage.style.transform = '';
+                originalPage.style.transformOrigin = 'top left';
+            }}
 
-                // 原始尺寸（未缩放）
-                const pageWidth  = originalPage ? (originalPage.scrollWidth  || originalPage.offsetWidth)  : (page.scrollWidth  || page.offsetWidth);
-                const pageHeight = originalPage ? (originalPage.scrollHeight || originalPage.offsetHeight) : (page.scrollHeight || page.offsetHeight);
-                if (!pageWidth) return;
+            // 原始尺寸（未缩放）
+            const pageWidth  = originalPage ? (originalPage.scrollWidth  || originalPage.offsetWidth)  : (page.scrollWidth  || page.offsetWidth);
+            const pageHeight = originalPage ? (originalPage.scrollHeight || originalPage.offsetHeight) : (page.scrollHeight || page.offsetHeight);
+            if (!pageWidth) return;
 
-                const rawScale = availableWidth / pageWidth;
-                const scale = Math.min(Math.max(rawScale, 0.3), 1.2);
+            const rawScale = availableWidth / pageWidth;
+            const scale = Math.min(Math.max(rawScale, 0.3), 1.2);
 
-                if (originalPage) {{
-                    originalPage.style.transform = `translateZ(0) scale(${{scale}})`;
-                    originalPage.style.transformOrigin = 'top left';
+            if (originalPage) {{
+                originalPage.style.transform = `translateZ(0) scale(${{scale}})`;
+                originalPage.style.transformOrigin = 'top left';
 
-                    // 关键：读取缩放后的真实绘制尺寸
-                    const rect = originalPage.getBoundingClientRect();
-                    const scaledW = Math.ceil(rect.width) + 1;   // +1 兜底，防 1px 裁切
-                    const scaledH = Math.ceil(rect.height) + 1;
-                    page.style.width  = scaledW + 'px';
-                    page.style.height = scaledH + 'px';
-                }} else {{
-                    // 极少数兜底：直接缩放外层
-                    page.style.transformOrigin = 'top left';
-                    page.style.transform = `translateZ(0) scale(${{scale}})`;
-                    page.style.width  = Math.ceil(pageWidth  * scale) + 1 + 'px';
-                    page.style.height = Math.ceil(pageHeight * scale) + 1 + 'px';
-                }}
+                // 关键：读取缩放后的真实绘制尺寸
+                const rect = originalPage.getBoundingClientRect();
+                const scaledW = Math.ceil(rect.width) + 1;   // +1 兜底，防 1px 裁切
+                const scaledH = Math.ceil(rect.height) + 1;
+                page.style.width  = scaledW + 'px';
+                page.style.height = scaledH + 'px';
+            }} else {{
+                // 极少数兜底：直接缩放外层
+                page.style.transformOrigin = 'top left';
+                page.style.transform = `translateZ(0) scale(${{scale}})`;
+                page.style.width  = Math.ceil(pageWidth  * scale) + 1 + 'px';
+                page.style.height = Math.ceil(pageHeight * scale) + 1 + 'px';
+            }}
+        }}
+
+        // —— 分页模式：页面内容为外部脚本片段（data-fragment），滚动到附近时才加载 ——
+        setupFragmentLoading() {{
+            const pages = document.querySelectorAll('.pdf2htmlex-page[data-fragment]');
+            if (!pages.length) return;
+            this.loadedFragments = new Set();
+            window.__pdf2htmlexPage = (pageNum, html) => this.insertFragment(pageNum, html);
+            const options = {{ root: document.querySelector('.screenshots-panel'), rootMargin: '150% 0px 150% 0px', threshold: 0 }};
+            this.fragmentObserver = new IntersectionObserver((entries) => {{
+                entries.forEach(entry => {{ if (entry.isIntersecting) this.loadFragment(entry.target); }});
+            }}, options);
+            pages.forEach(el => this.fragmentObserver.observe(el));
+        }}
+
+        loadFragment(page) {{
+            if (!page || !page.dataset.fragment || page.dataset.fragmentState) return;
+            page.dataset.fragmentState = 'loading';
+            const script = document.createElement('script');
+            script.src = page.dataset.fragment;
+            script.async = true;
+            script.onload = () => script.remove();
+            script.onerror = () => {{ script.remove(); delete page.dataset.fragmentState; }};
+            document.head.appendChild(script);
+        }}
+
+        insertFragment(pageNum, html) {{
+            const page = document.getElementById(`page-${{pageNum}}`);
+            if (!page || page.dataset.fragmentState !== 'loading') return;
+            const shell = page.querySelector('.pf');
+            const template = document.createElement('template');
+            template.innerHTML = html;
+            if (shell) {{
+                page.shellHtml = shell.outerHTML;
+                shell.replaceWith(template.content);
+            }} else {{
+                page.appendChild(template.content);
+            }}
+            page.dataset.fragmentState = 'loaded';
+            this.loadedFragments.add(pageNum);
+            this.scalePage(page, this.getAvailableWidth());
+            this.unloadDistantFragments();
+        }}
+
+        // 只保留当前页附近的页面内容，远处页面换回空外壳以控制内存
+        unloadDistantFragments() {{
+            const MAX_LOADED = 24;
+            if (this.loadedFragments.size <= MAX_LOADED) return;
+            const distant = Array.from(this.loadedFragments)
+                .sort((a, b) => Math.abs(b - this.currentPage) - Math.abs(a - this.currentPage))
+                .slice(0, this.loadedFragments.size - MAX_LOADED);
+            const availableWidth = this.getAvailableWidth();
+            distant.forEach(pageNum => {{
+                const page = document.getElementById(`page-${{pageNum}}`);
+                const content = page && page.querySelector('.pf');
+                if (!content || !page.shellHtml) return;
+                const template = document.createElement('template');
+                template.innerHTML = page.shellHtml;
+                content.replaceWith(template.content);
+                delete page.dataset.fragmentState;
+                this.loadedFragments.delete(pageNum);
+                this.scalePage(page, availableWidth);
             }});
         }}
 
@@ -3,8 +3,10 @@ from __future__ import annotations
 import math
 import sys
 import asyncio
-from typing import Optional
+from typing import Any, Dict, List, Optional, Sequence
 
+from app.services import vendor_assets
+from app.services.constants import CHROMIUM_RENDER_TIMEOUT_SECONDS
 from app.services.logger import get_logger
 logger = get_logger()
 
@@ -23,6 +25,15 @@ class HtmlRenderer:
 		# 1pt = 1/72 inch；常规屏幕 96 DPI -> 1pt = 96/72 px ≈ 1.3333px
 		return int(math.ceil(pt * (96.0 / 72.0)))
 
+	@staticmethod
+	def is_available() -> bool:
+		"""Playwright 已安装且 Chromium 池可用（启动失败后的退避期内不可用；有降级方案的调用方据此跳过 Chromium）"""
+		import importlib.util
+		if importlib.util.find_spec("playwright") is None:
+			return False
+		from .chromium_pool import get_chromium_pool
+		return get_chromium_pool().available
+
 	@staticmethod
 	def render_html_to_pdf_fragment(
 		html: str,
@@ -32,44 +43,86 @@ class HtmlRenderer:
 		background: str = "white",
 		mathjax: bool = True,
 		prism: bool = True,
+		timeout: float = CHROMIUM_RENDER_TIMEOUT_SECONDS,
 	) -> bytes:
+		"""渲染一个HTML片段为单页PDF（使用常驻的 Chromium 池，见 chromium_pool）"""
 		logger.info('Render html to pdf fragment, html length=%d, width_pt=%.1f, height_pt=%.1f', len(html or ''), width_pt, height_pt)
-		# Windows 下确保使用支持 subprocess 的事件循环
-		if sys.platform.startswith("win"):
-			try:
-				asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
-			except Exception:
-				pass
-		try:
-			from playwright.sync_api import sync_playwright
-		except Exception as e:
-			logger.error('Playwright import failed: %s', e, exc_info=True)
-			raise HtmlRendererError(
-				f"Playwright 不可用，请先安装依赖并安装 Chromium。原始错误: {e}"
-			)
+		from .chromium_pool import get_chromium_pool
+		fragment = {
+			"html": html, "width_pt": width_pt, "height_pt": height_pt, "css": css,
+			"background": background, "mathjax": mathjax, "prism": prism,
+		}
+		pdf_bytes = get_chromium_pool().render_fragment(fragment, timeout=timeout)
+		logger.info('PDF fragment rendered, bytes length=%d', len(pdf_bytes))
+		return pdf_bytes
 
-		page_width_in = HtmlRenderer._pt_to_inches(width_pt)
-		page_height_in = HtmlRenderer._pt_to_inches(height_pt)
-		vp_w = max(1, HtmlRenderer._pt_to_px(width_pt))
-		vp_h = max(1, HtmlRenderer._pt_to_px(height_pt))
+	@staticmethod
+	def render_html_to_pdf_fragments(
+		fragments: Sequence[Dict[str, Any]],
+		timeout: float = CHROMIUM_RENDER_TIMEOUT_SECONDS,
+	) -> List[bytes]:
+		"""
+		并发渲染多个HTML片段，结果与输入顺序一致
+
+		每个片段为 render_html_to_pdf_fragment 的关键字参数字典（html、width_pt、height_pt，
+		可选 css、background、mathjax、prism）
+		"""
+		from .chromium_pool import get_chromium_pool
+		return get_chromium_pool().render_fragments(fragments, timeout=timeout)
+
+	@staticmethod
+	async def render_html_to_pdf_fragments_async(
+		fragments: Sequence[Dict[str, Any]],
+		timeout: float = CHROMIUM_RENDER_TIMEOUT_SECONDS,
+	) -> List[bytes]:
+		"""render_html_to_pdf_fragments 的异步版本，不阻塞调用方的事件循环"""
+		from .chromium_pool import get_chromium_pool
+		return await get_chromium_pool().render_fragments_async(fragments, timeout=timeout)
+
+	@staticmethod
+	def render_html_to_pdf_batch(
+		fragments: Sequence[Dict[str, Any]],
+		timeout: float = CHROMIUM_RENDER_TIMEOUT_SECONDS,
+	) -> List[bytes]:
+		"""
+		批量渲染多个HTML片段：尺寸、CSS 和选项相同的片段放进同一个文档，每个片段占一页，
+		只调用一次 page.pdf，再按页拆分为单页PDF，结果与输入顺序一致
+
+		片段格式同 render_html_to_pdf_fragments；timeout 按批计算。超出一页的片段单独渲染，
+		其结果含续页（与 render_html_to_pdf_fragment 相同）
+		"""
+		from .chromium_pool import get_chromium_pool
+		return get_chromium_pool().render_batch(fragments, timeout=timeout)
+
+	@staticmethod
+	async def render_html_to_pdf_batch_async(
+		fragments: Sequence[Dict[str, Any]],
+		timeout: float = CHROMIUM_RENDER_TIMEOUT_SECONDS,
+	) -> List[bytes]:
+		"""render_html_to_pdf_batch 的异步版本"""
+		from .chromium_pool import get_chromium_pool
+		return await get_chromium_pool().render_batch_async(fragments, timeout=timeout)
+
+	@staticmethod
+	def _build_html_document(
+		html: str,
+		css: Optional[str] = None,
+		background: str = "white",
+		mathjax: bool = True,
+		prism: bool = True,
+	) -> str:
+		"""
+		构建完整的HTML文档：基础样式 + 自定义CSS + Prism/MathJax（本地内联，缺失时用CDN，见 vendor_assets）
 
+		文档定义 window.__renderFragment(html, css)，可在同一页面中替换片段内容并重新排版，
+		Chromium 池借此让每个页面只加载一次脚本；初始内容排版完成后置 window.__ready__。
+		window.__renderBatch(items, css, width, height) 把多个片段放入各自的定宽定高分页盒子，
+		供一次 page.pdf 打印整批，并返回内容超出盒子的片段下标
+		"""
 		# 基础 HTML 模板，注入 CSS / Prism / MathJax
-		css_block = f"<style>{css or ''}</style>"
-		prism_css = (
-			"<link rel=\"stylesheet\" href=\"https://cdn.jsdelivr.net/npm/prismjs@1.29.0/themes/prism.min.css\" />"
-			if prism else ""
-		)
-		prism_js = (
-			"<script src=\"https://cdn.jsdelivr.net/npm/prismjs@1.29.0/prism.min.js\"></script>"
-			"<script src=\"https://cdn.jsdelivr.net/npm/prismjs@1.29.0/components/prism-python.min.js\"></script>"
-			"<script src=\"https://cdn.jsdelivr.net/npm/prismjs@1.29.0/components/prism-javascript.min.js\"></script>"
-			if prism else ""
-		)
-		mathjax_js = (
-			"<script>window.MathJax = { tex: { inlineMath: [['$','$'], ['\\\\(','\\\\)']] }, svg: { fontCache: 'global' } };</script>"
-			"<script src=\"https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-svg.js\"></script>"
-			if mathjax else ""
-		)
+		css_block = f"<style id=\"fragment-css\">{css or ''}</style>"
+		prism_css = vendor_assets.head_tags(prism)
+		vendor_js = vendor_assets.script_tags(mathjax, prism)
 
 		# 页面基础样式，尽量与 pdf_processor 的 markdown 模式一致
 		base_css = f"""
@@ -82,6 +135,10 @@ class HtmlRenderer:
 			th, td {{ border: 1px solid #ccc; padding: 2pt 4pt; color: #000; }}
 			p {{ margin: 0 0 2pt 0; }}
 			ul, ol {{ margin: 0 0 2pt 1.2em; }}
+			/* batch: one fixed-size box per printed page */
+			html.batch, html.batch body, html.batch #container {{ height: auto; }}
+			.fragment {{ box-sizing: border-box; overflow: hidden; break-inside: avoid; break-after: page; }}
+			.fragment:last-child {{ break-after: auto; }}
 		"""
 
 		html_doc = f"""
@@ -97,20 +154,89 @@ class HtmlRenderer:
 			</head>
 			<body>
 			<div id=\"container\" style=\"box-sizing:border-box; width:100%; height:100%; padding:0;\">{html}</div>
-			{prism_js}
-			{mathjax_js}
+			{vendor_js}
 			<script>
-				(async () => {{
+				window.__typeset = async (root) => {{
 					try {{
-						if (window.Prism) {{ window.Prism.highlightAll(); }}
-						if (window.MathJax && window.MathJax.typesetPromise) {{ await window.MathJax.typesetPromise(); }}
-						window.__ready__ = true;
-					}} catch (e) {{ window.__ready__ = true; }}
+						if (window.Prism) {{ window.Prism.highlightAllUnder(root); }}
+						const mj = window.MathJax;
+						if (mj && mj.startup && mj.startup.promise) {{ await mj.startup.promise; }}
+						if (mj && mj.typesetPromise) {{
+							if (mj.typesetClear) {{ mj.typesetClear([root]); }}
+							await mj.typesetPromise([root]);
+						}}
+					}} catch (e) {{}}
+				}};
+				window.__renderFragment = async (html, css) => {{
+					document.documentElement.classList.remove('batch');
+					document.getElementById('fragment-css').textContent = css || '';
+					const root = document.getElementById('container');
+					root.innerHTML = html;
+					await window.__typeset(root);
+					return true;
+				}};
+				window.__renderBatch = async (items, css, width, height) => {{
+					document.documentElement.classList.add('batch');
+					document.getElementById('fragment-css').textContent = css || '';
+					const root = document.getElementById('container');
+					root.innerHTML = '';
+					for (const html of items) {{
+						const box = document.createElement('section');
+						box.className = 'fragment';
+						box.style.width = width + 'pt';
+						box.style.height = height + 'pt';
+						box.innerHTML = html;
+						root.appendChild(box);
+					}}
+					// 整批只排版一次
+					await window.__typeset(root);
+					// 内容超出盒子的片段（被裁剪），由调用方单独渲染出续页
+					return Array.from(root.children)
+						.map((box, i) => (box.scrollHeight > box.clientHeight + 1 ? i : -1))
+						.filter((i) => i >= 0);
+				}};
+				(async () => {{
+					await window.__typeset(document.getElementById('container'));
+					window.__ready__ = true;
 				}})();
 			</script>
 			</body>
 			</html>
 		"""
+		return html_doc
+
+	@staticmethod
+	def render_html_to_pdf_fragment_new_browser(
+		html: str,
+		width_pt: float,
+		height_pt: float,
+		css: Optional[str] = None,
+		background: str = "white",
+		mathjax: bool = True,
+		prism: bool = True,
+	) -> bytes:
+		"""每次调用启动并关闭一个 Chromium（旧实现，保留作基准对比与排障）"""
+		logger.info('Render html to pdf fragment, html length=%d, width_pt=%.1f, height_pt=%.1f', len(html or ''), width_pt, height_pt)
+		# Windows 下确保使用支持 subprocess 的事件循环
+		if sys.platform.startswith("win"):
+			try:
+				asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+			except Exception:
+				pass
+		try:
+			from playwright.sync_api import sync_playwright
+		except Exception as e:
+			logger.error('Playwright import failed: %s', e, exc_info=True)
+			raise HtmlRendererError(
+				f"Playwright 不可用，请先安装依赖并安装 Chromium。原始错误: {e}"
+			)
+
+		page_width_in = HtmlRenderer._pt_to_inches(width_pt)
+		page_height_in = HtmlRenderer._pt_to_inches(height_pt)
+		vp_w = max(1, HtmlRenderer._pt_to_px(width_pt))
+		vp_h = max(1, HtmlRenderer._pt_to_px(height_pt))
+
+		html_doc = HtmlRenderer._build_html_document(html, css, background, mathjax, prism)
 
 		try:
 			with sync_playwright() as p:
@@ -157,31 +283,34 @@ class HtmlRenderer:
 				browser.close()
 				return pdf_bytes
 
-		except NotImplementedError as e:
+		except Exception as e:
+			raise HtmlRenderer._render_error(e)
+
+	@staticmethod
+	def _render_error(e: Exception) -> HtmlRendererError:
+		"""把 Playwright/Chromium 异常转换为带排障提示的 HtmlRendererError"""
+		if isinstance(e, NotImplementedError):
 			logger.error('Chromium 启动失败: %s', e, exc_info=True)
 			# 常见于 Windows 事件循环或子进程策略问题
 			detailed_error = "Chromium 启动失败：Windows 子进程事件循环不兼容。"
 			suggestions = "请尝试: 1) 重启Streamlit应用, 2) 在虚拟环境中运行 `python -m playwright install chromium`"
-			if "streamlit" in detailed_error.lower():
-				suggestions += ", 3) 检查是否在Streamlit版本冲突"
-			elif "asyncio" in str(e).lower():
+			if "asyncio" in str(e).lower():
 				suggestions += ", 3) 这是异步事件循环问题，已应用修复但仍可能失败"
 			else:
 				suggestions += ", 3) 检查系统是否有足够的权限启动浏览器"
-			raise HtmlRendererError(f"{detailed_error} 建议: {suggestions}")
+			return HtmlRendererError(f"{detailed_error} 建议: {suggestions}")
 
-		except Exception as e:
-			logger.error('Chromium rendering failed: %s', e, exc_info=True)
-			error_msg = f"Chromium 渲染失败: {str(e)}"
-			if "timeout" in str(e).lower():
-				error_msg += " (渲染超时，可能内容过复杂)"
-			elif "connection" in str(e).lower():
-				error_msg += " (浏览器连接问题，可能需要重新安装Chromium)"
-			# 在Streamlit环境中，不要立即崩溃，提供降级方案
-			try:
-				import streamlit as st
-				if hasattr(st, 'runtime') and st.runtime.exists():
-					error_msg += " (已在Streamlit环境中)"
-			except ImportError:
-				pass
-			raise HtmlRendererError(error_msg)
+		logger.error('Chromium rendering failed: %s', e, exc_info=True)
+		error_msg = f"Chromium 渲染失败: {str(e)}"
+		if "timeout" in str(e).lower():
+			error_msg += " (渲染超时，可能内容过复杂)"
+		elif "connection" in str(e).lower():
+			error_msg += " (浏览器连接问题，可能需要重新安装Chromium)"
+		# 在Streamlit环境中，不要立即崩溃，提供降级方案
+		try:
+			import streamlit as st
+			if hasattr(st, 'runtime') and st.runtime.exists():
+				error_msg += " (已在Streamlit环境中)"
+		except ImportError:
+			pass
+		return HtmlRendererError(error_msg)
@@ -7,8 +7,9 @@ Generate single HTML file with PDF screenshots on left and markdown-rendered exp
 
 import base64
 import json
-from typing import Dict, Optional, List
+from typing import Dict, Iterable, Iterator, Optional, List
 from .logger import get_logger
+from .markdown_renderer import render_markdown_batch, render_markdown_to_html
 
 logger = get_logger()
 
@@ -18,42 +19,8 @@ class HTMLScreenshotGenerator:
     
     @staticmethod
     def _render_markdown_to_html(markdown_content: str) -> str:
-        """
-        Render markdown content to HTML
-        
-        Args:
-            markdown_content: Markdown formatted text
-            
-        Returns:
-            Rendered HTML string
-        """
-        if not markdown_content or not markdown_content.strip():
-            return "<p>暂无讲解内容</p>"
-        
-        try:
-            # Try using markdown library for rendering
-            import markdown
-            html_content = markdown.markdown(
-                markdown_content,
-                extensions=[
-                    'fenced_code',  # Code block support
-                    'tables',       # Table support
-                    'nl2br',        # Auto line break
-                    'sane_lists'    # Better list handling
-                ]
-            )
-            return html_content
-        except ImportError:
-            # If markdown library not available, use simple text conversion
-            html_content = markdown_content.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-            html_content = html_content.replace('\n\n', '</p><p>').replace('\n', '<br>')
-            return f"<p>{html_content}</p>"
-        except Exception as e:
-            # If rendering fails, return escaped original content
-            logger.warning(f"Failed to render markdown: {e}")
-            html_content = markdown_content.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-            html_content = html_content.replace('\n\n', '</p><p>').replace('\n', '<br>')
-            return f"<p>{html_content}</p>"
+        """Render markdown content to HTML (shared, cached renderer)"""
+        return render_markdown_to_html(markdown_content)
     
     @staticmethod
     def _generate_css_styles(
@@ -1030,11 +997,24 @@ class ScreenshotExplanationSync {{
         }}
     }}
     
+    loadNeighbourPages(pageNum) {{
+        // External-asset pages are lazy-loaded; switch the pages around the
+        // current one to eager so they are fetched before they scroll into view
+        for (let p = pageNum - 1; p <= pageNum + 2; p++) {{
+            const img = document.querySelector(`#page-${{p}} img[loading="lazy"]`);
+            if (img) {{
+                img.loading = 'eager';
+            }}
+        }}
+    }}
+    
     showExplanation(pageNum) {{
         if (pageNum < 1 || pageNum > this.totalPages) {{
             return;
         }}
         
+        this.loadNeighbourPages(pageNum);
+        
         // Save current page scroll position before switching
         const explanationsPanel = document.querySelector('.explanations-panel');
         if (explanationsPanel && this.currentPage) {{
@@ -1148,7 +1128,7 @@ window.goToPage = function(pageNum) {{
     
     @staticmethod
     def generate_html_screenshot_view(
-        screenshot_data: List[Dict[str, any]],
+        screenshot_data: Iterable[Dict[str, any]],
         explanations: Dict[int, str],
         total_pages: int,
         title: str = "PDF文档讲解",
@@ -1163,7 +1143,7 @@ window.goToPage = function(pageNum) {{
         Generate complete HTML screenshot view
         
         Args:
-            screenshot_data: List of dicts with 'page_num' and 'image_bytes' keys
+            screenshot_data: Dicts with 'page_num' and 'image_bytes' keys
             explanations: Dict mapping page numbers (1-indexed) to explanation text
             total_pages: Total number of pages
             title: Document title
@@ -1177,6 +1157,37 @@ window.goToPage = function(pageNum) {{
         Returns:
             Complete HTML document string
         """
+        return "".join(HTMLScreenshotGenerator.iter_html_screenshot_view(
+            screenshot_data, explanations, total_pages, title, font_name, font_size,
+            line_spacing, column_count, column_gap, show_column_rule
+        ))
+    
+    @staticmethod
+    def iter_html_screenshot_view(
+        screenshot_data: Iterable[Dict[str, any]],
+        explanations: Dict[int, str],
+        total_pages: int,
+        title: str = "PDF文档讲解",
+        font_name: str = "SimHei",
+        font_size: int = 14,
+        line_spacing: float = 1.2,
+        column_count: int = 2,
+        column_gap: int = 20,
+        show_column_rule: bool = True
+    ) -> Iterator[str]:
+        """
+        Generate the HTML screenshot view as a stream of chunks
+        
+        Pages are emitted one at a time, so ``screenshot_data`` can be a lazy
+        iterator and the document can be written straight to a file or ZIP
+        entry (see html_stream.write_html_chunks) without holding it in memory.
+        Takes the same arguments as generate_html_screenshot_view; entries
+        with 'image_src' (plus 'srcset', 'width', 'height') reference external
+        image files instead of embedding 'image_bytes'.
+        
+        Yields:
+            Consecutive pieces of the HTML document
+        """
         logger.info(f"Generating HTML screenshot view for {total_pages} pages with {column_count} columns")
         
         # Generate CSS and JavaScript
@@ -1184,45 +1195,9 @@ window.goToPage = function(pageNum) {{
             font_name, font_size, line_spacing, column_count, column_gap, show_column_rule
         )
         javascript_code = HTMLScreenshotGenerator._generate_javascript(total_pages)
+        size = 0
         
-        # Generate screenshot HTML
-        screenshots_html = ""
-        for data in screenshot_data:
-            page_num = data['page_num']
-            image_bytes = data['image_bytes']
-            
-            # Convert image to base64
-            base64_image = base64.b64encode(image_bytes).decode('utf-8')
-            
-            screenshots_html += f"""
-            <div class="page-screenshot" id="page-{page_num}" data-page="{page_num}">
-                <div class="page-number-badge">第 {page_num} 页</div>
-                <img src="data:image/png;base64,{base64_image}" alt="第{page_num}页截图" />
-            </div>
-            """
-        
-        # Generate explanations HTML
-        explanations_html = ""
-        for page_num in range(1, total_pages + 1):
-            explanation_text = explanations.get(page_num, "")
-            
-            # Render markdown to HTML
-            if explanation_text.strip():
-                explanation_html = HTMLScreenshotGenerator._render_markdown_to_html(explanation_text)
-            else:
-                explanation_html = "<p>暂无讲解内容</p>"
-            
-            explanations_html += f"""
-            <div class="explanation-item" id="explanation-{page_num}" data-page="{page_num}">
-                <div class="explanation-page-title">📖 第 {page_num} 页讲解</div>
-                <div class="explanation-content">
-                    {explanation_html}
-                </div>
-            </div>
-            """
-        
-        # Generate complete HTML document
-        html_document = f"""<!DOCTYPE html>
+        chunk = f"""<!DOCTYPE html>
 <html lang="zh-CN">
 <head>
     <meta charset="UTF-8">
@@ -1242,7 +1217,37 @@ window.goToPage = function(pageNum) {{
     <div class="main-container">
         <!-- Left panel: PDF screenshots -->
         <div class="screenshots-panel">
-            {screenshots_html}
+            """
+        size += len(chunk)
+        yield chunk
+        
+        # Screenshot HTML, one page at a time
+        for data in screenshot_data:
+            page_num = data['page_num']
+            
+            if data.get('image_src'):
+                # External asset: lazy-loaded, with reserved size and srcset
+                loading = "eager" if page_num == 1 else "lazy"
+                srcset = f' srcset="{data["srcset"]}" sizes="{data.get("sizes", "50vw")}"' if data.get('srcset') else ""
+                img_tag = (
+                    f'<img src="{data["image_src"]}"{srcset} width="{data["width"]}" height="{data["height"]}" '
+                    f'loading="{loading}" decoding="async" alt="第{page_num}页截图" />'
+                )
+            else:
+                # Convert image to base64
+                base64_image = base64.b64encode(data['image_bytes']).decode('ascii')
+                img_tag = f'<img src="data:image/png;base64,{base64_image}" alt="第{page_num}页截图" />'
+            
+            chunk = f"""
+            <div class="page-screenshot" id="page-{page_num}" data-page="{page_num}">
+                <div class="page-number-badge">第 {page_num} 页</div>
+                {img_tag}
+            </div>
+            """
+            size += len(chunk)
+            yield chunk
+        
+        chunk = f"""
         </div>
         
         <!-- Right panel: Explanations -->
@@ -1256,7 +1261,27 @@ window.goToPage = function(pageNum) {{
                 <button class="theme-toggle" title="切换主题">🌙</button>
             </div>
             <div class="explanations-container">
-                {explanations_html}
+                """
+        size += len(chunk)
+        yield chunk
+        
+        # Render every explanation in one batch, then emit one page at a time
+        rendered = render_markdown_batch(explanations)
+        for page_num in range(1, total_pages + 1):
+            explanation_html = rendered.get(page_num, "<p>暂无讲解内容</p>")
+            
+            chunk = f"""
+            <div class="explanation-item" id="explanation-{page_num}" data-page="{page_num}">
+                <div class="explanation-page-title">📖 第 {page_num} 页讲解</div>
+                <div class="explanation-content">
+                    {explanation_html}
+                </div>
+            </div>
+            """
+            size += len(chunk)
+            yield chunk
+        
+        chunk = f"""
             </div>
         </div>
     </div>
@@ -1306,7 +1331,7 @@ window.goToPage = function(pageNum) {{
 </body>
 </html>
 """
+        size += len(chunk)
+        yield chunk
         
-        logger.info(f"HTML screenshot view generated successfully, size: {len(html_document)} bytes")
-        return html_document
-
+        logger.info(f"HTML screenshot view generated successfully, size: {size} bytes")
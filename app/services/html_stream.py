@@ -0,0 +1,54 @@
+"""
+Streaming output for the HTML generators.
+
+The HTML generators expose ``iter_*`` variants that yield the document in
+page-sized chunks. These helpers write such a stream straight to a file or
+a ZIP entry, so building a large document never concatenates it in memory.
+"""
+
+import os
+import zipfile
+from typing import BinaryIO, Iterable, Union
+
+PathOrFile = Union[str, "os.PathLike[str]", BinaryIO]
+
+
+def _write_encoded(chunks: Iterable[str], stream: BinaryIO) -> int:
+    written = 0
+    for chunk in chunks:
+        data = chunk.encode("utf-8")
+        stream.write(data)
+        written += len(data)
+    return written
+
+
+def write_html_chunks(chunks: Iterable[str], target: PathOrFile) -> int:
+    """
+    Write an HTML chunk stream as UTF-8.
+
+    Args:
+        chunks: Iterable of HTML pieces (e.g. from iter_html_screenshot_view)
+        target: Output path or binary file object
+
+    Returns:
+        Number of bytes written
+    """
+    if isinstance(target, (str, os.PathLike)):
+        with open(target, "wb") as f:
+            return _write_encoded(chunks, f)
+    return _write_encoded(chunks, target)
+
+
+def write_html_chunks_to_zip(
+    zf: zipfile.ZipFile,
+    arcname: str,
+    chunks: Iterable[str],
+) -> int:
+    """
+    Stream an HTML chunk stream into a new ZIP entry.
+
+    Returns:
+        Number of uncompressed bytes written
+    """
+    with zf.open(arcname, "w", force_zip64=True) as entry:
+        return _write_encoded(chunks, entry)
@@ -0,0 +1,274 @@
+"""
+Page explanation journal.
+
+An append-only JSONL checkpoint file per uploaded file and explanation
+parameters. Each page explanation is written as soon as the LLM returns it,
+so a browser refresh or worker restart does not lose paid work: processing
+the same file again (alone or in any other batch) replays its journal and
+only the outstanding pages are sent to the LLM again.
+
+Record types (one JSON object per line):
+    {"type": "file", "file": <content hash>, "filename": ..., "total_pages": N}
+    {"type": "page", "file": <content hash>, "page": <0-based index>, "text": ...}
+    {"type": "file_done", "file": <content hash>, "status": ..., "failed_pages": [...]}
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .constants import JOURNAL_DIR_NAME
+from .content_hash import combine_with_params
+from .logger import get_logger
+
+logger = get_logger()
+
+JOURNAL_DIR = os.path.join(tempfile.gettempdir(), JOURNAL_DIR_NAME)
+
+# Parameters that change the generated explanations. Rendering/output options
+# and credentials are deliberately excluded so a file can be resumed after
+# switching output mode, and API keys never reach the journal id.
+EXPLANATION_PARAM_KEYS = (
+    "llm_provider",
+    "api_base",
+    "model_name",
+    "user_prompt",
+    "context_prompt",
+    "use_context",
+    "temperature",
+    "max_tokens",
+    "dpi",
+)
+
+
+def make_journal_id(content_hash: str, params: Dict[str, Any]) -> str:
+    """
+    Derive a stable journal id from one file and the explanation params.
+
+    Args:
+        content_hash: Content digest of the uploaded file
+        params: Processing parameters
+
+    Returns:
+        Journal id (hex digest)
+    """
+    relevant = {key: params.get(key) for key in EXPLANATION_PARAM_KEYS}
+    return combine_with_params(content_hash, relevant)
+
+
+class JobJournal:
+    """Append-only journal of page explanations (thread-safe)."""
+
+    def __init__(self, journal_id: str, journal_dir: Optional[str] = None):
+        """
+        Open (or create) a journal.
+
+        Args:
+            journal_id: Journal identifier, see make_journal_id
+            journal_dir: Directory holding journals (defaults to JOURNAL_DIR)
+        """
+        self.journal_id = journal_id
+        self.journal_dir = journal_dir or JOURNAL_DIR
+        os.makedirs(self.journal_dir, exist_ok=True)
+        self.path = os.path.join(self.journal_dir, f"{journal_id}.jsonl")
+        self._lock = threading.Lock()
+        self._files: Dict[str, Dict[str, Any]] = {}
+        self._replay()
+
+    @classmethod
+    def for_file(
+        cls,
+        content_hash: str,
+        params: Dict[str, Any],
+        journal_dir: Optional[str] = None
+    ) -> "FileJournal":
+        """Open the journal of one file (keyed by content hash) for the given parameters."""
+        return cls(make_journal_id(content_hash, params), journal_dir).file(content_hash)
+
+    def _file_state(self, file_key: str) -> Dict[str, Any]:
+        return self._files.setdefault(file_key, {
+            "filename": None,
+            "total_pages": 0,
+            "pages": {},
+            "done": False,
+            "status": None,
+            "failed_pages": [],
+        })
+
+    def _apply(self, record: Dict[str, Any]) -> None:
+        state = self._file_state(record["file"])
+        kind = record.get("type")
+        if kind == "file":
+            state["filename"] = record.get("filename")
+            state["total_pages"] = int(record.get("total_pages") or 0)
+        elif kind == "page":
+            state["pages"][int(record["page"])] = record.get("text", "")
+        elif kind == "file_done":
+            state["done"] = True
+            state["status"] = record.get("status")
+            state["failed_pages"] = list(record.get("failed_pages") or [])
+
+    def _replay(self) -> None:
+        """Rebuild in-memory state from the journal file."""
+        if not os.path.exists(self.path):
+            return
+        self._truncate_torn_tail()
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    self._apply(json.loads(line))
+                except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+                    logger.warning("Skipping unreadable journal line %s in %s: %s", line_no, self.path, e)
+
+    def _truncate_torn_tail(self) -> None:
+        """
+        Cut the file back to its last complete line.
+
+        A crash mid-write leaves a partial last line; appending to it would
+        glue the next record onto the fragment and lose it on replay.
+        """
+        with open(self.path, "rb+") as f:
+            size = f.seek(0, os.SEEK_END)
+            end = size
+            while end > 0:
+                start = max(end - 4096, 0)
+                f.seek(start)
+                newline = f.read(end - start).rfind(b"\n")
+                if newline >= 0:
+                    end = start + newline + 1
+                    break
+                end = start
+            if end < size:
+                logger.warning("Truncating torn journal tail (%s bytes) in %s", size - end, self.path)
+                f.truncate(end)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        record["ts"] = time.time()
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._apply(record)
+
+    def has_progress(self) -> bool:
+        """Whether any page explanation has already been recorded."""
+        with self._lock:
+            return any(state["pages"] for state in self._files.values())
+
+    def file(self, file_key: str) -> "FileJournal":
+        """Get the journal view for one file (keyed by content hash)."""
+        return FileJournal(self, file_key)
+
+    def files(self) -> Dict[str, Dict[str, Any]]:
+        """Snapshot of every file recorded in this journal."""
+        with self._lock:
+            return {
+                key: {**state, "pages": dict(state["pages"])}
+                for key, state in self._files.items()
+            }
+
+    def outstanding_work(self) -> Dict[str, List[int]]:
+        """
+        Pages still missing per file (0-based), for files not marked done.
+
+        Returns:
+            Mapping of file key to outstanding page indices
+        """
+        work: Dict[str, List[int]] = {}
+        with self._lock:
+            for key, state in self._files.items():
+                if state["done"] and not state["failed_pages"]:
+                    continue
+                missing = [p for p in range(state["total_pages"]) if p not in state["pages"]]
+                if missing:
+                    work[key] = missing
+        return work
+
+    def discard(self) -> None:
+        """Delete the journal file (e.g. once every page succeeded)."""
+        with self._lock:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            self._files.clear()
+
+
+class FileJournal:
+    """Journal view bound to a single file."""
+
+    def __init__(self, journal: JobJournal, file_key: str):
+        self.journal = journal
+        self.file_key = file_key
+
+    def start(self, filename: str, total_pages: int) -> None:
+        """Record that processing of the file started."""
+        self.journal._append({
+            "type": "file",
+            "file": self.file_key,
+            "filename": filename,
+            "total_pages": total_pages,
+        })
+
+    def record_page(self, page_index: int, text: str) -> None:
+        """Record one page explanation (0-based page index)."""
+        self.journal._append({
+            "type": "page",
+            "file": self.file_key,
+            "page": page_index,
+            "text": text,
+        })
+
+    def finish(self, status: str, failed_pages: Optional[List[int]] = None) -> None:
+        """Record that the file finished processing."""
+        self.journal._append({
+            "type": "file_done",
+            "file": self.file_key,
+            "status": status,
+            "failed_pages": failed_pages or [],
+        })
+
+    def completed_pages(self) -> Dict[int, str]:
+        """Explanations already recorded for this file (0-based keys)."""
+        with self.journal._lock:
+            state = self.journal._files.get(self.file_key)
+            return dict(state["pages"]) if state else {}
+
+    def outstanding_pages(self) -> Optional[List[int]]:
+        """
+        Pages still to generate (0-based), from JobJournal.outstanding_work.
+
+        Returns:
+            Outstanding page indices, or None if the page count was never recorded
+        """
+        with self.journal._lock:
+            state = self.journal._files.get(self.file_key)
+            if not state or not state["total_pages"]:
+                return None
+        return self.journal.outstanding_work().get(self.file_key, [])
+
+    def generation_kwargs(self) -> Dict[str, Any]:
+        """Keyword arguments for pdf_processor.generate_explanations to resume from this journal."""
+        kwargs: Dict[str, Any] = {
+            "existing_explanations": self.completed_pages(),
+            "on_page_result": self.record_page,
+        }
+        outstanding = self.outstanding_pages()
+        if kwargs["existing_explanations"] and outstanding is not None:
+            # 1-based, as generate_explanations expects
+            kwargs["target_pages"] = [page + 1 for page in outstanding]
+        return kwargs
+
+    def discard(self) -> None:
+        """Delete this file's journal (e.g. once all of its pages succeeded)."""
+        self.journal.discard()
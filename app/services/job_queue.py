@@ -0,0 +1,663 @@
+"""
+Local job queue for multi-user deployments.
+
+Sessions (Streamlit with JOB_QUEUE_DB set, or ``app.cli submit``) submit PDFs
+to a SQLite-backed queue and poll job status; a pool of worker processes
+claims and runs the jobs with the headless pipeline.
+All workers share one set of budgets stored in the database:
+
+- ``max_running_jobs``: jobs executing at once across every worker (CPU budget)
+- ``api_concurrency``: LLM requests in flight at once across every worker
+- ``api_rpm``: LLM requests started per rolling minute across every worker
+
+The API budget is enforced per request: each worker installs a
+QueueApiBudget as the process-wide concurrency controller, which leases a
+slot from the database around every LLM call.
+
+A claimed job is a lease held by one worker: run_job heartbeats it from a
+background thread, and a job requeued after its heartbeat went stale can
+only be completed or failed by the worker that claimed it next. Pages are
+checkpointed to the file's JobJournal, so the next worker only pays for
+the pages the previous one had not finished.
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from .constants import (
+    QUEUE_DEFAULT_API_CONCURRENCY,
+    QUEUE_DEFAULT_MAX_RUNNING_JOBS,
+    QUEUE_DIR_NAME,
+    QUEUE_HEARTBEAT_SECONDS,
+    QUEUE_STALE_JOB_SECONDS,
+    QUEUE_WORKER_TIMEOUT_SECONDS,
+    DEFAULT_RPM_LIMIT,
+)
+from .logger import get_logger
+
+logger = get_logger()
+
+QUEUE_DIR = os.path.join(tempfile.gettempdir(), QUEUE_DIR_NAME)
+
+# Never persisted: workers read credentials from their own environment
+_SECRET_PARAMS = ("api_key",)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    src_path TEXT NOT NULL,
+    output_dir TEXT NOT NULL,
+    params TEXT NOT NULL,
+    submitted_by TEXT,
+    worker TEXT,
+    progress_done INTEGER NOT NULL DEFAULT 0,
+    progress_total INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    started REAL,
+    heartbeat REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created);
+CREATE TABLE IF NOT EXISTS api_leases (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    holder TEXT NOT NULL,
+    acquired REAL NOT NULL,
+    released REAL
+);
+CREATE INDEX IF NOT EXISTS api_leases_acquired ON api_leases (acquired);
+CREATE TABLE IF NOT EXISTS workers (
+    id TEXT PRIMARY KEY,
+    heartbeat REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+DEFAULT_BUDGETS = {
+    "max_running_jobs": QUEUE_DEFAULT_MAX_RUNNING_JOBS,
+    "api_concurrency": QUEUE_DEFAULT_API_CONCURRENCY,
+    "api_rpm": DEFAULT_RPM_LIMIT,
+}
+
+# Leases older than this are treated as abandoned (crashed worker)
+_LEASE_TIMEOUT_SECONDS = 15 * 60
+
+
+class JobQueue:
+    """SQLite-backed job queue shared by Streamlit sessions and worker processes."""
+
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        Open (or create) a queue.
+
+        Args:
+            db_path: SQLite database path (defaults to <tmp>/pdf_processor_queue/queue.db)
+        """
+        self.db_path = db_path or os.path.join(QUEUE_DIR, "queue.db")
+        self.root = os.path.dirname(os.path.abspath(self.db_path))
+        self.spool_dir = os.path.join(self.root, "uploads")
+        os.makedirs(self.spool_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Exclusive write transaction (serializes claims and leases across processes)."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    @staticmethod
+    def _row_to_job(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    # ------------------------------------------------------------------
+    # Budgets
+    # ------------------------------------------------------------------
+
+    def set_budgets(self, **budgets: int) -> None:
+        """Set global budgets (max_running_jobs, api_concurrency, api_rpm)."""
+        unknown = set(budgets) - set(DEFAULT_BUDGETS)
+        if unknown:
+            raise ValueError(f"Unknown budget(s): {', '.join(sorted(unknown))}")
+        with self._transaction() as conn:
+            for key, value in budgets.items():
+                if int(value) < 1:
+                    raise ValueError(f"{key} must be at least 1")
+                conn.execute(
+                    "INSERT INTO settings (key, value) VALUES (?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                    (key, str(int(value))),
+                )
+
+    def get_budgets(self) -> Dict[str, int]:
+        """Current global budgets."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT key, value FROM settings").fetchall()
+        budgets = dict(DEFAULT_BUDGETS)
+        budgets.update({row["key"]: int(row["value"]) for row in rows if row["key"] in budgets})
+        return budgets
+
+    # ------------------------------------------------------------------
+    # Session side
+    # ------------------------------------------------------------------
+
+    def submit(
+        self,
+        src_bytes: bytes,
+        filename: str,
+        params: Dict[str, Any],
+        output_dir: Optional[str] = None,
+        submitted_by: Optional[str] = None,
+    ) -> str:
+        """
+        Enqueue one PDF.
+
+        Args:
+            src_bytes: PDF bytes (spooled to disk next to the database)
+            filename: Original file name
+            params: Processing parameters; credentials are stripped
+            output_dir: Where the worker writes outputs (defaults to <queue>/outputs/<job id>)
+            submitted_by: Optional session identifier
+
+        Returns:
+            Job id
+        """
+        job_id = uuid.uuid4().hex
+        src_path = os.path.join(self.spool_dir, f"{job_id}.pdf")
+        with open(src_path, "wb") as f:
+            f.write(src_bytes)
+        output_dir = output_dir or os.path.join(self.root, "outputs", job_id)
+        stored_params = {k: v for k, v in params.items() if k not in _SECRET_PARAMS}
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, filename, src_path, output_dir, params, submitted_by, created) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?, ?)",
+                (job_id, filename, src_path, output_dir,
+                 json.dumps(stored_params, ensure_ascii=False, default=str), submitted_by, time.time()),
+            )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get one job by id."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def list_jobs(
+        self,
+        status: Optional[str] = None,
+        submitted_by: Optional[str] = None,
+        limit: int = 100,
+    ) -> List[Dict[str, Any]]:
+        """List jobs, newest first."""
+        clauses, args = [], []
+        if status:
+            clauses.append("status = ?")
+            args.append(status)
+        if submitted_by:
+            clauses.append("submitted_by = ?")
+            args.append(submitted_by)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM jobs {where} ORDER BY created DESC LIMIT ?", (*args, limit)
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job that has not started yet."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ? AND status = 'queued'",
+                (time.time(), job_id),
+            )
+        return cursor.rowcount == 1
+
+    # ------------------------------------------------------------------
+    # Worker side
+    # ------------------------------------------------------------------
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Atomically claim the oldest queued job, respecting max_running_jobs.
+
+        Returns:
+            The claimed job, or None if nothing can run now
+        """
+        max_running = self.get_budgets()["max_running_jobs"]
+        now = time.time()
+        with self._transaction() as conn:
+            running = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'running'").fetchone()[0]
+            if running >= max_running:
+                return None
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, started = ?, heartbeat = ? WHERE id = ?",
+                (worker_id, now, now, row["id"]),
+            )
+        job = self._row_to_job(row)
+        job.update(status="running", worker=worker_id, started=now, heartbeat=now)
+        return job
+
+    @staticmethod
+    def _lease_clause(worker: Optional[str]) -> "tuple[str, tuple]":
+        # Only the worker holding the lease may touch a running job
+        if worker is None:
+            return "", ()
+        return " AND status = 'running' AND worker = ?", (worker,)
+
+    def report_progress(self, job_id: str, done: int, total: int, worker: Optional[str] = None) -> bool:
+        """Update page progress (also acts as heartbeat)."""
+        clause, args = self._lease_clause(worker)
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"UPDATE jobs SET progress_done = ?, progress_total = ?, heartbeat = ? WHERE id = ?{clause}",
+                (done, total, time.time(), job_id, *args),
+            )
+        return cursor.rowcount == 1
+
+    def heartbeat(self, job_id: str, worker: Optional[str] = None) -> bool:
+        """
+        Mark a running job as alive.
+
+        Returns:
+            False if ``worker`` no longer holds the job
+        """
+        clause, args = self._lease_clause(worker)
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"UPDATE jobs SET heartbeat = ? WHERE id = ?{clause}", (time.time(), job_id, *args)
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id: str, result: Dict[str, Any], worker: Optional[str] = None) -> bool:
+        """
+        Mark a job completed and store its summary.
+
+        Returns:
+            False if ``worker`` no longer holds the job (nothing is recorded)
+        """
+        clause, args = self._lease_clause(worker)
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"UPDATE jobs SET status = 'completed', result = ?, finished = ? WHERE id = ?{clause}",
+                (json.dumps(result, ensure_ascii=False, default=str), time.time(), job_id, *args),
+            )
+        if cursor.rowcount != 1:
+            logger.warning(f"Worker {worker} lost the lease of job {job_id}; result dropped")
+        return cursor.rowcount == 1
+
+    def fail(
+        self,
+        job_id: str,
+        error: str,
+        result: Optional[Dict[str, Any]] = None,
+        worker: Optional[str] = None,
+    ) -> bool:
+        """
+        Mark a job failed.
+
+        Returns:
+            False if ``worker`` no longer holds the job (nothing is recorded)
+        """
+        clause, args = self._lease_clause(worker)
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"UPDATE jobs SET status = 'failed', error = ?, result = ?, finished = ? WHERE id = ?{clause}",
+                (error, json.dumps(result, ensure_ascii=False, default=str) if result else None,
+                 time.time(), job_id, *args),
+            )
+        if cursor.rowcount != 1:
+            logger.warning(f"Worker {worker} lost the lease of job {job_id}; failure not recorded")
+        return cursor.rowcount == 1
+
+    def worker_heartbeat(self, worker_id: str) -> None:
+        """Mark a worker process as alive (idle or running a job)."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO workers (id, heartbeat) VALUES (?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET heartbeat = excluded.heartbeat",
+                (worker_id, time.time()),
+            )
+
+    def live_workers(self, within: float = QUEUE_WORKER_TIMEOUT_SECONDS) -> int:
+        """Number of workers that sent a heartbeat in the last ``within`` seconds."""
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM workers WHERE heartbeat >= ?", (time.time() - within,)
+            ).fetchone()[0]
+
+    def requeue_stale(self, stale_after: float = QUEUE_STALE_JOB_SECONDS) -> int:
+        """Put running jobs whose worker stopped heartbeating back in the queue."""
+        cutoff = time.time() - stale_after
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL "
+                "WHERE status = 'running' AND heartbeat < ?",
+                (cutoff,),
+            )
+        if cursor.rowcount:
+            logger.warning(f"Requeued {cursor.rowcount} stale job(s)")
+        return cursor.rowcount
+
+    # ------------------------------------------------------------------
+    # Global API budget
+    # ------------------------------------------------------------------
+
+    def try_acquire_api_slot(self, holder: str) -> Optional[int]:
+        """
+        Lease one LLM request slot if both the concurrency and RPM budgets allow.
+
+        Returns:
+            Lease id, or None if the caller should wait and retry
+        """
+        budgets = self.get_budgets()
+        now = time.time()
+        with self._transaction() as conn:
+            in_flight = conn.execute(
+                "SELECT COUNT(*) FROM api_leases WHERE released IS NULL AND acquired > ?",
+                (now - _LEASE_TIMEOUT_SECONDS,),
+            ).fetchone()[0]
+            if in_flight >= budgets["api_concurrency"]:
+                return None
+            last_minute = conn.execute(
+                "SELECT COUNT(*) FROM api_leases WHERE acquired > ?", (now - 60,)
+            ).fetchone()[0]
+            if last_minute >= budgets["api_rpm"]:
+                return None
+            cursor = conn.execute(
+                "INSERT INTO api_leases (holder, acquired) VALUES (?, ?)", (holder, now)
+            )
+            # Old leases are only needed for the rolling RPM window
+            conn.execute("DELETE FROM api_leases WHERE acquired < ?", (now - _LEASE_TIMEOUT_SECONDS,))
+            return cursor.lastrowid
+
+    def release_api_slot(self, lease_id: int) -> None:
+        """Release an LLM request slot (the lease still counts toward RPM)."""
+        with self._connect() as conn:
+            conn.execute("UPDATE api_leases SET released = ? WHERE id = ?", (time.time(), lease_id))
+
+
+class QueueApiBudget:
+    """
+    Async context manager that leases a global API slot around each LLM call.
+
+    Drop-in replacement for GlobalConcurrencyController inside queue workers.
+    """
+
+    def __init__(self, queue: JobQueue, holder: str, poll_interval: float = 0.05):
+        self.queue = queue
+        self.holder = holder
+        self.poll_interval = poll_interval
+        self._leases: Dict[int, List[int]] = {}
+
+    async def __aenter__(self):
+        delay = self.poll_interval
+        while True:
+            lease_id = await asyncio.to_thread(self.queue.try_acquire_api_slot, self.holder)
+            if lease_id is not None:
+                break
+            await asyncio.sleep(delay)
+            delay = min(1.0, delay * 1.5)
+        self._leases.setdefault(id(asyncio.current_task()), []).append(lease_id)
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        leases = self._leases.get(id(asyncio.current_task()))
+        if leases:
+            lease_id = leases.pop()
+            if not leases:
+                self._leases.pop(id(asyncio.current_task()), None)
+            await asyncio.to_thread(self.queue.release_api_slot, lease_id)
+
+
+def _api_key_from_env(provider: str) -> str:
+    if (provider or "gemini").lower() == "openai":
+        return os.getenv("OPENAI_API_KEY", os.getenv("API_KEY", ""))
+    return os.getenv("GEMINI_API_KEY", os.getenv("API_KEY", ""))
+
+
+class _JobHeartbeat:
+    """Heartbeats a claimed job from a background thread while it runs."""
+
+    def __init__(self, queue: JobQueue, job_id: str, worker: str, interval: float):
+        self.queue = queue
+        self.job_id = job_id
+        self.worker = worker
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"job-heartbeat-{job_id[:8]}", daemon=True)
+
+    def _run(self) -> None:
+        # Long steps (pdf2htmlEX, compose, waiting for an API slot) report no
+        # progress; without this the job would look stale and be requeued
+        while not self._stop.wait(self.interval):
+            try:
+                self.queue.worker_heartbeat(self.worker)
+                if not self.queue.heartbeat(self.job_id, self.worker):
+                    logger.warning(f"Worker {self.worker} no longer holds job {self.job_id}")
+                    return
+            except sqlite3.Error as e:
+                logger.warning(f"Heartbeat for job {self.job_id} failed: {e}")
+
+    def __enter__(self) -> "_JobHeartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def run_job(queue: JobQueue, job: Dict[str, Any], heartbeat_interval: float = QUEUE_HEARTBEAT_SECONDS) -> None:
+    """Run one claimed job with the headless pipeline and record the outcome."""
+    from .batch_pipeline import process_document, write_outputs
+    from .content_hash import get_content_hash
+    from .document_info import get_document_info
+    from .job_journal import JobJournal
+
+    job_id = job["id"]
+    worker = job["worker"]
+    params = dict(job["params"])
+    params["api_key"] = _api_key_from_env(params.get("llm_provider"))
+    last_report = {"t": 0.0}
+
+    def on_event(event: Dict[str, Any]) -> None:
+        if event.get("event") != "progress":
+            return
+        now = time.time()
+        if now - last_report["t"] >= 0.5 or event["done"] >= event["total"]:
+            last_report["t"] = now
+            queue.report_progress(job_id, event["done"], event["total"], worker)
+
+    with _JobHeartbeat(queue, job_id, worker, heartbeat_interval):
+        try:
+            if not params["api_key"]:
+                raise RuntimeError("worker has no API key configured for provider "
+                                   f"{params.get('llm_provider', 'gemini')}")
+            with open(job["src_path"], "rb") as f:
+                src_bytes = f.read()
+            content_hash = get_content_hash(src_bytes)
+            try:
+                document_info = get_document_info(src_bytes, content_hash)
+                total_pages = document_info.page_count
+            except Exception:
+                document_info, total_pages = None, 0
+            # A job requeued after a crash or an expired lease resumes from its journal
+            file_journal = JobJournal.for_file(content_hash, params)
+            file_journal.start(job["filename"], total_pages)
+            result = process_document(src_bytes, job["filename"], params, on_event=on_event,
+                                      journal=file_journal, content_hash=content_hash,
+                                      document_info=document_info)
+            summary = {
+                "failed_pages": result.get("failed_pages", []),
+                "outputs": [],
+            }
+            if result.get("status") != "completed":
+                file_journal.finish(result.get("status") or "failed", summary["failed_pages"])
+                queue.fail(job_id, result.get("error") or "处理失败", summary, worker=worker)
+                return
+            summary["outputs"] = write_outputs(job["filename"], result, job["output_dir"])
+            file_journal.finish("completed", summary["failed_pages"])
+            if not summary["failed_pages"]:
+                file_journal.discard()
+            queue.complete(job_id, summary, worker=worker)
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+            queue.fail(job_id, str(e), worker=worker)
+
+
+def load_job_result(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Read a finished job's outputs back into a session result dictionary.
+
+    Returns:
+        Result dict as produced by the in-process pipeline ("status",
+        "explanations", "failed_pages" and "pdf_bytes" / "markdown_content" /
+        "html_content" with "assets_dir"), keyed by the names write_outputs uses
+    """
+    summary = job.get("result") or {}
+    result: Dict[str, Any] = {
+        "status": job["status"],
+        "explanations": {},
+        "failed_pages": list(summary.get("failed_pages") or []),
+    }
+    if job["status"] != "completed":
+        result["error"] = job.get("error") or "处理失败"
+        return result
+    base_name = os.path.splitext(os.path.basename(job["filename"]))[0]
+    for path in summary.get("outputs") or []:
+        name = os.path.basename(path)
+        if os.path.isdir(path):
+            result["assets_dir"] = path
+            result["assets_url"] = name
+        elif name == f"{base_name}讲解版.pdf":
+            with open(path, "rb") as f:
+                result["pdf_bytes"] = f.read()
+        elif name == f"{base_name}讲解文档.md":
+            with open(path, "r", encoding="utf-8") as f:
+                result["markdown_content"] = f.read()
+        elif name == f"{base_name}讲解文档.html":
+            with open(path, "r", encoding="utf-8") as f:
+                result["html_content"] = f.read()
+        elif name == f"{base_name}.json":
+            with open(path, "r", encoding="utf-8") as f:
+                result["explanations"] = {int(k): v for k, v in json.load(f).items()}
+    return result
+
+
+def run_worker(
+    db_path: str,
+    worker_id: Optional[str] = None,
+    poll_interval: float = 1.0,
+    stop_event: Optional[Any] = None,
+    max_jobs: Optional[int] = None,
+) -> int:
+    """
+    Worker process main loop: claim jobs and run them until stopped.
+
+    Args:
+        db_path: Queue database path
+        worker_id: Identifier recorded on claimed jobs (defaults to host:pid)
+        poll_interval: Seconds to sleep when no job can be claimed
+        stop_event: multiprocessing.Event that ends the loop when set
+        max_jobs: Exit after this many jobs (None = run forever)
+
+    Returns:
+        Number of jobs processed
+    """
+    from .concurrency_controller import GlobalConcurrencyController
+
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    queue = JobQueue(db_path)
+    GlobalConcurrencyController.install(QueueApiBudget(queue, worker_id))
+    logger.info(f"Queue worker {worker_id} started on {db_path}")
+
+    processed = 0
+    while not (stop_event is not None and stop_event.is_set()):
+        if max_jobs is not None and processed >= max_jobs:
+            break
+        queue.worker_heartbeat(worker_id)
+        queue.requeue_stale()
+        job = queue.claim(worker_id)
+        if job is None:
+            if stop_event is not None:
+                stop_event.wait(poll_interval)
+            else:
+                time.sleep(poll_interval)
+            continue
+        logger.info(f"Worker {worker_id} running job {job['id']} ({job['filename']})")
+        run_job(queue, job)
+        processed += 1
+    logger.info(f"Queue worker {worker_id} stopped after {processed} job(s)")
+    return processed
+
+
+def start_workers(
+    db_path: str,
+    count: int,
+    poll_interval: float = 1.0,
+) -> "tuple[List[multiprocessing.Process], Any]":
+    """
+    Start worker processes.
+
+    Returns:
+        (processes, stop_event); set stop_event and join the processes to shut down
+    """
+    ctx = multiprocessing.get_context("spawn")
+    stop_event = ctx.Event()
+    processes = []
+    for index in range(count):
+        process = ctx.Process(
+            target=run_worker,
+            kwargs={
+                "db_path": db_path,
+                "worker_id": f"{socket.gethostname()}:w{index}",
+                "poll_interval": poll_interval,
+                "stop_event": stop_event,
+            },
+            name=f"queue-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        processes.append(process)
+    return processes, stop_event
@@ -8,6 +8,7 @@ Markdown 生成服务
 import base64
 import os
 from typing import Optional, Tuple, Dict, Callable
+from .document_info import DocumentInfo, PageRenderCache
 from .pdf_composer import _page_png_bytes
 from .logger import get_logger
 import fitz
@@ -68,7 +69,9 @@ def generate_markdown_with_screenshots(
     title: str = "PDF文档讲解",
     images_dir: Optional[str] = None,
     on_progress: Optional[Callable[[int, int], None]] = None,
-    on_page_status: Optional[Callable[[int, str, Optional[str]], None]] = None
+    on_page_status: Optional[Callable[[int, str, Optional[str]], None]] = None,
+    images: Optional[Dict[str, bytes]] = None,
+    document_info: Optional[DocumentInfo] = None
 ) -> Tuple[str, Optional[str]]:
     """
     生成包含页面截图和讲解的完整 Markdown 文档
@@ -80,6 +83,9 @@ def generate_markdown_with_screenshots(
         embed_images: 是否将图片嵌入到 Markdown（base64编码）
         title: 文档标题
         images_dir: 外部图片保存目录（仅在 embed_images=False 时使用）
+        images: 外部图片改为收集到此字典（文件名 -> PNG 字节），不写磁盘；
+            提供时忽略 images_dir（仅在 embed_images=False 时使用）
+        document_info: 该 PDF 的预检结果（可选），用于让重复页面只渲染一次
     
     Returns:
         (markdown_content, images_dir) 元组
@@ -90,10 +96,12 @@ def generate_markdown_with_screenshots(
         # 打开 PDF 文档
         src_doc = fitz.open(stream=src_bytes, filetype="pdf")
         total_pages = src_doc.page_count
+        # 重复的页面（页面哈希相同）只渲染一次
+        renders = PageRenderCache(document_info, total_pages, lambda pno: _page_png_bytes(src_doc, pno, screenshot_dpi))
         
         # 如果使用外部图片，确保图片目录存在
         actual_images_dir = None
-        if not embed_images:
+        if not embed_images and images is None:
             if images_dir:
                 actual_images_dir = images_dir
             else:
@@ -122,7 +130,7 @@ def generate_markdown_with_screenshots(
             
             # 生成页面截图
             try:
-                screenshot_bytes = _page_png_bytes(src_doc, page_num, screenshot_dpi)
+                screenshot_bytes = renders.get(page_num)
             except Exception as e:
                 logger.warning(f"Failed to generate screenshot for page {page_num + 1}: {e}")
                 # 如果截图失败，仍然添加讲解内容
@@ -149,7 +157,10 @@ def generate_markdown_with_screenshots(
             
             # 如果使用外部图片，保存图片文件
             image_path = None
-            if not embed_images and actual_images_dir:
+            if not embed_images and images is not None:
+                image_path = f"page_{page_num + 1}.png"
+                images[image_path] = screenshot_bytes
+            elif not embed_images and actual_images_dir:
                 image_filename = f"page_{page_num + 1}.png"
                 image_path = os.path.join(actual_images_dir, image_filename)
                 try:
@@ -0,0 +1,182 @@
+"""
+Shared Markdown → HTML renderer for the HTML generators.
+
+The HTML screenshot, pdf2htmlEX and sync generators all render explanations
+with the same python-markdown configuration. Building a ``Markdown``
+instance (and loading its four extensions) costs more than converting a
+typical explanation, so MarkdownRenderer keeps one configured instance per
+thread and ``reset()``s it between documents. Rendered HTML is kept in an
+LRU keyed by the text hash, which makes re-exports, regenerations and
+repeated pages (e.g. "暂无讲解" boilerplate) free.
+
+``render_many`` renders all pages of a document in one call, converting
+each distinct uncached text once.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, TypeVar
+
+from .constants import MARKDOWN_CACHE_SIZE
+from .logger import get_logger
+
+logger = get_logger()
+
+K = TypeVar("K")
+
+EMPTY_EXPLANATION_HTML = "<p>暂无讲解内容</p>"
+
+MARKDOWN_EXTENSIONS = (
+    'fenced_code',  # Code block support
+    'tables',       # Table support
+    'nl2br',        # Auto line break
+    'sane_lists',   # Better list handling
+)
+
+
+def _escape_fallback(markdown_content: str) -> str:
+    html_content = markdown_content.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    html_content = html_content.replace('\n\n', '</p><p>').replace('\n', '<br>')
+    return f"<p>{html_content}</p>"
+
+
+_local = threading.local()
+
+
+def _convert(markdown_content: str) -> str:
+    """Render without the cache, reusing this thread's Markdown instance."""
+    md = getattr(_local, "md", None)
+    if md is None:
+        try:
+            import markdown
+        except ImportError:
+            # If markdown library not available, use simple text conversion
+            return _escape_fallback(markdown_content)
+        md = markdown.Markdown(extensions=list(MARKDOWN_EXTENSIONS))
+        _local.md = md
+    try:
+        return md.reset().convert(markdown_content)
+    except Exception as e:
+        # If rendering fails, return escaped original content
+        logger.warning(f"Failed to render markdown: {e}")
+        _local.md = None
+        return _escape_fallback(markdown_content)
+
+
+class MarkdownRenderer:
+    """Thread-safe Markdown renderer with an LRU of rendered HTML."""
+
+    def __init__(self, cache_size: int = MARKDOWN_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._lock:
+            html = self._cache.get(key)
+            if html is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return html
+
+    def _put(self, key: str, html: str) -> None:
+        if self.cache_size <= 0:
+            return
+        with self._lock:
+            self._cache[key] = html
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def render(self, markdown_content: str) -> str:
+        """
+        Render markdown content to HTML
+
+        Args:
+            markdown_content: Markdown formatted text
+
+        Returns:
+            Rendered HTML string (a placeholder paragraph for empty text)
+        """
+        if not markdown_content or not markdown_content.strip():
+            return EMPTY_EXPLANATION_HTML
+        key = self._key(markdown_content)
+        html = self._get(key)
+        if html is None:
+            html = _convert(markdown_content)
+            self._put(key, html)
+        return html
+
+    def render_many(self, texts: Dict[K, str]) -> Dict[K, str]:
+        """
+        Render every explanation of a document at once.
+
+        Args:
+            texts: Mapping of page key to markdown text
+
+        Returns:
+            Mapping of the same keys to rendered HTML
+        """
+        results: Dict[K, str] = {}
+        pending: Dict[str, str] = {}  # key -> text, de-duplicated
+        page_keys: Dict[K, str] = {}
+        for page, text in texts.items():
+            if not text or not text.strip():
+                results[page] = EMPTY_EXPLANATION_HTML
+                continue
+            key = self._key(text)
+            html = self._get(key)
+            if html is None:
+                pending[key] = text
+                page_keys[page] = key
+            else:
+                results[page] = html
+
+        if pending:
+            fresh = {key: _convert(text) for key, text in pending.items()}
+            for key, html in fresh.items():
+                self._put(key, html)
+            for page, key in page_keys.items():
+                results[page] = fresh[key]
+
+        # Preserve the caller's page order
+        return {page: results[page] for page in texts}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+_renderer: Optional[MarkdownRenderer] = None
+_renderer_lock = threading.Lock()
+
+
+def get_markdown_renderer() -> MarkdownRenderer:
+    """Process-wide shared renderer."""
+    global _renderer
+    if _renderer is None:
+        with _renderer_lock:
+            if _renderer is None:
+                _renderer = MarkdownRenderer()
+    return _renderer
+
+
+def render_markdown_to_html(markdown_content: str) -> str:
+    """Render one explanation with the shared renderer."""
+    return get_markdown_renderer().render(markdown_content)
+
+
+def render_markdown_batch(texts: Dict[K, str]) -> Dict[K, str]:
+    """Render a document's explanations with the shared renderer."""
+    return get_markdown_renderer().render_many(texts)
@@ -8,7 +8,7 @@ import subprocess
 import tempfile
 import os
 import re
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 from .logger import get_logger
 from .pandoc_renderer import PandocRenderer
 
@@ -283,6 +283,27 @@ $body$
         PandocPDFGenerator._template_cache[cache_key] = template
         return template
     
+    @staticmethod
+    def is_available() -> bool:
+        """Pandoc 和 LaTeX 引擎是否都可用（使用缓存的检查结果）"""
+        if PandocPDFGenerator._pandoc_available is None:
+            PandocPDFGenerator._pandoc_available = PandocRenderer.check_pandoc_available()[0]
+        if not PandocPDFGenerator._pandoc_available:
+            return False
+        if PandocPDFGenerator._xelatex_available is None:
+            PandocPDFGenerator.check_latex_engine_available()
+        return bool(PandocPDFGenerator._xelatex_available)
+    
+    @staticmethod
+    def render_latex_bodies(markdown_contents: List[str]) -> List[Optional[str]]:
+        """
+        一次 pandoc 进程把整份文档各页的讲解转换为 LaTeX 正文（见 PandocRenderer.render_many）
+
+        Returns:
+            与输入顺序一致的 LaTeX 正文；转换失败的页为 None（generate_pdf 会单独调用 pandoc）
+        """
+        return [body if ok else None for body, ok in PandocRenderer.render_many(markdown_contents, to='latex')]
+    
     @staticmethod
     def get_last_error() -> Optional[str]:
         """获取最后一次错误的详细信息"""
@@ -296,7 +317,8 @@ $body$
         font_name: Optional[str] = None,
         font_size: int = 12,
         line_spacing: float = 1.4,
-        column_padding: int = 10
+        column_padding: int = 10,
+        latex_body: Optional[str] = None
     ) -> Tuple[Optional[bytes], bool]:
         """
         使用 Pandoc + LaTeX 生成三栏布局的 PDF
@@ -309,6 +331,8 @@ $body$
             font_size: 字号，必须 > 0
             line_spacing: 行距倍数，必须 > 0
             column_padding: 栏内边距，必须 >= 0
+            latex_body: markdown_content 已转换好的 LaTeX 正文（见 render_latex_bodies），
+                给出时跳过这一页的 pandoc 调用
             
         Returns:
             (PDF bytes, 是否成功)
@@ -420,76 +444,80 @@ $body$
                 logger.error('Failed to write template file: %s', e)
                 return None, False
             
-            # 创建临时 markdown 文件（使用 UTF-8 编码，确保无 BOM）
-            md_file = os.path.join(temp_dir, 'input.md')
-            try:
-                with open(md_file, 'w', encoding='utf-8', errors='strict') as f:
-                    f.write(markdown_content)
-            except Exception as e:
-                logger.error('Failed to write markdown file: %s', e)
-                return None, False
+            if latex_body is not None:
+                # 正文已由 PandocRenderer.render_many 批量转换（整份文档只启动一次 pandoc）
+                tex_content = template_content.replace('$body$', latex_body)
+            else:
+                # 创建临时 markdown 文件（使用 UTF-8 编码，确保无 BOM）
+                md_file = os.path.join(temp_dir, 'input.md')
+                try:
+                    with open(md_file, 'w', encoding='utf-8', errors='strict') as f:
+                        f.write(markdown_content)
+                except Exception as e:
+                    logger.error('Failed to write markdown file: %s', e)
+                    return None, False
             
-            # 方案5: 先生成 LaTeX，后处理移除 \noalign{}，然后编译
-            logger.info('Calling pandoc to generate LaTeX, content length=%d', len(markdown_content))
+                # 方案5: 先生成 LaTeX，后处理移除 \noalign{}，然后编译
+                logger.info('Calling pandoc to generate LaTeX, content length=%d', len(markdown_content))
             
-            # 第一步：使用 pandoc 生成 LaTeX
-            tex_file = os.path.join(temp_dir, 'output.tex')
-            pandoc_args_tex = [
-                pandoc_cmd,
-                md_file,
-                '--from=markdown+tex_math_single_backslash',
-                '--to=latex',
-                '--template', template_file,
-                '--standalone',
-            ]
+                # 第一步：使用 pandoc 生成 LaTeX
+                tex_file = os.path.join(temp_dir, 'output.tex')
+                pandoc_args_tex = [
+                    pandoc_cmd,
+                    md_file,
+                    '--from=markdown+tex_math_single_backslash',
+                    '--to=latex',
+                    '--template', template_file,
+                    '--standalone',
+                ]
             
-            # 根据内容长度动态调整超时时间
-            content_size_factor = max(1.0, len(markdown_content) / 10000)  # 每10KB增加1倍
-            pandoc_timeout = min(30, max(10, int(10 * content_size_factor)))
+                # 根据内容长度动态调整超时时间
+                content_size_factor = max(1.0, len(markdown_content) / 10000)  # 每10KB增加1倍
+                pandoc_timeout = min(30, max(10, int(10 * content_size_factor)))
             
-            process_tex = subprocess.run(
-                pandoc_args_tex,
-                capture_output=True,
-                text=True,
-                encoding='utf-8',
-                errors='replace',
-                timeout=pandoc_timeout,
-                shell=False,
-                cwd=temp_dir
-            )
+                process_tex = subprocess.run(
+                    pandoc_args_tex,
+                    capture_output=True,
+                    text=True,
+                    encoding='utf-8',
+                    errors='replace',
+                    timeout=pandoc_timeout,
+                    shell=False,
+                    cwd=temp_dir
+                )
             
-            if process_tex.returncode != 0:
-                error_msgs = []
-                error_msgs.append(f"Pandoc return code: {process_tex.returncode}")
-                if process_tex.stderr:
-                    stderr_preview = process_tex.stderr[:2000] if len(process_tex.stderr) > 2000 else process_tex.stderr
-                    error_msgs.append(f"stderr: {stderr_preview}")
-                if process_tex.stdout:
-                    stdout_preview = process_tex.stdout[:2000] if len(process_tex.stdout) > 2000 else process_tex.stdout
-                    error_msgs.append(f"stdout: {stdout_preview}")
-                error_msg = "\n".join(error_msgs) if error_msgs else "Unknown error"
+                if process_tex.returncode != 0:
+                    error_msgs = []
+                    error_msgs.append(f"Pandoc return code: {process_tex.returncode}")
+                    if process_tex.stderr:
+                        stderr_preview = process_tex.stderr[:2000] if len(process_tex.stderr) > 2000 else process_tex.stderr
+                        error_msgs.append(f"stderr: {stderr_preview}")
+                    if process_tex.stdout:
+                        stdout_preview = process_tex.stdout[:2000] if len(process_tex.stdout) > 2000 else process_tex.stdout
+                        error_msgs.append(f"stdout: {stdout_preview}")
+                    error_msg = "\n".join(error_msgs) if error_msgs else "Unknown error"
                 
-                # 记录完整错误信息
-                logger.error('Pandoc LaTeX generation failed (return code %d)', process_tex.returncode)
-                logger.debug('Full Pandoc error: %s', error_msg)
+                    # 记录完整错误信息
+                    logger.error('Pandoc LaTeX generation failed (return code %d)', process_tex.returncode)
+                    logger.debug('Full Pandoc error: %s', error_msg)
                 
-                # 检查常见错误并设置详细错误信息
-                detailed_error = error_msg
-                if "not found" in error_msg.lower() or "cannot find" in error_msg.lower():
-                    detailed_error = f"Pandoc or template file not found: {error_msg}"
-                    logger.error('Pandoc or template file not found')
-                elif "permission" in error_msg.lower() or "access" in error_msg.lower():
-                    detailed_error = f"Permission denied accessing files: {error_msg}"
-                    logger.error('Permission denied accessing files')
-                elif "encoding" in error_msg.lower() or "utf" in error_msg.lower():
-                    detailed_error = f"Encoding error in input: {error_msg}"
-                    logger.error('Encoding error in input')
+                    # 检查常见错误并设置详细错误信息
+                    detailed_error = error_msg
+                    if "not found" in error_msg.lower() or "cannot find" in error_msg.lower():
+                        detailed_error = f"Pandoc or template file not found: {error_msg}"
+                        logger.error('Pandoc or template file not found')
+                    elif "permission" in error_msg.lower() or "access" in error_msg.lower():
+                        detailed_error = f"Permission denied accessing files: {error_msg}"
+                        logger.error('Permission denied accessing files')
+                    elif "encoding" in error_msg.lower() or "utf" in error_msg.lower():
+                        detailed_error = f"Encoding error in input: {error_msg}"
+                        logger.error('Encoding error in input')
                 
-                PandocPDFGenerator._last_error = detailed_error
-                return None, False
+                    PandocPDFGenerator._last_error = detailed_error
+                    return None, False
             
-            # 第二步：后处理生成的 LaTeX，移除 \noalign{}（在多栏环境中不能使用）
-            tex_content = process_tex.stdout
+                # 第二步：后处理生成的 LaTeX，移除 \noalign{}（在多栏环境中不能使用）
+                tex_content = process_tex.stdout
             
             # 使用更高效的正则表达式，一次性处理多个模式
             # 移除 toprule\midrule\bottomrule 后面的 \noalign{}
@@ -4,18 +4,31 @@ Pandoc Markdown 渲染服务
 使用真正的 Pandoc 命令行工具进行 Markdown 到 HTML 的转换
 """
 
+import hashlib
 import subprocess
 import tempfile
 import os
 import re
-from typing import Optional, Tuple
+import threading
+import uuid
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+from .constants import PANDOC_BATCH_MAX_CHARS, PANDOC_CACHE_SIZE, PANDOC_TIMEOUT_SECONDS
 from .logger import get_logger
 logger = get_logger()
 
+# 脚注 / 链接引用定义在整批文档中全局生效，这类文档不能与其他文档合并渲染
+_DOCUMENT_SCOPED_SYNTAX = re.compile(r'\[\^[^\]]+\]|^ {0,3}\[[^\]]+\]:', re.MULTILINE)
+
 
 class PandocRenderer:
     """Pandoc Markdown 渲染器"""
     _pandoc_exe: str = 'pandoc'  # 默认使用系统 PATH 中的 pandoc
+    _pandoc_checked: bool = False  # 是否已探测过 pandoc 路径（避免每次渲染多启动一个 --version 进程）
+
+    # 渲染结果缓存：Markdown 文本哈希 -> HTML（仅缓存 Pandoc 成功的结果）
+    _cache: "OrderedDict[str, str]" = OrderedDict()
+    _cache_lock = threading.Lock()
 
     @staticmethod
     def check_pandoc_available() -> Tuple[bool, str]:
@@ -74,6 +87,82 @@ class PandocRenderer:
         logger.error('Pandoc not found')
         return False, "Pandoc 未找到，请先安装 Pandoc"
 
+    @staticmethod
+    def _ensure_pandoc_path() -> None:
+        """确保 Pandoc 路径已设置（每个进程只探测一次）"""
+        if not PandocRenderer._pandoc_checked:
+            PandocRenderer.check_pandoc_available()
+            PandocRenderer._pandoc_checked = True
+
+    @staticmethod
+    def _pandoc_command(to: str = 'html5') -> List[str]:
+        if to == 'latex':
+            # 只输出正文，由调用方套用模板（见 PandocPDFGenerator.generate_pdf）
+            return [PandocRenderer._pandoc_exe, '--from=markdown+tex_math_single_backslash', '--to=latex']
+        return [
+            PandocRenderer._pandoc_exe,
+            # 输入格式
+            '--from=markdown+tex_math_single_backslash',
+            # 输出格式
+            '--to=html5',
+            # 扩展功能
+            '--mathjax',
+            '--highlight-style=tango',
+            '--table-of-contents'  # 如果需要
+        ]
+
+    @staticmethod
+    def _run_pandoc(markdown_content: str, timeout: float, to: str = 'html5') -> Tuple[Optional[str], Optional[str]]:
+        """
+        运行一次 Pandoc 进程
+
+        Returns:
+            (输出文本, 错误信息)，成功时错误信息为 None
+        """
+        try:
+            process = subprocess.run(
+                PandocRenderer._pandoc_command(to),
+                input=markdown_content,
+                capture_output=True,
+                text=True,
+                encoding='utf-8',  # 明确指定 UTF-8 编码
+                timeout=timeout,
+                # 避免命令行输出干扰
+                shell=False
+            )
+        except subprocess.TimeoutExpired:
+            return None, 'timeout'
+        except Exception as e:
+            return None, str(e)
+        if process.returncode != 0:
+            return None, process.stderr
+        return process.stdout, None
+
+    @staticmethod
+    def _cache_key(markdown_content: str, to: str = 'html5') -> str:
+        return hashlib.sha1(f"{to}\0{markdown_content}".encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _cache_get(key: str) -> Optional[str]:
+        with PandocRenderer._cache_lock:
+            html = PandocRenderer._cache.get(key)
+            if html is not None:
+                PandocRenderer._cache.move_to_end(key)
+            return html
+
+    @staticmethod
+    def _cache_put(key: str, html: str) -> None:
+        with PandocRenderer._cache_lock:
+            PandocRenderer._cache[key] = html
+            PandocRenderer._cache.move_to_end(key)
+            while len(PandocRenderer._cache) > PANDOC_CACHE_SIZE:
+                PandocRenderer._cache.popitem(last=False)
+
+    @staticmethod
+    def clear_cache() -> None:
+        with PandocRenderer._cache_lock:
+            PandocRenderer._cache.clear()
+
     @staticmethod
     def render_markdown_to_html(markdown_content: str) -> Tuple[str, bool]:
         """
@@ -90,51 +179,160 @@ class PandocRenderer:
             logger.debug('Input markdown is empty')
             return "", True
 
-        # 确保 Pandoc 路径已设置
-        if PandocRenderer._pandoc_exe == 'pandoc':
-            PandocRenderer.check_pandoc_available()
+        key = PandocRenderer._cache_key(markdown_content)
+        cached = PandocRenderer._cache_get(key)
+        if cached is not None:
+            return cached, True
+
+        PandocRenderer._ensure_pandoc_path()
 
         try:
             # 处理 LaTeX 公式保护
             processed_md = PandocRenderer._protect_latex_formulas(markdown_content)
+            html, error = PandocRenderer._run_pandoc(processed_md, PANDOC_TIMEOUT_SECONDS)
+        except Exception as e:
+            logger.error('Pandoc render exception: %s', e, exc_info=True)
+            return PandocRenderer._fallback_to_python_markdown(markdown_content), False
 
-            # 使用 pandoc 转换
-            pandoc_cmd = PandocRenderer._pandoc_exe
-            process = subprocess.run(
-                [
-                    pandoc_cmd,
-                    # 输入格式
-                    '--from=markdown+tex_math_single_backslash',
-                    # 输出格式
-                    '--to=html5',
-                    # 扩展功能
-                    '--mathjax',
-                    '--highlight-style=tango',
-                    '--table-of-contents'  # 如果需要
-                ],
-                input=processed_md,
-                capture_output=True,
-                text=True,
-                encoding='utf-8',  # 明确指定 UTF-8 编码
-                timeout=10,
-                # 避免命令行输出干扰
-                shell=False
-            )
+        if error is None:
+            html = html.strip()
+            PandocRenderer._cache_put(key, html)
+            logger.info('Pandoc render success, html length=%d', len(html))
+            return html, True
+        logger.error('Pandoc render failed: %s', error)
+        return PandocRenderer._fallback_to_python_markdown(markdown_content), False
+
+    @staticmethod
+    def render_latex(markdown_content: str) -> Tuple[str, bool]:
+        """
+        使用 Pandoc 将 Markdown 转换为 LaTeX 正文（不含导言区）
+
+        Returns:
+            (LaTeX 字符串, 是否成功)；失败时为空字符串
+        """
+        if not markdown_content.strip():
+            return "", True
+        key = PandocRenderer._cache_key(markdown_content, 'latex')
+        cached = PandocRenderer._cache_get(key)
+        if cached is not None:
+            return cached, True
+        PandocRenderer._ensure_pandoc_path()
+        latex, error = PandocRenderer._run_pandoc(
+            PandocRenderer._protect_latex_formulas(markdown_content), PANDOC_TIMEOUT_SECONDS, 'latex'
+        )
+        if error is not None:
+            logger.error('Pandoc LaTeX render failed: %s', error)
+            return "", False
+        latex = latex.strip()
+        PandocRenderer._cache_put(key, latex)
+        return latex, True
+
+    @staticmethod
+    def render_many(markdown_contents: Sequence[str], to: str = 'html5') -> List[Tuple[str, bool]]:
+        """
+        批量渲染多段 Markdown，一次 Pandoc 进程处理一整批
+
+        各段之间插入唯一的分隔符（HTML 注释，或 LaTeX 输出时的原始 LaTeX 注释行），
+        Pandoc 原样输出后再按分隔符切分。含脚注或链接引用定义的文档会影响整批输出，
+        仍单独渲染；切分数量不符时整批退回逐个渲染。已渲染过的文本直接从缓存返回。
+
+        注意：标题的自动 id 在同一批内会去重（如第二个同名标题得到 `-1` 后缀）。
+
+        Args:
+            markdown_contents: Markdown 字符串列表
+            to: 'html5'（见 render_markdown_to_html）或 'latex'（见 render_latex）
 
-            if process.returncode == 0:
-                html = process.stdout.strip()
-                logger.info('Pandoc render success, html length=%d', len(html))
-                return html, True
+        Returns:
+            与输入顺序一致的 (输出字符串, 是否成功) 列表
+        """
+        render_one = PandocRenderer.render_latex if to == 'latex' else PandocRenderer.render_markdown_to_html
+        results: List[Optional[Tuple[str, bool]]] = [None] * len(markdown_contents)
+        pending: "OrderedDict[str, List[int]]" = OrderedDict()  # 缓存键 -> 输入下标（相同文本只渲染一次）
+        texts = {}
+        isolated: List[int] = []
+
+        for index, content in enumerate(markdown_contents):
+            if not content or not content.strip():
+                results[index] = ("", True)
+                continue
+            key = PandocRenderer._cache_key(content, to)
+            cached = PandocRenderer._cache_get(key)
+            if cached is not None:
+                results[index] = (cached, True)
+            elif _DOCUMENT_SCOPED_SYNTAX.search(content):
+                isolated.append(index)
             else:
-                logger.error('Pandoc render failed: %s', process.stderr)
-                return PandocRenderer._fallback_to_python_markdown(markdown_content), False
+                if key not in pending:
+                    pending[key] = []
+                    texts[key] = content
+                pending[key].append(index)
 
-        except subprocess.TimeoutExpired:
-            logger.error('Pandoc render timeout')
-            return PandocRenderer._fallback_to_python_markdown(markdown_content), False
-        except Exception as e:
-            logger.error('Pandoc render exception: %s', e, exc_info=True)
-            return PandocRenderer._fallback_to_python_markdown(markdown_content), False
+        if pending:
+            PandocRenderer._ensure_pandoc_path()
+            for batch in PandocRenderer._split_batches(list(pending), texts):
+                rendered = PandocRenderer._render_batch([texts[key] for key in batch], to)
+                for key, output in zip(batch, rendered):
+                    if output is None:
+                        result = render_one(texts[key])
+                    else:
+                        PandocRenderer._cache_put(key, output)
+                        result = (output, True)
+                    for index in pending[key]:
+                        results[index] = result
+
+        for index in isolated:
+            results[index] = render_one(markdown_contents[index])
+
+        return results
+
+    @staticmethod
+    def _split_batches(keys: List[str], texts: dict) -> List[List[str]]:
+        batches: List[List[str]] = []
+        current: List[str] = []
+        size = 0
+        for key in keys:
+            length = len(texts[key])
+            if current and size + length > PANDOC_BATCH_MAX_CHARS:
+                batches.append(current)
+                current, size = [], 0
+            current.append(key)
+            size += length
+        if current:
+            batches.append(current)
+        return batches
+
+    @staticmethod
+    def _render_batch(contents: List[str], to: str = 'html5') -> List[Optional[str]]:
+        """
+        一次 Pandoc 调用渲染一批文档
+
+        Returns:
+            每段的输出；整批失败或切分不一致时全部为 None
+        """
+        if len(contents) == 1:
+            return [None]  # 单段直接走 render_markdown_to_html / render_latex
+        marker = f"pandoc-split-{uuid.uuid4().hex}"
+        if to == 'latex':
+            # HTML 注释在 LaTeX 输出中会被丢弃；原始 LaTeX 块原样保留为注释行
+            separator, sentinel = f"```{{=latex}}\n% {marker}\n```", f"% {marker}"
+        else:
+            separator = sentinel = f"<!-- {marker} -->"
+        joined = f"\n\n{separator}\n\n".join(
+            PandocRenderer._protect_latex_formulas(content) for content in contents
+        )
+        # 超时随批量大小放宽，但远小于逐个启动进程的总耗时
+        timeout = PANDOC_TIMEOUT_SECONDS + len(contents) * 0.1
+        output, error = PandocRenderer._run_pandoc(joined, timeout, to)
+        if error is not None:
+            logger.warning('Pandoc batch render failed (%d docs): %s', len(contents), error)
+            return [None] * len(contents)
+        parts = output.split(sentinel)
+        if len(parts) != len(contents):
+            # 未闭合的代码块等会吞掉分隔符，退回逐个渲染
+            logger.warning('Pandoc batch split mismatch: expected %d parts, got %d', len(contents), len(parts))
+            return [None] * len(contents)
+        logger.info('Pandoc batch render success: %d docs in one process', len(contents))
+        return [part.strip() for part in parts]
 
     @staticmethod
     def _protect_latex_formulas(markdown_content: str) -> str:
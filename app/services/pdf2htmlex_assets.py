@@ -0,0 +1,202 @@
+"""
+Split-page output for the HTML-pdf2htmlEX mode.
+
+pdf2htmlEX output is converted (and cached) with fonts and background images
+inlined as base64, so the final document holds every page, font and image up
+front. In split mode the same conversion is written out as separate files
+next to the HTML (``<name>_assets/``):
+
+- fonts and images become plain files named by content hash, so the CSS and
+  the page markup only carry short relative URLs (and the browser only
+  downloads a font once a glyph actually uses it)
+- each page becomes a small script ``page-0001.js`` that hands its markup to
+  the viewer; the HTML only keeps the empty, correctly sized ``div.pf`` shell
+  of every page and loads fragments as they scroll into view
+
+Fragments are scripts rather than HTML files so the document still works
+when opened straight from disk (``fetch`` is blocked on ``file://``).
+"""
+
+import base64
+import binascii
+import hashlib
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+# url('data:<mime>;base64,<data>') in CSS
+_CSS_DATA_URL = re.compile(
+    r"""url\(\s*(['"]?)data:([\w.+/-]+)(?:;[\w=.-]+)*;base64,([A-Za-z0-9+/=\s]*)\1\s*\)""",
+    re.IGNORECASE,
+)
+# src="data:<mime>;base64,<data>" in page markup
+_HTML_DATA_SRC = re.compile(
+    r"""\bsrc=(["'])data:([\w.+/-]+)(?:;[\w=.-]+)*;base64,([A-Za-z0-9+/=\s]*)\1""",
+    re.IGNORECASE,
+)
+# Files written by a split (see _write_data_url and write_pdf2htmlex_page_fragment)
+_SPLIT_FILE = re.compile(r"^(?:page-\d{4,}\.js|(?:font|img)-[0-9a-f]{16}\.\w+)$")
+# Opening tag of the page's outer div.pf, which carries its size classes
+_PAGE_SHELL = re.compile(r'\s*(<div\b[^>]*\bclass=["\'](?:[^"\']*\s)?pf(?:\s[^"\']*)?["\'][^>]*>)', re.IGNORECASE)
+
+_EXTENSIONS = {
+    "font-woff": "woff",
+    "font/woff": "woff",
+    "application/font-woff": "woff",
+    "application/x-font-woff": "woff",
+    "font/woff2": "woff2",
+    "application/font-woff2": "woff2",
+    "font/ttf": "ttf",
+    "font/truetype": "ttf",
+    "application/x-font-ttf": "ttf",
+    "application/x-font-truetype": "ttf",
+    "font/otf": "otf",
+    "font/opentype": "otf",
+    "application/x-font-otf": "otf",
+    "application/x-font-opentype": "otf",
+    "image/png": "png",
+    "image/jpeg": "jpg",
+    "image/jpg": "jpg",
+    "image/gif": "gif",
+    "image/webp": "webp",
+    "image/svg+xml": "svg",
+}
+
+
+def _asset_url(url_prefix: str, name: str) -> str:
+    prefix = quote(url_prefix.rstrip("/"))
+    return f"{prefix}/{quote(name)}" if prefix else quote(name)
+
+
+def _write_data_url(mime: str, data: str, kind: str, assets_dir: str) -> Optional[str]:
+    """Decode one base64 payload into assets_dir; return its file name (None if undecodable)."""
+    try:
+        payload = base64.b64decode("".join(data.split()), validate=True)
+    except (binascii.Error, ValueError):
+        return None
+    ext = _EXTENSIONS.get(mime.lower(), "bin")
+    name = f"{kind}-{hashlib.sha1(payload).hexdigest()[:16]}.{ext}"
+    path = os.path.join(assets_dir, name)
+    # Content-addressed: identical fonts/images are written once
+    if not os.path.exists(path):
+        with open(path, "wb") as f:
+            f.write(payload)
+    return name
+
+
+def externalize_pdf2htmlex_css(css: str, assets_dir: str, url_prefix: str) -> str:
+    """
+    Move base64 fonts (and images) out of pdf2htmlEX CSS into ``assets_dir``.
+
+    Args:
+        css: pdf2htmlEX CSS with inlined data URLs
+        assets_dir: Directory receiving the files (created if missing)
+        url_prefix: Relative URL of ``assets_dir`` as seen from the HTML file
+
+    Returns:
+        CSS referencing the written files
+    """
+    if not css:
+        return ""
+    os.makedirs(assets_dir, exist_ok=True)
+
+    def replace(match: "re.Match") -> str:
+        mime = match.group(2)
+        kind = "img" if mime.lower().startswith("image/") else "font"
+        name = _write_data_url(mime, match.group(3), kind, assets_dir)
+        if name is None:
+            return match.group(0)
+        return f"url('{_asset_url(url_prefix, name)}')"
+
+    return _CSS_DATA_URL.sub(replace, css)
+
+
+def write_pdf2htmlex_page_fragment(
+    page_html: str,
+    page_num: int,
+    assets_dir: str,
+    url_prefix: str,
+) -> Dict[str, Any]:
+    """
+    Write one pdf2htmlEX page as a lazily loaded fragment.
+
+    Args:
+        page_html: Page markup (outer div.pf) with inlined images
+        page_num: 1-based page number
+        assets_dir: Directory receiving the files (created if missing)
+        url_prefix: Relative URL of ``assets_dir`` as seen from the HTML file
+
+    Returns:
+        Page entry for HTMLPdf2htmlEXGenerator: page_num, fragment_src and
+        shell (the empty, sized div.pf shown until the fragment arrives)
+    """
+    os.makedirs(assets_dir, exist_ok=True)
+
+    def replace(match: "re.Match") -> str:
+        name = _write_data_url(match.group(2), match.group(3), "img", assets_dir)
+        if name is None:
+            return match.group(0)
+        return f'src="{_asset_url(url_prefix, name)}"'
+
+    page_html = _HTML_DATA_SRC.sub(replace, page_html)
+    shell_match = _PAGE_SHELL.match(page_html)
+    shell = f"{shell_match.group(1)}</div>" if shell_match else "<div class=\"pf\"></div>"
+
+    name = f"page-{page_num:04d}.js"
+    payload = json.dumps(page_html, ensure_ascii=False)
+    with open(os.path.join(assets_dir, name), "w", encoding="utf-8") as f:
+        f.write(f"window.__pdf2htmlexPage && window.__pdf2htmlexPage({page_num}, {payload});\n")
+    return {
+        'page_num': page_num,
+        'fragment_src': _asset_url(url_prefix, name),
+        'shell': shell,
+    }
+
+
+def clear_split_files(assets_dir: str) -> int:
+    """
+    Remove the fonts, images and page fragments of a previous split.
+
+    Returns:
+        Number of files removed
+    """
+    try:
+        names = os.listdir(assets_dir)
+    except FileNotFoundError:
+        return 0
+    removed = 0
+    for name in names:
+        if _SPLIT_FILE.match(name):
+            try:
+                os.remove(os.path.join(assets_dir, name))
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+def split_pdf2htmlex_output(
+    css_content: str,
+    page_htmls: List[str],
+    assets_dir: str,
+    url_prefix: str,
+) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Split a parsed pdf2htmlEX conversion into files in ``assets_dir``.
+
+    ``assets_dir`` should be a fresh directory per result. Split files left
+    in it by an earlier conversion (e.g. the extra pages of a longer
+    document) are removed first, so they never end up in a download.
+
+    Returns:
+        (css referencing the font files, page entries for the viewer)
+    """
+    clear_split_files(assets_dir)
+    css_content = externalize_pdf2htmlex_css(css_content, assets_dir, url_prefix)
+    entries = [
+        write_pdf2htmlex_page_fragment(page_html, index + 1, assets_dir, url_prefix)
+        for index, page_html in enumerate(page_htmls)
+    ]
+    return css_content, entries
@@ -0,0 +1,199 @@
+"""
+On-disk cache of pdf2htmlEX conversions.
+
+pdf2htmlEX output only depends on the PDF bytes and the conversion options,
+so the parsed ``(css_content, page_htmls)`` is stored content-addressed
+under the PDF's hash. Cache-hit rebuilds, JSON recompose and re-generation
+after a font or layout tweak then skip the (minutes-long) conversion.
+
+Layout, one directory per conversion::
+
+    <cache>/<key>/manifest.json      page count, sizes
+    <cache>/<key>/style.css.gz
+    <cache>/<key>/p0001.html.gz ...  one compressed entry per page
+
+Entries are written to a temp directory and renamed into place, so readers
+never see half-written conversions. Least recently used conversions are
+evicted once the cache exceeds its size budget or its expiry age.
+"""
+
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from typing import List, Optional, Tuple
+
+from .constants import (
+    CACHE_EXPIRY_DAYS,
+    PDF2HTMLEX_CACHE_DIR_NAME,
+    PDF2HTMLEX_CACHE_MAX_BYTES,
+)
+from .content_hash import get_content_hash
+from .logger import get_logger
+
+logger = get_logger()
+
+# Bump when the parser, the stored layout or the key's options change
+CACHE_FORMAT_VERSION = 3
+MANIFEST_NAME = "manifest.json"
+CSS_NAME = "style.css.gz"
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), PDF2HTMLEX_CACHE_DIR_NAME)
+
+
+def _page_name(index: int) -> str:
+    return f"p{index + 1:04d}.html.gz"
+
+
+class Pdf2htmlEXCache:
+    """Content-addressed, compressed store of parsed pdf2htmlEX output."""
+
+    def __init__(
+        self,
+        cache_dir: str = DEFAULT_CACHE_DIR,
+        max_bytes: int = PDF2HTMLEX_CACHE_MAX_BYTES,
+        max_age_days: float = CACHE_EXPIRY_DAYS,
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_days * 86400
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(pdf_bytes: bytes, content_hash: Optional[str] = None, **options) -> str:
+        """
+        Cache key for a PDF and its conversion options (zoom, dpi, ...).
+
+        Pass ``content_hash`` when the upload has already been hashed.
+        """
+        digest = content_hash or get_content_hash(pdf_bytes)
+        if not options:
+            return f"{digest}-v{CACHE_FORMAT_VERSION}"
+        suffix = "-".join(f"{name}{options[name]}" for name in sorted(options))
+        return f"{digest}-v{CACHE_FORMAT_VERSION}-{suffix}"
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key: str) -> Optional[Tuple[str, List[str]]]:
+        """Return (css_content, page_htmls) for key, or None on a miss."""
+        entry = self._entry_dir(key)
+        manifest_path = os.path.join(entry, MANIFEST_NAME)
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            with gzip.open(os.path.join(entry, CSS_NAME), "rt", encoding="utf-8") as f:
+                css_content = f.read()
+            page_htmls = []
+            for index in range(manifest["pages"]):
+                with gzip.open(os.path.join(entry, _page_name(index)), "rt", encoding="utf-8") as f:
+                    page_htmls.append(f.read())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # Corrupted entry: drop it and convert again
+            logger.warning(f"Failed to load pdf2htmlEX cache entry {key}: {e}")
+            shutil.rmtree(entry, ignore_errors=True)
+            return None
+        try:
+            # Recency for LRU eviction
+            os.utime(manifest_path, None)
+        except OSError:
+            pass
+        logger.info(f"pdf2htmlEX cache hit: {key} ({len(page_htmls)} pages)")
+        return css_content, page_htmls
+
+    def get_page(self, key: str, index: int) -> Optional[str]:
+        """Return one page's HTML (0-based index) without loading the rest."""
+        try:
+            with gzip.open(os.path.join(self._entry_dir(key), _page_name(index)), "rt", encoding="utf-8") as f:
+                return f.read()
+        except (FileNotFoundError, OSError):
+            return None
+
+    def put(self, key: str, css_content: str, page_htmls: List[str]) -> None:
+        """Store a conversion, then evict old entries if over budget."""
+        entry = self._entry_dir(key)
+        staging = os.path.join(self.cache_dir, f".{key}.{uuid.uuid4().hex}.tmp")
+        try:
+            os.makedirs(staging)
+            size = 0
+            with gzip.open(os.path.join(staging, CSS_NAME), "wt", encoding="utf-8", compresslevel=6) as f:
+                f.write(css_content or "")
+            for index, page_html in enumerate(page_htmls):
+                with gzip.open(os.path.join(staging, _page_name(index)), "wt", encoding="utf-8", compresslevel=6) as f:
+                    f.write(page_html)
+            for name in os.listdir(staging):
+                size += os.path.getsize(os.path.join(staging, name))
+            with open(os.path.join(staging, MANIFEST_NAME), "w", encoding="utf-8") as f:
+                json.dump({"pages": len(page_htmls), "bytes": size, "created": time.time()}, f)
+            try:
+                os.rename(staging, entry)
+            except OSError:
+                # Another process stored the same conversion first
+                shutil.rmtree(staging, ignore_errors=True)
+                return
+        except Exception as e:
+            logger.warning(f"Failed to store pdf2htmlEX cache entry {key}: {e}")
+            shutil.rmtree(staging, ignore_errors=True)
+            return
+        logger.info(f"pdf2htmlEX cache stored: {key} ({len(page_htmls)} pages, {size} bytes)")
+        try:
+            self.evict()
+        except Exception as e:
+            # The entry is stored; a failed cleanup must not fail the conversion
+            logger.warning(f"Failed to evict pdf2htmlEX cache entries: {e}")
+
+    def evict(self) -> int:
+        """
+        Remove expired entries, then least recently used ones until the cache fits max_bytes.
+
+        Returns:
+            Number of removed entries
+        """
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            entry = os.path.join(self.cache_dir, name)
+            manifest_path = os.path.join(entry, MANIFEST_NAME)
+            try:
+                used = os.path.getmtime(manifest_path)
+                with open(manifest_path, "r", encoding="utf-8") as f:
+                    size = json.load(f).get("bytes", 0)
+            except (OSError, ValueError):
+                # Staging directory or broken entry; leave recent staging dirs alone
+                try:
+                    if name.endswith(".tmp") and now - os.path.getmtime(entry) < 3600:
+                        continue
+                except OSError:
+                    # Renamed into place or removed by another process meanwhile
+                    continue
+                shutil.rmtree(entry, ignore_errors=True)
+                continue
+            entries.append((used, size, entry))
+
+        removed = 0
+        total = sum(size for _, size, _ in entries)
+        for used, size, entry in sorted(entries):
+            if now - used <= self.max_age_seconds and total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            removed += 1
+        if removed:
+            logger.info(f"pdf2htmlEX cache evicted {removed} entries")
+        return removed
+
+
+_default_cache: Optional[Pdf2htmlEXCache] = None
+
+
+def get_pdf2htmlex_cache() -> Pdf2htmlEXCache:
+    """Process-wide cache in the system temp directory."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = Pdf2htmlEXCache()
+    return _default_cache
@@ -3,11 +3,18 @@ from __future__ import annotations
 import asyncio
 import base64
 import sys
-from typing import Any, Callable, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 import fitz
 
 # Import all functions from the modularized components
+from .document_info import (
+    DocumentInfo,
+    PageRenderCache,
+    analyze_pdf,
+    get_document_info
+)
+
 from .pdf_validator import (
     safe_utf8_loads,
     is_blank_explanation,
@@ -32,7 +39,10 @@ from .logger import get_logger
 from .batch_processor import (
     match_pdf_json_files,
     batch_recompose_from_json,
-    batch_recompose_from_json_async
+    batch_recompose_from_json_async,
+    iter_recompose_from_json,
+    iter_recompose_pairs,
+    aiter_recompose_from_json
 )
 
 from .markdown_generator import (
@@ -44,10 +54,17 @@ from .html_screenshot_generator import (
     HTMLScreenshotGenerator
 )
 
+from .html_assets import write_page_assets
+
 from .html_pdf2htmlex_generator import (
+    CHUNK_RENAMING,
     HTMLPdf2htmlEXGenerator
 )
 
+from .constants import PDF2HTMLEX_DPI, PDF2HTMLEX_PARALLEL_WORKERS, PDF2HTMLEX_ZOOM
+from .pdf2htmlex_assets import split_pdf2htmlex_output
+from .pdf2htmlex_cache import Pdf2htmlEXCache, get_pdf2htmlex_cache
+
 
 logger = get_logger()
 
@@ -115,6 +132,9 @@ async def _generate_explanations_async(
 	global_concurrency_controller=None,
 	on_page_status: Optional[Callable[[int, str, Optional[str]], None]] = None,
 	target_pages: Optional[List[int]] = None,
+	on_page_result: Optional[Callable[[int, str], None]] = None,
+	initial_completed: int = 0,
+	scheduler=None,
 ) -> Tuple[Dict[int, str], Dict[int, str], List[int]]:
 	total_pages = len(page_images)
 	if total_pages == 0:
@@ -129,10 +149,12 @@ async def _generate_explanations_async(
 		if not pages_to_process:
 			return {}, {}, []
 
-	# Use local semaphore for page-level concurrency
+	# Use local semaphore for page-level concurrency, or a lane of the
+	# batch scheduler so pages of all files share one fair budget
 	local_semaphore = asyncio.Semaphore(max(1, concurrency))
+	lane = scheduler.open_lane(limit=max(1, concurrency)) if scheduler is not None else None
 	progress_lock = asyncio.Lock()
-	completed = {"count": 0}
+	completed = {"count": initial_completed}
 	preview_images: Dict[int, str] = {
 		idx + 1: base64.b64encode(img).decode("utf-8")
 		for idx, img in enumerate(page_images)
@@ -140,7 +162,7 @@ async def _generate_explanations_async(
 
 	async def process_page(page_index: int) -> Tuple[int, str, Optional[Exception]]:
 		# Acquire both local and global semaphores
-		async with local_semaphore:
+		async with (lane.slot() if lane is not None else local_semaphore):
 			# Use global concurrency controller if available
 			if global_concurrency_controller:
 				request_id = f"page_{page_index}"
@@ -225,6 +247,11 @@ async def _generate_explanations_async(
 					except Exception:
 						pass
 			else:
+				if on_page_result:
+					try:
+						on_page_result(page_index, result.strip())
+					except Exception as exc:  # noqa: BLE001
+						logger.warning("Failed to checkpoint page %s: %s", page_index + 1, exc)
 				if on_log:
 					try:
 						on_log(f"第 {page_index + 1} 页生成完成")
@@ -234,7 +261,11 @@ async def _generate_explanations_async(
 			return page_index, result.strip(), error
 
 	tasks = [asyncio.create_task(process_page(idx)) for idx in pages_to_process]
-	results = await asyncio.gather(*tasks, return_exceptions=False)
+	try:
+		results = await asyncio.gather(*tasks, return_exceptions=False)
+	finally:
+		if lane is not None:
+			lane.close()
 	explanations: Dict[int, str] = {}
 	failed_pages: List[int] = []
 	for page_index, text, error in results:
@@ -268,12 +299,63 @@ def generate_explanations(
 	target_pages: Optional[List[int]] = None,
 	auto_retry_failed_pages: bool = True,
 	max_auto_retries: int = 2,
+	existing_explanations: Optional[Dict[int, str]] = None,
+	on_page_result: Optional[Callable[[int, str], None]] = None,
+	scheduler=None,
+	document_info: Optional[DocumentInfo] = None,
 ) -> Tuple[Dict[int, str], Dict[int, str], List[int]]:
+	"""
+	Render pages and generate an explanation for each one.
+
+	``existing_explanations`` (0-based) resumes an interrupted run: those pages
+	are kept as-is and only the remaining pages (or ``target_pages``, e.g. a
+	journal's outstanding pages) are sent to the LLM.
+	``on_page_result(page_index, text)`` is called as soon as each page
+	succeeds, e.g. to checkpoint it to a JobJournal.
+	``scheduler`` (a started PageScheduler) runs the LLM calls on the batch's
+	shared event loop, where pages of all files are dispatched fairly.
+	``document_info`` (see document_info) supplies the page count without
+	opening the PDF and lets repeated pages be rendered once.
+	"""
 	if not api_key:
 		raise ValueError("api_key is required to generate explanations")
 	if not model_name:
 		raise ValueError("model_name is required to generate explanations")
 
+	existing = {int(k): v for k, v in (existing_explanations or {}).items()}
+	if existing:
+		if document_info is not None:
+			page_count = document_info.page_count
+		else:
+			pdf_doc = fitz.open(stream=src_bytes, filetype="pdf")
+			try:
+				page_count = pdf_doc.page_count
+			finally:
+				pdf_doc.close()
+		if target_pages is None:
+			target_pages = [p + 1 for p in range(page_count) if p not in existing]
+		else:
+			# Outstanding pages from the journal (1-based); never regenerate kept ones
+			target_pages = [p for p in target_pages if p - 1 not in existing]
+		for page_index in existing:
+			if on_page_status:
+				try:
+					on_page_status(page_index, "completed", None)
+				except Exception:
+					pass
+		if not target_pages:
+			if on_progress:
+				try:
+					on_progress(page_count, page_count)
+				except Exception:
+					pass
+			return existing, {}, []
+		if on_log:
+			try:
+				on_log(f"从检查点恢复 {len(existing)} 页，剩余 {len(target_pages)} 页待生成")
+			except Exception:
+				pass
+
 	llm_client = _create_llm_client(
 		llm_provider=llm_provider,
 		api_key=api_key,
@@ -288,10 +370,11 @@ def generate_explanations(
 
 	pdf_doc = fitz.open(stream=src_bytes, filetype="pdf")
 	try:
+		renders = PageRenderCache(document_info, pdf_doc.page_count, lambda pno: _page_png_bytes(pdf_doc, pno, dpi))
 		page_images: List[bytes] = []
 		for page_index in range(pdf_doc.page_count):
 			try:
-				page_images.append(_page_png_bytes(pdf_doc, page_index, dpi))
+				page_images.append(renders.get(page_index))
 			except Exception as exc:  # noqa: BLE001
 				logger.warning("Failed to render page %s at %s DPI: %s", page_index + 1, dpi, exc)
 				page_images.append(b"")
@@ -307,8 +390,10 @@ def generate_explanations(
 			except Exception:
 				pass
 
-	# Get global concurrency controller if available
+	# The batch scheduler only orders pages within its batch; the process-wide
+	# controller still caps requests across batches and Streamlit sessions
 	from .concurrency_controller import GlobalConcurrencyController
+	run = scheduler.run if scheduler is not None else _run_async
 	global_controller = GlobalConcurrencyController.get_instance_sync()
 	
 	# Convert target_pages from 1-based to 0-based if provided
@@ -318,7 +403,7 @@ def generate_explanations(
 		target_pages_0based = [p - 1 for p in target_pages if p > 0]
 	
 	# Initial processing
-	explanations, preview_images, failed_pages = _run_async(
+	explanations, preview_images, failed_pages = run(
 		_generate_explanations_async(
 			llm_client=llm_client,
 			page_images=[img if img else b"" for img in page_images],
@@ -331,6 +416,9 @@ def generate_explanations(
 			global_concurrency_controller=global_controller,
 			on_page_status=on_page_status,
 			target_pages=target_pages_0based,
+			on_page_result=on_page_result,
+			initial_completed=len(existing),
+			scheduler=scheduler,
 		)
 	)
 	
@@ -354,7 +442,7 @@ def generate_explanations(
 			
 			# Retry failed pages (convert 1-based to 0-based)
 			failed_pages_0based = [p - 1 for p in failed_pages]
-			new_explanations, _, new_failed_pages = _run_async(
+			new_explanations, _, new_failed_pages = run(
 				_generate_explanations_async(
 					llm_client=llm_client,
 					page_images=[img if img else b"" for img in page_images],
@@ -367,6 +455,8 @@ def generate_explanations(
 					global_concurrency_controller=global_controller,
 					on_page_status=on_page_status,
 					target_pages=failed_pages_0based,
+					on_page_result=on_page_result,
+					scheduler=scheduler,
 				)
 			)
 			
@@ -391,6 +481,9 @@ def generate_explanations(
 			except Exception:
 				pass
 	
+	if existing:
+		explanations = {**existing, **explanations}
+	
 	return explanations, preview_images, failed_pages
 
 
@@ -541,7 +634,11 @@ def generate_html_screenshot_document(
     column_gap: int = 20,
     show_column_rule: bool = True,
     on_progress: Optional[Callable[[int, int], None]] = None,
-    on_page_status: Optional[Callable[[int, str, Optional[str]], None]] = None
+    on_page_status: Optional[Callable[[int, str, Optional[str]], None]] = None,
+    embed_images: bool = True,
+    assets_dir: Optional[str] = None,
+    assets_url: str = "assets",
+    document_info: Optional[DocumentInfo] = None
 ) -> str:
     """
     Generate HTML screenshot document with PDF screenshots and explanations
@@ -557,50 +654,95 @@ def generate_html_screenshot_document(
         column_count: Number of columns for explanation text
         column_gap: Gap between columns in px
         show_column_rule: Whether to show column separator line
+        embed_images: Embed screenshots as base64; when False they are written
+            to assets_dir and lazy-loaded from assets_url (see html_assets)
+        assets_dir: Directory for external page images (required if not embed_images)
+        assets_url: URL of assets_dir relative to the HTML file
+        document_info: Pre-flight analysis of src_bytes (optional); repeated
+            pages are rendered once
         
     Returns:
         Complete HTML document string
     """
+    return "".join(iter_html_screenshot_document(
+        src_bytes, explanations, screenshot_dpi, title, font_name, font_size,
+        line_spacing, column_count, column_gap, show_column_rule,
+        on_progress=on_progress, on_page_status=on_page_status,
+        embed_images=embed_images, assets_dir=assets_dir, assets_url=assets_url,
+        document_info=document_info
+    ))
+
+
+def iter_html_screenshot_document(
+    src_bytes: bytes,
+    explanations: dict,
+    screenshot_dpi: int = 150,
+    title: str = "PDF文档讲解",
+    font_name: str = "SimHei",
+    font_size: int = 14,
+    line_spacing: float = 1.2,
+    column_count: int = 2,
+    column_gap: int = 20,
+    show_column_rule: bool = True,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    on_page_status: Optional[Callable[[int, str, Optional[str]], None]] = None,
+    embed_images: bool = True,
+    assets_dir: Optional[str] = None,
+    assets_url: str = "assets",
+    document_info: Optional[DocumentInfo] = None
+) -> Iterator[str]:
+    """
+    Stream the HTML screenshot document chunk by chunk.
+    
+    Each page is rendered just before its chunk is emitted, so only one
+    screenshot is held in memory at a time. Arguments match
+    generate_html_screenshot_document.
+    """
+    if not embed_images and not assets_dir:
+        raise ValueError("assets_dir is required when embed_images is False")
     
     # Open PDF document
     src_doc = fitz.open(stream=src_bytes, filetype="pdf")
     total_pages = src_doc.page_count
+    renders = PageRenderCache(document_info, total_pages, lambda pno: _page_png_bytes(src_doc, pno, screenshot_dpi))
     
-    # Generate screenshots for all pages
-    screenshot_data = []
-    for page_num in range(total_pages):
-        # 更新页面状态：开始处理
-        if on_page_status:
-            try:
-                on_page_status(page_num, "processing", None)
-            except Exception:
-                pass
-        
-        try:
-            screenshot_bytes = _page_png_bytes(src_doc, page_num, screenshot_dpi)
-            screenshot_data.append({
-                'page_num': page_num + 1,  # Convert to 1-indexed
-                'image_bytes': screenshot_bytes
-            })
-            
-            # 更新页面状态：完成
+    def screenshots() -> Iterator[Dict[str, Any]]:
+        for page_num in range(total_pages):
+            # 更新页面状态：开始处理
             if on_page_status:
                 try:
-                    on_page_status(page_num, "completed", None)
+                    on_page_status(page_num, "processing", None)
                 except Exception:
                     pass
             
-            # 更新进度
-            if on_progress:
-                try:
-                    on_progress(page_num + 1, total_pages)
-                except Exception:
-                    pass
-        except Exception as e:
-            # 更新页面状态：失败
+            try:
+                if embed_images:
+                    entry = {
+                        'page_num': page_num + 1,  # Convert to 1-indexed
+                        'image_bytes': renders.get(page_num)
+                    }
+                else:
+                    entry = write_page_assets(src_doc, page_num, assets_dir, assets_url, screenshot_dpi)
+            except Exception as e:
+                # 更新页面状态：失败
+                if on_page_status:
+                    try:
+                        on_page_status(page_num, "failed", str(e))
+                    except Exception:
+                        pass
+                
+                # 更新进度
+                if on_progress:
+                    try:
+                        on_progress(page_num + 1, total_pages)
+                    except Exception:
+                        pass
+                raise
+            
+            # 更新页面状态：完成
             if on_page_status:
                 try:
-                    on_page_status(page_num, "failed", str(e))
+                    on_page_status(page_num, "completed", None)
                 except Exception:
                     pass
             
@@ -610,9 +752,8 @@ def generate_html_screenshot_document(
                     on_progress(page_num + 1, total_pages)
                 except Exception:
                     pass
-            raise
-    
-    src_doc.close()
+            
+            yield entry
     
     # Convert explanations from 0-indexed to 1-indexed
     explanations_1indexed = {
@@ -620,35 +761,84 @@ def generate_html_screenshot_document(
         for page_num, text in explanations.items()
     }
     
-    # Generate HTML document
-    html_content = HTMLScreenshotGenerator.generate_html_screenshot_view(
-        screenshot_data=screenshot_data,
-        explanations=explanations_1indexed,
-        total_pages=total_pages,
-        title=title,
-        font_name=font_name,
-        font_size=font_size,
-        line_spacing=line_spacing,
-        column_count=column_count,
-        column_gap=column_gap,
-        show_column_rule=show_column_rule
-    )
-    
-    return html_content
+    try:
+        yield from HTMLScreenshotGenerator.iter_html_screenshot_view(
+            screenshot_data=screenshots(),
+            explanations=explanations_1indexed,
+            total_pages=total_pages,
+            title=title,
+            font_name=font_name,
+            font_size=font_size,
+            line_spacing=line_spacing,
+            column_count=column_count,
+            column_gap=column_gap,
+            show_column_rule=show_column_rule
+        )
+    finally:
+        src_doc.close()
 
 # Helper function to convert PDF to HTML using pdf2htmlEX (can be run in parallel)
 def _convert_pdf_to_html_pdf2htmlex(
-    src_bytes: bytes
+    src_bytes: bytes,
+    workers: Optional[int] = None,
+    use_cache: bool = True
 ) -> Tuple[Optional[str], Optional[List[str]], Optional[str]]:
     """
     Convert PDF to HTML using pdf2htmlEX (internal helper for parallel execution).
     
+    Conversions are cached on disk by PDF content hash (see pdf2htmlex_cache),
+    so unchanged PDFs skip pdf2htmlEX entirely. Large documents are split
+    into page ranges converted by concurrent pdf2htmlEX processes (see
+    HTMLPdf2htmlEXGenerator.convert_pdf2htmlex_parallel); if that fails the
+    whole file is converted in one process.
+    
     Args:
         src_bytes: Source PDF file bytes
+        workers: Concurrent pdf2htmlEX processes (default: CPU count, 1 disables splitting)
+        use_cache: Read and write the conversion cache
         
     Returns:
         (css_content, page_htmls_list, error_message)
     """
+    cache = get_pdf2htmlex_cache() if use_cache else None
+    cache_key = None
+    if cache:
+        # Keyed on the PDF and conversion options only: chunked and
+        # single-process conversions render the same pages, so the entry is
+        # shared across machines and worker settings
+        cache_key = Pdf2htmlEXCache.make_key(
+            src_bytes, zoom=PDF2HTMLEX_ZOOM, dpi=PDF2HTMLEX_DPI, renaming=CHUNK_RENAMING
+        )
+        cached = cache.get(cache_key)
+        if cached:
+            return cached[0], cached[1], None
+    
+    css_content, page_htmls, error = _run_pdf2htmlex_conversion(src_bytes, workers)
+    if cache and not error and page_htmls:
+        cache.put(cache_key, css_content or "", page_htmls)
+    return css_content, page_htmls, error
+
+
+def _pdf2htmlex_chunk_count(src_bytes: bytes, workers: Optional[int] = None) -> int:
+    """Page ranges _run_pdf2htmlex_conversion splits the PDF into (1: one process)."""
+    import os
+    
+    workers = workers or PDF2HTMLEX_PARALLEL_WORKERS or os.cpu_count() or 1
+    if workers <= 1:
+        return 1
+    try:
+        total_pages = get_document_info(src_bytes).page_count
+    except Exception:
+        # Unreadable PDF: pdf2htmlEX gets it whole and reports the error
+        return 1
+    return len(HTMLPdf2htmlEXGenerator.plan_page_ranges(total_pages, workers))
+
+
+def _run_pdf2htmlex_conversion(
+    src_bytes: bytes,
+    workers: Optional[int] = None
+) -> Tuple[Optional[str], Optional[List[str]], Optional[str]]:
+    """Run pdf2htmlEX (in parallel page ranges when worthwhile) and parse its output."""
     import tempfile
     import os
     
@@ -657,6 +847,16 @@ def _convert_pdf_to_html_pdf2htmlex(
     if not is_installed:
         return None, None, f"pdf2htmlEX not available: {message}"
     
+    workers = workers or PDF2HTMLEX_PARALLEL_WORKERS or os.cpu_count() or 1
+    if _pdf2htmlex_chunk_count(src_bytes, workers) > 1:
+        total_pages = get_document_info(src_bytes).page_count
+        css_content, page_htmls, error = HTMLPdf2htmlEXGenerator.convert_pdf2htmlex_parallel(
+            src_bytes, total_pages, workers=workers
+        )
+        if not error:
+            return css_content, page_htmls, None
+        logger.warning(f"Parallel pdf2htmlEX conversion failed, converting in one process: {error}")
+    
     # Create temporary directory for pdf2htmlEX output
     temp_dir = tempfile.mkdtemp()
     try:
@@ -696,7 +896,10 @@ def generate_html_pdf2htmlex_document(
     column_gap: int = 20,
     show_column_rule: bool = True,
     on_progress: Optional[Callable[[int, int], None]] = None,
-    on_page_status: Optional[Callable[[int, str, Optional[str]], None]] = None
+    on_page_status: Optional[Callable[[int, str, Optional[str]], None]] = None,
+    embed_images: bool = True,
+    assets_dir: Optional[str] = None,
+    assets_url: str = "assets"
 ) -> str:
     """
     Generate HTML pdf2htmlEX document with pdf2htmlEX converted PDF and explanations
@@ -711,12 +914,47 @@ def generate_html_pdf2htmlex_document(
         column_count: Number of columns for explanation text
         column_gap: Gap between columns in px
         show_column_rule: Whether to show column separator line
+        embed_images: Keep fonts, images and all pages inline; when False they
+            are split into files in assets_dir and pages are loaded on scroll
+            (see pdf2htmlex_assets)
+        assets_dir: Directory for the split files (required if not embed_images)
+        assets_url: URL of assets_dir relative to the HTML file
         
     Returns:
         Complete HTML document string
     """
-    import tempfile
-    import os
+    return "".join(iter_html_pdf2htmlex_document(
+        src_bytes, explanations, title, font_name, font_size, line_spacing,
+        column_count, column_gap, show_column_rule,
+        on_progress=on_progress, on_page_status=on_page_status,
+        embed_images=embed_images, assets_dir=assets_dir, assets_url=assets_url
+    ))
+
+
+def iter_html_pdf2htmlex_document(
+    src_bytes: bytes,
+    explanations: dict,
+    title: str = "PDF文档讲解",
+    font_name: str = "SimHei",
+    font_size: int = 14,
+    line_spacing: float = 1.2,
+    column_count: int = 2,
+    column_gap: int = 20,
+    show_column_rule: bool = True,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    on_page_status: Optional[Callable[[int, str, Optional[str]], None]] = None,
+    embed_images: bool = True,
+    assets_dir: Optional[str] = None,
+    assets_url: str = "assets"
+) -> Iterator[str]:
+    """
+    Stream the HTML pdf2htmlEX document chunk by chunk.
+    
+    Arguments match generate_html_pdf2htmlex_document; the conversion runs
+    when the first chunk is requested.
+    """
+    if not embed_images and not assets_dir:
+        raise ValueError("assets_dir is required when embed_images is False")
     
     # Use helper function to get pdf2htmlEX conversion result
     # (This can be called in parallel with explanation generation)
@@ -740,6 +978,10 @@ def generate_html_pdf2htmlex_document(
         for page_num, text in explanations.items()
     }
     
+    # 分页模式：字体/图片写成外部文件，页面写成按需加载的片段
+    if not embed_images:
+        css_content, page_htmls = split_pdf2htmlex_output(css_content, page_htmls, assets_dir, assets_url)
+    
     # 更新每个页面的状态（解析阶段）
     for page_num in range(total_pages):
         if on_page_status:
@@ -761,7 +1003,7 @@ def generate_html_pdf2htmlex_document(
                 pass
     
     # Generate HTML document
-    html_content = HTMLPdf2htmlEXGenerator.generate_html_pdf2htmlex_view(
+    yield from HTMLPdf2htmlEXGenerator.iter_html_pdf2htmlex_view(
         page_htmls=page_htmls,
         pdf2htmlex_css=css_content,
         explanations=explanations_1indexed,
@@ -774,11 +1016,12 @@ def generate_html_pdf2htmlex_document(
         column_gap=column_gap,
         show_column_rule=show_column_rule
     )
-    
-    return html_content
 
 # For backward compatibility, import everything into this namespace
 __all__ = [
+    "DocumentInfo",
+    "analyze_pdf",
+    "get_document_info",
     "safe_utf8_loads",
     "is_blank_explanation",
     "validate_pdf_file",
@@ -790,10 +1033,15 @@ __all__ = [
     "match_pdf_json_files",
     "batch_recompose_from_json",
     "batch_recompose_from_json_async",
+    "iter_recompose_from_json",
+    "iter_recompose_pairs",
+    "aiter_recompose_from_json",
     "create_page_screenshot_markdown",
     "generate_markdown_with_screenshots",
     "generate_html_screenshot_document",
     "generate_html_pdf2htmlex_document",
+    "iter_html_screenshot_document",
+    "iter_html_pdf2htmlex_document",
     "generate_explanations",
     "retry_failed_pages",
     "process_markdown_mode",
@@ -4,8 +4,7 @@ import json
 import re
 from typing import Dict, List, Optional, Tuple
 
-import fitz  # PyMuPDF
-
+from .document_info import DocumentInfo, get_document_info
 from .logger import get_logger
 
 logger = get_logger()
@@ -54,44 +53,33 @@ def is_blank_explanation(text: Optional[str], min_chars: int = 10) -> bool:
     return len(s.strip()) < min_chars
 
 
-def validate_pdf_file(pdf_bytes: bytes) -> Tuple[bool, str]:
+def validate_pdf_file(pdf_bytes: bytes, document_info: Optional[DocumentInfo] = None) -> Tuple[bool, str]:
     """
     验证PDF文件是否有效
 
     Args:
         pdf_bytes: PDF文件字节数据
+        document_info: 已有的预检结果（可选，否则按内容哈希获取/分析一次）
 
     Returns:
         (bool, str): (是否有效, 错误信息)
     """
-    doc = None
-    try:
-        # 尝试打开PDF文件
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-
-        # 检查页数
-        if doc.page_count == 0:
-            return False, "PDF文件没有页面"
-
-        # 检查第一页是否可以正常访问
+    if document_info is None:
         try:
-            page = doc.load_page(0)
-            if page.rect.width <= 0 or page.rect.height <= 0:
-                return False, "PDF页面尺寸无效"
+            document_info = get_document_info(pdf_bytes)
         except Exception as e:
-            return False, f"无法读取PDF页面: {str(e)}"
-
-        return True, ""
-
-    except Exception as e:
-        return False, f"PDF文件无效或已损坏: {str(e)}"
-    finally:
-        # Ensure document is closed even if error occurs
-        if doc is not None:
-            try:
-                doc.close()
-            except Exception:
-                pass
+            return False, f"PDF文件无效或已损坏: {str(e)}"
+
+    # 检查页数
+    if document_info.page_count == 0:
+        return False, "PDF文件没有页面"
+
+    # 检查第一页是否可以正常访问
+    first_page = document_info.pages[0]
+    if first_page.width <= 0 or first_page.height <= 0:
+        return False, "PDF页面尺寸无效"
+
+    return True, ""
 
 
 def pages_with_blank_explanations(explanations: Dict[int, str], min_chars: int = 10) -> List[int]:
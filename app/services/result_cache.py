@@ -0,0 +1,65 @@
+"""
+On-disk result cache.
+
+Stores per-file processing results (explanations, failed pages, ...) as JSON
+keyed by content + parameter hash. Free of any UI dependency so it can be
+shared by the Streamlit app and the headless pipeline.
+"""
+
+import json
+import os
+import tempfile
+from typing import Any, Dict, Optional
+
+from .constants import CACHE_DIR_NAME
+from .content_hash import combine_with_params, get_content_hash
+from .logger import get_logger
+
+logger = get_logger()
+
+TEMP_DIR = os.path.join(tempfile.gettempdir(), CACHE_DIR_NAME)
+os.makedirs(TEMP_DIR, exist_ok=True)
+
+
+def get_file_hash(file_bytes: bytes, params: dict, content_hash: Optional[str] = None) -> str:
+    """
+    Generate hash based on file content and parameters.
+
+    Pass ``content_hash`` (see app.services.content_hash.get_content_hash) when
+    the upload has already been hashed, so the bytes are not hashed again.
+    """
+    if content_hash is None:
+        content_hash = get_content_hash(file_bytes)
+    return combine_with_params(content_hash, params)
+
+
+def save_result_to_file(file_hash: str, result: dict) -> str:
+    """Save processing result to temporary file."""
+    filepath = os.path.join(TEMP_DIR, f"{file_hash}.json")
+    with open(filepath, 'w', encoding='utf-8') as f:
+        # Don't save pdf_bytes to file, only save other information
+        result_copy = result.copy()
+        result_copy.pop('pdf_bytes', None)
+        json.dump(result_copy, f, ensure_ascii=False, indent=2)
+    return filepath
+
+
+def load_result_from_file(file_hash: str) -> Optional[Dict[str, Any]]:
+    """Load processing result from temporary file."""
+    filepath = os.path.join(TEMP_DIR, f"{file_hash}.json")
+    if not os.path.exists(filepath):
+        return None
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        # Corrupted cache should be handled gracefully
+        logger.warning(f"Failed to load cache file {filepath}: {e}")
+        try:
+            os.remove(filepath)
+        except OSError:
+            pass
+        return None
+    except Exception as e:
+        logger.error(f"Unexpected error loading cache file {filepath}: {e}", exc_info=True)
+        return None
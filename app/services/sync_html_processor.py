@@ -11,6 +11,7 @@ from pathlib import Path
 
 from app.services.logger import get_logger
 from app.services.enhanced_html_generator import EnhancedHTMLGenerator
+from app.services.html_stream import write_html_chunks
 
 logger = get_logger()
 
@@ -55,7 +56,7 @@ class SyncHTMLProcessor:
             生成的HTML文件路径
         """
         try:
-            html_content = self.generator.generate_sync_html(
+            html_chunks = self.generator.iter_sync_html(
                 pdf_content=pdf_content,
                 explanations=explanations,
                 total_pages=total_pages,
@@ -65,8 +66,7 @@ class SyncHTMLProcessor:
             )
             
             output_path = self.output_dir / filename
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(html_content)
+            write_html_chunks(html_chunks, output_path)
             
             logger.info(f"同步视图HTML已生成: {output_path}")
             return str(output_path)
@@ -1,8 +1,12 @@
 from __future__ import annotations
 
-from typing import List, Optional
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 
 import fitz  # PyMuPDF
+import numpy as np
 
 from . import constants
 
@@ -135,4 +139,142 @@ def _smart_text_layout(text: str, column_rects: List[fitz.Rect], font_size: int,
         # Add remaining text to the last column for overflow handling
         text_parts[-1] += "\n\n" + remaining_text
 
-    return text_parts
\ No newline at end of file
+    return text_parts
+
+# id(font) -> (font, {char: advance at size 1}); the font reference keeps the id valid
+_advance_cache: Dict[int, Tuple[fitz.Font, Dict[str, float]]] = {}
+_ADVANCE_CACHE_FONTS = 16
+
+# (id(font), text) -> (font, TextProfile), least recently used first
+_profile_cache: "OrderedDict[Tuple[int, str], Tuple[fitz.Font, TextProfile]]" = OrderedDict()
+_profile_lock = threading.Lock()
+
+_SPACE, _NEWLINE = ord(" "), ord("\n")
+
+
+def _char_advances(font: fitz.Font) -> Dict[str, float]:
+    entry = _advance_cache.get(id(font))
+    if entry is None or entry[0] is not font:
+        if len(_advance_cache) >= _ADVANCE_CACHE_FONTS:
+            _advance_cache.clear()
+        entry = _advance_cache[id(font)] = (font, {})
+    return entry[1]
+
+
+def _normalize(text: str) -> str:
+    # Same words and paragraphs as splitting at single spaces: runs of spaces collapse
+    return "\n".join(" ".join(word for word in paragraph.split(" ") if word) for paragraph in text.splitlines())
+
+
+class TextProfile:
+    """
+    Measured glyph widths of one text in one font, independent of the size.
+
+    Holds the prefix sums of the per-character advances at font size 1
+    (built with NumPy from one measurement per distinct character), so the
+    width of any slice is one subtraction and the longest slice that fits a
+    line is a binary search. Laying the same text out again at another size
+    or width reuses the profile; only the searches are redone.
+    """
+
+    def __init__(self, text: str, font: fitz.Font):
+        self.text = text
+        codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        # Measure every distinct character once, then spread the widths over the text
+        unique, inverse = np.unique(codes, return_inverse=True)
+        advances = _char_advances(font)
+        table = np.empty(len(unique), dtype=np.float64)
+        for i, code in enumerate(unique.tolist()):
+            char = chr(code)
+            advance = advances.get(char)
+            if advance is None:
+                advance = advances[char] = font.text_length(char, fontsize=1)
+            table[i] = advance
+        prefix = np.concatenate(([0.0], np.cumsum(table[inverse])))
+
+        separator = (codes == _SPACE) | (codes == _NEWLINE)
+        # Positions right after the last character of a word
+        word_ends = np.flatnonzero(~separator & np.append(separator[1:], True)) + 1
+        # Queries are scalar; plain lists with bisect beat per-call NumPy overhead
+        self.prefix: List[float] = prefix.tolist()
+        self.word_ends: List[int] = word_ends.tolist()
+        self.word_end_prefix: List[float] = prefix[word_ends].tolist()
+        self.paragraph_ends: List[int] = np.append(np.flatnonzero(codes == _NEWLINE), len(codes)).tolist()
+
+    def lines(self, font_size: float, width: float) -> List[str]:
+        """Greedy line breaking at ``font_size`` into lines of at most ``width`` points."""
+        text, prefix = self.text, self.prefix
+        word_ends, word_end_prefix = self.word_ends, self.word_end_prefix
+        # Rounding slack: prefix differences and running sums disagree in the last bits
+        limit = (width / font_size if font_size > 0 else float("inf")) + 1e-9
+        lines: List[str] = []
+        start = first = 0
+        for paragraph_end in self.paragraph_ends:
+            if start == paragraph_end:
+                lines.append("")
+            # Words first..stop-1 belong to this paragraph
+            stop = bisect_right(word_ends, paragraph_end, first)
+            while start < paragraph_end:
+                bound = prefix[start] + limit
+                # Longest run of whole words that fits
+                k = bisect_right(word_end_prefix, bound, first, stop) - 1
+                if k >= first and word_ends[k] > start:
+                    end = word_ends[k]
+                    if k + 1 < stop and word_end_prefix[k + 1] - prefix[end + 1] > limit:
+                        # The next word is too wide for any line: its first piece may still fill this one
+                        piece_end = self._cut(end + 1, limit)
+                        if prefix[piece_end] <= bound:
+                            end = piece_end
+                else:
+                    # The word at start alone is too wide (e.g. a CJK sentence): cut between characters
+                    end = self._cut(start, limit)
+                lines.append(text[start:end])
+                start = end + 1 if end < paragraph_end and text[end] == " " else end
+            start, first = paragraph_end + 1, stop
+        return lines
+
+    def _cut(self, start: int, limit: float) -> int:
+        # End of the longest slice from start within limit, at least one character
+        end = bisect_right(self.prefix, self.prefix[start] + limit, start) - 1
+        return max(end, start + 1)
+
+
+def text_profile(text: str, font: fitz.Font) -> TextProfile:
+    """Cached TextProfile of ``text`` (normalized as wrap_text_lines does) in ``font``."""
+    text = _normalize(text)
+    key = (id(font), text)
+    with _profile_lock:
+        entry = _profile_cache.get(key)
+        if entry is not None and entry[0] is font:
+            _profile_cache.move_to_end(key)
+            return entry[1]
+    profile = TextProfile(text, font)
+    with _profile_lock:
+        _profile_cache[key] = (font, profile)
+        _profile_cache.move_to_end(key)
+        while len(_profile_cache) > constants.TEXT_PROFILE_CACHE_SIZE:
+            _profile_cache.popitem(last=False)
+    return profile
+
+
+def wrap_text_lines(text: str, font: fitz.Font, font_size: float, width: float) -> List[str]:
+    """
+    Greedy line breaking with measured glyph widths.
+
+    Breaks like TextWriter.fill_textbox (at spaces, long words between
+    characters, blank lines kept). The text is measured once per font
+    (text_profile) and every line is found by binary search, so laying an
+    explanation out again at another size costs only the searches.
+
+    Args:
+        text: Input text; newlines start new lines
+        font: Font used to draw the text
+        font_size: Font size in points
+        width: Available line width in points
+
+    Returns:
+        Lines that each fit into ``width``
+    """
+    if not text:
+        return []
+    return text_profile(text, font).lines(font_size, width)
@@ -0,0 +1,127 @@
+"""
+Locally vendored MathJax / Prism for HTML fragment rendering.
+
+HtmlRenderer used to pull MathJax and Prism from cdn.jsdelivr.net for every
+fragment: online that is several round-trips per page, offline every render
+waited out the 15 s ready timeout. The pinned files listed in VENDOR_ASSETS
+are kept in ``app/static/vendor/`` and inlined into the page instead. With
+the Chromium pool reusing pages, that page is loaded once and only the
+fragment content changes between renders.
+
+The files are not committed; fetch them once with::
+
+    python -m app.services.vendor_assets
+
+scripts/install.sh does this for local installs, docker/start.sh and
+docker/quick-start.sh before ``docker-compose build`` (so the files are in
+the image), and docker/entrypoint.sh at container start if the image lacks
+them. Missing files fall back to the CDN URLs.
+"""
+
+import functools
+import os
+import urllib.request
+from typing import Dict, List, Optional
+
+from .logger import get_logger
+
+logger = get_logger()
+
+VENDOR_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static", "vendor")
+
+# Local name -> pinned CDN URL (also the fallback when the file is missing)
+VENDOR_ASSETS: Dict[str, str] = {
+    "mathjax/tex-svg.js": "https://cdn.jsdelivr.net/npm/mathjax@3.2.2/es5/tex-svg.js",
+    "prism/prism.min.css": "https://cdn.jsdelivr.net/npm/prismjs@1.29.0/themes/prism.min.css",
+    "prism/prism.min.js": "https://cdn.jsdelivr.net/npm/prismjs@1.29.0/prism.min.js",
+    "prism/prism-python.min.js": "https://cdn.jsdelivr.net/npm/prismjs@1.29.0/components/prism-python.min.js",
+    "prism/prism-javascript.min.js": "https://cdn.jsdelivr.net/npm/prismjs@1.29.0/components/prism-javascript.min.js",
+}
+
+MATHJAX_SCRIPTS = ["mathjax/tex-svg.js"]
+PRISM_STYLES = ["prism/prism.min.css"]
+PRISM_SCRIPTS = ["prism/prism.min.js", "prism/prism-python.min.js", "prism/prism-javascript.min.js"]
+
+# Typesetting is triggered per fragment, not on page load
+MATHJAX_CONFIG = (
+    "<script>window.MathJax = { tex: { inlineMath: [['$','$'], ['\\\\(','\\\\)']] }, "
+    "svg: { fontCache: 'global' }, startup: { typeset: false } };</script>"
+)
+
+
+@functools.lru_cache(maxsize=None)
+def read_asset(name: str) -> Optional[str]:
+    """Return the vendored file's text, or None if it has not been fetched."""
+    try:
+        with open(os.path.join(VENDOR_DIR, name), "r", encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _script_tag(name: str) -> str:
+    content = read_asset(name)
+    if content is None:
+        return f'<script src="{VENDOR_ASSETS[name]}"></script>'
+    # Inline scripts end at the first "</script", wherever it appears
+    return "<script>" + content.replace("</script", "<\\/script") + "</script>"
+
+
+def _style_tag(name: str) -> str:
+    content = read_asset(name)
+    if content is None:
+        return f'<link rel="stylesheet" href="{VENDOR_ASSETS[name]}" />'
+    return f"<style>{content}</style>"
+
+
+def head_tags(prism: bool = True) -> str:
+    """Stylesheets for the document <head>."""
+    return "".join(_style_tag(name) for name in PRISM_STYLES) if prism else ""
+
+
+def script_tags(mathjax: bool = True, prism: bool = True) -> str:
+    """Scripts for the end of <body>: inlined when vendored, CDN links otherwise."""
+    tags: List[str] = []
+    if prism:
+        tags.extend(_script_tag(name) for name in PRISM_SCRIPTS)
+    if mathjax:
+        tags.append(MATHJAX_CONFIG)
+        tags.extend(_script_tag(name) for name in MATHJAX_SCRIPTS)
+    return "".join(tags)
+
+
+def missing_assets() -> List[str]:
+    """Names of vendored files that have not been fetched yet."""
+    return [name for name in VENDOR_ASSETS if not os.path.isfile(os.path.join(VENDOR_DIR, name))]
+
+
+def fetch_vendor_assets(force: bool = False, timeout: float = 30) -> List[str]:
+    """
+    Download the pinned assets into VENDOR_DIR.
+
+    Returns:
+        Names of the files written
+    """
+    written = []
+    for name, url in VENDOR_ASSETS.items():
+        path = os.path.join(VENDOR_DIR, name)
+        if os.path.isfile(path) and not force:
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            data = response.read()
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        written.append(name)
+        logger.info(f"Vendored {name} ({len(data)} bytes) from {url}")
+    read_asset.cache_clear()
+    return written
+
+
+if __name__ == "__main__":
+    fetched = fetch_vendor_assets()
+    print(f"fetched {len(fetched)} file(s) into {VENDOR_DIR}")
+    for missing in missing_assets():
+        print(f"missing: {missing}")
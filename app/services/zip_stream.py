@@ -0,0 +1,188 @@
+"""
+Streaming ZIP packages for batch downloads.
+
+Batch downloads used to be built as one ``BytesIO`` after the whole batch
+had finished and kept in ``st.session_state`` as bytes, next to the results
+they were built from. StreamingZipWriter instead appends each result as soon
+as it completes to a spooled temp file (memory up to ZIP_SPOOL_MAX_MB, disk
+beyond that). Entries are written by one background thread, so deflating
+text outputs (HTML, Markdown, JSON) overlaps with the rest of the batch;
+already-compressed files such as PDFs and images are stored as-is.
+finish() hands back a ZipDownload that reads the archive on demand.
+"""
+
+import io
+import json
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+
+from .constants import ZIP_SPOOL_MAX_MB, ZIP_STORED_EXTENSIONS
+
+
+def compress_type_for(arcname: str) -> int:
+    """ZIP_STORED for already-compressed formats, ZIP_DEFLATED otherwise."""
+    return zipfile.ZIP_STORED if arcname.lower().endswith(ZIP_STORED_EXTENSIONS) else zipfile.ZIP_DEFLATED
+
+
+class _ArchiveReader(io.RawIOBase):
+    """Read-only view of a ZipDownload with its own position."""
+
+    def __init__(self, download: "ZipDownload"):
+        self._download = download
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        count = self._download._read_at(self._pos, buffer)
+        self._pos += count
+        return count
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._download.size
+        self._pos = max(0, offset)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+
+class ZipDownload:
+    """A finished ZIP archive backed by a spooled temp file."""
+
+    def __init__(self, file: Any, size: int, entries: int):
+        self._file = file
+        self._lock = threading.Lock()
+        self.size = size
+        self.entries = entries
+
+    def _read_at(self, offset: int, buffer) -> int:
+        with self._lock:
+            self._file.seek(offset)
+            return self._file.readinto(buffer)
+
+    def open(self) -> io.BufferedReader:
+        """
+        A new reader over the archive, read in chunks as it is consumed.
+
+        Readers are independent of each other, so the archive can be
+        downloaded several times (pass ``download.open`` to st.download_button).
+        """
+        return io.BufferedReader(_ArchiveReader(self))
+
+    def getvalue(self) -> bytes:
+        """Read the whole archive into memory."""
+        with self.open() as reader:
+            return reader.read()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class StreamingZipWriter:
+    """
+    Append-only ZIP writer that compresses in a background thread.
+
+    The add_* methods only queue the entry and return, and may be called
+    from several threads; entries are written in the order they were added.
+    ``write`` mirrors ``ZipFile.write`` so helpers written for a ZipFile
+    (e.g. add_html_assets_to_zip) accept a writer as well.
+    """
+
+    def __init__(self, spool_max_mb: int = ZIP_SPOOL_MAX_MB):
+        self._file = tempfile.SpooledTemporaryFile(max_size=spool_max_mb * 1024 * 1024)
+        self._zip = zipfile.ZipFile(self._file, "w", zipfile.ZIP_DEFLATED)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="zip-writer")
+        self._lock = threading.Lock()
+        self._futures: List[Future] = []
+        self._closed = False
+
+    def _submit(self, write: Callable[[], None]) -> None:
+        with self._lock:
+            if self._closed:
+                raise ValueError("ZIP writer is already finished")
+            self._futures.append(self._executor.submit(write))
+
+    def add_bytes(self, arcname: str, data: bytes, compress_type: Optional[int] = None) -> None:
+        """Queue ``data`` as ``arcname`` (stored or deflated by extension unless given)."""
+        if compress_type is None:
+            compress_type = compress_type_for(arcname)
+        self._submit(lambda: self._zip.writestr(arcname, data, compress_type=compress_type))
+
+    def add_text(self, arcname: str, text: str) -> None:
+        """Queue ``text`` as a UTF-8 entry; encoding happens in the writer thread too."""
+        self._submit(lambda: self._zip.writestr(
+            arcname, text.encode("utf-8"), compress_type=compress_type_for(arcname)
+        ))
+
+    def add_json(self, arcname: str, obj: Any) -> None:
+        """Queue ``obj`` serialized the way the app exports explanations."""
+        self._submit(lambda: self._zip.writestr(
+            arcname,
+            json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8"),
+            compress_type=compress_type_for(arcname),
+        ))
+
+    def write(self, filename: str, arcname: Optional[str] = None, compress_type: Optional[int] = None) -> None:
+        """Queue the file at ``filename``; it is read when the entry is written."""
+        arcname = arcname or filename
+        if compress_type is None:
+            compress_type = compress_type_for(arcname)
+        self._submit(lambda: self._zip.write(filename, arcname, compress_type=compress_type))
+
+    def finish(self) -> Optional[ZipDownload]:
+        """
+        Wait for the queued entries and close the archive.
+
+        Returns:
+            The archive, or None if nothing was added
+
+        Raises:
+            The first error raised while writing an entry
+        """
+        with self._lock:
+            self._closed = True
+            futures = self._futures
+        try:
+            for future in futures:
+                future.result()
+            self._zip.close()
+        except BaseException:
+            self.abort()
+            raise
+        finally:
+            self._executor.shutdown(wait=True)
+        if not futures:
+            self._file.close()
+            return None
+        size = self._file.tell()
+        return ZipDownload(self._file, size, len(futures))
+
+    def abort(self) -> None:
+        """Drop the archive without waiting for queued entries to succeed."""
+        with self._lock:
+            self._closed = True
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        try:
+            self._zip.close()
+        except Exception:
+            pass
+        self._file.close()
+
+    def __enter__(self) -> "StreamingZipWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            self.abort()
@@ -3,7 +3,6 @@ import io
 import time
 import json
 import zipfile
-import hashlib
 import tempfile
 import sys
 from typing import Optional, Dict, Any, List
@@ -25,7 +24,7 @@ from dotenv import load_dotenv
 from app.ui_helpers import (
     StateManager, display_batch_status, validate_file_upload,
     process_single_file, process_single_file_with_progress, display_file_result,
-    build_zip_cache_pdf, build_zip_cache_markdown
+    start_zip_cache, add_result_to_zip
 )
 
 load_dotenv()
@@ -103,7 +102,10 @@ def sidebar_form():
 			html_show_column_rule = True
 			
 			markdown_title = st.text_input("文档标题", value="PDF文档讲解", help="HTML文档的标题（留空则使用文件名）")
-			embed_images = True
+			if output_mode == "HTML截图版":
+				embed_images = st.checkbox("嵌入图片到HTML", value=True, help="将截图base64编码嵌入HTML文件；关闭后截图保存为外部图片（WebP）并按需懒加载，大文档打开更快，需使用打包下载")
+			else:
+				embed_images = st.checkbox("嵌入字体和页面到HTML", value=True, help="将字体、图片和所有页面内嵌到单个HTML文件；关闭后拆分为外部文件，页面随滚动按需加载，大文档打开更快、占用内存更少，需使用打包下载")
 			st.divider()
 		else:  # PDF讲解版
 			# PDF模式的默认值
@@ -418,7 +420,19 @@ def batch_process_files(uploaded_files: List, params: Dict[str, Any]) -> None:
 	# Initialize processing state
 	StateManager.set_processing(True)
 	StateManager.set_batch_results({})
-	st.session_state["batch_zip_bytes"] = None
+	StateManager.set_zip_download("batch_zip_bytes", None)
+	# Resolved here: worker threads have no script context
+	result_dirs = StateManager.get_result_dirs()
+	
+	# Results go into the download ZIP as soon as each file completes; it is dropped if the batch raises
+	with start_zip_cache() as zip_writer:
+		_run_batch(uploaded_files, params, result_dirs, zip_writer)
+	
+	StateManager.set_processing(False)
+
+
+def _run_batch(uploaded_files: List, params: Dict[str, Any], result_dirs: Any, zip_writer: Any) -> None:
+	"""Process the files of batch_process_files, adding each result to zip_writer."""
 	
 	total_files = len(uploaded_files)
 	output_mode = params.get("output_mode", "PDF讲解版")
@@ -440,19 +454,44 @@ def batch_process_files(uploaded_files: List, params: Dict[str, Any]) -> None:
 		processing_mode="batch_generation"
 	)
 	
-	# Initialize files in tracker and get page counts
-	import fitz
+	# Pre-flight analysis: open each upload once; the DocumentInfo (page
+	# count, sizes, page hashes, token estimate) is passed to every stage
+	from app.services.content_hash import get_content_hash
+	from app.services.document_info import get_document_info
+	from app.services.job_journal import JobJournal
+	page_counts: Dict[str, int] = {}
+	document_infos: Dict[str, Any] = {}
 	for uploaded_file in uploaded_files:
-		uploaded_file.seek(0)
-		src_bytes = uploaded_file.read()
+		# Hash each upload once; the digest is memoized on the upload object
+		content_hash = get_content_hash(uploaded_file)
 		try:
-			pdf_doc = fitz.open(stream=src_bytes, filetype="pdf")
-			total_pages = pdf_doc.page_count
-			pdf_doc.close()
+			document_infos[uploaded_file.name] = get_document_info(uploaded_file, content_hash)
+			total_pages = document_infos[uploaded_file.name].page_count
 		except Exception:
 			total_pages = 0
+		page_counts[uploaded_file.name] = total_pages
 		progress_tracker.initialize_file(uploaded_file.name, total_pages)
 	
+	if document_infos:
+		estimated_tokens = sum(
+			info.estimate_tokens(
+				dpi=params.get("dpi", 180),
+				prompt_tokens=len(params.get("user_prompt") or ""),
+				output_tokens=params.get("max_tokens", 4096),
+			)
+			for info in document_infos.values()
+		)
+		st.caption(f"共 {sum(page_counts.values())} 页，预计最多消耗约 {estimated_tokens:,} tokens")
+	
+	# On-disk journal per file: every page explanation is checkpointed as it
+	# lands, and processing the same file again (e.g. after a refresh, in any
+	# batch) only generates its outstanding pages
+	journals = {f.name: JobJournal.for_file(get_content_hash(f), params) for f in uploaded_files}
+	resumed_pages = sum(len(j.completed_pages()) for j in journals.values())
+	if resumed_pages:
+		outstanding_pages = sum(len(j.outstanding_pages() or []) for j in journals.values())
+		st.info(f"♻️ 检测到断点记录，已恢复 {resumed_pages} 页讲解，仅生成缺失的 {outstanding_pages} 页")
+	
 	# Render initial progress
 	progress_tracker.force_render()  # Force initial render
 	
@@ -463,8 +502,12 @@ def batch_process_files(uploaded_files: List, params: Dict[str, Any]) -> None:
 	# Decide whether to use concurrent processing
 	use_concurrent = file_count > 1 and max_file_concurrency > 1
 	
+	# Multi-user deployments: hand the batch to the job queue workers, which
+	# share one API/CPU budget across every session
+	queue_db = os.getenv("JOB_QUEUE_DB")
+	
 	# Display concurrency information
-	if use_concurrent:
+	if use_concurrent and not queue_db:
 		page_concurrency = params.get("concurrency", 50)
 		theoretical_max = page_concurrency * file_count
 		st.info(
@@ -473,7 +516,7 @@ def batch_process_files(uploaded_files: List, params: Dict[str, Any]) -> None:
 		)
 	
 	# Define function to process a single file
-	def process_single_file_task(uploaded_file, on_progress=None, on_page_status=None):
+	def process_single_file_task(uploaded_file, on_progress=None, on_page_status=None, scheduler=None):
 		"""Process a single file and return result."""
 		filename = uploaded_file.name
 		try:
@@ -493,20 +536,31 @@ def batch_process_files(uploaded_files: List, params: Dict[str, Any]) -> None:
 			# Read file bytes and get cache hash
 			uploaded_file.seek(0)  # Reset file pointer
 			src_bytes = uploaded_file.read()
-			file_hash = get_file_hash(src_bytes, params)
+			content_hash = get_content_hash(uploaded_file)
+			file_hash = get_file_hash(src_bytes, params, content_hash=content_hash)
 			cached_result = load_result_from_file(file_hash)
+			file_journal = journals[filename]
+			file_journal.start(filename, page_counts.get(filename, 0))
 			
 			# Process file with progress callbacks
 			result = process_single_file_with_progress(
 				src_bytes, filename, params, file_hash, cached_result,
-				on_progress=on_progress, on_page_status=on_page_status
+				on_progress=on_progress, on_page_status=on_page_status,
+				journal=file_journal, scheduler=scheduler,
+				document_info=document_infos.get(filename), result_dirs=result_dirs
 			)
+			file_journal.finish(result.get("status", "failed"), result.get("failed_pages"))
+			# The result cache now holds every explanation; keep the journal
+			# only while something is left to resume
+			if result.get("status") == "completed" and not result.get("failed_pages"):
+				file_journal.discard()
 			
 			# Update stage to composing
 			progress_tracker.update_file_stage(filename, 2)  # Stage 2: Composing
 			
 			# Update result
 			StateManager.get_batch_results()[filename] = result
+			add_result_to_zip(zip_writer, filename, result, output_mode)
 			
 			# Mark file as completed or failed
 			if result.get("status") == "completed":
@@ -527,15 +581,40 @@ def batch_process_files(uploaded_files: List, params: Dict[str, Any]) -> None:
 				"error": str(e)
 			}
 	
-	# Process files (concurrent or sequential)
-	if use_concurrent:
+	# Process files (job queue, concurrent or sequential)
+	if queue_db:
+		import uuid
+		from app.services.job_queue import JobQueue
+		from app.ui_helpers import run_batch_via_queue
+		st.info("📥 已提交到任务队列，由 worker 进程处理（使用 worker 环境中的 API Key）")
+		
+		def on_queue_result(filename: str, result: Dict[str, Any]) -> None:
+			StateManager.get_batch_results()[filename] = result
+			add_result_to_zip(zip_writer, filename, result, output_mode)
+			if result.get("status") == "completed":
+				progress_tracker.complete_file(filename, success=True)
+			else:
+				progress_tracker.complete_file(filename, success=False, error=result.get("error"))
+			display_file_result(filename, result)
+		
+		session_id = st.session_state.setdefault("queue_session_id", uuid.uuid4().hex)
+		run_batch_via_queue(
+			JobQueue(queue_db), uploaded_files, params, progress_tracker,
+			on_queue_result, submitted_by=session_id
+		)
+	elif use_concurrent:
 		# Concurrent processing - create thread-safe callbacks for each file
 		file_callbacks = {}
 		for uploaded_file in uploaded_files:
 			on_progress, on_page_status = progress_tracker.create_thread_safe_callbacks(uploaded_file.name)
 			file_callbacks[uploaded_file.name] = (on_progress, on_page_status)
 		
-		with ThreadPoolExecutor(max_workers=max_file_concurrency) as executor:
+		# One shared event loop dispatches pages of all files fairly
+		# (shortest remaining first), so small files are not starved
+		from app.services.batch_scheduler import PageScheduler
+		from app.services.constants import BATCH_SCHEDULER_POLICY
+		with PageScheduler(policy=BATCH_SCHEDULER_POLICY) as scheduler, \
+				ThreadPoolExecutor(max_workers=max_file_concurrency) as executor:
 			# Submit all tasks and mark files as processing
 			future_to_file = {}
 			for uploaded_file in uploaded_files:
@@ -549,7 +628,8 @@ def batch_process_files(uploaded_files: List, params: Dict[str, Any]) -> None:
 					process_single_file_task,
 					uploaded_file,
 					on_progress,
-					on_page_status
+					on_page_status,
+					scheduler
 				)
 				future_to_file[future] = filename
 			
@@ -667,19 +747,8 @@ def batch_process_files(uploaded_files: List, params: Dict[str, Any]) -> None:
 	else:
 		st.error("❌ 所有文件处理失败")
 	
-	# Build ZIP cache
-	if output_mode == "Markdown截图讲解":
-		st.session_state["batch_zip_bytes"] = build_zip_cache_markdown(batch_results)
-	elif output_mode == "HTML截图版":
-		from app.ui_helpers import build_zip_cache_html_screenshot
-		st.session_state["batch_zip_bytes"] = build_zip_cache_html_screenshot(batch_results)
-	elif output_mode == "HTML-pdf2htmlEX版":
-		from app.ui_helpers import build_zip_cache_html_pdf2htmlex
-		st.session_state["batch_zip_bytes"] = build_zip_cache_html_pdf2htmlex(batch_results)
-	else:
-		st.session_state["batch_zip_bytes"] = build_zip_cache_pdf(batch_results)
-	
-	StateManager.set_processing(False)
+	# Wait for the last ZIP entries; the UI downloads from the spooled file
+	StateManager.set_zip_download("batch_zip_bytes", zip_writer.finish())
 
 
 def main():
@@ -973,7 +1042,7 @@ def main():
 				
 				st.download_button(
 					label=label_text,
-					data=zip_bytes,
+					data=zip_bytes.open if zip_bytes else b"",
 					file_name=zip_filename,
 					mime="application/zip",
 					use_container_width=True,
@@ -1024,6 +1093,8 @@ def main():
 							html_filename = f"{base_name}讲解文档.html"
 							json_filename = f"{base_name}.json"
 
+							if result.get("assets_dir"):
+								st.caption("截图/页面为外部文件，单独下载的HTML无法显示PDF内容，请使用打包下载")
 							col_dl1, col_dl2 = st.columns(2)
 							with col_dl1:
 								if result.get("html_content"):
@@ -1082,10 +1153,7 @@ def main():
 									)
 
 	def _build_and_run_with_pairs(pairs):
-		import json
-		from app.services import pdf_processor
 		from app.ui.components.detailed_progress_tracker import DetailedProgressTracker
-		import fitz
 
 		output_mode = params.get("output_mode", "PDF讲解版")
 		if output_mode == "Markdown截图讲解":
@@ -1098,8 +1166,11 @@ def main():
 			st.info("开始批量根据JSON重新生成PDF...")
 
 		st.session_state["batch_json_processing"] = True
+		# 替换旧结果前删除其临时资源目录；新结果各用一个独立目录（工作线程中无法访问 session_state）
+		result_dirs = StateManager.get_result_dirs()
+		result_dirs.release(st.session_state.get("batch_json_results"))
 		st.session_state["batch_json_results"] = {}
-		st.session_state["batch_json_zip_bytes"] = None
+		StateManager.set_zip_download("batch_json_zip_bytes", None)
 
 		# 将确认配对转为现有批处理入口的两个列表，并让 JSON 名与 PDF 同名匹配
 		pdf_data, json_data = [], []
@@ -1117,12 +1188,11 @@ def main():
 			processing_mode="json_regeneration"
 		)
 		
-		# Initialize files in tracker
+		# Initialize files in tracker (page counts from the cached pre-flight analysis)
+		from app.services.document_info import get_document_info
 		for pdf_name, pdf_bytes in pdf_data:
 			try:
-				pdf_doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-				total_pages = pdf_doc.page_count
-				pdf_doc.close()
+				total_pages = get_document_info(pdf_bytes).page_count
 			except Exception:
 				total_pages = 0
 			progress_tracker.initialize_file(pdf_name, total_pages)
@@ -1130,7 +1200,21 @@ def main():
 		# Render initial progress
 		progress_tracker.force_render()  # Force initial render
 
+		# 每个文件完成后立即写入下载ZIP（PDF模式只打包PDF）；处理出错时丢弃
+		with start_zip_cache() as zip_writer:
+			_regenerate_pairs(output_mode, pdf_data, json_data, progress_tracker, result_dirs, zip_writer)
+
+		st.session_state["batch_json_processing"] = False
+
+	def _regenerate_pairs(output_mode, pdf_data, json_data, progress_tracker, result_dirs, zip_writer):
+		"""逐个（或并发）根据JSON重新生成文档，每个结果完成后写入 zip_writer"""
+		import json
+		from app.services import pdf_processor
+		from app.services.document_info import get_document_info
+
+		total_files = len(pdf_data)
 		batch_results = {}
+		include_json = output_mode != "PDF讲解版"
 		
 		# 创建JSON数据映射，便于查找
 		json_data_map = {name: bytes_data for name, bytes_data in json_data}
@@ -1152,6 +1236,8 @@ def main():
 				# 解析JSON
 				json_content = json.loads(json_bytes.decode('utf-8'))
 				explanations = {int(k): str(v) for k, v in json_content.items()}
+				# 预检结果已在初始化进度时按内容哈希缓存
+				document_info = get_document_info(pdf_bytes)
 				
 				# 根据输出模式生成内容
 				if output_mode == "Markdown截图讲解":
@@ -1159,9 +1245,7 @@ def main():
 					embed_images = params.get("embed_images", True)
 					images_dir = None
 					if not embed_images:
-						base_name = os.path.splitext(pdf_name)[0]
-						images_dir = os.path.join(TEMP_DIR, f"{base_name}_images")
-						os.makedirs(images_dir, exist_ok=True)
+						images_dir = result_dirs.create("pdf_images_")
 					
 					markdown_content, images_dir_return = pdf_processor.generate_markdown_with_screenshots(
 						src_bytes=pdf_bytes,
@@ -1171,7 +1255,8 @@ def main():
 						title=params.get("markdown_title", "PDF文档讲解"),
 						images_dir=images_dir,
 						on_progress=on_progress,
-						on_page_status=on_page_status
+						on_page_status=on_page_status,
+						document_info=document_info
 					)
 					
 					return pdf_name, {
@@ -1185,6 +1270,13 @@ def main():
 					base_name = os.path.splitext(pdf_name)[0]
 					title = params.get("markdown_title", "").strip() or base_name
 					
+					# 不嵌入时，截图（HTML截图版）或拆分的字体/页面（pdf2htmlEX版）保存到外部资源目录
+					embed_images = params.get("embed_images", True)
+					assets_dir = None
+					assets_url = f"{base_name}_assets"
+					if not embed_images:
+						assets_dir = result_dirs.create("html_assets_")
+					
 					if output_mode == "HTML-pdf2htmlEX版":
 						html_content = pdf_processor.generate_html_pdf2htmlex_document(
 							src_bytes=pdf_bytes,
@@ -1197,7 +1289,10 @@ def main():
 							column_gap=params.get("html_column_gap", 20),
 							show_column_rule=params.get("html_show_column_rule", True),
 							on_progress=on_progress,
-							on_page_status=on_page_status
+							on_page_status=on_page_status,
+							embed_images=embed_images,
+							assets_dir=assets_dir,
+							assets_url=assets_url
 						)
 					else:  # HTML截图版
 						html_content = pdf_processor.generate_html_screenshot_document(
@@ -1212,13 +1307,19 @@ def main():
 							column_gap=params.get("html_column_gap", 20),
 							show_column_rule=params.get("html_show_column_rule", True),
 							on_progress=on_progress,
-							on_page_status=on_page_status
+							on_page_status=on_page_status,
+							embed_images=embed_images,
+							assets_dir=assets_dir,
+							assets_url=assets_url,
+							document_info=document_info
 						)
 					
 					return pdf_name, {
 						"status": "completed",
 						"html_content": html_content,
-						"explanations": explanations
+						"explanations": explanations,
+						"assets_dir": assets_dir,
+						"assets_url": assets_url
 					}
 					
 				else:  # PDF模式
@@ -1231,7 +1332,8 @@ def main():
 						font_name=(params.get("cjk_font_name") or "SimHei"),
 						render_mode=params.get("render_mode", "markdown"),
 						line_spacing=params["line_spacing"],
-						column_padding=params.get("column_padding", 10)
+						column_padding=params.get("column_padding", 10),
+						document_info=document_info
 					)
 					
 					return pdf_name, {
@@ -1290,6 +1392,7 @@ def main():
 					try:
 						result_pdf_name, result = future.result()
 						batch_results[result_pdf_name] = result
+						add_result_to_zip(zip_writer, result_pdf_name, result, output_mode, include_json=include_json)
 						
 						# 更新进度：完成
 						if result.get("status") == "completed":
@@ -1339,6 +1442,7 @@ def main():
 					pdf_name, pdf_bytes, on_progress=on_progress, on_page_status=on_page_status
 				)
 				batch_results[result_pdf_name] = result
+				add_result_to_zip(zip_writer, result_pdf_name, result, output_mode, include_json=include_json)
 				
 				if result.get("status") == "completed":
 					progress_tracker.update_file_stage(pdf_name, 1)
@@ -1352,76 +1456,8 @@ def main():
 		# Final progress render
 		progress_tracker.force_render()  # Force final render
 
-		# 构建ZIP缓存
-		if output_mode == "Markdown截图讲解":
-			completed_count = sum(1 for r in batch_results.values() if r["status"] == "completed" and r.get("markdown_content"))
-			if completed_count > 0:
-				zip_buffer = io.BytesIO()
-				with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-					for filename, result in batch_results.items():
-						if result["status"] == "completed" and result.get("markdown_content"):
-							base_name = os.path.splitext(filename)[0]
-							markdown_filename = f"{base_name}讲解文档.md"
-							zip_file.writestr(markdown_filename, result["markdown_content"])
-							# 保存JSON
-							if result.get("explanations"):
-								try:
-									json_bytes = json.dumps(result["explanations"], ensure_ascii=False, indent=2).encode("utf-8")
-									json_filename = f"{base_name}.json"
-									zip_file.writestr(json_filename, json_bytes)
-								except Exception:
-									pass
-							# 如果有外部图片文件夹，打包到ZIP中
-							images_dir = result.get("images_dir")
-							if images_dir and os.path.exists(images_dir):
-								for img_file in os.listdir(images_dir):
-									img_path = os.path.join(images_dir, img_file)
-									if os.path.isfile(img_path):
-										# 在ZIP中创建images目录
-										zip_img_path = f"{base_name}_images/{img_file}"
-										zip_file.write(img_path, zip_img_path)
-				zip_buffer.seek(0)
-				st.session_state["batch_json_zip_bytes"] = zip_buffer.getvalue()
-			else:
-				st.session_state["batch_json_zip_bytes"] = None
-		elif output_mode == "HTML截图版" or output_mode == "HTML-pdf2htmlEX版":
-			completed_count = sum(1 for r in batch_results.values() if r["status"] == "completed" and r.get("html_content"))
-			if completed_count > 0:
-				zip_buffer = io.BytesIO()
-				with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-					for filename, result in batch_results.items():
-						if result["status"] == "completed" and result.get("html_content"):
-							base_name = os.path.splitext(filename)[0]
-							html_filename = f"{base_name}讲解文档.html"
-							zip_file.writestr(html_filename, result["html_content"])
-							# 保存JSON
-							if result.get("explanations"):
-								try:
-									json_bytes = json.dumps(result["explanations"], ensure_ascii=False, indent=2).encode("utf-8")
-									json_filename = f"{base_name}.json"
-									zip_file.writestr(json_filename, json_bytes)
-								except Exception:
-									pass
-				zip_buffer.seek(0)
-				st.session_state["batch_json_zip_bytes"] = zip_buffer.getvalue()
-			else:
-				st.session_state["batch_json_zip_bytes"] = None
-		else:
-			completed_count = sum(1 for r in batch_results.values() if r["status"] == "completed" and r.get("pdf_bytes"))
-			if completed_count > 0:
-				zip_buffer = io.BytesIO()
-				with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-					for filename, result in batch_results.items():
-						if result["status"] == "completed" and result.get("pdf_bytes"):
-							base_name = os.path.splitext(filename)[0]
-							new_filename = f"{base_name}讲解版.pdf"
-							zip_file.writestr(new_filename, result["pdf_bytes"])
-				zip_buffer.seek(0)
-				st.session_state["batch_json_zip_bytes"] = zip_buffer.getvalue()
-			else:
-				st.session_state["batch_json_zip_bytes"] = None
-
-		st.session_state["batch_json_processing"] = False
+		# 等待最后的ZIP条目写完；下载时从临时文件读取
+		StateManager.set_zip_download("batch_json_zip_bytes", zip_writer.finish())
 
 	# 批量根据JSON重新生成PDF/Markdown（单框上传 + 智能配对）
 	st.subheader("📚 批量根据JSON重新生成PDF/Markdown（单框上传）")
@@ -1540,7 +1576,7 @@ def main():
 				st.info("💡 批量处理结果将以压缩包形式下载，包含所有文档和相关图片文件夹")
 				st.download_button(
 					label=button_label,
-					data=zip_bytes,
+					data=zip_bytes.open if zip_bytes else b"",
 					file_name=zip_filename,
 					mime="application/zip",
 					use_container_width=True,
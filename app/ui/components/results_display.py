@@ -6,11 +6,11 @@ Displays processing results with download options and statistics.
 
 from typing import Dict, Any, List, Optional
 import json
-import io
-import zipfile
 import streamlit as st
 import os
 
+from app.services.zip_stream import StreamingZipWriter, ZipDownload
+
 
 class ResultsDisplay:
     """Displays batch processing results with download options."""
@@ -145,7 +145,7 @@ class ResultsDisplay:
 
                 st.download_button(
                     label="📦 下载 ZIP 压缩包",
-                    data=zip_bytes,
+                    data=zip_bytes.getvalue,
                     file_name=zip_filename,
                     mime="application/zip",
                     use_container_width=True,
@@ -233,7 +233,7 @@ class ResultsDisplay:
                 st.session_state.retry_files = failed_files
                 st.rerun()
 
-    def _build_zip(self, batch_results: Dict[str, Any]) -> Optional[bytes]:
+    def _build_zip(self, batch_results: Dict[str, Any]) -> Optional[ZipDownload]:
         """
         Build ZIP file from results.
 
@@ -241,43 +241,33 @@ class ResultsDisplay:
             batch_results: Dictionary of batch results
 
         Returns:
-            ZIP file bytes or None
+            File-backed ZIP archive or None
         """
-        zip_buffer = io.BytesIO()
+        zip_writer = StreamingZipWriter()
 
         try:
-            with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                # Add PDF files
-                for filename, result in batch_results.items():
-                    if result.get("status") != "completed":
-                        continue
-
-                    base_name = os.path.splitext(filename)[0]
-
-                    # Add PDF
-                    if result.get("pdf_bytes"):
-                        pdf_filename = f"{base_name}讲解版.pdf"
-                        zip_file.writestr(pdf_filename, result["pdf_bytes"])
-
-                    # Add Markdown
-                    if result.get("markdown_content"):
-                        md_filename = f"{base_name}讲解文档.md"
-                        zip_file.writestr(md_filename, result["markdown_content"])
-
-                    # Add JSON
-                    if result.get("explanations"):
-                        json_filename = f"{base_name}.json"
-                        json_bytes = json.dumps(
-                            result["explanations"],
-                            ensure_ascii=False,
-                            indent=2
-                        ).encode("utf-8")
-                        zip_file.writestr(json_filename, json_bytes)
-
-            zip_buffer.seek(0)
-            return zip_buffer.getvalue()
+            for filename, result in batch_results.items():
+                if result.get("status") != "completed":
+                    continue
+
+                base_name = os.path.splitext(filename)[0]
+
+                # Add PDF (stored, already compressed)
+                if result.get("pdf_bytes"):
+                    zip_writer.add_bytes(f"{base_name}讲解版.pdf", result["pdf_bytes"])
+
+                # Add Markdown
+                if result.get("markdown_content"):
+                    zip_writer.add_text(f"{base_name}讲解文档.md", result["markdown_content"])
+
+                # Add JSON
+                if result.get("explanations"):
+                    zip_writer.add_json(f"{base_name}.json", result["explanations"])
+
+            return zip_writer.finish()
 
         except Exception as e:
+            zip_writer.abort()
             st.error(f"构建ZIP文件失败: {str(e)}")
             return None
 
@@ -7,6 +7,7 @@ Manages batch processing operations.
 from typing import Dict, Any, List, Callable, Optional
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import streamlit as st
+from app.services.content_hash import get_content_hash
 from .file_handler import FileHandler
 from ..components.progress_tracker import ProgressTracker
 
@@ -61,7 +62,8 @@ class BatchHandler:
                 result = self.file_handler.process_file(
                     file_bytes,
                     file.name,
-                    params
+                    params,
+                    content_hash=get_content_hash(file)
                 )
                 results[file.name] = result
 
@@ -120,7 +122,8 @@ class BatchHandler:
                     self._process_single_file_safe,
                     file_bytes,
                     file.name,
-                    params
+                    params,
+                    get_content_hash(file)
                 )
                 future_to_file[future] = file.name
 
@@ -170,7 +173,8 @@ class BatchHandler:
         self,
         file_bytes: bytes,
         filename: str,
-        params: Dict[str, Any]
+        params: Dict[str, Any],
+        content_hash: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Process a single file safely (for threading).
@@ -179,12 +183,15 @@ class BatchHandler:
             file_bytes: File bytes
             filename: File name
             params: Processing parameters
+            content_hash: Precomputed content digest (optional)
 
         Returns:
             Processing result
         """
         try:
-            return self.file_handler.process_file(file_bytes, filename, params)
+            return self.file_handler.process_file(
+                file_bytes, filename, params, content_hash=content_hash
+            )
         except Exception as e:
             return {
                 "status": "failed",
@@ -4,13 +4,13 @@ Download Handler.
 Manages file downloads and packaging.
 """
 
-from typing import Dict, Any, Optional
-import io
-import zipfile
+from typing import Any, Callable, Dict, Optional, Union
 import json
 import os
 import streamlit as st
 
+from app.services.zip_stream import StreamingZipWriter, ZipDownload
+
 
 class DownloadHandler:
     """Handles file downloads and packaging."""
@@ -23,7 +23,7 @@ class DownloadHandler:
         self,
         batch_results: Dict[str, Any],
         output_mode: str = "PDF讲解版"
-    ) -> Optional[bytes]:
+    ) -> Optional[ZipDownload]:
         """
         Build ZIP package from batch results.
 
@@ -32,48 +32,39 @@ class DownloadHandler:
             output_mode: Output mode (PDF or Markdown)
 
         Returns:
-            ZIP file bytes or None
+            File-backed ZIP archive or None
         """
-        zip_buffer = io.BytesIO()
+        zip_writer = StreamingZipWriter()
 
         try:
-            with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                for filename, result in batch_results.items():
-                    if result.get("status") != "completed":
-                        continue
+            for filename, result in batch_results.items():
+                if result.get("status") != "completed":
+                    continue
 
-                    base_name = os.path.splitext(filename)[0]
+                base_name = os.path.splitext(filename)[0]
 
-                    # Add PDF
-                    if result.get("pdf_bytes") and output_mode == "PDF讲解版":
-                        pdf_filename = f"{base_name}讲解版.pdf"
-                        zip_file.writestr(pdf_filename, result["pdf_bytes"])
+                # Add PDF (stored, already compressed)
+                if result.get("pdf_bytes") and output_mode == "PDF讲解版":
+                    zip_writer.add_bytes(f"{base_name}讲解版.pdf", result["pdf_bytes"])
 
-                    # Add Markdown
-                    if result.get("markdown_content") and output_mode == "Markdown截图讲解":
-                        md_filename = f"{base_name}讲解文档.md"
-                        zip_file.writestr(md_filename, result["markdown_content"])
+                # Add Markdown
+                if result.get("markdown_content") and output_mode == "Markdown截图讲解":
+                    zip_writer.add_text(f"{base_name}讲解文档.md", result["markdown_content"])
 
-                    # Add JSON (always)
-                    if result.get("explanations"):
-                        json_filename = f"{base_name}.json"
-                        json_bytes = json.dumps(
-                            result["explanations"],
-                            ensure_ascii=False,
-                            indent=2
-                        ).encode("utf-8")
-                        zip_file.writestr(json_filename, json_bytes)
+                # Add JSON (always)
+                if result.get("explanations"):
+                    zip_writer.add_json(f"{base_name}.json", result["explanations"])
 
-            zip_buffer.seek(0)
-            return zip_buffer.getvalue()
+            return zip_writer.finish()
 
         except Exception as e:
+            zip_writer.abort()
             st.error(f"构建ZIP包失败: {str(e)}")
             return None
 
     def create_download_button(
         self,
-        data: bytes,
+        data: Union[bytes, str, Callable[[], bytes]],
         filename: str,
         label: str,
         mime: str,
@@ -84,7 +75,7 @@ class DownloadHandler:
         Create a download button.
 
         Args:
-            data: File data
+            data: File data, or a callable producing it on click
             filename: Download filename
             label: Button label
             mime: MIME type
@@ -210,11 +201,11 @@ class BatchDownloadHandler(DownloadHandler):
         # Build and download ZIP
         if st.button("📦 生成并下载ZIP", type="primary", use_container_width=True):
             with st.spinner("正在构建ZIP包..."):
-                zip_bytes = self.build_zip_package(batch_results, output_mode)
+                zip_download = self.build_zip_package(batch_results, output_mode)
 
-                if zip_bytes:
+                if zip_download:
                     self.create_download_button(
-                        data=zip_bytes,
+                        data=zip_download.getvalue,
                         filename=zip_filename,
                         label="📥 下载 ZIP 压缩包",
                         mime="application/zip",
@@ -5,8 +5,9 @@ Manages file processing operations.
 """
 
 from typing import Dict, Any, Optional, Tuple
-import hashlib
 from app.cache_processor import get_file_hash, load_result_from_file
+from app.services.content_hash import get_content_hash
+from app.services.document_info import get_document_info
 
 
 class FileHandler:
@@ -21,7 +22,8 @@ class FileHandler:
         file_bytes: bytes,
         filename: str,
         params: Dict[str, Any],
-        cached_result: Optional[Dict[str, Any]] = None
+        cached_result: Optional[Dict[str, Any]] = None,
+        content_hash: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Process a single file.
@@ -31,6 +33,7 @@ class FileHandler:
             filename: Name of the file
             params: Processing parameters
             cached_result: Cached result if available
+            content_hash: Precomputed content digest of file_bytes (optional)
 
         Returns:
             Processing result dictionary
@@ -47,7 +50,7 @@ class FileHandler:
                 }
 
             # Get file hash for caching
-            file_hash = get_file_hash(file_bytes, params)
+            file_hash = get_file_hash(file_bytes, params, content_hash=content_hash)
 
             # Try to use cached result
             if cached_result and cached_result.get("status") == "completed":
@@ -208,26 +211,31 @@ class FileHandler:
         }
 
     @staticmethod
-    def get_file_info(file_bytes: bytes, filename: str) -> Dict[str, Any]:
+    def get_file_info(
+        file_bytes: bytes,
+        filename: str,
+        content_hash: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
         Get basic information about a file.
 
         Args:
             file_bytes: File content as bytes
             filename: File name
+            content_hash: Precomputed content digest of file_bytes (optional)
 
         Returns:
-            Dictionary with file information
+            Dictionary with file information ("document_info" is the cached
+            pre-flight analysis, None if the file is not a readable PDF)
         """
         file_size_kb = len(file_bytes) / 1024
+        if content_hash is None:
+            content_hash = get_content_hash(file_bytes)
 
-        # Try to get page count for PDF
-        page_count = None
+        # Page count from the pre-flight analysis (shared with processing)
+        document_info = None
         try:
-            import fitz
-            doc = fitz.open(stream=file_bytes)
-            page_count = len(doc)
-            doc.close()
+            document_info = get_document_info(file_bytes, content_hash)
         except Exception:
             pass
 
@@ -235,7 +243,9 @@ class FileHandler:
             "filename": filename,
             "size_bytes": len(file_bytes),
             "size_kb": file_size_kb,
-            "page_count": page_count
+            "page_count": document_info.page_count if document_info else None,
+            "content_hash": content_hash,
+            "document_info": document_info
         }
 
 
@@ -265,21 +275,16 @@ class FileValidator:
         if len(file_bytes) < 100:
             return False, "PDF文件太小或为空"
 
-        # Try to open with PyMuPDF
+        # Analyze with PyMuPDF (cached by content hash for the later stages)
         try:
-            import fitz
-            doc = fitz.open(stream=file_bytes)
-
-            # Check if document has pages
-            if len(doc) == 0:
-                doc.close()
-                return False, "PDF文件没有页面"
-
-            doc.close()
-
+            document_info = get_document_info(file_bytes)
         except Exception as e:
             return False, f"无法打开PDF文件: {str(e)}"
 
+        # Check if document has pages
+        if document_info.page_count == 0:
+            return False, "PDF文件没有页面"
+
         return True, None
 
     def _is_pdf(self, file_bytes: bytes) -> bool:
@@ -299,10 +299,10 @@ def cached(
 
 
 # Smart cache decorators for common use cases
-@cached(ttl=1800)
-def cache_file_hash(file_bytes: bytes) -> str:
-    """Cache file hash computation."""
-    return hashlib.md5(file_bytes).hexdigest()
+def cache_file_hash(file_bytes: Any) -> str:
+    """File content hash, shared with the processing caches (memoized on upload objects)."""
+    from app.services.content_hash import get_content_hash
+    return get_content_hash(file_bytes)
 
 
 @cached(ttl=3600)
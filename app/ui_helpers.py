@@ -5,17 +5,76 @@ This module contains helper functions to reduce code duplication
 and improve maintainability of the main Streamlit app.
 """
 
-from typing import Dict, List, Optional, Tuple, Any, Callable
+from typing import Dict, List, Optional, Set, Tuple, Any, Callable, TYPE_CHECKING
 import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import weakref
 import streamlit as st
 
 from app.services import pdf_processor
 from app.services import constants
 
+if TYPE_CHECKING:
+    from app.services.zip_stream import StreamingZipWriter, ZipDownload
+
 # Logger for background thread operations
 logger = logging.getLogger(__name__)
 
 
+def _remove_dirs(dirs: Set[str]) -> None:
+    for path in list(dirs):
+        shutil.rmtree(path, ignore_errors=True)
+    dirs.clear()
+
+
+class ResultDirs:
+    """
+    Temp directories holding the files of one session's results.
+
+    Every result gets a fresh directory for its external HTML assets, so
+    uploads with the same name in other sessions or earlier runs never
+    share (or ship each other's) files. A result's directory is removed
+    when the result is replaced, and every directory when the owning
+    session state is dropped (session end) or the process exits.
+    """
+
+    def __init__(self):
+        self._dirs: Set[str] = set()
+        self._lock = threading.Lock()
+        self._finalizer = weakref.finalize(self, _remove_dirs, self._dirs)
+
+    def create(self, prefix: str = "html_assets_") -> str:
+        """Create a directory owned by this session."""
+        path = tempfile.mkdtemp(prefix=prefix)
+        with self._lock:
+            self._dirs.add(path)
+        return path
+
+    def release(self, results: Optional[Dict[str, Dict[str, Any]]]) -> None:
+        """Remove the directories of ``results`` (e.g. before they are replaced)."""
+        for result in (results or {}).values():
+            for key in ("assets_dir", "images_dir"):
+                path = (result or {}).get(key)
+                with self._lock:
+                    owned = path in self._dirs
+                    self._dirs.discard(path)
+                if owned:
+                    shutil.rmtree(path, ignore_errors=True)
+
+    def close(self) -> None:
+        """Remove every directory created so far."""
+        with self._lock:
+            self._finalizer()
+
+
+# Used where no session passes its own ResultDirs (e.g. outside Streamlit)
+_default_result_dirs = ResultDirs()
+
+
 class StateManager:
     """Manages Streamlit session state with type safety."""
     
@@ -42,9 +101,30 @@ class StateManager:
     
     @staticmethod
     def set_batch_results(value: Dict[str, Dict[str, Any]]):
-        """Set batch results in session state."""
+        """Set batch results in session state (the replaced results' temp files are removed)."""
+        StateManager.get_result_dirs().release(st.session_state.get("batch_results"))
         st.session_state["batch_results"] = value
     
+    @staticmethod
+    def set_zip_download(key: str, value: Optional["ZipDownload"]):
+        """Store a batch download ZIP under key (the replaced archive's temp file is closed)."""
+        previous = st.session_state.get(key)
+        if previous is not None and previous is not value:
+            previous.close()
+        st.session_state[key] = value
+    
+    @staticmethod
+    def get_result_dirs() -> ResultDirs:
+        """
+        Temp directories of this session's results.
+
+        Call from the script thread and pass the object to worker threads:
+        those have no script context and would see an empty session state.
+        """
+        if st.session_state.get("result_dirs") is None:
+            st.session_state["result_dirs"] = ResultDirs()
+        return st.session_state["result_dirs"]
+    
     @staticmethod
     def is_processing() -> bool:
         """Check if batch processing is in progress."""
@@ -111,6 +191,36 @@ def validate_file_upload(uploaded_files: List, params: Dict[str, Any]) -> Tuple[
     return True, None
 
 
+def _journal_kwargs(journal: Optional[Any]) -> Dict[str, Any]:
+    """generate_explanations kwargs that resume from / checkpoint to a FileJournal."""
+    if journal is None:
+        return {}
+    return journal.generation_kwargs()
+
+
+def _html_asset_kwargs(
+    params: Dict[str, Any],
+    base_name: str,
+    result_dirs: Optional[ResultDirs] = None,
+) -> Dict[str, Any]:
+    """
+    HTML document kwargs for the image mode in params.
+    
+    With embed_images off, page screenshots (HTML截图版) or the split
+    pdf2htmlEX fonts, images and page fragments (HTML-pdf2htmlEX版) go to a
+    fresh temp directory owned by ``result_dirs`` (the session's, see
+    StateManager.get_result_dirs) that the ZIP builders ship as
+    ``{base_name}_assets/`` next to the HTML.
+    """
+    if params.get("embed_images", True):
+        return {}
+    return {
+        "embed_images": False,
+        "assets_dir": (result_dirs or _default_result_dirs).create("html_assets_"),
+        "assets_url": f"{base_name}_assets",
+    }
+
+
 def process_single_file_pdf(
     uploaded_file: Optional[Any],
     filename: str,
@@ -120,6 +230,9 @@ def process_single_file_pdf(
     file_hash: str,
     on_progress: Optional[Callable[[int, int], None]] = None,
     on_page_status: Optional[Callable[[int, str, Optional[str]], None]] = None,
+    journal: Optional[Any] = None,
+    scheduler: Optional[Any] = None,
+    document_info: Optional[Any] = None,
 ) -> Dict[str, Any]:
     """
     Process a single PDF file in PDF mode.
@@ -133,6 +246,9 @@ def process_single_file_pdf(
         file_hash: File hash for cache
         on_progress: Progress callback (done, total)
         on_page_status: Page status callback (page_index, status, error)
+        journal: FileJournal used to checkpoint/resume page explanations (optional)
+        scheduler: Batch PageScheduler that dispatches this file's pages (optional)
+        document_info: DocumentInfo of src_bytes from the pre-flight analysis (optional)
         
     Returns:
         Processing result dictionary
@@ -153,7 +269,8 @@ def process_single_file_pdf(
                 font_name=(params.get("cjk_font_name") or "SimHei"),
                 render_mode=params.get("render_mode", "markdown"),
                 line_spacing=params["line_spacing"],
-                column_padding=column_padding_value
+                column_padding=column_padding_value,
+                document_info=document_info
             )
             return {
                 "status": "completed",
@@ -188,6 +305,9 @@ def process_single_file_pdf(
             on_page_status=on_page_status,
             auto_retry_failed_pages=params.get("auto_retry_failed_pages", True),
             max_auto_retries=params.get("max_auto_retries", 2),
+            scheduler=scheduler,
+            document_info=document_info,
+            **_journal_kwargs(journal),
         )
         
         result_bytes = pdf_processor.compose_pdf(
@@ -198,7 +318,8 @@ def process_single_file_pdf(
             font_name=(params.get("cjk_font_name") or "SimHei"),
             render_mode=params.get("render_mode", "markdown"),
             line_spacing=params["line_spacing"],
-            column_padding=column_padding_value
+            column_padding=column_padding_value,
+            document_info=document_info
         )
         
         result = {
@@ -232,6 +353,9 @@ def process_single_file_markdown(
     file_hash: str,
     on_progress: Optional[Callable[[int, int], None]] = None,
     on_page_status: Optional[Callable[[int, str, Optional[str]], None]] = None,
+    journal: Optional[Any] = None,
+    scheduler: Optional[Any] = None,
+    document_info: Optional[Any] = None,
 ) -> Dict[str, Any]:
     """
     Process a single file in Markdown mode.
@@ -245,6 +369,9 @@ def process_single_file_markdown(
         file_hash: File hash for cache
         on_progress: Progress callback
         on_page_status: Page status callback
+        journal: FileJournal used to checkpoint/resume page explanations (optional)
+        scheduler: Batch PageScheduler that dispatches this file's pages (optional)
+        document_info: DocumentInfo of src_bytes from the pre-flight analysis (optional)
         
     Returns:
         Processing result dictionary
@@ -309,6 +436,9 @@ def process_single_file_markdown(
             on_page_status=on_page_status,
             auto_retry_failed_pages=params.get("auto_retry_failed_pages", True),
             max_auto_retries=params.get("max_auto_retries", 2),
+            scheduler=scheduler,
+            document_info=document_info,
+            **_journal_kwargs(journal),
         )
         
         # Generate markdown
@@ -318,6 +448,7 @@ def process_single_file_markdown(
             screenshot_dpi=params["screenshot_dpi"],
             embed_images=params["embed_images"],
             title=params["markdown_title"],
+            document_info=document_info,
         )
         
         result = {
@@ -351,6 +482,10 @@ def process_single_file_html_screenshot(
     file_hash: str,
     on_progress: Optional[Callable[[int, int], None]] = None,
     on_page_status: Optional[Callable[[int, str, Optional[str]], None]] = None,
+    journal: Optional[Any] = None,
+    scheduler: Optional[Any] = None,
+    document_info: Optional[Any] = None,
+    result_dirs: Optional[ResultDirs] = None,
 ) -> Dict[str, Any]:
     """
     Process a single file in HTML screenshot mode.
@@ -364,6 +499,10 @@ def process_single_file_html_screenshot(
         file_hash: File hash for cache
         on_progress: Progress callback
         on_page_status: Page status callback
+        journal: FileJournal used to checkpoint/resume page explanations (optional)
+        scheduler: Batch PageScheduler that dispatches this file's pages (optional)
+        document_info: DocumentInfo of src_bytes from the pre-flight analysis (optional)
+        result_dirs: Session ResultDirs owning the external asset directory (optional)
         
     Returns:
         Processing result dictionary
@@ -378,6 +517,7 @@ def process_single_file_html_screenshot(
             base_name = filename.rsplit('.', 1)[0] if '.' in filename else filename
             # Use user-configured title if provided, otherwise use filename
             title = params.get("markdown_title", "").strip() or base_name
+            asset_kwargs = _html_asset_kwargs(params, base_name, result_dirs)
             html_content = pdf_processor.generate_html_screenshot_document(
                 src_bytes=src_bytes,
                 explanations=cached_result["explanations"],
@@ -388,13 +528,17 @@ def process_single_file_html_screenshot(
                 line_spacing=params.get("line_spacing", 1.2),
                 column_count=params.get("html_column_count", 2),
                 column_gap=params.get("html_column_gap", 20),
-                show_column_rule=params.get("html_show_column_rule", True)
+                show_column_rule=params.get("html_show_column_rule", True),
+                document_info=document_info,
+                **asset_kwargs
             )
             return {
                 "status": "completed",
                 "html_content": html_content,
                 "explanations": cached_result["explanations"],
-                "failed_pages": cached_result["failed_pages"]
+                "failed_pages": cached_result["failed_pages"],
+                "assets_dir": asset_kwargs.get("assets_dir"),
+                "assets_url": asset_kwargs.get("assets_url"),
             }
         except Exception as e:
             logger.warning(f"缓存重新生成失败，尝试重新处理: {str(e)}")
@@ -424,6 +568,9 @@ def process_single_file_html_screenshot(
             on_page_status=on_page_status,
             auto_retry_failed_pages=params.get("auto_retry_failed_pages", True),
             max_auto_retries=params.get("max_auto_retries", 2),
+            scheduler=scheduler,
+            document_info=document_info,
+            **_journal_kwargs(journal),
         )
         
         if explanations:
@@ -432,6 +579,7 @@ def process_single_file_html_screenshot(
                 base_name = filename.rsplit('.', 1)[0] if '.' in filename else filename
                 # Use user-configured title if provided, otherwise use filename
                 title = params.get("markdown_title", "").strip() or base_name
+                asset_kwargs = _html_asset_kwargs(params, base_name, result_dirs)
                 html_content = pdf_processor.generate_html_screenshot_document(
                     src_bytes=src_bytes,
                     explanations=explanations,
@@ -442,7 +590,9 @@ def process_single_file_html_screenshot(
                     line_spacing=params.get("line_spacing", 1.2),
                     column_count=params.get("html_column_count", 2),
                     column_gap=params.get("html_column_gap", 20),
-                    show_column_rule=params.get("html_show_column_rule", True)
+                    show_column_rule=params.get("html_show_column_rule", True),
+                    document_info=document_info,
+                    **asset_kwargs
                 )
                 result = {
                     "status": "completed",
@@ -451,6 +601,9 @@ def process_single_file_html_screenshot(
                     "failed_pages": failed_pages
                 }
                 save_result_to_file(file_hash, result)
+                # Asset directories are temporary, keep them out of the cache file
+                result["assets_dir"] = asset_kwargs.get("assets_dir")
+                result["assets_url"] = asset_kwargs.get("assets_url")
                 return result
             except Exception as e:
                 return {
@@ -488,6 +641,10 @@ def process_single_file_html_pdf2htmlex(
     file_hash: str,
     on_progress: Optional[Callable[[int, int], None]] = None,
     on_page_status: Optional[Callable[[int, str, Optional[str]], None]] = None,
+    journal: Optional[Any] = None,
+    scheduler: Optional[Any] = None,
+    document_info: Optional[Any] = None,
+    result_dirs: Optional[ResultDirs] = None,
 ) -> Dict[str, Any]:
     """
     Process a single file in HTML pdf2htmlEX mode.
@@ -501,6 +658,10 @@ def process_single_file_html_pdf2htmlex(
         file_hash: File hash for cache
         on_progress: Progress callback
         on_page_status: Page status callback
+        journal: FileJournal used to checkpoint/resume page explanations (optional)
+        scheduler: Batch PageScheduler that dispatches this file's pages (optional)
+        document_info: DocumentInfo of src_bytes from the pre-flight analysis (optional)
+        result_dirs: Session ResultDirs owning the external asset directory (optional)
         
     Returns:
         Processing result dictionary
@@ -513,6 +674,7 @@ def process_single_file_html_pdf2htmlex(
         try:
             base_name = filename.rsplit('.', 1)[0] if '.' in filename else filename
             title = params.get("markdown_title", "").strip() or base_name
+            asset_kwargs = _html_asset_kwargs(params, base_name, result_dirs)
             html_content = pdf_processor.generate_html_pdf2htmlex_document(
                 src_bytes=src_bytes,
                 explanations=cached_result["explanations"],
@@ -522,13 +684,16 @@ def process_single_file_html_pdf2htmlex(
                 line_spacing=params.get("line_spacing", 1.2),
                 column_count=params.get("html_column_count", 2),
                 column_gap=params.get("html_column_gap", 20),
-                show_column_rule=params.get("html_show_column_rule", True)
+                show_column_rule=params.get("html_show_column_rule", True),
+                **asset_kwargs
             )
             return {
                 "status": "completed",
                 "html_content": html_content,
                 "explanations": cached_result["explanations"],
-                "failed_pages": cached_result["failed_pages"]
+                "failed_pages": cached_result["failed_pages"],
+                "assets_dir": asset_kwargs.get("assets_dir"),
+                "assets_url": asset_kwargs.get("assets_url"),
             }
         except Exception as e:
             logger.warning(f"缓存重新生成失败，尝试重新处理: {str(e)}")
@@ -556,6 +721,9 @@ def process_single_file_html_pdf2htmlex(
                 rpd_limit=params["rpd_limit"],
                 auto_retry_failed_pages=params.get("auto_retry_failed_pages", True),
                 max_auto_retries=params.get("max_auto_retries", 2),
+                scheduler=scheduler,
+                document_info=document_info,
+                **_journal_kwargs(journal),
                 on_progress=on_progress,
                 use_context=params.get("use_context", False),
                 context_prompt=params.get("context_prompt", None),
@@ -651,6 +819,14 @@ def process_single_file_html_pdf2htmlex(
                 
                 total_pages = len(page_htmls)
                 
+                # Split-page mode: fonts, images and pages become files in assets_dir
+                asset_kwargs = _html_asset_kwargs(params, base_name, result_dirs)
+                if asset_kwargs:
+                    from app.services.pdf2htmlex_assets import split_pdf2htmlex_output
+                    css_content, page_htmls = split_pdf2htmlex_output(
+                        css_content, page_htmls, asset_kwargs["assets_dir"], asset_kwargs["assets_url"]
+                    )
+                
                 # Generate HTML document
                 from app.services.html_pdf2htmlex_generator import HTMLPdf2htmlEXGenerator
                 html_content = HTMLPdf2htmlEXGenerator.generate_html_pdf2htmlex_view(
@@ -674,6 +850,9 @@ def process_single_file_html_pdf2htmlex(
                     "failed_pages": failed_pages
                 }
                 save_result_to_file(file_hash, result)
+                # Asset directories are temporary, keep them out of the cache file
+                result["assets_dir"] = asset_kwargs.get("assets_dir")
+                result["assets_url"] = asset_kwargs.get("assets_url")
                 return result
             except Exception as e:
                 return {
@@ -765,6 +944,10 @@ def process_single_file_with_progress(
     cached_result: Optional[Dict[str, Any]],
     on_progress: Optional[Callable[[int, int], None]] = None,
     on_page_status: Optional[Callable[[int, str, Optional[str]], None]] = None,
+    journal: Optional[Any] = None,
+    scheduler: Optional[Any] = None,
+    document_info: Optional[Any] = None,
+    result_dirs: Optional[ResultDirs] = None,
 ) -> Dict[str, Any]:
     """
     Process a single uploaded file with progress callbacks.
@@ -777,13 +960,17 @@ def process_single_file_with_progress(
         cached_result: Cached result if available
         on_progress: Progress callback (done, total)
         on_page_status: Page status callback (page_index, status, error)
+        journal: FileJournal used to checkpoint/resume page explanations (optional)
+        scheduler: Batch PageScheduler that dispatches this file's pages (optional)
+        document_info: DocumentInfo of src_bytes from the pre-flight analysis (optional)
+        result_dirs: Session ResultDirs owning the external asset directory (optional)
         
     Returns:
         Processing result dictionary
     """
     try:
         # Validate PDF file
-        is_valid, validation_error = pdf_processor.validate_pdf_file(src_bytes)
+        is_valid, validation_error = pdf_processor.validate_pdf_file(src_bytes, document_info)
         if not is_valid:
             return {
                 "status": "failed",
@@ -792,28 +979,37 @@ def process_single_file_with_progress(
                 "failed_pages": [],
                 "error": f"PDF文件验证失败: {validation_error}"
             }
+        # Analyzed once per content hash, then shared by every stage below
+        if document_info is None:
+            document_info = pdf_processor.get_document_info(src_bytes)
         
         # Process based on output mode
         output_mode = params.get("output_mode", "PDF讲解版")
         if output_mode == "Markdown截图讲解":
             return process_single_file_markdown(
                 None, filename, src_bytes, params, cached_result, file_hash,
-                on_progress=on_progress, on_page_status=on_page_status
+                on_progress=on_progress, on_page_status=on_page_status,
+                journal=journal, scheduler=scheduler, document_info=document_info
             )
         elif output_mode == "HTML截图版":
             return process_single_file_html_screenshot(
                 None, filename, src_bytes, params, cached_result, file_hash,
-                on_progress=on_progress, on_page_status=on_page_status
+                on_progress=on_progress, on_page_status=on_page_status,
+                journal=journal, scheduler=scheduler, document_info=document_info,
+                result_dirs=result_dirs
             )
         elif output_mode == "HTML-pdf2htmlEX版":
             return process_single_file_html_pdf2htmlex(
                 None, filename, src_bytes, params, cached_result, file_hash,
-                on_progress=on_progress, on_page_status=on_page_status
+                on_progress=on_progress, on_page_status=on_page_status,
+                journal=journal, scheduler=scheduler, document_info=document_info,
+                result_dirs=result_dirs
             )
         else:
             return process_single_file_pdf(
                 None, filename, src_bytes, params, cached_result, file_hash,
-                on_progress=on_progress, on_page_status=on_page_status
+                on_progress=on_progress, on_page_status=on_page_status,
+                journal=journal, scheduler=scheduler, document_info=document_info
             )
             
     except Exception as e:
@@ -844,145 +1040,171 @@ def display_file_result(filename: str, result: Dict[str, Any]):
         st.error(f"❌ {filename} 处理失败: {result.get('error', '未知错误')}")
 
 
-def build_zip_cache_pdf(batch_results: Dict[str, Dict[str, Any]]) -> Optional[bytes]:
-    """Build ZIP file containing PDFs and JSONs from batch results."""
-    import zipfile
-    import io
-    import json
+def run_batch_via_queue(
+    queue: Any,
+    uploaded_files: List[Any],
+    params: Dict[str, Any],
+    progress_tracker: Any,
+    on_result: Callable[[str, Dict[str, Any]], None],
+    submitted_by: Optional[str] = None,
+    poll_interval: float = constants.QUEUE_POLL_SECONDS,
+    worker_timeout: float = constants.QUEUE_WORKER_TIMEOUT_SECONDS,
+    stall_timeout: float = constants.QUEUE_STALL_TIMEOUT_SECONDS,
+) -> None:
+    """
+    Submit uploads to the job queue and wait for the worker processes.
+
+    Stops waiting, and reports the unfinished files as failed, when no
+    worker has sent a heartbeat for ``worker_timeout`` seconds or the jobs
+    made no progress for ``stall_timeout`` seconds.
+
+    Args:
+        queue: JobQueue shared with the workers
+        uploaded_files: Uploaded PDF files
+        params: Processing parameters (credentials are not stored in the queue)
+        progress_tracker: DetailedProgressTracker fed from the polled job status
+        on_result: Called with (filename, result) as each job finishes
+        submitted_by: Session identifier recorded on the jobs
+        poll_interval: Seconds between status polls
+        worker_timeout: Seconds without any worker heartbeat before giving up
+        stall_timeout: Seconds without job progress before giving up
+    """
+    from app.services.job_queue import load_job_result
+
+    pending: Dict[str, str] = {}
+    for uploaded_file in uploaded_files:
+        uploaded_file.seek(0)
+        job_id = queue.submit(uploaded_file.read(), uploaded_file.name, params, submitted_by=submitted_by)
+        pending[job_id] = uploaded_file.name
+    progress_tracker.force_render()
+
+    started = set()
+    states: Dict[str, Any] = {}
+    last_progress = time.monotonic()
+    while pending:
+        for job_id, filename in list(pending.items()):
+            job = queue.get(job_id)
+            if job is None or job["status"] == "cancelled":
+                del pending[job_id]
+                on_result(filename, {"status": "failed", "error": "任务已取消"})
+                continue
+            state = (job["status"], job["progress_done"])
+            if states.get(job_id) != state:
+                states[job_id] = state
+                last_progress = time.monotonic()
+            if job["status"] == "running":
+                if job_id not in started:
+                    started.add(job_id)
+                    progress_tracker.start_file(filename)
+                if job["progress_total"]:
+                    progress_tracker.update_file_stage(filename, 1)  # Stage 1: Generating
+                    progress_tracker.update_file_page_progress(filename, job["progress_done"], job["progress_total"])
+            elif job["status"] in ("completed", "failed"):
+                del pending[job_id]
+                on_result(filename, load_job_result(job))
+        progress_tracker.render()
+        if not pending:
+            break
+        if not queue.live_workers(within=worker_timeout):
+            error = f"没有运行中的队列 worker（{int(worker_timeout)} 秒内无心跳），请启动 worker 后重试"
+        elif time.monotonic() - last_progress > stall_timeout:
+            error = f"任务 {int(stall_timeout)} 秒内没有进展，已停止等待"
+        else:
+            time.sleep(poll_interval)
+            continue
+        for job_id, filename in pending.items():
+            # Queued jobs are withdrawn; a running job keeps its lease and may still finish
+            queue.cancel(job_id)
+            on_result(filename, {"status": "failed", "error": error})
+        return
+
+
+def start_zip_cache() -> "StreamingZipWriter":
+    """Open the download ZIP of a batch; results are added as they complete."""
+    from app.services.zip_stream import StreamingZipWriter
+    return StreamingZipWriter()
+
+
+def add_result_to_zip(
+    zip_file: Any,
+    filename: str,
+    result: Dict[str, Any],
+    output_mode: str,
+    include_json: bool = True,
+) -> None:
+    """
+    Add the outputs of one completed file to a download ZIP.
+
+    Args:
+        zip_file: StreamingZipWriter (or anything with its add_*/write methods)
+        filename: Uploaded PDF name
+        result: Processing result dictionary
+        output_mode: Output mode the result was produced in
+        include_json: Also add the explanations as ``<name>.json``
+    """
+    if result.get("status") != "completed":
+        return
+    base_name = filename.rsplit('.', 1)[0] if '.' in filename else filename
     
-    zip_buffer = io.BytesIO()
+    if output_mode == "Markdown截图讲解":
+        if result.get("markdown_content"):
+            zip_file.add_text(f"{base_name}讲解文档.md", result["markdown_content"])
+        images_dir = result.get("images_dir")
+        if images_dir and os.path.isdir(images_dir):
+            for img_file in sorted(os.listdir(images_dir)):
+                img_path = os.path.join(images_dir, img_file)
+                if os.path.isfile(img_path):
+                    zip_file.write(img_path, f"{base_name}_images/{img_file}")
+    elif output_mode in ("HTML截图版", "HTML-pdf2htmlEX版"):
+        if result.get("html_content"):
+            zip_file.add_text(f"{base_name}讲解文档.html", result["html_content"])
+        # External page images / split pdf2htmlEX pages
+        if result.get("assets_dir"):
+            add_html_assets_to_zip(zip_file, result["assets_dir"], result.get("assets_url") or f"{base_name}_assets")
+    elif result.get("pdf_bytes"):
+        zip_file.add_bytes(f"{base_name}讲解版.pdf", result["pdf_bytes"])
     
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+    if include_json and result.get("explanations"):
+        zip_file.add_json(f"{base_name}.json", result["explanations"])
+
+
+def _build_zip_cache(batch_results: Dict[str, Dict[str, Any]], output_mode: str) -> Optional["ZipDownload"]:
+    zip_writer = start_zip_cache()
+    try:
         for filename, result in batch_results.items():
-            if result.get("status") == "completed":
-                base_name = filename.rsplit('.', 1)[0] if '.' in filename else filename
-                
-                # Add PDF
-                if result.get("pdf_bytes"):
-                    zip_file.writestr(
-                        f"{base_name}讲解版.pdf",
-                        result["pdf_bytes"]
-                    )
-                
-                # Add JSON
-                if result.get("explanations"):
-                    json_bytes = json.dumps(
-                        result["explanations"],
-                        ensure_ascii=False,
-                        indent=2
-                    ).encode("utf-8")
-                    zip_file.writestr(
-                        f"{base_name}.json",
-                        json_bytes
-                    )
-    
-    zip_buffer.seek(0)
-    return zip_buffer.read() if zip_buffer.getvalue() else None
+            add_result_to_zip(zip_writer, filename, result, output_mode)
+    except Exception:
+        zip_writer.abort()
+        raise
+    return zip_writer.finish()
+
+
+def build_zip_cache_pdf(batch_results: Dict[str, Dict[str, Any]]) -> Optional["ZipDownload"]:
+    """Build ZIP file containing PDFs and JSONs from batch results."""
+    return _build_zip_cache(batch_results, "PDF讲解版")
 
 
-def build_zip_cache_markdown(batch_results: Dict[str, Dict[str, Any]]) -> Optional[bytes]:
+def build_zip_cache_markdown(batch_results: Dict[str, Dict[str, Any]]) -> Optional["ZipDownload"]:
     """Build ZIP file containing Markdown files and JSONs from batch results."""
-    import zipfile
-    import io
-    import json
-    
-    zip_buffer = io.BytesIO()
-    
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        for filename, result in batch_results.items():
-            if result.get("status") == "completed":
-                base_name = filename.rsplit('.', 1)[0] if '.' in filename else filename
-                
-                # Add Markdown
-                if result.get("markdown_content"):
-                    zip_file.writestr(
-                        f"{base_name}讲解文档.md",
-                        result["markdown_content"].encode("utf-8")
-                    )
-                
-                # Add JSON
-                if result.get("explanations"):
-                    json_bytes = json.dumps(
-                        result["explanations"],
-                        ensure_ascii=False,
-                        indent=2
-                    ).encode("utf-8")
-                    zip_file.writestr(
-                        f"{base_name}.json",
-                        json_bytes
-                    )
-    
-    zip_buffer.seek(0)
-    return zip_buffer.read() if zip_buffer.getvalue() else None
+    return _build_zip_cache(batch_results, "Markdown截图讲解")
 
 
-def build_zip_cache_html_screenshot(batch_results: Dict[str, Dict[str, Any]]) -> Optional[bytes]:
+def build_zip_cache_html_screenshot(batch_results: Dict[str, Dict[str, Any]]) -> Optional["ZipDownload"]:
     """Build ZIP file containing HTML screenshot files and JSONs from batch results."""
-    import zipfile
-    import io
-    import json
-    
-    zip_buffer = io.BytesIO()
-    
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        for filename, result in batch_results.items():
-            if result.get("status") == "completed":
-                base_name = filename.rsplit('.', 1)[0] if '.' in filename else filename
-                
-                # Add HTML
-                if result.get("html_content"):
-                    zip_file.writestr(
-                        f"{base_name}讲解文档.html",
-                        result["html_content"].encode("utf-8")
-                    )
-                
-                # Add JSON
-                if result.get("explanations"):
-                    json_bytes = json.dumps(
-                        result["explanations"],
-                        ensure_ascii=False,
-                        indent=2
-                    ).encode("utf-8")
-                    zip_file.writestr(
-                        f"{base_name}.json",
-                        json_bytes
-                    )
-    
-    zip_buffer.seek(0)
-    return zip_buffer.read() if zip_buffer.getvalue() else None
+    return _build_zip_cache(batch_results, "HTML截图版")
 
 
-def build_zip_cache_html_pdf2htmlex(batch_results: Dict[str, Dict[str, Any]]) -> Optional[bytes]:
+def build_zip_cache_html_pdf2htmlex(batch_results: Dict[str, Dict[str, Any]]) -> Optional["ZipDownload"]:
     """Build ZIP file containing HTML pdf2htmlEX files and JSONs from batch results."""
+    return _build_zip_cache(batch_results, "HTML-pdf2htmlEX版")
+
+
+def add_html_assets_to_zip(zip_file: Any, assets_dir: str, assets_url: str) -> None:
+    """Store the external files of an HTML document under assets_url/."""
     import zipfile
-    import io
-    import json
-    
-    zip_buffer = io.BytesIO()
-    
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        for filename, result in batch_results.items():
-            if result.get("status") == "completed":
-                base_name = filename.rsplit('.', 1)[0] if '.' in filename else filename
-                
-                # Add HTML
-                if result.get("html_content"):
-                    zip_file.writestr(
-                        f"{base_name}讲解文档.html",
-                        result["html_content"].encode("utf-8")
-                    )
-                
-                # Add JSON
-                if result.get("explanations"):
-                    json_bytes = json.dumps(
-                        result["explanations"],
-                        ensure_ascii=False,
-                        indent=2
-                    ).encode("utf-8")
-                    zip_file.writestr(
-                        f"{base_name}.json",
-                        json_bytes
-                    )
+    from app.services.html_assets import iter_asset_files
     
-    zip_buffer.seek(0)
-    return zip_buffer.read() if zip_buffer.getvalue() else None
+    for name, path in iter_asset_files(assets_dir):
+        # Images and WOFF fonts are already compressed, store them as-is
+        compress_type = zipfile.ZIP_DEFLATED if name.endswith((".js", ".ttf", ".otf", ".svg")) else zipfile.ZIP_STORED
+        zip_file.write(path, f"{assets_url}/{name}", compress_type=compress_type)
@@ -31,6 +31,15 @@ fi
 # 设置工作目录
 cd /app
 
+# 镜像中缺少 MathJax/Prism 时（构建前未下载）尝试补齐，失败则渲染回退到 CDN
+if python -c "import sys; from app.services.vendor_assets import missing_assets; sys.exit(1 if missing_assets() else 0)" 2>/dev/null; then
+    echo "MathJax/Prism 已内置"
+elif python -m app.services.vendor_assets > /dev/null 2>&1; then
+    echo "MathJax/Prism 下载完成"
+else
+    echo "警告: MathJax/Prism 下载失败，公式和代码高亮将从 CDN 加载"
+fi
+
 # 如果提供了自定义启动参数，使用它们；否则使用默认参数
 if [ "$#" -eq 0 ]; then
     echo "启动 Streamlit 应用..."
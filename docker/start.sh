@@ -104,6 +104,14 @@ EOF
 build_image() {
     log_info "构建 Docker 镜像..."
     
+    # MathJax/Prism 不在仓库中（见 app/services/vendor_assets.py），构建前下载到构建上下文，随 app/ 一起打包进镜像
+    log_info "下载本地 MathJax/Prism..."
+    if python3 -m app.services.vendor_assets; then
+        log_success "MathJax/Prism 已就绪"
+    else
+        log_warning "MathJax/Prism 下载失败，容器启动时将重试，仍失败则渲染回退到 CDN"
+    fi
+    
     docker-compose build --no-cache
     
     log_success "镜像构建完成"
@@ -0,0 +1,113 @@
+"""
+Benchmark: per-file event loops vs. the batch PageScheduler.
+
+Processes a mixed-size batch against a fake LLM with fixed latency and
+reports time-to-first-finished-file, mean file completion time and
+makespan for each dispatch strategy. The "threads" baseline is the
+per-file path: one event loop per file. Every strategy is capped by
+GlobalConcurrencyController, as in the app.
+
+    python scripts/bench_batch_scheduler.py --latency 0.05 --global-cap 16
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import fitz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import pdf_processor  # noqa: E402
+from app.services.batch_scheduler import PageScheduler  # noqa: E402
+from app.services.concurrency_controller import GlobalConcurrencyController  # noqa: E402
+
+DEFAULT_SIZES = [80, 60, 40, 12, 8, 5, 4, 3, 2, 1]
+
+
+class FakeLLM:
+    """Sleeps for a fixed latency per page and tracks peak in-flight requests."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak = 0
+
+    async def explain_pages_with_context(self, images, system_prompt=None, context_prompt=None):
+        with self.lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+        return "explanation"
+
+
+def make_pdf(pages: int) -> bytes:
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page(width=200, height=150).insert_text((20, 40), f"page {i + 1}")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def run_batch(pdfs, strategy: str, global_cap: int, page_concurrency: int, workers: int, llm: FakeLLM):
+    # Every strategy goes through the process-wide controller, as in the app
+    GlobalConcurrencyController.install(GlobalConcurrencyController(global_cap))
+    scheduler = None if strategy == "threads" else PageScheduler(global_cap, policy=strategy).start()
+
+    started = time.perf_counter()
+    finish_times = []
+
+    def run_one(src_bytes: bytes) -> None:
+        pdf_processor.generate_explanations(
+            src_bytes=src_bytes, api_key="x", model_name="fake", user_prompt="p",
+            temperature=0.2, max_tokens=64, dpi=36, concurrency=page_concurrency,
+            rpm_limit=10_000, tpm_budget=10_000_000, rpd_limit=100_000,
+            auto_retry_failed_pages=False, scheduler=scheduler,
+        )
+        finish_times.append(time.perf_counter() - started)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(run_one, pdfs))
+    finally:
+        if scheduler is not None:
+            scheduler.close()
+        GlobalConcurrencyController.install(None)
+    return sorted(finish_times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="pages per file")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake LLM latency per page (s)")
+    parser.add_argument("--global-cap", type=int, default=16, help="pages in flight across the batch")
+    parser.add_argument("--page-concurrency", type=int, default=8, help="pages in flight per file")
+    parser.add_argument("--workers", type=int, default=max(4, os.cpu_count() or 1),
+                        help="files processed at once (default: CPU count, at least 4, as in run_batch)")
+    args = parser.parse_args()
+
+    pdfs = [make_pdf(n) for n in args.sizes]
+    print(f"files={len(pdfs)} pages={sum(args.sizes)} latency={args.latency}s "
+          f"global_cap={args.global_cap} page_concurrency={args.page_concurrency} workers={args.workers}")
+    print(f"{'strategy':<12} {'first file':>11} {'mean file':>10} {'makespan':>9} {'peak':>5}")
+    for strategy in ("threads", "round_robin", "srf"):
+        llm = FakeLLM(args.latency)
+        pdf_processor._create_llm_client = lambda **kwargs: llm
+        times = run_batch(pdfs, strategy, args.global_cap, args.page_concurrency, args.workers, llm)
+        print(f"{strategy:<12} {times[0]:>10.2f}s {statistics.mean(times):>9.2f}s "
+              f"{times[-1]:>8.2f}s {llm.peak:>5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark: HTML fragment rendering with a fresh Chromium per call vs. the
+shared Chromium pool.
+
+Renders the same set of explanation-sized fragments four ways:
+
+- new browser: HtmlRenderer.render_html_to_pdf_fragment_new_browser (one
+  Chromium launch per fragment, the previous behaviour)
+- pool, one by one: HtmlRenderer.render_html_to_pdf_fragment
+- pool, concurrent: HtmlRenderer.render_html_to_pdf_fragments (one page.pdf
+  per fragment, spread over the pool's pages)
+- pool, one document: HtmlRenderer.render_html_to_pdf_batch (fragments laid
+  out in one document, one page.pdf per batch, then split)
+
+MathJax/Prism are off by default so the numbers measure the browser, not
+the CDN. Requires Playwright with Chromium installed.
+
+    python scripts/bench_chromium_pool.py --fragments 40
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.chromium_pool import get_chromium_pool  # noqa: E402
+from app.services.html_renderer import HtmlRenderer  # noqa: E402
+
+
+def make_fragments(count: int, mathjax: bool):
+    return [
+        {
+            "html": f"<h2>第{i + 1}页讲解</h2>" + "<p>梯度下降沿负梯度方向更新参数。</p>" * 12
+            + "<pre><code>for step in range(100):\n    w -= lr * grad(w)</code></pre>",
+            "width_pt": 300,
+            "height_pt": 540,
+            "mathjax": mathjax,
+            "prism": mathjax,
+        }
+        for i in range(count)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fragments", type=int, default=40)
+    parser.add_argument("--mathjax", action="store_true", help="load MathJax and Prism in every fragment")
+    args = parser.parse_args()
+    fragments = make_fragments(args.fragments, args.mathjax)
+
+    start = time.perf_counter()
+    for fragment in fragments:
+        HtmlRenderer.render_html_to_pdf_fragment_new_browser(**fragment)
+    baseline = time.perf_counter() - start
+
+    # Warm the pool so its one-time launch is reported separately
+    start = time.perf_counter()
+    HtmlRenderer.render_html_to_pdf_fragment(**fragments[0])
+    launch = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for fragment in fragments:
+        HtmlRenderer.render_html_to_pdf_fragment(**fragment)
+    sequential = time.perf_counter() - start
+
+    start = time.perf_counter()
+    HtmlRenderer.render_html_to_pdf_fragments(fragments)
+    concurrent = time.perf_counter() - start
+
+    start = time.perf_counter()
+    HtmlRenderer.render_html_to_pdf_batch(fragments)
+    batch = time.perf_counter() - start
+
+    n = len(fragments)
+    print(f"fragments={n} mathjax={args.mathjax} pool pages={get_chromium_pool().pages}")
+    print(f"{'mode':<20} {'total':>8} {'per fragment':>13}")
+    print(f"{'new browser':<20} {baseline:>7.2f}s {baseline / n * 1000:>10.0f} ms")
+    print(f"{'pool launch (once)':<20} {launch:>7.2f}s")
+    print(f"{'pool, one by one':<20} {sequential:>7.2f}s {sequential / n * 1000:>10.0f} ms")
+    print(f"{'pool, concurrent':<20} {concurrent:>7.2f}s {concurrent / n * 1000:>10.0f} ms")
+    print(f"{'pool, one document':<20} {batch:>7.2f}s {batch / n * 1000:>10.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
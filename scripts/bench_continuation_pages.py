@@ -0,0 +1,92 @@
+"""
+Benchmark: composing pages whose explanations overflow onto continuation pages.
+
+Builds a source PDF with one text page per explanation and runs compose_pdf
+in text and markdown modes on explanations that need several continuation
+pages. Reports the compose time, the number of output pages, how much of
+each explanation's text can be found in the output again (word coverage) and
+the smallest font size used on the right side, so that lost or shrunk
+overflow text shows up next to the timing.
+
+Use --image-kb to give every source page an incompressible image, which
+shows what repeating the source page on continuation pages costs in output
+size and save time.
+
+    python scripts/bench_continuation_pages.py --pages 20 --paragraphs 60
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # noqa: E402
+
+from app.services.pdf_composer import compose_pdf  # noqa: E402
+
+
+def make_source_pdf(pages: int, image_kb: int = 0) -> bytes:
+    doc = fitz.open()
+    side = int((image_kb * 1024 / 3) ** 0.5)
+    for i in range(pages):
+        page = doc.new_page(width=595, height=842)
+        page.insert_text((72, 72), f"Slide {i + 1}", fontsize=24)
+        page.insert_textbox(fitz.Rect(72, 120, 523, 770), "Gradient descent lecture notes. " * 40, fontsize=11)
+        if side:
+            pixmap = fitz.Pixmap(fitz.csRGB, side, side, os.urandom(side * side * 3), 0)
+            page.insert_image(fitz.Rect(72, 420, 523, 770), pixmap=pixmap)
+    data = doc.tobytes(deflate=True)
+    doc.close()
+    return data
+
+
+def make_explanation(page: int, paragraphs: int) -> str:
+    return "\n\n".join(
+        f"Paragraph {page}-{j}: the step size w{page}x{j} controls how far each update moves "
+        f"the parameters along the negative gradient, and a schedule lowers it over time."
+        for j in range(paragraphs)
+    )
+
+
+def inspect_output(pdf_bytes: bytes, explanations, source_width: float):
+    """Return (output pages, word coverage, smallest explanation font size)."""
+    text, sizes = [], []
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        page_count = doc.page_count
+        for page in doc:
+            text.append(page.get_text())
+            for block in page.get_text("dict")["blocks"]:
+                for line in block.get("lines", []):
+                    sizes.extend(span["size"] for span in line["spans"]
+                                 if span["bbox"][0] > source_width and span["text"].strip())
+    words = set(re.findall(r"w\d+x\d+", "".join(text)))
+    expected = [w for expl in explanations.values() for w in re.findall(r"w\d+x\d+", expl)]
+    found = sum(1 for w in expected if w in words) / max(len(expected), 1)
+    return page_count, found, min(sizes) if sizes else 0.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--paragraphs", type=int, default=60, help="paragraphs per explanation")
+    parser.add_argument("--image-kb", type=int, default=0, help="random image per source page (KB)")
+    args = parser.parse_args()
+
+    src = make_source_pdf(args.pages, args.image_kb)
+    explanations = {i: make_explanation(i, args.paragraphs) for i in range(args.pages)}
+    print(f"pages={args.pages} explanation={len(explanations[0])} chars source={len(src) / 1024 / 1024:.1f} MB")
+    print(f"{'mode':<10} {'time':>8} {'output pages':>13} {'coverage':>9} {'min font':>9} {'size':>9}")
+    for mode in ("text", "markdown"):
+        start = time.perf_counter()
+        out = compose_pdf(src, explanations, 0.48, 11, render_mode=mode)
+        elapsed = time.perf_counter() - start
+        page_count, found, min_size = inspect_output(out, explanations, 595)
+        print(f"{mode:<10} {elapsed:>7.2f}s {page_count:>13} {found:>8.0%} {min_size:>7.1f}pt "
+              f"{len(out) / 1024 / 1024:>6.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark: BeautifulSoup vs. streaming pdf2htmlEX output parser.
+
+Generates a synthetic pdf2htmlEX-style HTML file (base CSS, embedded
+base64 fonts, one div.pf per page with positioned text lines and an
+embedded background image) and times both parsers, with peak Python
+memory measured by tracemalloc.
+
+    python scripts/bench_pdf2htmlex_parser.py --pages 400 --font-mb 20
+"""
+
+import argparse
+import base64
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.html_pdf2htmlex_generator import HTMLPdf2htmlEXGenerator  # noqa: E402
+
+
+def write_sample(path: str, pages: int, font_mb: float, image_kb: int) -> None:
+    rng = random.Random(0)
+    blob = lambda size: base64.b64encode(rng.randbytes(size)).decode("ascii")  # noqa: E731
+    fonts = max(1, int(font_mb))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<!DOCTYPE html>\n<html xmlns="http://www.w3.org/1999/xhtml"><head><meta charset="utf-8"/>\n')
+        f.write('<style type="text/css">#page-container{position:absolute;top:0;left:0}.pf{position:relative}'
+                '.t{position:absolute;white-space:pre}</style>\n')
+        f.write('<style type="text/css">\n')
+        for i in range(fonts):
+            f.write(f"@font-face{{font-family:ff{i:x};src:url('data:application/font-woff;base64,"
+                    f"{blob(int(font_mb * 1024 * 1024 / fonts * 3 / 4))}')format(\"woff\");}}"
+                    f".ff{i:x}{{font-family:ff{i:x};line-height:0.9;}}\n")
+        f.write("</style>\n<script>try{pdf2htmlEX.defaultViewer = new pdf2htmlEX.Viewer({});}catch(e){}</script>\n")
+        f.write('</head><body>\n<div id="sidebar"><div id="outline"></div></div>\n<div id="page-container">\n')
+        image = blob(image_kb * 1024)
+        for n in range(1, pages + 1):
+            lines = "".join(
+                f'<div class="t m0 x{j % 9:x} h2 y{j:x} ff{j % fonts:x} fs0 fc0 sc0 ls0 ws0">'
+                f'第{n}页 第{j}行 gradient descent<span class="_ _0"></span>step</div>'
+                for j in range(40)
+            )
+            f.write(f'<div id="pf{n:x}" class="pf w0 h0" data-page-no="{n:x}"><div class="pc pc{n:x} w0 h0">'
+                    f'<img class="bi x0 y0 w1 h1" alt="" src="data:image/png;base64,{image}"/>{lines}</div>'
+                    f'<div class="pi" data-data=\'{{"ctm":[1.5,0,0,1.5,0,0]}}\'></div></div>\n')
+        f.write('</div>\n<div class="loading-indicator"></div>\n</body></html>\n')
+
+
+def measure(fn, path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    css, pages, error = fn(path)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert not error, error
+    return elapsed, peak, css, pages
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--font-mb", type=float, default=20, help="embedded font data (MB)")
+    parser.add_argument("--image-kb", type=int, default=30, help="background image per page (KB)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "output.html")
+        write_sample(path, args.pages, args.font_mb, args.image_kb)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        print(f"pages={args.pages} file={size_mb:.1f} MB")
+        print(f"{'parser':<14} {'time':>8} {'peak mem':>10}")
+        results = {}
+        for name, fn in (("beautifulsoup", HTMLPdf2htmlEXGenerator._parse_pdf2htmlex_html_soup),
+                         ("streaming", HTMLPdf2htmlEXGenerator.parse_pdf2htmlex_html)):
+            elapsed, peak, css, pages = measure(fn, path)
+            results[name] = (css, pages)
+            print(f"{name:<14} {elapsed:>7.2f}s {peak / 1024 / 1024:>8.1f} MB")
+        assert len(results["streaming"][1]) == len(results["beautifulsoup"][1]) == args.pages
+        assert results["streaming"][0] == results["beautifulsoup"][0]
+
+
+if __name__ == "__main__":
+    main()
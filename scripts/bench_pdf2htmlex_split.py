@@ -0,0 +1,102 @@
+"""
+Benchmark: single-file vs. split-page HTML-pdf2htmlEX output.
+
+Builds the viewer for a synthetic pdf2htmlEX conversion (same sample as
+bench_pdf2htmlex_parser.py) both ways and reports what the browser has to
+download and turn into DOM nodes before the first page is shown:
+
+- single file: the whole HTML (every page, font and image inline)
+- split pages: the HTML plus the fragments of the first screen (the viewer
+  preloads about three pages); font files are fetched on first use and
+  listed separately
+
+DOM size is counted with html.parser as a stand-in for the browser's
+parse/layout cost and memory.
+
+    python scripts/bench_pdf2htmlex_split.py --pages 400 --font-mb 20
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from html.parser import HTMLParser
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+
+from bench_pdf2htmlex_parser import write_sample  # noqa: E402
+from app.services.html_pdf2htmlex_generator import HTMLPdf2htmlEXGenerator  # noqa: E402
+from app.services.pdf2htmlex_assets import split_pdf2htmlex_output  # noqa: E402
+
+FIRST_SCREEN_PAGES = 3
+
+
+class _ElementCounter(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.elements = 0
+
+    def handle_starttag(self, tag, attrs):
+        self.elements += 1
+
+
+def dom_elements(html: str) -> int:
+    counter = _ElementCounter()
+    counter.feed(html)
+    counter.close()
+    return counter.elements
+
+
+def build(css, pages, pages_count):
+    explanations = {n: f"第{n}页讲解" for n in range(1, pages_count + 1)}
+    return HTMLPdf2htmlEXGenerator.generate_html_pdf2htmlex_view(pages, css, explanations, pages_count)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--font-mb", type=float, default=20, help="embedded font data (MB)")
+    parser.add_argument("--image-kb", type=int, default=30, help="background image per page (KB)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "output.html")
+        write_sample(path, args.pages, args.font_mb, args.image_kb)
+        css, pages, error = HTMLPdf2htmlEXGenerator.parse_pdf2htmlex_html(path)
+        assert not error, error
+
+        start = time.perf_counter()
+        single = build(css, pages, len(pages))
+        single_time = time.perf_counter() - start
+
+        assets_dir = os.path.join(tmp, "deck_assets")
+        start = time.perf_counter()
+        split_css, entries = split_pdf2htmlex_output(css, pages, assets_dir, "deck_assets")
+        split = build(split_css, entries, len(entries))
+        split_time = time.perf_counter() - start
+
+        fragments = [os.path.join(assets_dir, f"page-{n:04d}.js") for n in range(1, FIRST_SCREEN_PAGES + 1)]
+        first_screen_bytes = len(split.encode("utf-8")) + sum(os.path.getsize(p) for p in fragments)
+        first_screen_dom = dom_elements(split)
+        for fragment in fragments:
+            with open(fragment, encoding="utf-8") as f:
+                first_screen_dom += dom_elements(f.read())
+        assets_bytes = sum(os.path.getsize(os.path.join(assets_dir, n)) for n in os.listdir(assets_dir))
+        font_bytes = sum(os.path.getsize(os.path.join(assets_dir, n)) for n in os.listdir(assets_dir)
+                         if n.startswith("font-"))
+
+        mb = 1024 * 1024
+        print(f"pages={args.pages} fonts={args.font_mb:g} MB images={args.image_kb} KB/page")
+        print(f"{'output':<14} {'build':>7} {'first screen':>13} {'DOM elements':>13} {'total on disk':>14}")
+        print(f"{'single file':<14} {single_time:>6.2f}s {len(single.encode('utf-8')) / mb:>10.1f} MB "
+              f"{dom_elements(single):>13} {len(single.encode('utf-8')) / mb:>11.1f} MB")
+        print(f"{'split pages':<14} {split_time:>6.2f}s {first_screen_bytes / mb:>10.1f} MB "
+              f"{first_screen_dom:>13} {(len(split.encode('utf-8')) + assets_bytes) / mb:>11.1f} MB")
+        print(f"split font files (fetched when first used): {font_bytes / mb:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
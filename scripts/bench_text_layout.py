@@ -0,0 +1,56 @@
+"""
+Benchmark: line breaking of long explanations (text_layout.wrap_text_lines).
+
+Wraps an English and a CJK explanation at several font sizes, as the text
+mode compose path does when the same explanation is laid out again (other
+font size, regenerated document). The first size is timed separately since
+it is the only one that has to measure the text.
+
+    python scripts/bench_text_layout.py --chars 20000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # noqa: E402
+
+from app.services.text_layout import wrap_text_lines  # noqa: E402
+
+FONT_SIZES = [11, 10, 12, 9, 14, 11]
+COLUMN_WIDTH = 330
+
+
+def make_texts(chars: int):
+    english = "The step size controls how far each update moves the parameters along the negative gradient. "
+    cjk = "梯度下降沿负梯度方向更新参数，学习率决定每一步的大小。"
+    return {
+        "english": "\n\n".join([english * 6] * (chars // (len(english) * 6) + 1))[:chars],
+        "cjk": "\n".join([cjk * 8] * (chars // (len(cjk) * 8) + 1))[:chars],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chars", type=int, default=20000)
+    args = parser.parse_args()
+
+    font = fitz.Font("helv")
+    print(f"chars={args.chars} width={COLUMN_WIDTH}pt sizes={FONT_SIZES}")
+    print(f"{'text':<8} {'first size':>11} {'other sizes (each)':>19} {'lines':>6}")
+    for name, text in make_texts(args.chars).items():
+        start = time.perf_counter()
+        lines = wrap_text_lines(text, font, FONT_SIZES[0], COLUMN_WIDTH)
+        first = time.perf_counter() - start
+        start = time.perf_counter()
+        for size in FONT_SIZES[1:]:
+            wrap_text_lines(text, font, size, COLUMN_WIDTH)
+        others = (time.perf_counter() - start) / (len(FONT_SIZES) - 1)
+        print(f"{name:<8} {first * 1000:>8.1f} ms {others * 1000:>16.1f} ms {len(lines):>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -107,6 +107,11 @@ if [ $? -ne 0 ]; then
 fi
 success "依赖安装完成"
 
+# Vendor MathJax/Prism for offline HTML fragment rendering
+echo ""
+info "下载本地 MathJax/Prism（离线渲染公式和代码高亮）..."
+(cd "$PROJECT_ROOT" && python -m app.services.vendor_assets) || warning "下载失败，渲染时将回退到 CDN"
+
 # Create .env.example if not exists
 echo ""
 info "检查环境变量配置..."
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import os
+import time
+
+import fitz
+import pytest
+
+from app.services import batch_processor
+from app.services.batch_processor import (
+    batch_recompose_from_json,
+    batch_recompose_from_json_async,
+    iter_recompose_from_json,
+)
+
+
+def _pdf(pages):
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page(width=595, height=842).insert_text((72, 72), f"Slide {i + 1}")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def _compose_or_crash(pdf_filename, pdf_bytes, json_filename, json_bytes, options):
+    # Runs in a spawned worker: deck1 kills its process, the others stay in flight meanwhile
+    if pdf_filename == "deck1.pdf":
+        os._exit(1)
+    time.sleep(0.5)
+    return batch_processor._recompose_one(pdf_filename, pdf_bytes, json_filename, json_bytes, options)
+
+
+def _inputs():
+    pdf_files = [(f"deck{i}.pdf", _pdf(i + 1)) for i in range(4)] + [("orphan.pdf", _pdf(1))]
+    json_files = [
+        (f"deck{i}.json", json.dumps({str(p): f"Note {i}-{p}" for p in range(i + 1)}).encode())
+        for i in range(3)
+    ] + [("deck3.json", b"{not json")]
+    return pdf_files, json_files
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_recompose_reports_every_file_in_input_order(workers):
+    pdf_files, json_files = _inputs()
+    seen = []
+
+    results = batch_recompose_from_json(pdf_files, json_files, 0.48, 11, workers=workers,
+                                        on_result=lambda name, result: seen.append(name))
+
+    assert list(results) == [name for name, _ in pdf_files]
+    assert sorted(seen) == sorted(results)
+    assert [results[f"deck{i}.pdf"]["status"] for i in range(4)] == ["completed"] * 3 + ["failed"]
+    assert "JSON解析失败" in results["deck3.pdf"]["error"]
+    assert results["orphan.pdf"]["error"] == "未找到匹配的JSON文件"
+    with fitz.open(stream=results["deck2.pdf"]["pdf_bytes"], filetype="pdf") as doc:
+        assert doc.page_count == 3
+        assert "Note 2-1" in doc[1].get_text()
+
+
+def test_async_recompose_matches_sync():
+    pdf_files, json_files = _inputs()
+
+    results = asyncio.run(batch_recompose_from_json_async(pdf_files, json_files, 0.48, 11, workers=2))
+
+    assert {name: r["status"] for name, r in results.items()} == {
+        name: r["status"] for name, r in batch_recompose_from_json(pdf_files, json_files, 0.48, 11, workers=1).items()
+    }
+
+
+def test_memory_budget_limits_jobs_in_flight(monkeypatch):
+    pdf_files, json_files = _inputs()
+    peaks = []
+    admit = batch_processor._RecomposeJobs.admit
+
+    def tracking_admit(self, limit):
+        admitted = admit(self, limit)
+        peaks.append(self.running)
+        return admitted
+
+    monkeypatch.setattr(batch_processor._RecomposeJobs, "admit", tracking_admit)
+
+    # A zero budget still lets one job run at a time
+    results = dict(iter_recompose_from_json(pdf_files, json_files, 0.48, 11, workers=3, memory_budget_mb=0))
+
+    assert max(peaks) == 1
+    assert sum(r["status"] == "completed" for r in results.values()) == 3
+
+
+def test_recompose_workers_are_spawned_not_forked():
+    pool = batch_processor._process_pool(2)
+    try:
+        assert pool._mp_context.get_start_method() == "spawn"
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.parametrize("run_async", [False, True])
+def test_a_crashing_worker_only_fails_its_own_file(monkeypatch, run_async):
+    pdf_files, json_files = _inputs()
+    monkeypatch.setattr(batch_processor, "_recompose_one", _compose_or_crash)
+
+    if run_async:
+        results = asyncio.run(batch_recompose_from_json_async(pdf_files, json_files, 0.48, 11, workers=3))
+    else:
+        results = batch_recompose_from_json(pdf_files, json_files, 0.48, 11, workers=3)
+
+    assert list(results) == [name for name, _ in pdf_files]
+    assert {name: r["status"] for name, r in results.items()} == {
+        "deck0.pdf": "completed", "deck1.pdf": "failed", "deck2.pdf": "completed",
+        "deck3.pdf": "failed", "orphan.pdf": "failed",
+    }
+    assert results["deck1.pdf"]["error"] == "PDF合成失败: 合成进程意外退出"
+    assert "JSON解析失败" in results["deck3.pdf"]["error"]
@@ -0,0 +1,81 @@
+import io
+import json
+import threading
+import zipfile
+
+import fitz
+import pytest
+
+from app.services.batch_regeneration_service import BatchRegenerationService
+
+
+def _pdf(pages):
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page(width=200, height=100).insert_text((20, 50), f"Slide {i + 1}")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def _pairs():
+    return [
+        (_pdf(i + 2), json.dumps({str(p): f"Note {i}-{p}" for p in range(i + 2)}).encode(), f"deck{i}.pdf")
+        for i in range(3)
+    ] + [(_pdf(1), b"{broken", "bad.pdf")]
+
+
+def _tracking_callbacks():
+    lock = threading.Lock()
+    events = {}
+
+    def callbacks(pdf_name):
+        def on_progress(done, total):
+            with lock:
+                events.setdefault(pdf_name, []).append((done, total))
+
+        return on_progress, lambda page_index, status, error: None
+
+    return callbacks, events
+
+
+@pytest.mark.parametrize("output_mode", ["分页HTML版", "Markdown截图讲解", "PDF讲解版"])
+def test_regenerates_every_file_in_input_order(output_mode):
+    callbacks, events = _tracking_callbacks()
+    done = []
+
+    results = BatchRegenerationService.regenerate_pdf_batch(
+        _pairs(), output_mode, {"embed_images": False}, max_workers=2,
+        progress_callbacks=callbacks, on_file_done=lambda name, result: done.append(name)
+    )
+
+    assert list(results) == ["deck0.pdf", "deck1.pdf", "deck2.pdf", "bad.pdf"]
+    assert [r["status"] for r in results.values()] == ["completed"] * 3 + ["failed"]
+    assert sorted(done) == sorted(results)
+    if output_mode != "PDF讲解版":
+        # Page-level progress like the generation path
+        assert events["deck2.pdf"][-1] == (4, 4)
+
+
+def test_per_page_html_zip_is_built_from_memory():
+    results = BatchRegenerationService.regenerate_pdf_batch(_pairs()[:2], "分页HTML版", {})
+
+    data = BatchRegenerationService.create_flattened_zip_for_per_page_html(results)
+
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        names = set(zf.namelist())
+        assert {"deck0/page_1.html", "deck0/page_2.html", "deck0/deck0.pdf", "deck1/page_3.html"} <= names
+        assert {"json/deck0.json", "json/deck1.json"} <= names
+        assert zf.read("deck1/deck1.pdf") == results["deck1.pdf"]["pdf_bytes"]
+
+
+def test_markdown_screenshots_go_into_the_zip_without_a_temp_dir():
+    results = BatchRegenerationService.regenerate_pdf_batch(_pairs()[:1], "Markdown截图讲解", {"embed_images": False})
+
+    result = results["deck0.pdf"]
+    assert sorted(result["images"]) == ["page_1.png", "page_2.png"]
+    assert "images_dir" not in result
+    data = BatchRegenerationService.create_zip_for_other_modes(results, "Markdown截图讲解")
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.read("deck0_images/page_2.png") == result["images"]["page_2.png"]
+        assert "](page_1.png)" in zf.read("deck0讲解文档.md").decode("utf-8")
@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import fitz
+import pytest
+
+from app.services import pdf_processor
+from app.services.batch_scheduler import PageScheduler
+from app.services.concurrency_controller import GlobalConcurrencyController
+from app.services.pdf_processor import _generate_explanations_async
+
+
+class SlowLLM:
+    def __init__(self, latency=0.02):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak = 0
+
+    async def explain_pages_with_context(self, images, system_prompt=None, context_prompt=None):
+        with self.lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(self.latency)
+        with self.lock:
+            self.in_flight -= 1
+        return "ok"
+
+
+def _run_files(scheduler, llm, sizes, page_concurrency=4):
+    started = time.perf_counter()
+    finished = {}
+
+    def run_one(name, pages):
+        explanations, _, failed = scheduler.run(_generate_explanations_async(
+            llm_client=llm, page_images=[b"png"] * pages, user_prompt="p",
+            context_prompt=None, use_context=False, concurrency=page_concurrency,
+            on_progress=None, on_log=None, scheduler=scheduler,
+        ))
+        finished[name] = time.perf_counter() - started
+        assert len(explanations) == pages and not failed
+
+    with ThreadPoolExecutor(max_workers=len(sizes)) as executor:
+        for future in [executor.submit(run_one, name, pages) for name, pages in sizes.items()]:
+            future.result()
+    return finished
+
+
+@pytest.mark.parametrize("policy", ["round_robin", "srf"])
+def test_small_file_is_not_starved_and_cap_holds(policy):
+    llm = SlowLLM()
+    with PageScheduler(max_concurrency=3, policy=policy) as scheduler:
+        finished = _run_files(scheduler, llm, {"big": 30, "small": 2})
+
+    assert llm.peak <= 3
+    # The small file completes within a few rounds instead of after the big one
+    assert finished["small"] < finished["big"] / 2
+
+
+def test_per_file_limit_is_respected():
+    llm = SlowLLM()
+    with PageScheduler(max_concurrency=10) as scheduler:
+        _run_files(scheduler, llm, {"only": 12}, page_concurrency=2)
+
+    assert llm.peak == 2
+
+
+def test_unknown_policy_rejected():
+    with pytest.raises(ValueError):
+        PageScheduler(policy="lifo")
+
+
+def test_schedulers_of_separate_sessions_share_the_global_cap(monkeypatch):
+    llm = SlowLLM()
+    monkeypatch.setattr(pdf_processor, "_create_llm_client", lambda **kwargs: llm)
+    doc = fitz.open()
+    for _ in range(8):
+        doc.new_page(width=100, height=100)
+    src_bytes = doc.tobytes()
+    doc.close()
+
+    def run_one(scheduler):
+        explanations, _, failed = pdf_processor.generate_explanations(
+            src_bytes=src_bytes, api_key="x", model_name="fake", user_prompt="p",
+            temperature=0.2, max_tokens=64, dpi=36, concurrency=8,
+            rpm_limit=10_000, tpm_budget=10_000_000, rpd_limit=100_000,
+            auto_retry_failed_pages=False, scheduler=scheduler,
+        )
+        assert len(explanations) == 8 and not failed
+
+    GlobalConcurrencyController.install(GlobalConcurrencyController(3))
+    try:
+        # Two Streamlit sessions, each with its own batch scheduler
+        with PageScheduler(max_concurrency=10) as first, PageScheduler(max_concurrency=10) as second:
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                for future in [executor.submit(run_one, s) for s in (first, second, first, second)]:
+                    future.result()
+    finally:
+        GlobalConcurrencyController.install(None)
+
+    assert llm.peak <= 3
@@ -0,0 +1,259 @@
+import asyncio
+import threading
+import time
+
+import fitz
+import pytest
+
+from app.services.chromium_pool import ChromiumPool, plan_batches
+from app.services.html_renderer import HtmlRendererError
+
+
+class FakePage:
+    def __init__(self, browser):
+        self.browser = browser
+        self.closed = False
+        self.content = None
+
+    def is_closed(self):
+        return self.closed
+
+    def set_default_timeout(self, ms):
+        pass
+
+    def set_default_navigation_timeout(self, ms):
+        pass
+
+    async def set_viewport_size(self, size):
+        pass
+
+    async def set_content(self, html, wait_until):
+        self.browser.documents += 1
+
+    async def evaluate(self, script, args):
+        self.content = args[0]
+        if isinstance(self.content, list):
+            # __renderBatch reports the boxes whose content is clipped
+            return [i for i, html in enumerate(self.content) if "long" in html]
+
+    async def wait_for_function(self, script, timeout):
+        pass
+
+    async def pdf(self, **kwargs):
+        browser = self.browser
+        browser.active += 1
+        browser.peak = max(browser.peak, browser.active)
+        await asyncio.sleep(0.01)
+        browser.active -= 1
+        if isinstance(self.content, list):
+            # One printed page per box; a "spill" box overflows onto a second page
+            browser.pdf_calls += 1
+            doc = fitz.open()
+            for html in self.content:
+                for _ in range(2 if "spill" in html else 1):
+                    doc.new_page(width=100, height=50).insert_text((5, 20), html)
+            data = doc.tobytes()
+            doc.close()
+            return data
+        if "boom" in self.content:
+            raise RuntimeError("page crashed")
+        if "slow" in self.content:
+            await asyncio.sleep(0.3)
+        return f"pdf:{self.content}".encode()
+
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+        self.page = None
+
+    async def new_page(self):
+        self.page = FakePage(self.browser)
+        return self.page
+
+    async def close(self):
+        self.page.closed = True
+        self.browser.closed_contexts += 1
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.connected = True
+        self.contexts = 0
+        self.closed_contexts = 0
+        self.active = 0
+        self.peak = 0
+        self.documents = 0
+        self.pdf_calls = 0
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self):
+        self.contexts += 1
+        return FakeContext(self)
+
+    async def close(self):
+        self.connected = False
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    browsers = []
+
+    async def launch(self):
+        browsers.append(FakeBrowser())
+        return None, browsers[-1]
+
+    monkeypatch.setattr(ChromiumPool, "_launch", launch)
+    pool = ChromiumPool(pages=2, max_queue=4, recycle_after=3)
+    pool.browsers = browsers
+    yield pool
+    pool.close()
+
+
+def _fragments(prefix, count, **options):
+    return [dict(html=f"{prefix}{i}", width_pt=100, height_pt=50, **options) for i in range(count)]
+
+
+def test_pool_reuses_one_browser_and_recycles_pages(pool):
+    assert pool.render_fragments(_fragments("doc", 12)) == [f"pdf:doc{i}".encode() for i in range(12)]
+
+    assert pool.launches == 1
+    browser = pool.browsers[0]
+    assert browser.peak == 2
+    # Each page serves 3 renders before its context is replaced
+    assert browser.contexts == 4
+    assert browser.closed_contexts == 4
+    # The renderer document (MathJax/Prism) is loaded once per page, not per fragment
+    assert browser.documents == 4
+
+    pool.render_fragments(_fragments("plain", 2, mathjax=False, prism=False))
+    assert browser.documents == 6
+
+
+def test_failed_render_replaces_page_and_dead_browser_is_relaunched(pool):
+    with pytest.raises(HtmlRendererError):
+        pool.render_fragment(dict(html="boom", width_pt=100, height_pt=50))
+    assert pool.browsers[0].closed_contexts == 1
+    assert pool.render_fragment(dict(html="ok", width_pt=100, height_pt=50)) == b"pdf:ok"
+
+    pool.browsers[0].connected = False
+    assert pool.render_fragment(dict(html="again", width_pt=100, height_pt=50)) == b"pdf:again"
+    assert pool.launches == 2
+
+
+def test_async_api_renders_concurrently(pool):
+    results = asyncio.run(pool.render_fragments_async(_fragments("a", 6)))
+
+    assert results == [f"pdf:a{i}".encode() for i in range(6)]
+    assert pool.browsers[0].peak == 2
+
+
+def _page_text(pdf_bytes):
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        assert doc.page_count == 1
+        return doc[0].get_text().strip()
+
+
+def test_plan_batches_groups_by_size_css_and_options():
+    fragments = (
+        _fragments("a", 3)
+        + [dict(html="wide", width_pt=200, height_pt=50)]
+        + _fragments("b", 2, css="p{color:red}")
+        + _fragments("c", 2)
+    )
+
+    assert plan_batches(fragments, batch_size=4) == [[0, 1, 2, 6], [7], [3], [4, 5]]
+
+
+def test_batch_prints_each_group_once_and_splits_pages(pool):
+    fragments = _fragments("doc", 5) + _fragments("red", 2, css="p{color:red}")
+
+    results = pool.render_batch(fragments, batch_size=3)
+
+    assert [_page_text(pdf) for pdf in results] == [f"doc{i}" for i in range(5)] + ["red0", "red1"]
+    browser = pool.browsers[0]
+    # [doc0-2], [doc3-4], [red0-1]
+    assert browser.pdf_calls == 3
+    assert pool.batches == 3
+
+
+def test_batch_falls_back_to_single_renders_when_pages_do_not_match(pool):
+    results = pool.render_batch([dict(html=html, width_pt=100, height_pt=50) for html in ("one", "spill", "two")])
+
+    assert results == [b"pdf:one", b"pdf:spill", b"pdf:two"]
+
+
+def test_batch_renders_overflowing_fragments_alone(pool):
+    results = pool.render_batch(_fragments("doc", 2) + [dict(html="long", width_pt=100, height_pt=50)])
+
+    assert [_page_text(pdf) for pdf in results[:2]] == ["doc0", "doc1"]
+    assert results[2] == b"pdf:long"
+    assert pool.browsers[0].pdf_calls == 1
+
+
+def test_async_batch_keeps_input_order(pool):
+    fragments = _fragments("a", 2) + _fragments("b", 2, mathjax=False) + _fragments("c", 1)
+
+    results = asyncio.run(pool.render_batch_async(fragments))
+
+    assert [_page_text(pdf) for pdf in results] == ["a0", "a1", "b0", "b1", "c0"]
+
+
+def test_render_timeout_covers_queueing_and_rendering(monkeypatch):
+    async def launch(self):
+        return None, FakeBrowser()
+
+    monkeypatch.setattr(ChromiumPool, "_launch", launch)
+    pool = ChromiumPool(pages=1, max_queue=1)
+    try:
+        first = threading.Thread(target=pool.render_fragment, args=(dict(html="slow1", width_pt=100, height_pt=50),))
+        first.start()
+        time.sleep(0.05)
+        started = time.monotonic()
+        # Admitted after ~0.25s and rendered for another 0.3s: past the one 0.4s deadline
+        with pytest.raises(HtmlRendererError):
+            pool.render_fragment(dict(html="slow2", width_pt=100, height_pt=50), timeout=0.4)
+        assert time.monotonic() - started < 0.5
+        first.join()
+    finally:
+        pool.close()
+
+
+def test_launch_failure_marks_pool_unavailable(monkeypatch):
+    async def launch(self):
+        raise HtmlRendererError("no chromium")
+
+    monkeypatch.setattr(ChromiumPool, "_launch", launch)
+    pool = ChromiumPool(pages=1)
+    try:
+        assert pool.available
+        with pytest.raises(HtmlRendererError):
+            pool.render_fragment(dict(html="x", width_pt=100, height_pt=50))
+        assert not pool.available
+    finally:
+        pool.close()
+
+
+def test_pool_is_retried_after_a_failed_launch(monkeypatch):
+    attempts = []
+
+    async def launch(self):
+        attempts.append(1)
+        raise HtmlRendererError("out of file descriptors")
+
+    monkeypatch.setattr(ChromiumPool, "_launch", launch)
+    pool = ChromiumPool(pages=1, launch_retry=0.1)
+    try:
+        with pytest.raises(HtmlRendererError):
+            pool.render_fragment(dict(html="x", width_pt=100, height_pt=50))
+        assert not pool.available
+        time.sleep(0.15)
+        # The back-off has passed: callers use the pool again and it relaunches
+        assert pool.available
+        with pytest.raises(HtmlRendererError):
+            pool.render_fragment(dict(html="x", width_pt=100, height_pt=50))
+        assert len(attempts) == 2
+    finally:
+        pool.close()
@@ -0,0 +1,82 @@
+import json
+
+import fitz
+import pytest
+
+from app import cli
+from app.services import pdf_processor
+
+
+class FakeLLM:
+    async def explain_pages_with_context(self, images, system_prompt=None, context_prompt=None):
+        return "讲解 explanation"
+
+
+@pytest.fixture
+def sample_pdf(tmp_path):
+    doc = fitz.open()
+    for _ in range(2):
+        doc.new_page().insert_text((72, 72), "hello")
+    path = tmp_path / "slides.pdf"
+    doc.save(str(path))
+    doc.close()
+    return path
+
+
+def test_process_writes_outputs_and_streams_json_events(tmp_path, sample_pdf, monkeypatch, capsys):
+    monkeypatch.setattr(pdf_processor, "_create_llm_client", lambda **kwargs: FakeLLM())
+    monkeypatch.setattr("app.services.result_cache.TEMP_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr("app.services.job_journal.JOURNAL_DIR", str(tmp_path / "jobs"))
+    (tmp_path / "cache").mkdir()
+    out_dir = tmp_path / "out"
+
+    exit_code = cli.main([
+        "process", str(sample_pdf), "-o", str(out_dir),
+        "--mode", "markdown", "--api-key", "test", "--workers", "2",
+    ])
+
+    events = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert exit_code == 0
+    assert events[0]["event"] == "batch_start"
+    assert events[-1] == {**events[-1], "event": "batch_done", "completed": 1, "failed": 0}
+    assert (out_dir / "slides讲解文档.md").exists()
+    assert json.loads((out_dir / "slides.json").read_text(encoding="utf-8")) == {
+        "0": "讲解 explanation",
+        "1": "讲解 explanation",
+    }
+
+
+def test_failed_pages_are_retried_on_the_next_run(tmp_path, sample_pdf, monkeypatch, capsys):
+    class FlakyLLM:
+        calls = 0
+
+        async def explain_pages_with_context(self, images, system_prompt=None, context_prompt=None):
+            FlakyLLM.calls += 1
+            if FlakyLLM.calls == 1:
+                raise RuntimeError("quota exceeded")
+            return "讲解 explanation"
+
+    monkeypatch.setattr(pdf_processor, "_create_llm_client", lambda **kwargs: FlakyLLM())
+    monkeypatch.setattr("app.services.result_cache.TEMP_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr("app.services.job_journal.JOURNAL_DIR", str(tmp_path / "jobs"))
+    (tmp_path / "cache").mkdir()
+    args = ["process", str(sample_pdf), "-o", str(tmp_path / "out"), "--mode", "markdown",
+            "--api-key", "test", "--concurrency", "1", "--no-retry"]
+
+    cli.main(args)
+    first = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    cli.main(args)
+    second = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+    assert next(e for e in first if e["event"] == "file_done")["failed_pages"]
+    # Not served from the cache: only the failed page goes to the LLM again
+    assert not any(e["event"] == "cache_hit" for e in second)
+    assert next(e for e in second if e["event"] == "file_done")["failed_pages"] == []
+    assert FlakyLLM.calls == 3
+
+
+def test_process_rejects_missing_inputs(tmp_path, capsys):
+    exit_code = cli.main(["process", str(tmp_path / "missing.pdf"), "--api-key", "x"])
+
+    assert exit_code == 2
+    assert json.loads(capsys.readouterr().out)["event"] == "error"
@@ -0,0 +1,57 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.concurrency_controller import GlobalConcurrencyController
+from app.services.pdf_processor import _run_async
+
+
+def test_cap_holds_across_twenty_file_threads_with_their_own_loops():
+    controller = GlobalConcurrencyController(max_global_concurrency=5)
+    lock = threading.Lock()
+    state = {"in_flight": 0, "peak": 0, "done": 0}
+
+    async def page():
+        async with controller:
+            with lock:
+                state["in_flight"] += 1
+                state["peak"] = max(state["peak"], state["in_flight"])
+            await asyncio.sleep(0.002)
+            with lock:
+                state["in_flight"] -= 1
+                state["done"] += 1
+
+    async def file_pages():
+        await asyncio.gather(*(page() for _ in range(15)))
+
+    # Mirrors the batch path: one thread and one event loop per file
+    with ThreadPoolExecutor(max_workers=20) as executor:
+        futures = [executor.submit(_run_async, file_pages()) for _ in range(20)]
+        for future in futures:
+            future.result(timeout=60)
+
+    stats = controller.get_stats()
+    assert state["done"] == 300
+    assert state["peak"] <= 5
+    assert stats.peak_requests <= 5
+    assert stats.total_requests == 300
+    assert stats.current_requests == 0
+    assert controller.get_available_slots() == 5
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    controller = GlobalConcurrencyController(max_global_concurrency=1)
+
+    async def scenario():
+        await controller.acquire()
+        waiter = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        controller.release()
+        await asyncio.gather(waiter, return_exceptions=True)
+        await asyncio.sleep(0)
+        async with controller:
+            pass
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=5))
+    assert controller.get_available_slots() == 1
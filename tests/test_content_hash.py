@@ -0,0 +1,32 @@
+import io
+
+from app.services.content_hash import (
+    combine_with_params,
+    get_content_hash,
+    hash_bytes,
+    hash_stream,
+)
+
+
+def test_stream_and_bytes_hashes_match():
+    data = b"%PDF-1.4" + bytes(range(256)) * 9000
+
+    assert hash_stream(io.BytesIO(data)) == hash_bytes(data)
+
+
+def test_content_hash_is_memoized_on_upload_object():
+    upload = io.BytesIO(b"%PDF-1.4 sample")
+    upload.seek(5)
+
+    first = get_content_hash(upload)
+    upload.write(b"changed")
+
+    assert get_content_hash(upload) == first
+    assert upload.tell() == 5 + len(b"changed")
+
+
+def test_params_change_cache_key():
+    digest = hash_bytes(b"abc")
+
+    assert combine_with_params(digest, {"dpi": 150}) != combine_with_params(digest, {"dpi": 180})
+    assert combine_with_params(digest, {"a": 1, "b": 2}) == combine_with_params(digest, {"b": 2, "a": 1})
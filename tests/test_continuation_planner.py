@@ -0,0 +1,228 @@
+import re
+
+import fitz
+import pytest
+
+from app.services.continuation_planner import plan_explanation
+from app.services.pdf_composer import compose_pdf
+from app.services.text_layout import text_profile, wrap_text_lines
+
+
+def _source_pdf(pages=1):
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page(width=595, height=842).insert_text((72, 72), f"Slide {i + 1}")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def _long_explanation(paragraphs):
+    return "\n\n".join(
+        f"Paragraph {j}: the step size w{j}x controls how far each update moves the parameters "
+        f"along the negative gradient, and a schedule lowers it over time."
+        for j in range(paragraphs)
+    )
+
+
+def _markers(text):
+    return re.findall(r"w\d+x", text)
+
+
+def test_wrap_text_lines_breaks_long_cjk_runs_without_losing_text():
+    font = fitz.Font("helv")
+    text = "梯度下降沿负梯度方向更新参数。" * 200
+
+    lines = wrap_text_lines(text, font, 11, 200)
+
+    assert "".join(lines) == text
+    assert len(lines) > 10
+    assert all(font.text_length(line, fontsize=11) <= 200 + 1e-6 for line in lines)
+
+
+def test_wrap_text_lines_reuses_one_profile_across_sizes():
+    font = fitz.Font("helv")
+    text = "The  learning rate controls the step size.\n\n" + "Gradient descent " * 50
+
+    profile = text_profile(text, font)
+    for size in (9, 11, 14):
+        lines = wrap_text_lines(text, font, size, 150)
+        assert text_profile(text, font) is profile
+        assert " ".join(line for line in lines if line).split() == text.split()
+        assert "" in lines
+        assert all(font.text_length(line, fontsize=size) <= 150 + 1e-6 for line in lines)
+    assert len(wrap_text_lines(text, font, 14, 150)) > len(wrap_text_lines(text, font, 9, 150))
+
+
+def test_text_plan_flows_lines_through_columns_and_continuation_pages():
+    text = _long_explanation(150)
+
+    plan = plan_explanation(text, 595, 842, 11, render_mode="text")
+
+    assert 1 < plan.page_count <= 6
+    assert not plan.truncated
+    placed = "\n".join(column.text for page in plan.pages for column in page)
+    assert _markers(placed) == _markers(text)
+    # Every page but the last one is filled across all columns
+    assert all(len(page) == 3 for page in plan.pages[:-1])
+
+
+def test_plan_stops_at_max_pages_and_reports_truncation():
+    plan = plan_explanation(_long_explanation(400), 595, 842, 11, render_mode="text", max_pages=2)
+
+    assert plan.page_count == 2
+    assert plan.truncated
+
+
+@pytest.mark.parametrize("render_mode", ["text", "markdown"])
+def test_compose_pdf_keeps_all_overflow_text_at_full_size(render_mode):
+    text = _long_explanation(150)
+
+    out = compose_pdf(_source_pdf(), {0: text}, 0.48, 11, render_mode=render_mode)
+
+    with fitz.open(stream=out, filetype="pdf") as doc:
+        assert 1 < doc.page_count <= 6
+        page_texts = [page.get_text() for page in doc]
+        sizes = {
+            round(span["size"])
+            for page in doc
+            for block in page.get_text("dict")["blocks"]
+            for line in block.get("lines", [])
+            for span in line["spans"]
+            if span["bbox"][0] > 595 and span["text"].strip()
+        }
+    # Slide repeated on the left of every continuation page
+    assert all("Slide 1" in page_text for page_text in page_texts)
+    assert _markers("".join(page_texts)) == _markers(text)
+    # Nothing was shrunk to fit
+    assert sizes == {11}
+
+
+def test_short_explanation_needs_no_continuation_page():
+    out = compose_pdf(_source_pdf(2), {0: "Short note.", 1: ""}, 0.48, 11, render_mode="text")
+
+    with fitz.open(stream=out, filetype="pdf") as doc:
+        assert doc.page_count == 2
+        assert "Short note." in doc[0].get_text()
+
+
+def test_continuation_pages_reuse_the_source_page_xobject():
+    src = fitz.open()
+    page = src.new_page(width=595, height=842)
+    page.insert_text((72, 72), "Rotated slide")
+    page.set_rotation(90)
+    src_bytes = src.tobytes()
+    src.close()
+
+    out = compose_pdf(src_bytes, {0: _long_explanation(150)}, 0.48, 11, render_mode="text")
+
+    with fitz.open(stream=out, filetype="pdf") as doc:
+        assert doc.page_count > 1
+        shown = {tuple(xobj[0] for xobj in page.get_xobjects() if xobj[2] == 0) for page in doc}
+        # Main and continuation pages draw the source page the same way
+        positions = {tuple(round(v) for v in page.search_for("Rotated slide")[0]) for page in doc}
+    assert len(shown) == 1
+    assert len(positions) == 1
+
+
+def test_markdown_explanations_fall_back_to_chromium_without_pandoc(monkeypatch):
+    from app.services.html_renderer import HtmlRenderer, HtmlRendererError
+    from app.services.pandoc_pdf_generator import PandocPDFGenerator
+
+    rendered = []
+
+    def render(html, width_pt, height_pt, css=None, **kwargs):
+        rendered.append(html)
+        # A long explanation flows onto two pages of the column size
+        doc = fitz.open()
+        for text in ("part 1", "part 2"):
+            doc.new_page(width=width_pt, height=height_pt).insert_text((10, 20), text)
+        data = doc.tobytes()
+        doc.close()
+        return data
+
+    def no_batch(fragments, **kwargs):
+        raise HtmlRendererError("batch failed")
+
+    monkeypatch.setattr(PandocPDFGenerator, "is_available", staticmethod(lambda: False))
+    monkeypatch.setattr(PandocPDFGenerator, "generate_pdf", staticmethod(lambda **kwargs: (None, False)))
+    monkeypatch.setattr(HtmlRenderer, "is_available", staticmethod(lambda: True))
+    monkeypatch.setattr(HtmlRenderer, "render_html_to_pdf_batch", staticmethod(no_batch))
+    monkeypatch.setattr(HtmlRenderer, "render_html_to_pdf_fragment", staticmethod(render))
+
+    out = compose_pdf(_source_pdf(), {0: "**bold** note"}, 0.48, 11, render_mode="markdown")
+
+    assert "<strong>bold</strong>" in rendered[0]
+    with fitz.open(stream=out, filetype="pdf") as doc:
+        assert doc.page_count == 2
+        assert "part 2" in doc[1].get_text()
+
+
+def test_markdown_explanations_of_a_document_are_rendered_as_one_batch(monkeypatch):
+    from app.services.html_renderer import HtmlRenderer
+    from app.services.pandoc_pdf_generator import PandocPDFGenerator
+
+    batches = []
+
+    def render_batch(fragments, **kwargs):
+        batches.append(fragments)
+        results = []
+        for i, fragment in enumerate(fragments):
+            doc = fitz.open()
+            doc.new_page(width=fragment["width_pt"], height=fragment["height_pt"]).insert_text((10, 20), f"box {i}")
+            results.append(doc.tobytes())
+            doc.close()
+        return results
+
+    def render_one(*args, **kwargs):
+        raise AssertionError("rendered page by page")
+
+    monkeypatch.setattr(PandocPDFGenerator, "is_available", staticmethod(lambda: False))
+    monkeypatch.setattr(HtmlRenderer, "is_available", staticmethod(lambda: True))
+    monkeypatch.setattr(HtmlRenderer, "render_html_to_pdf_batch", staticmethod(render_batch))
+    monkeypatch.setattr(HtmlRenderer, "render_html_to_pdf_fragment", staticmethod(render_one))
+
+    out = compose_pdf(_source_pdf(3), {0: "first", 2: "*third*"}, 0.48, 11, render_mode="markdown")
+
+    assert len(batches) == 1
+    assert [f["html"] for f in batches[0]] == ["<p>first</p>", "<p><em>third</em></p>"]
+    with fitz.open(stream=out, filetype="pdf") as doc:
+        assert doc.page_count == 3
+        assert "box 0" in doc[0].get_text()
+        assert "box 1" in doc[2].get_text()
+
+
+def test_pandoc_converts_a_documents_explanations_in_one_process(monkeypatch):
+    from app.services.pandoc_pdf_generator import PandocPDFGenerator
+    from app.services.pandoc_renderer import PandocRenderer
+
+    runs = []
+    bodies = []
+
+    def run(markdown_content, timeout, to="html5"):
+        runs.append(to)
+        return markdown_content.replace("```{=latex}\n", "").replace("\n```", ""), None
+
+    def generate_pdf(markdown_content, width_pt, height_pt, latex_body=None, **kwargs):
+        bodies.append(latex_body)
+        doc = fitz.open()
+        doc.new_page(width=width_pt, height=height_pt).insert_text((10, 20), latex_body)
+        data = doc.tobytes()
+        doc.close()
+        return data, True
+
+    monkeypatch.setattr(PandocPDFGenerator, "is_available", staticmethod(lambda: True))
+    monkeypatch.setattr(PandocPDFGenerator, "generate_pdf", staticmethod(generate_pdf))
+    monkeypatch.setattr(PandocRenderer, "_run_pandoc", staticmethod(run))
+    monkeypatch.setattr(PandocRenderer, "_pandoc_checked", True)
+    PandocRenderer.clear_cache()
+    try:
+        out = compose_pdf(_source_pdf(3), {0: "page one", 1: "page two", 2: "page three"}, 0.48, 11,
+                          render_mode="markdown")
+    finally:
+        PandocRenderer.clear_cache()
+
+    assert runs == ["latex"]
+    assert bodies == ["page one", "page two", "page three"]
+    with fitz.open(stream=out, filetype="pdf") as doc:
+        assert "page two" in doc[1].get_text()
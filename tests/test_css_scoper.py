@@ -0,0 +1,86 @@
+from app.services import css_scoper
+from app.services.css_scoper import merge_css, scope_css
+
+SCOPE = ".pdf2htmlex-container"
+
+
+def test_scope_css_handles_minified_at_rules_strings_and_comments():
+    css = (
+        "@charset \"utf-8\";"
+        "@font-face{font-family:ff1;src:url('data:font/woff;base64,e30=}{')format(\"woff\");}"
+        ".ff1,.ff2{font-family:ff1;}/* .x{} */"
+        "@media print{.pf{margin:0;}@page{margin:0}}"
+        "@keyframes fadein{from{opacity:0}to{opacity:1}}"
+        "a[title=\"a,b{\"]{content:\"}\"}"
+    )
+
+    lines = scope_css(css, SCOPE).splitlines()
+
+    assert lines == [
+        '@charset "utf-8";',
+        "@font-face{font-family:ff1;src:url('data:font/woff;base64,e30=}{')format(\"woff\");}",
+        f"{SCOPE} .ff1, {SCOPE} .ff2{{font-family:ff1;}}",
+        "@media print{",
+        f"{SCOPE} .pf{{margin:0;}}",
+        "@page{margin:0}",
+        "}",
+        "@keyframes fadein{from{opacity:0}to{opacity:1}}",
+        f"{SCOPE} a[title=\"a,b{{\"]{{content:\"}}\"}}",
+    ]
+
+
+def test_repeated_font_faces_are_emitted_once():
+    font = "@font-face{font-family:ff1;src:url('data:font/a');}"
+    scoped = scope_css(font + ".a{color:red}" + font + ".b{color:blue}", SCOPE)
+
+    assert scoped.count("@font-face") == 1
+    assert f"{SCOPE} .a{{color:red}}" in scoped
+    assert f"{SCOPE} .b{{color:blue}}" in scoped
+
+
+def test_scope_css_is_memoized(monkeypatch):
+    calls = []
+    original = css_scoper._scope_rules
+
+    def counting(*args):
+        calls.append(args[1])
+        return original(*args)
+
+    monkeypatch.setattr(css_scoper, "_scope_rules", counting)
+    css = ".memo-test{left:1px}"
+
+    first = scope_css(css, SCOPE)
+    assert scope_css(css, SCOPE) == first
+    assert len(calls) == 1
+    # A different scope is a different entry
+    assert scope_css(css, ".other").startswith(".other .memo-test")
+
+
+def test_memo_is_bounded_by_total_size(monkeypatch):
+    from collections import OrderedDict
+
+    monkeypatch.setattr(css_scoper, "_cache", OrderedDict())
+    monkeypatch.setattr(css_scoper, "_cache_bytes", 0)
+    monkeypatch.setattr(css_scoper, "CSS_SCOPE_CACHE_MAX_BYTES", 200)
+    font = "@font-face{font-family:ff1;src:url(data:font/woff;base64," + "A" * 300 + ")}"
+
+    # Larger than the whole budget: rendered but not kept
+    scope_css(font, SCOPE)
+    assert not css_scoper._cache
+    for index in range(6):
+        scope_css(f".size-test{index}{{left:{index}px}}", SCOPE)
+    assert 0 < css_scoper._cache_bytes <= 200
+    assert css_scoper._cache_bytes == sum(map(len, css_scoper._cache.values()))
+    assert len(css_scoper._cache) < 6
+
+
+def test_merge_css_drops_repeated_blocks_of_minified_css():
+    base = ".pf{position:relative;}.t{position:absolute;}@media print{.pf{margin:0;}}"
+    merged = merge_css([base + ".x0{left:1px;}", base + ".x0-k1{left:2px;}/* tail */"])
+
+    assert merged.count(".pf{position:relative;}") == 1
+    assert merged.count(".t{position:absolute;}") == 1
+    assert merged.count("@media print{") == 1
+    assert ".x0{left:1px;}" in merged and ".x0-k1{left:2px;}" in merged
+    # A single stylesheet comes back unchanged
+    assert merge_css([base]) == base
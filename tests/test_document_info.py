@@ -0,0 +1,93 @@
+import io
+
+import fitz
+
+from app.services.document_info import PageRenderCache, analyze_pdf, get_document_info
+from app.services.pdf_composer import compose_pdf
+from app.services.pdf_validator import validate_pdf_file
+
+
+def _deck(texts, width=595, height=842):
+    doc = fitz.open()
+    for text in texts:
+        page = doc.new_page(width=width, height=height)
+        if text:
+            page.insert_text((72, 72), text)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_analysis_records_pages_sizes_and_kinds():
+    doc = fitz.open()
+    doc.new_page(width=595, height=842).insert_text((72, 72), "Gradient descent updates the parameters")
+    doc.new_page(width=842, height=595)
+    doc[1].set_rotation(90)
+    data = doc.tobytes()
+    doc.close()
+
+    info = analyze_pdf(data)
+
+    assert info.page_count == 2
+    assert info.page_sizes == [(595, 842), (595, 842)]
+    assert info.pages[1].rotation == 90
+    assert info.text_pages == [0]
+    assert info.image_pages == [1]
+    assert info.size_bytes == len(data)
+    assert info.estimate_tokens(prompt_tokens=10, output_tokens=100) == info.estimated_tokens + 220
+
+
+def test_uploads_are_analyzed_once_per_content():
+    data = _deck(["Slide 1", "Slide 2"])
+    upload = io.BytesIO(data)
+    upload.seek(3)
+
+    info = get_document_info(upload)
+
+    assert upload.tell() == 3
+    assert get_document_info(data) is info
+    assert info.page_count == 2
+
+
+def test_repeated_pages_are_detected_and_rendered_once():
+    info = analyze_pdf(_deck(["Agenda", "Slide 2", "Agenda", "Slide 4", "Agenda"]))
+    rendered = []
+
+    def render(index):
+        rendered.append(index)
+        return f"png{index}"
+
+    cache = PageRenderCache(info, info.page_count, render)
+
+    assert info.duplicates == {2: 0, 4: 0}
+    assert [cache.get(i) for i in range(5)] == ["png0", "png1", "png0", "png3", "png0"]
+    assert rendered == [0, 1, 3]
+    # Everything handed out: nothing is kept any longer
+    assert cache._kept == {}
+
+
+def test_render_cache_ignores_info_of_another_document():
+    info = analyze_pdf(_deck(["Agenda", "Agenda"]))
+    cache = PageRenderCache(info, 3, lambda index: index)
+
+    assert [cache.get(i) for i in range(3)] == [0, 1, 2]
+
+
+def test_validation_uses_the_analysis():
+    is_valid, error = validate_pdf_file(b"%PDF-1.7 broken")
+    assert not is_valid and error.startswith("PDF文件无效或已损坏")
+    data = _deck(["Slide 1"])
+    assert validate_pdf_file(data, analyze_pdf(data)) == (True, "")
+
+
+def test_compose_imports_repeated_pages_once():
+    data = _deck(["Agenda", "Slide 2", "Agenda"])
+    info = get_document_info(data)
+
+    out = compose_pdf(data, {0: "a", 1: "b", 2: "c"}, 0.48, 11, render_mode="text", document_info=info)
+
+    with fitz.open(stream=out, filetype="pdf") as doc:
+        assert doc.page_count == 3
+        xobjects = [{xref for xref, *_ in doc[i].get_xobjects()} for i in range(3)]
+    assert xobjects[0] == xobjects[2]
+    assert xobjects[0] != xobjects[1]
@@ -0,0 +1,106 @@
+import io
+import zipfile
+
+import fitz
+import pytest
+
+from app.services import pdf_processor
+from app.services.batch_pipeline import render_output, write_outputs
+from app.services.html_assets import ASSET_FORMAT
+
+
+def _pdf_bytes(pages: int) -> bytes:
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page(width=200, height=150).insert_text((20, 40), f"page {i + 1}")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_external_assets_are_lazy_loaded_with_srcset(tmp_path):
+    assets = tmp_path / "课件 1_assets"
+    html = pdf_processor.generate_html_screenshot_document(
+        _pdf_bytes(3), {0: "讲解"}, screenshot_dpi=60,
+        embed_images=False, assets_dir=str(assets), assets_url="课件 1_assets",
+    )
+
+    assert "data:image" not in html
+    # Two resolutions per page
+    assert sorted(p.name for p in assets.iterdir()) == [
+        f"p000{page}-{dpi}.{ASSET_FORMAT}" for page in (1, 2, 3) for dpi in (30, 60)
+    ]
+    # First page loads eagerly, the rest on demand
+    assert html.count('loading="eager"') == 1
+    assert html.count('loading="lazy" decoding="async"') == 2
+    assert f'srcset="%E8%AF%BE%E4%BB%B6%201_assets/p0002-30.{ASSET_FORMAT} ' in html
+    assert 'width="167" height="125"' in html
+
+
+def test_external_assets_require_a_directory():
+    with pytest.raises(ValueError):
+        pdf_processor.generate_html_screenshot_document(_pdf_bytes(1), {}, embed_images=False)
+
+
+def test_batch_pipeline_writes_assets_next_to_html(tmp_path):
+    params = {"output_mode": "HTML截图版", "embed_images": False, "screenshot_dpi": 40}
+    result = render_output(_pdf_bytes(2), "deck.pdf", {0: "讲解"}, params)
+    written = write_outputs("deck.pdf", result, str(tmp_path))
+
+    assert str(tmp_path / "deck_assets") in written
+    assert len(list((tmp_path / "deck_assets").iterdir())) == 4
+    assert 'src="deck_assets/p0001-40.' in (tmp_path / "deck讲解文档.html").read_text(encoding="utf-8")
+
+
+def test_rewriting_outputs_drops_assets_of_a_longer_earlier_run(tmp_path):
+    params = {"output_mode": "HTML截图版", "embed_images": False, "screenshot_dpi": 40}
+    for pages in (3, 1):
+        write_outputs("deck.pdf", render_output(_pdf_bytes(pages), "deck.pdf", {}, params), str(tmp_path))
+
+    assert len(list((tmp_path / "deck_assets").iterdir())) == 2
+
+
+def test_zip_stores_assets_under_assets_url(tmp_path):
+    from app.ui_helpers import build_zip_cache_html_screenshot
+
+    assets = tmp_path / "a"
+    html = pdf_processor.generate_html_screenshot_document(
+        _pdf_bytes(1), {}, screenshot_dpi=40, embed_images=False,
+        assets_dir=str(assets), assets_url="deck_assets",
+    )
+    data = build_zip_cache_html_screenshot({"deck.pdf": {
+        "status": "completed", "html_content": html, "explanations": {0: "x"},
+        "assets_dir": str(assets), "assets_url": "deck_assets",
+    }})
+
+    with zipfile.ZipFile(io.BytesIO(data.getvalue())) as zf:
+        names = zf.namelist()
+        assert f"deck_assets/p0001-40.{ASSET_FORMAT}" in names
+        assert zf.getinfo(f"deck_assets/p0001-40.{ASSET_FORMAT}").compress_type == zipfile.ZIP_STORED
+
+
+def test_each_result_gets_its_own_asset_dir_removed_on_replace(tmp_path):
+    import os
+
+    from app.ui_helpers import ResultDirs, _html_asset_kwargs
+
+    dirs = ResultDirs()
+    params = {"embed_images": False}
+    first = _html_asset_kwargs(params, "deck", dirs)
+    second = _html_asset_kwargs(params, "deck", dirs)
+    shared = tmp_path / "deck_assets"
+    shared.mkdir()
+
+    # Same upload name, separate directories; the ZIP path stays the same
+    assert first["assets_dir"] != second["assets_dir"]
+    assert first["assets_url"] == second["assets_url"] == "deck_assets"
+
+    dirs.release({"deck.pdf": {"assets_dir": first["assets_dir"]},
+                  "other.pdf": {"assets_dir": str(shared)}})
+    assert not os.path.exists(first["assets_dir"])
+    assert os.path.isdir(second["assets_dir"])
+    # Directories the session did not create are left alone
+    assert shared.is_dir()
+
+    dirs.close()
+    assert not os.path.exists(second["assets_dir"])
@@ -0,0 +1,48 @@
+import io
+import zipfile
+
+import fitz
+
+from app.services import pdf_processor
+from app.services.html_screenshot_generator import HTMLScreenshotGenerator
+from app.services.html_stream import write_html_chunks, write_html_chunks_to_zip
+
+
+def _pdf_bytes(pages: int) -> bytes:
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page(width=200, height=150).insert_text((20, 40), f"page {i + 1}")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_screenshot_view_streams_one_chunk_per_page():
+    shots = ({"page_num": i, "image_bytes": b"png"} for i in range(1, 4))
+    chunks = list(HTMLScreenshotGenerator.iter_html_screenshot_view(shots, {2: "**讲解**"}, 3))
+
+    # head, 3 screenshots, middle, 3 explanations, tail
+    assert len(chunks) == 9
+    assert "<strong>讲解</strong>" in chunks[6]
+    assert chunks[-1].rstrip().endswith("</html>")
+
+
+def test_streamed_document_matches_joined_document_on_disk_and_in_zip(tmp_path):
+    src = _pdf_bytes(3)
+    explanations = {0: "# 第一页", 2: "- a\n- b"}
+    expected = pdf_processor.generate_html_screenshot_document(src, explanations, screenshot_dpi=50)
+
+    path = tmp_path / "out.html"
+    written = write_html_chunks(
+        pdf_processor.iter_html_screenshot_document(src, explanations, screenshot_dpi=50), path
+    )
+    assert written == len(expected.encode("utf-8"))
+    assert path.read_text(encoding="utf-8") == expected
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        write_html_chunks_to_zip(
+            zf, "doc.html", pdf_processor.iter_html_screenshot_document(src, explanations, screenshot_dpi=50)
+        )
+    with zipfile.ZipFile(buffer) as zf:
+        assert zf.read("doc.html").decode("utf-8") == expected
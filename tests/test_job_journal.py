@@ -0,0 +1,67 @@
+from app.services.job_journal import JobJournal, make_journal_id
+
+
+def test_journal_replays_pages_after_restart(tmp_path):
+    journal = JobJournal("batch", journal_dir=str(tmp_path))
+    file_journal = journal.file("abc")
+    file_journal.start("a.pdf", 3)
+    file_journal.record_page(0, "page one")
+    file_journal.record_page(2, "page three")
+
+    reopened = JobJournal("batch", journal_dir=str(tmp_path))
+
+    assert reopened.file("abc").completed_pages() == {0: "page one", 2: "page three"}
+    assert reopened.outstanding_work() == {"abc": [1]}
+
+
+def test_journal_skips_torn_trailing_line(tmp_path):
+    journal = JobJournal("batch", journal_dir=str(tmp_path))
+    journal.file("abc").record_page(0, "ok")
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"type": "page", "file": "abc", "pa')
+
+    reopened = JobJournal("batch", journal_dir=str(tmp_path))
+
+    assert reopened.file("abc").completed_pages() == {0: "ok"}
+
+
+def test_records_after_a_torn_tail_survive_replay(tmp_path):
+    journal = JobJournal("batch", journal_dir=str(tmp_path))
+    journal.file("abc").record_page(0, "ok")
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"type": "page", "file": "abc", "pa')
+
+    JobJournal("batch", journal_dir=str(tmp_path)).file("abc").record_page(1, "after crash")
+    reopened = JobJournal("batch", journal_dir=str(tmp_path))
+
+    assert reopened.file("abc").completed_pages() == {0: "ok", 1: "after crash"}
+
+
+def test_resume_targets_only_outstanding_pages(tmp_path):
+    params = {"model_name": "m"}
+    file_journal = JobJournal.for_file("abc", params, journal_dir=str(tmp_path))
+    file_journal.start("a.pdf", 4)
+    file_journal.record_page(0, "one")
+    file_journal.record_page(2, "three")
+
+    kwargs = JobJournal.for_file("abc", params, journal_dir=str(tmp_path)).generation_kwargs()
+
+    assert kwargs["existing_explanations"] == {0: "one", 2: "three"}
+    assert kwargs["target_pages"] == [2, 4]
+
+
+def test_journals_are_keyed_per_file(tmp_path):
+    params = {"model_name": "m"}
+    JobJournal.for_file("h1", params, journal_dir=str(tmp_path)).record_page(0, "one")
+
+    # Uploaded again next to another file, h1 still resumes from its own journal
+    assert JobJournal.for_file("h1", params, journal_dir=str(tmp_path)).completed_pages() == {0: "one"}
+    assert JobJournal.for_file("h2", params, journal_dir=str(tmp_path)).completed_pages() == {}
+
+
+def test_journal_id_ignores_credentials_and_output_mode():
+    base = {"model_name": "m", "api_key": "k1", "output_mode": "PDF讲解版"}
+    other = {"model_name": "m", "api_key": "k2", "output_mode": "HTML截图版"}
+
+    assert make_journal_id("h1", base) == make_journal_id("h1", other)
+    assert make_journal_id("h1", base) != make_journal_id("h1", {**base, "model_name": "n"})
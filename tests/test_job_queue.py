@@ -0,0 +1,174 @@
+import time
+
+import fitz
+import pytest
+
+from app.services.batch_pipeline import write_outputs
+from app.services.content_hash import get_content_hash
+from app.services.job_journal import JobJournal
+from app.services.job_queue import JobQueue, load_job_result, run_job, start_workers
+from fake_llm_server import FakeLLMServer
+
+
+def _pdf_bytes(pages: int, label: str) -> bytes:
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page().insert_text((72, 72), f"{label} page {i}")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "queue" / "queue.db"))
+
+
+def test_claim_respects_max_running_jobs_and_strips_api_key(queue):
+    queue.set_budgets(max_running_jobs=1)
+    first = queue.submit(b"%PDF-1", "a.pdf", {"api_key": "secret", "dpi": 150})
+    queue.submit(b"%PDF-2", "b.pdf", {"dpi": 150})
+
+    job = queue.claim("w1")
+    assert job["id"] == first
+    assert "api_key" not in job["params"]
+    assert queue.claim("w2") is None
+
+    queue.complete(first, {"outputs": []})
+    assert queue.claim("w2")["filename"] == "b.pdf"
+
+
+def test_api_slots_enforce_concurrency_and_rpm(queue):
+    queue.set_budgets(api_concurrency=2, api_rpm=3)
+    a = queue.try_acquire_api_slot("w")
+    b = queue.try_acquire_api_slot("w")
+    assert None not in (a, b)
+    assert queue.try_acquire_api_slot("w") is None
+
+    queue.release_api_slot(a)
+    assert queue.try_acquire_api_slot("w") is not None
+    queue.release_api_slot(b)
+    # Three requests started within the minute: RPM budget exhausted
+    assert queue.try_acquire_api_slot("w") is None
+
+
+def test_worker_processes_share_the_global_api_budget(tmp_path, monkeypatch):
+    monkeypatch.setenv("TMPDIR", str(tmp_path))
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    queue = JobQueue(str(tmp_path / "queue" / "queue.db"))
+    queue.set_budgets(api_concurrency=3, max_running_jobs=4, api_rpm=1000)
+
+    with FakeLLMServer(delay=0.2) as server:
+        params = {
+            "llm_provider": "openai",
+            "api_base": server.api_base,
+            "model_name": "fake",
+            "user_prompt": "explain",
+            "temperature": 0.4,
+            "max_tokens": 256,
+            "dpi": 50,
+            "concurrency": 4,
+            "rpm_limit": 1000,
+            "tpm_budget": 10_000_000,
+            "rpd_limit": 10_000,
+            "output_mode": "Markdown截图讲解",
+        }
+        job_ids = [queue.submit(_pdf_bytes(3, f"doc{i}"), f"doc{i}.pdf", params) for i in range(4)]
+
+        processes, stop_event = start_workers(queue.db_path, 2, poll_interval=0.1)
+        try:
+            deadline = time.time() + 120
+            while time.time() < deadline:
+                jobs = [queue.get(job_id) for job_id in job_ids]
+                if all(job["status"] in ("completed", "failed") for job in jobs):
+                    break
+                time.sleep(0.2)
+        finally:
+            stop_event.set()
+            for process in processes:
+                process.join(timeout=30)
+
+    assert [job["status"] for job in jobs] == ["completed"] * 4, [job["error"] for job in jobs]
+    assert all(job["progress_done"] == job["progress_total"] == 3 for job in jobs)
+    assert server.requests == 12
+    assert server.peak <= 3
+
+
+def test_requeued_job_rejects_the_previous_worker(queue):
+    job_id = queue.submit(b"%PDF-1", "a.pdf", {})
+    queue.claim("w1")
+    # w1 stalls long enough for its lease to go stale; w2 takes the job over
+    assert queue.requeue_stale(stale_after=-1) == 1
+    assert queue.claim("w2")["id"] == job_id
+
+    assert not queue.heartbeat(job_id, "w1")
+    assert not queue.complete(job_id, {"outputs": []}, worker="w1")
+    assert not queue.fail(job_id, "late", worker="w1")
+    assert queue.get(job_id)["status"] == "running"
+
+    assert queue.complete(job_id, {"outputs": []}, worker="w2")
+    assert queue.get(job_id)["status"] == "completed"
+
+
+def test_run_job_heartbeats_during_long_steps(queue, monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    job_id = queue.submit(b"%PDF-1", "a.pdf", {})
+    job = queue.claim("w1")
+    claimed_at = job["heartbeat"]
+    beats = []
+
+    def slow_process_document(src_bytes, filename, params, on_event=None, **kwargs):
+        # No progress events, like a pdf2htmlEX conversion or a wait for an API slot
+        time.sleep(0.3)
+        beats.append(queue.get(job_id)["heartbeat"])
+        return {"status": "failed", "error": "boom"}
+
+    monkeypatch.setattr("app.services.batch_pipeline.process_document", slow_process_document)
+    run_job(queue, job, heartbeat_interval=0.05)
+
+    assert beats[0] > claimed_at
+    assert queue.get(job_id)["status"] == "failed"
+
+
+def test_requeued_job_resumes_from_the_journal(queue, tmp_path, monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr("app.services.job_journal.JOURNAL_DIR", str(tmp_path / "jobs"))
+    src = _pdf_bytes(3, "deck")
+    params = {"model_name": "fake", "output_mode": "PDF讲解版"}
+    job_id = queue.submit(src, "deck.pdf", params, output_dir=str(tmp_path / "out"))
+    # The first worker explained two pages before it died
+    previous = JobJournal.for_file(get_content_hash(src), params)
+    previous.start("deck.pdf", 3)
+    previous.record_page(0, "one")
+    previous.record_page(1, "two")
+    queue.claim("w1")
+    queue.requeue_stale(stale_after=-1)
+    job = queue.claim("w2")
+    resumed = []
+
+    def process_document(src_bytes, filename, params, on_event=None, journal=None, **kwargs):
+        resumed.append(journal.generation_kwargs())
+        return {"status": "completed", "explanations": {0: "one", 1: "two", 2: "three"},
+                "failed_pages": [], "pdf_bytes": b"%PDF-out"}
+
+    monkeypatch.setattr("app.services.batch_pipeline.process_document", process_document)
+    run_job(queue, job)
+
+    assert resumed[0]["existing_explanations"] == {0: "one", 1: "two"}
+    assert resumed[0]["target_pages"] == [3]
+    assert queue.get(job_id)["status"] == "completed"
+    # Every page succeeded: the journal is no longer needed
+    assert not JobJournal.for_file(get_content_hash(src), params).completed_pages()
+
+
+def test_load_job_result_reads_worker_outputs(queue, tmp_path):
+    job_id = queue.submit(b"%PDF-1", "deck.pdf", {}, output_dir=str(tmp_path / "out"))
+    job = queue.claim("w1")
+    outputs = write_outputs("deck.pdf", {"pdf_bytes": b"%PDF-out", "explanations": {0: "讲解"}}, job["output_dir"])
+    queue.complete(job_id, {"failed_pages": [], "outputs": outputs}, worker="w1")
+
+    result = load_job_result(queue.get(job_id))
+
+    assert result["status"] == "completed"
+    assert result["pdf_bytes"] == b"%PDF-out"
+    assert result["explanations"] == {0: "讲解"}
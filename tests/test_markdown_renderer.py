@@ -0,0 +1,36 @@
+import markdown
+
+from app.services.markdown_renderer import MARKDOWN_EXTENSIONS, MarkdownRenderer
+
+SAMPLES = [
+    "# 标题\n\n- a\n- b",
+    "```python\nx = 1\n```",
+    "| a | b |\n|---|---|\n| 1 | 2 |",
+    "line1\nline2 <b>x</b> & y",
+    "[^1]: 脚注之前的状态不应残留",
+    "1. one\n2. two",
+]
+
+
+def test_reused_instance_matches_fresh_markdown_calls():
+    renderer = MarkdownRenderer()
+    for text in SAMPLES * 2:
+        assert renderer.render(text) == markdown.markdown(text, extensions=list(MARKDOWN_EXTENSIONS))
+
+
+def test_render_many_dedupes_caches_and_keeps_page_order():
+    renderer = MarkdownRenderer(cache_size=2)
+    texts = {3: "**a**", 1: "", 2: "**a**", 4: "*b*"}
+
+    rendered = renderer.render_many(texts)
+
+    assert list(rendered) == [3, 1, 2, 4]
+    assert rendered[1] == "<p>暂无讲解内容</p>"
+    assert rendered[3] == rendered[2] == "<p><strong>a</strong></p>"
+    renderer.render("*b*")
+    assert renderer.hits == 1
+
+    # LRU bound: a third distinct text evicts the least recently used one
+    renderer.render("c")
+    assert len(renderer._cache) == 2
+    assert renderer._key("**a**") not in renderer._cache
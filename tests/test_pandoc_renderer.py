@@ -0,0 +1,76 @@
+import markdown
+import pytest
+
+from app.services.pandoc_renderer import PandocRenderer
+
+
+@pytest.fixture
+def fake_pandoc(monkeypatch):
+    """Stand-in for the pandoc binary: converts with python-markdown and counts processes."""
+    calls = []
+
+    def run(markdown_content, timeout, to="html5"):
+        calls.append(markdown_content)
+        html = markdown.markdown(markdown_content, extensions=["fenced_code"])
+        if "```\n未闭合" in markdown_content:
+            # Like pandoc, treat everything after an unclosed fence as code
+            html = html.replace("&lt;!-- pandoc-split", "").replace("<!-- pandoc-split", "")
+        return html, None
+
+    monkeypatch.setattr(PandocRenderer, "_run_pandoc", staticmethod(run))
+    monkeypatch.setattr(PandocRenderer, "_pandoc_checked", True)
+    PandocRenderer.clear_cache()
+    yield calls
+    PandocRenderer.clear_cache()
+
+
+def test_render_many_uses_one_process_and_caches(fake_pandoc):
+    docs = ["# 一", "**二**", "", "# 一", "```\ncode\n```"]
+
+    results = PandocRenderer.render_many(docs)
+
+    assert len(fake_pandoc) == 1
+    assert results == [
+        ('<h1>一</h1>', True),
+        ('<p><strong>二</strong></p>', True),
+        ("", True),
+        ('<h1>一</h1>', True),
+        ('<pre><code>code\n</code></pre>', True),
+    ]
+    # Second pass is served from the cache
+    assert PandocRenderer.render_many(docs) == results
+    assert PandocRenderer.render_markdown_to_html("**二**") == ('<p><strong>二</strong></p>', True)
+    assert len(fake_pandoc) == 1
+
+
+def test_render_many_isolates_footnotes_and_recovers_from_swallowed_sentinel(fake_pandoc):
+    results = PandocRenderer.render_many(["正文[^1]\n\n[^1]: 脚注", "```\n未闭合代码块", "尾部"])
+
+    assert all(ok for _, ok in results)
+    # Unclosed fence swallows the separator: batch falls back to one process per document
+    assert "尾部" in results[2][0] and "尾部" not in results[1][0]
+    assert len(fake_pandoc) == 1 + 2 + 1
+
+
+def test_render_many_to_latex_splits_on_raw_latex_separator(monkeypatch):
+    calls = []
+
+    def run(markdown_content, timeout, to="html5"):
+        calls.append(to)
+        # Like pandoc: raw LaTeX blocks pass through, HTML comments would be dropped
+        out = markdown_content.replace("```{=latex}\n", "").replace("\n```", "")
+        return out.replace("**二**", "\\textbf{二}"), None
+
+    monkeypatch.setattr(PandocRenderer, "_run_pandoc", staticmethod(run))
+    monkeypatch.setattr(PandocRenderer, "_pandoc_checked", True)
+    PandocRenderer.clear_cache()
+    try:
+        results = PandocRenderer.render_many(["一", "**二**", ""], to="latex")
+
+        assert calls == ["latex"]
+        assert results == [("一", True), ("\\textbf{二}", True), ("", True)]
+        # LaTeX and HTML results are cached separately
+        assert PandocRenderer.render_latex("一") == ("一", True)
+        assert calls == ["latex"]
+    finally:
+        PandocRenderer.clear_cache()
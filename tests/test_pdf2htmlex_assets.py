@@ -0,0 +1,73 @@
+import base64
+import json
+
+import fitz
+
+from app.services import pdf_processor
+
+FONT = base64.b64encode(b"wOFF fake font").decode("ascii")
+IMAGE = base64.b64encode(b"\x89PNG fake image").decode("ascii")
+CSS = (
+    ".pf{position:relative;}.w0{width:600px;}.h0{height:800px;}"
+    f"@font-face{{font-family:ff1;src:url('data:application/font-woff;base64,{FONT}')format(\"woff\");}}"
+    ".ff1{font-family:ff1;}"
+)
+
+
+def _page(n: int) -> str:
+    return (
+        f'<div id="pf{n:x}" class="pf w0 h0" data-page-no="{n:x}"><div class="pc pc{n:x} w0 h0">'
+        f'<img class="bi x0 y0 w1 h1" alt="" src="data:image/png;base64,{IMAGE}"/>'
+        f'<div class="t m0 x0 h1 y0 ff1">第{n}页</div></div></div>'
+    )
+
+
+def test_split_mode_writes_fonts_images_and_page_fragments(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        pdf_processor, "_convert_pdf_to_html_pdf2htmlex",
+        lambda src_bytes: (CSS, [_page(n) for n in (1, 2, 3)], None),
+    )
+    doc = fitz.open()
+    doc.new_page()
+    assets = tmp_path / "deck_assets"
+
+    html = pdf_processor.generate_html_pdf2htmlex_document(
+        doc.tobytes(), {0: "讲解"}, embed_images=False,
+        assets_dir=str(assets), assets_url="deck_assets",
+    )
+
+    assert "base64" not in html and "第2页" not in html
+    names = sorted(p.name for p in assets.iterdir())
+    # One font and one (shared) background image, one fragment per page
+    assert [n.split("-")[0] for n in names] == ["font", "img", "page", "page", "page"]
+    font_name = next(n for n in names if n.startswith("font-"))
+    assert f"url('deck_assets/{font_name}')" in html
+    # Sized empty shells in the HTML, content loaded from the fragments
+    assert html.count('data-fragment="deck_assets/page-000') == 3
+    assert '<div id="pf2" class="pf w0 h0" data-page-no="2"></div>' in html
+
+    script = (assets / "page-0002.js").read_text(encoding="utf-8")
+    prefix = "window.__pdf2htmlexPage && window.__pdf2htmlexPage(2, "
+    assert script.startswith(prefix)
+    fragment = json.loads(script[len(prefix):].rstrip().rstrip(";").rstrip(")"))
+    assert "第2页" in fragment and 'src="deck_assets/img-' in fragment
+    assert (assets / names[1]).read_bytes() == b"\x89PNG fake image"
+
+
+def test_split_removes_pages_left_by_a_longer_document(tmp_path, monkeypatch):
+    assets = tmp_path / "deck_assets"
+    doc = fitz.open()
+    doc.new_page()
+    src_bytes = doc.tobytes()
+
+    for pages in ((1, 2, 3), (1,)):
+        monkeypatch.setattr(
+            pdf_processor, "_convert_pdf_to_html_pdf2htmlex",
+            lambda src_bytes, pages=pages: (CSS, [_page(n) for n in pages], None),
+        )
+        pdf_processor.generate_html_pdf2htmlex_document(
+            src_bytes, {}, embed_images=False, assets_dir=str(assets), assets_url="deck_assets",
+        )
+
+    assert sorted(p.name.split("-")[0] for p in assets.iterdir()) == ["font", "img", "page"]
+    assert (assets / "page-0001.js").exists()
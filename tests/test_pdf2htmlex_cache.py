@@ -0,0 +1,87 @@
+import os
+import time
+
+from app.services import pdf_processor
+from app.services.pdf2htmlex_cache import Pdf2htmlEXCache
+
+
+def test_round_trip_per_page_entries_and_lru_eviction(tmp_path):
+    cache = Pdf2htmlEXCache(str(tmp_path), max_bytes=10 ** 9)
+    pages = [f'<div class="pf">第{i}页 ' + "x" * 500 + "</div>" for i in range(3)]
+    key = Pdf2htmlEXCache.make_key(b"%PDF-a", zoom=1.3)
+
+    assert cache.get(key) is None
+    cache.put(key, ".ff1{font-family:ff1}", pages)
+    assert cache.get(key) == (".ff1{font-family:ff1}", pages)
+    assert cache.get_page(key, 2) == pages[2]
+    assert sorted(os.listdir(tmp_path / key)) == ["manifest.json", "p0001.html.gz", "p0002.html.gz",
+                                                  "p0003.html.gz", "style.css.gz"]
+
+    # Over budget: the least recently used conversion goes first
+    other = Pdf2htmlEXCache.make_key(b"%PDF-b")
+    cache.put(other, "", pages)
+    old = time.time() - 100
+    os.utime(tmp_path / key / "manifest.json", (old, old))
+    cache.max_bytes = 1
+    cache.evict()
+    assert cache.get(key) is None
+
+
+def test_conversion_is_served_from_cache(tmp_path, monkeypatch):
+    cache = Pdf2htmlEXCache(str(tmp_path))
+    monkeypatch.setattr(pdf_processor, "get_pdf2htmlex_cache", lambda: cache)
+    runs = []
+
+    def convert(src_bytes, workers=None):
+        runs.append(src_bytes)
+        return "css", ["<div>1</div>"], None
+
+    monkeypatch.setattr(pdf_processor, "_run_pdf2htmlex_conversion", convert)
+
+    first = pdf_processor._convert_pdf_to_html_pdf2htmlex(b"%PDF-same")
+    second = pdf_processor._convert_pdf_to_html_pdf2htmlex(b"%PDF-same")
+
+    assert first == second == ("css", ["<div>1</div>"], None)
+    assert len(runs) == 1
+
+
+def test_key_ignores_how_the_conversion_was_split(tmp_path, monkeypatch):
+    cache = Pdf2htmlEXCache(str(tmp_path))
+    runs = []
+    monkeypatch.setattr(pdf_processor, "get_pdf2htmlex_cache", lambda: cache)
+
+    def chunk_count(src_bytes, workers=None):
+        raise AssertionError("cache lookups must not analyze the PDF")
+
+    def convert(src_bytes, workers=None):
+        runs.append(workers)
+        return "css", [f"<div>{workers}</div>"], None
+
+    monkeypatch.setattr(pdf_processor, "_pdf2htmlex_chunk_count", chunk_count)
+    monkeypatch.setattr(pdf_processor, "_run_pdf2htmlex_conversion", convert)
+
+    # Another worker setting (or CPU count) reuses the stored conversion
+    assert pdf_processor._convert_pdf_to_html_pdf2htmlex(b"%PDF-same", workers=1)[1] == ["<div>1</div>"]
+    assert pdf_processor._convert_pdf_to_html_pdf2htmlex(b"%PDF-same", workers=3)[1] == ["<div>1</div>"]
+    assert runs == [1]
+    assert len(os.listdir(tmp_path)) == 1
+    assert Pdf2htmlEXCache.make_key(b"%PDF-a", zoom=1.3) != Pdf2htmlEXCache.make_key(b"%PDF-a", zoom=2)
+
+
+def test_failed_eviction_does_not_fail_put(tmp_path, monkeypatch):
+    cache = Pdf2htmlEXCache(str(tmp_path))
+    # A staging directory that disappears while evict() looks at it
+    (tmp_path / ".gone.tmp").mkdir()
+    real_getmtime = os.path.getmtime
+
+    def getmtime(path):
+        if str(path).endswith(".tmp"):
+            raise FileNotFoundError(path)
+        return real_getmtime(path)
+
+    monkeypatch.setattr(os.path, "getmtime", getmtime)
+    assert cache.evict() == 0
+
+    monkeypatch.setattr(cache, "evict", lambda: (_ for _ in ()).throw(OSError("busy")))
+    cache.put("key", "css", ["<div></div>"])
+    assert cache.get("key") == ("css", ["<div></div>"])
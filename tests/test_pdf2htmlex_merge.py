@@ -0,0 +1,57 @@
+from app.services.html_pdf2htmlex_generator import HTMLPdf2htmlEXGenerator
+
+BASE_CSS = ".pf{position:relative;background-color:#fff;}\n.t{position:absolute;white-space:pre;}"
+
+
+def _chunk(page_numbers, font_src, x_left):
+    css = "\n".join([
+        BASE_CSS,
+        f"@font-face{{font-family:ff1;src:url('{font_src}');}}.ff1{{font-family:ff1;line-height:0.9;}}",
+        f".x0{{left:{x_left}px;}}",
+        "@media print{",
+        f".x0{{left:{x_left}pt;}}",
+        "}",
+    ])
+    pages = [
+        f'<div id="pf{n:x}" class="pf w0 h0" data-page-no="{n:x}">'
+        f'<div class="pc pc{n:x} w0 h0"><div class="t m0 x0 h1 y2 ff1 fs0 fc0 sc0 ls0 ws0">p{n}'
+        f'<span class="_ _0"></span></div></div></div>'
+        for n in page_numbers
+    ]
+    return css, pages
+
+
+def test_merge_renames_generated_classes_of_later_chunks():
+    css, pages = HTMLPdf2htmlEXGenerator.merge_pdf2htmlex_chunks([
+        _chunk([1, 2], "data:font/a", 10),
+        _chunk([3], "data:font/b", 20),
+    ])
+
+    assert len(pages) == 3
+    # First chunk is untouched
+    assert 'class="t m0 x0 h1 y2 ff1 fs0 fc0 sc0 ls0 ws0"' in pages[0]
+    # Later chunks use suffixed generated classes; fixed classes stay as they are
+    assert 'class="pf w0-k1 h0-k1"' in pages[2]
+    assert 'class="pc pc3 w0-k1 h0-k1"' in pages[2]
+    assert 'class="t m0-k1 x0-k1 h1-k1 y2-k1 ff1-k1 fs0-k1 fc0-k1 sc0-k1 ls0-k1 ws0-k1"' in pages[2]
+    assert 'class="_ _0-k1"' in pages[2]
+
+    assert "@font-face{font-family:ff1-k1;src:url('data:font/b');}.ff1-k1{font-family:ff1-k1;" in css
+    assert ".x0-k1{left:20px;}" in css
+    # Base CSS appears once, print rules are kept for both chunks
+    assert css.count(".pf{position:relative") == 1
+    assert css.count("@media print{") == 2
+    assert ".x0{left:10pt;}" in css and ".x0-k1{left:20pt;}" in css
+    assert "#fff" in css
+
+
+def test_merge_dedupes_minified_base_css():
+    minified = BASE_CSS.replace("\n", "")
+    css, _ = HTMLPdf2htmlEXGenerator.merge_pdf2htmlex_chunks([
+        (minified + ".x0{left:1px;}", ["<div></div>"]),
+        (minified + ".x0{left:2px;}", ["<div></div>"]),
+    ])
+
+    assert css.count(".pf{position:relative") == 1
+    assert css.count(".t{position:absolute") == 1
+    assert ".x0{left:1px;}" in css and ".x0-k1{left:2px;}" in css
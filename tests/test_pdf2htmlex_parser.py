@@ -0,0 +1,51 @@
+import re
+
+import pytest
+from bs4 import BeautifulSoup
+
+from app.services.html_pdf2htmlex_generator import HTMLPdf2htmlEXGenerator, scan_pdf2htmlex_html
+
+PAGES = [
+    '<div id="pf1" class="pf w0 h0" data-page-no="1"><div class="pc pc1 w0 h0">'
+    '<div class="t m0 x0 h1 y0 ff1">第一页<span class="_ _0"></span></div></div>'
+    '<div class="pi" data-data=\'{"ctm":[1,0,0,1,0,0]}\'></div></div>',
+    '<DIV id="pf2" class="pf w0 h0" data-page-no="2"><div class="pc pc2 w0 h0">'
+    '<img class="bi x0 y0" src="data:image/png;base64,AAAA"/><div class="t">二</div></div></DIV>',
+]
+HTML = (
+    '<!DOCTYPE html><html><head><style type="text/css">.pf{position:relative}</style>\n'
+    '<script>var s = "<style>not css</style>"; var d = \'<div class="pf">\';</script>'
+    '<STYLE>@font-face{font-family:ff1;src:url(data:font/woff;base64,QUJD)}</STYLE></head>'
+    '<body><div id="sidebar"><div class="pf">outline</div></div>\n<div id="page-container">\n'
+    + "\n".join(PAGES) +
+    '\n</div><div class="loading-indicator"><div class="pf">x</div></div></body></html>'
+)
+
+
+def _normalized(markup):
+    """Markup re-serialized by BeautifulSoup (sorted attributes, lowercase tags), whitespace collapsed."""
+    return re.sub(r"\s+", " ", str(BeautifulSoup(markup, "html.parser"))).strip()
+
+
+@pytest.mark.parametrize("chunk_size", [5, 64, 1 << 20])
+def test_scanner_extracts_styles_and_exact_page_fragments(tmp_path, chunk_size):
+    path = tmp_path / "output.html"
+    path.write_text(HTML, encoding="utf-8")
+
+    css_blocks, pages = scan_pdf2htmlex_html(str(path), chunk_size=chunk_size)
+
+    assert css_blocks == [".pf{position:relative}", "@font-face{font-family:ff1;src:url(data:font/woff;base64,QUJD)}"]
+    assert pages == PAGES
+
+
+def test_parse_matches_beautifulsoup_result(tmp_path):
+    path = tmp_path / "output.html"
+    path.write_text(HTML, encoding="utf-8")
+
+    css, pages, error = HTMLPdf2htmlEXGenerator.parse_pdf2htmlex_html(str(path))
+    soup_css, soup_pages, _ = HTMLPdf2htmlEXGenerator._parse_pdf2htmlex_html_soup(str(path))
+
+    assert error is None
+    assert css == soup_css
+    assert len(pages) == len(soup_pages) == 2
+    assert [_normalized(page) for page in pages] == [_normalized(page) for page in soup_pages]
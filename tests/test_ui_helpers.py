@@ -37,3 +37,91 @@ def test_validate_file_upload_accepts_when_api_key_present():
 
     assert is_valid
     assert message is None
+
+
+class RecordingTracker:
+    def __init__(self):
+        self.progress = []
+
+    def force_render(self):
+        pass
+
+    def render(self):
+        pass
+
+    def start_file(self, filename):
+        pass
+
+    def update_file_stage(self, filename, stage_index):
+        pass
+
+    def update_file_page_progress(self, filename, done, total):
+        self.progress.append((filename, done, total))
+
+
+def test_run_batch_via_queue_polls_jobs_until_workers_finish(tmp_path):
+    import io
+    import threading
+    import time
+
+    from app.services.job_queue import JobQueue
+    from app.ui_helpers import run_batch_via_queue
+
+    queue = JobQueue(str(tmp_path / "queue.db"))
+    upload = io.BytesIO(b"%PDF-1")
+    upload.name = "deck.pdf"
+    results = {}
+
+    def worker():
+        while (job := queue.claim("w1")) is None:
+            time.sleep(0.01)
+        queue.report_progress(job["id"], 1, 2, "w1")
+        queue.fail(job["id"], "boom", worker="w1")
+
+    queue.worker_heartbeat("w1")
+    thread = threading.Thread(target=worker)
+    thread.start()
+    run_batch_via_queue(queue, [upload], {"api_key": "secret"}, RecordingTracker(),
+                        results.__setitem__, poll_interval=0.01)
+    thread.join()
+
+    assert results == {"deck.pdf": {"status": "failed", "explanations": {}, "failed_pages": [], "error": "boom"}}
+
+
+def test_run_batch_via_queue_gives_up_without_live_workers(tmp_path):
+    import io
+
+    from app.services.job_queue import JobQueue
+    from app.ui_helpers import run_batch_via_queue
+
+    queue = JobQueue(str(tmp_path / "queue.db"))
+    upload = io.BytesIO(b"%PDF-1")
+    upload.name = "deck.pdf"
+    results = {}
+
+    run_batch_via_queue(queue, [upload], {"api_key": "secret"}, RecordingTracker(),
+                        results.__setitem__, poll_interval=0.01)
+
+    assert results["deck.pdf"]["status"] == "failed"
+    assert "worker" in results["deck.pdf"]["error"]
+    assert queue.list_jobs()[0]["status"] == "cancelled"
+
+
+def test_run_batch_via_queue_gives_up_when_jobs_stall(tmp_path):
+    import io
+
+    from app.services.job_queue import JobQueue
+    from app.ui_helpers import run_batch_via_queue
+
+    queue = JobQueue(str(tmp_path / "queue.db"))
+    upload = io.BytesIO(b"%PDF-1")
+    upload.name = "deck.pdf"
+    results = {}
+    # A live worker that never claims the job (e.g. stuck on another job)
+    queue.worker_heartbeat("w1")
+
+    run_batch_via_queue(queue, [upload], {"api_key": "secret"}, RecordingTracker(),
+                        results.__setitem__, poll_interval=0.01, stall_timeout=0.1)
+
+    assert results["deck.pdf"]["status"] == "failed"
+    assert "没有进展" in results["deck.pdf"]["error"]
@@ -0,0 +1,20 @@
+from app.services import vendor_assets
+from app.services.html_renderer import HtmlRenderer
+
+
+def test_vendored_files_are_inlined_and_missing_ones_use_the_cdn(tmp_path, monkeypatch):
+    (tmp_path / "mathjax").mkdir()
+    (tmp_path / "mathjax" / "tex-svg.js").write_text("var s = '</script>';", encoding="utf-8")
+    monkeypatch.setattr(vendor_assets, "VENDOR_DIR", str(tmp_path))
+    vendor_assets.read_asset.cache_clear()
+    try:
+        doc = HtmlRenderer._build_html_document("<p>$x$</p>", ".a{}", "white", mathjax=True, prism=True)
+    finally:
+        vendor_assets.read_asset.cache_clear()
+
+    assert "<script>var s = '<\\/script>';</script>" in doc
+    assert "cdn.jsdelivr.net/npm/mathjax" not in doc
+    assert 'src="https://cdn.jsdelivr.net/npm/prismjs@1.29.0/prism.min.js"' in doc
+    assert "startup: { typeset: false }" in doc
+    assert '<style id="fragment-css">.a{}</style>' in doc
+    assert "window.__renderFragment" in doc
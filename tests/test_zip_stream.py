@@ -0,0 +1,94 @@
+import io
+import threading
+import zipfile
+
+import pytest
+
+from app.services.zip_stream import StreamingZipWriter
+from app.ui_helpers import add_result_to_zip, start_zip_cache
+
+
+def _open(download):
+    return zipfile.ZipFile(io.BytesIO(download.getvalue()))
+
+
+def test_pdfs_are_stored_and_text_outputs_deflated():
+    writer = StreamingZipWriter()
+    writer.add_bytes("deck讲解版.pdf", b"%PDF-1.7 " * 1000)
+    writer.add_text("deck讲解文档.md", "# 讲解\n" * 1000)
+    writer.add_json("deck.json", {0: "讲解"})
+
+    download = writer.finish()
+
+    with _open(download) as zf:
+        assert zf.namelist() == ["deck讲解版.pdf", "deck讲解文档.md", "deck.json"]
+        assert zf.getinfo("deck讲解版.pdf").compress_type == zipfile.ZIP_STORED
+        assert zf.getinfo("deck讲解文档.md").compress_type == zipfile.ZIP_DEFLATED
+        assert zf.read("deck.json").decode("utf-8") == '{\n  "0": "讲解"\n}'
+    assert download.entries == 3
+    assert download.size == len(download.getvalue())
+
+
+def test_large_archives_spill_to_disk_and_stay_readable():
+    writer = StreamingZipWriter(spool_max_mb=1)
+    payloads = {f"deck{i}讲解版.pdf": bytes([i]) * 400_000 for i in range(5)}
+    # Results arrive from several worker threads
+    threads = [threading.Thread(target=writer.add_bytes, args=item) for item in payloads.items()]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    download = writer.finish()
+
+    assert download._file._rolled
+    with _open(download) as zf:
+        assert {name: zf.read(name) for name in zf.namelist()} == payloads
+
+
+def test_empty_batch_yields_no_download():
+    assert StreamingZipWriter().finish() is None
+
+
+def test_write_errors_surface_on_finish(tmp_path):
+    writer = StreamingZipWriter()
+    writer.write(str(tmp_path / "missing.png"), "missing.png")
+
+    with pytest.raises(FileNotFoundError):
+        writer.finish()
+
+
+def test_batch_results_are_packaged_per_output_mode():
+    writer = start_zip_cache()
+    add_result_to_zip(writer, "a.pdf", {"status": "completed", "pdf_bytes": b"%PDF", "explanations": {0: "x"}}, "PDF讲解版")
+    add_result_to_zip(writer, "b.pdf", {"status": "failed", "pdf_bytes": b"%PDF"}, "PDF讲解版")
+    add_result_to_zip(writer, "c.pdf", {"status": "completed", "pdf_bytes": b"%PDF"}, "PDF讲解版", include_json=False)
+
+    with _open(writer.finish()) as zf:
+        assert zf.namelist() == ["a讲解版.pdf", "a.json", "c讲解版.pdf"]
+
+
+def test_downloads_are_read_through_independent_readers():
+    writer = StreamingZipWriter()
+    writer.add_text("deck讲解文档.md", "# 讲解\n" * 1000)
+    download = writer.finish()
+
+    first, second = download.open(), download.open()
+    head = first.read(4)
+    whole = second.read()
+
+    assert head == b"PK\x03\x04"
+    assert first.read() == whole[4:]
+    assert len(whole) == download.size
+    download.close()
+
+
+def test_writer_is_aborted_when_the_batch_raises():
+    with pytest.raises(RuntimeError):
+        with start_zip_cache() as writer:
+            writer.add_text("deck讲解文档.md", "# 讲解")
+            raise RuntimeError("batch failed")
+
+    assert writer._file.closed
+    with pytest.raises(ValueError):
+        writer.add_text("late.md", "x")